@@ -0,0 +1,110 @@
+"""
+Benchmark da escrita e da leitura dos arquivos .rst ascii trocados com as rotinas externas.
+
+Compara a escrita valor a valor (implementacao antiga de leh_geotiff_escreve_ascii) com a escrita em blocos
+de modulos_files/rst_io.py e confirma que os dois arquivos gerados sao identicos byte a byte. Em seguida compara
+a leitura linha a linha (implementacao antiga de leh_rst_escreve_geotiff) com a leitura em blocos e, por fim,
+mede a escrita/leitura no formato binario e o tamanho do arquivo em relacao ao ascii.
+
+Uso:
+    python benchmarks/bench_rst_ascii.py [nlin] [ncol]
+"""
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modulos_files.rst_io import escreve_rst_ascii, escreve_rst_binario, le_rst_ascii, le_rst_binario  # noqa: E402
+
+
+def escreve_rst_ascii_loop(arquivo, dados, int_float):
+    '''Escrita valor a valor, como era feita em leh_geotiff_escreve_ascii'''
+    nlin, ncol = dados.shape
+    if int_float == 'int':
+        with open(arquivo, 'w') as arquivo_ascii:
+            for lin in range(0, nlin):
+                for col in range(0, ncol):
+                    arquivo_ascii.write(f'{str(int(dados[lin,col]))}\n')
+
+    elif int_float == 'float':
+        with open(arquivo, 'w') as arquivo_ascii:
+            for lin in range(nlin):
+                for col in range(ncol):
+                    arquivo_ascii.write(f'{str(float(dados[lin,col]))}\n')
+
+
+def le_rst_ascii_loop(arquivo, nlin, ncol, file_type):
+    '''Leitura linha a linha, como era feita em leh_rst_escreve_geotiff'''
+    rst_to_raster = np.zeros((nlin, ncol))
+    with open(arquivo, 'r') as arquivo_ascii:
+        for lin in range(nlin):
+            for col in range(ncol):
+                if file_type == 'int':
+                    rst_to_raster[lin, col] = int(arquivo_ascii.readline())
+                else:
+                    rst_to_raster[lin, col] = float(arquivo_ascii.readline())
+    return rst_to_raster
+
+
+def cronometra(funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    return time.perf_counter() - inicio
+
+
+def main(nlin=1000, ncol=1000):
+    rng = np.random.default_rng(0)
+    casos = {
+        'int (Int16)': (rng.integers(-500, 3000, (nlin, ncol)).astype(np.int16), 'int'),
+        'int (Float32)': ((rng.random((nlin, ncol)) * 2000 - 100).astype(np.float32), 'int'),
+        'float (Float32)': ((rng.random((nlin, ncol)) * 1500).astype(np.float32), 'float'),
+        'float (Float64)': (rng.normal(0, 1e3, (nlin, ncol)), 'float'),
+        'float (classes)': (rng.integers(30, 100, (nlin, ncol)).astype(np.float32), 'float'),
+    }
+
+    print(f'Raster: {nlin} x {ncol} ({nlin * ncol} pixels)')
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, (dados, int_float) in casos.items():
+            arquivo_loop = os.path.join(pasta, 'loop.rst')
+            arquivo_bloco = os.path.join(pasta, 'bloco.rst')
+
+            t_loop = cronometra(escreve_rst_ascii_loop, arquivo_loop, dados, int_float)
+            t_bloco = cronometra(escreve_rst_ascii, arquivo_bloco, dados, int_float)
+            identicos = filecmp.cmp(arquivo_loop, arquivo_bloco, shallow=False)
+
+            print(f'escrita {nome:<18} loop: {t_loop:8.3f}s  blocos: {t_bloco:8.3f}s  '
+                  f'ganho: {t_loop / t_bloco:6.1f}x  identicos: {identicos}')
+
+            inicio = time.perf_counter()
+            lido_loop = le_rst_ascii_loop(arquivo_loop, nlin, ncol, int_float)
+            t_loop = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            lido_bloco = le_rst_ascii(arquivo_bloco, nlin, ncol, int_float)
+            t_bloco = time.perf_counter() - inicio
+            iguais = np.array_equal(lido_loop, lido_bloco, equal_nan=True)
+
+            print(f'leitura {nome:<18} loop: {t_loop:8.3f}s  blocos: {t_bloco:8.3f}s  '
+                  f'ganho: {t_loop / t_bloco:6.1f}x  iguais: {iguais}')
+
+            arquivo_bin = os.path.join(pasta, 'binario.rst')
+            inicio = time.perf_counter()
+            tipo = escreve_rst_binario(arquivo_bin, dados, int_float)
+            t_escrita = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            lido_bin = le_rst_binario(arquivo_bin, nlin, ncol, tipo)
+            t_leitura = time.perf_counter() - inicio
+            iguais = np.array_equal(lido_bin, lido_bloco.astype(np.float32) if tipo == 'float32' else lido_bloco,
+                                    equal_nan=True)
+            razao = os.path.getsize(arquivo_bloco) / os.path.getsize(arquivo_bin)
+
+            print(f'binario {nome:<18} escrita: {t_escrita:8.3f}s  leitura: {t_leitura:8.3f}s  '
+                  f'tipo: {tipo:<7}  ascii/binario: {razao:4.1f}x  iguais: {iguais}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -25,7 +25,7 @@ from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt, QSettings, QTranslator, QCoreApplication, QUrl
 from qgis.PyQt.QtGui import QIcon, QIntValidator, QDoubleValidator, QFont, QPixmap, QDesktopServices
 from qgis.PyQt.QtWidgets import QApplication, QAction, QFileDialog, QMessageBox, QTableWidgetItem
-from qgis.core import QgsMapLayerProxyModel, Qgis, QgsProject, QgsMapLayer, QgsRasterLayer, QgsVectorLayer
+from qgis.core import QgsApplication, QgsMapLayerProxyModel, Qgis, QgsProject, QgsMapLayer, QgsRasterLayer, QgsVectorLayer
 import qgis.utils
 
 # Import the code for the dialog
@@ -34,11 +34,26 @@ import shutil
 import os
 import glob
 from .hidropixel_dialog import HidropixelDialog
+from .hidroPixel_task import HidropixelTask, MonitorProgresso, executa_motor, executa_rotina_externa
 from pathlib import Path
 from datetime import datetime
 # A importacao dos modulos contendo as variaveis
 from hidropixel.modulos_files.RDC_variables import RDCVariables
 from hidropixel.modulos_files.global_variables import GlobalVariables
+from hidropixel.modulos_files.conversion_cache import ConversionCache, TAMANHO_MAXIMO_PADRAO_MB
+from hidropixel.modulos_files.weights_cache import WeightsCache
+from hidropixel.modulos_files.excess_rainfall import executa_excess_rainfall
+from hidropixel.modulos_files.rainfall_interpolation import executa_rainfall_interpolation
+from hidropixel.modulos_files.travel_time import executa_travel_time
+from hidropixel.modulos_files.flow_routing import executa_flow_routing
+from hidropixel.modulos_files.pipeline import (
+    ParametrosExcessRainfall, ParametrosFlowRouting, ParametrosRainfallInterpolation, ParametrosTravelTime,
+    processa_chuva_media)
+from hidropixel.modulos_files.geotiff_io import OpcoesGeoTiff, PERFIL_COG, PERFIL_OTIMIZADO
+from hidropixel.modulos_files.raster_conversion import (
+    InfoRaster, converte_geotiff_rst, converte_rst_geotiff, executa_em_paralelo, janela_bacia)
+from hidropixel.modulos_files.rst_io import FORMATO_ASCII, FORMATO_BINARIO, FORMATOS_TROCA, le_rst_ascii
+from hidropixel.modulos_files.scratch_workspace import LimpezaAreas, PoliticaRetencao, raiz_trabalho
 
 # importa validacoes
 from .validations.validators import RasterValidator
@@ -52,11 +67,10 @@ from .resources import *
 
 # Importing libs
 import numpy as np
-import subprocess
 import sys
 import io
 
-from osgeo import ogr, gdal, gdalconst
+from osgeo import ogr
 from functools import wraps
 
 # Ensure sys.stderr is file-like: some hosts or wrappers can set it to None
@@ -115,6 +129,42 @@ class Hidropixel:
         self.global_vars = GlobalVariables(0, 0)
         self.rdc_vars = RDCVariables(0, 0)
 
+        # Formato dos arquivos .rst trocados com as rotinas externas: ascii (padrao) ou binario
+        self.formato_troca = QSettings().value('hidropixel/exchange_format', FORMATO_ASCII)
+        if self.formato_troca not in FORMATOS_TROCA:
+            self.formato_troca = FORMATO_ASCII
+
+        # Cache dos rasters convertidos para .rst: evita converter novamente os mesmos arquivos em cada rotina
+        self.cache_conversao = ConversionCache(
+            os.path.join(self.plugin_dir, 'temp', 'cache'),
+            QSettings().value('hidropixel/cache_size_mb', TAMANHO_MAXIMO_PADRAO_MB, type=int))
+
+        # Cache das matrizes de pesos da interpolacao da chuva: reutilizadas enquanto os postos e a bacia nao mudam
+        self.pasta_cache_pesos = os.path.join(self.plugin_dir, 'temp', 'cache', 'weights')
+
+        # Quantidade de threads usadas nas conversoes dos rasters (0 = quantidade de processadores)
+        self.num_workers = QSettings().value('hidropixel/workers', 0, type=int)
+
+        # Altura das faixas de linhas lidas dos rasters (0 = definida pelo bloco nativo de cada arquivo)
+        self.linhas_por_bloco = QSettings().value('hidropixel/block_rows', 0, type=int)
+
+        # Recorte dos rasters na extensao da bacia (mais uma margem em pixels) antes do envio para as rotinas externas
+        self.recorta_bacia = QSettings().value('hidropixel/crop_to_watershed', False, type=bool)
+        self.margem_recorte = QSettings().value('hidropixel/crop_margin', 5, type=int)
+        self.janela_recorte = None
+
+        # Opcoes de criacao dos GeoTIFFs de saida: perfil (plain, optimized ou cog), compressao, nodata e overviews
+        self.opcoes_geotiff = self.carrega_opcoes_geotiff()
+
+        # Areas de trabalho: cada execucao escreve os seus arquivos em uma pasta propria dentro da raiz (que pode apontar
+        # para um tmpfs ou um SSD local); as pastas sao removidas em segundo plano segundo a politica de retencao
+        self.limpeza_trabalho = LimpezaAreas(
+            raiz_trabalho(QSettings().value('hidropixel/scratch_root', ''),
+                          os.path.join(self.plugin_dir, 'temp', 'runs')),
+            PoliticaRetencao(QSettings().value('hidropixel/scratch_keep_done', False, type=bool),
+                             QSettings().value('hidropixel/scratch_keep_failed', 3, type=int),
+                             QSettings().value('hidropixel/scratch_max_age_hours', 24.0, type=float) * 3600))
+
         # Seleciona o diretorio atual do plugin
         file_path = os.path.dirname(__file__)
 
@@ -158,6 +208,12 @@ class Hidropixel:
         self.dlg_save_project_exc_rain = uic.loadUi(ui_file6)
         self.dlg_save_project_flow_rout = uic.loadUi(ui_file7)
 
+        # Motores nativos (Python): marcados por padrao fora do Windows, onde as rotinas externas (.exe) nao executam
+        self.dlg_exc_rain.ch_native_pg1.setChecked(sys.platform != 'win32')
+        self.dlg_exc_rain.ch_native_pg_ri.setChecked(sys.platform != 'win32')
+        self.dlg_flow_tt.ch_native_pg1.setChecked(sys.platform != 'win32')
+        self.dlg_flow_rout.ch_native_pg1.setChecked(sys.platform != 'win32')
+
         # Cria outras variaveis necessarias
         self.save_result = None
         self.fn_n_conect_dren = None
@@ -206,6 +262,10 @@ class Hidropixel:
         self.output2_flow_rout = ''
         self.output3_flow_rout = ''
         self.output4_flow_rout = ''
+        # Tarefas do gerenciador de tarefas do QGIS em execucao: modulo -> conjunto de HidropixelTask (uma tarefa
+        # cancelada continua no conjunto ate terminar, mesmo que uma nova execucao do modulo ja tenha sido iniciada)
+        self.tarefas_ativas = {}
+
         self.output5_flow_rout = ''
         self.highlighted_style = "background-color: rgb(173, 216, 230)"
         self.validations = {}
@@ -220,15 +280,18 @@ class Hidropixel:
 
         self._connect_buttons()
 
-        # Cria pasta para salvar os arquivos temporários
-        os.makedirs(os.path.join(self.diretorio_atual,
-                    'temp/maps'), exist_ok=True)
-        os.makedirs(os.path.join(self.diretorio_atual,
-                    'temp/hydrographs'), exist_ok=True)
-        os.makedirs(os.path.join(self.diretorio_atual,
-                    'temp/tv_for_each_poi'), exist_ok=True)
+        # Cria pasta para salvar as tabelas editadas nos dialogos (os arquivos de cada execucao ficam na sua area de trabalho)
+        os.makedirs(os.path.join(self.diretorio_atual, 'temp'), exist_ok=True)
 
     def _connect_buttons(self):
+        # Botoes cancel das paginas de log: conectados uma unica vez, cancelam a tarefa em execucao do modulo
+        self.dlg_flow_tt.btn_cancel_log.clicked.connect(lambda: self.cancela_tarefa(
+            'flow_tt', self.dlg_flow_tt.te_logg, self.dlg_flow_tt.pg_par_ftt, self.dlg_flow_tt.pg_log_ftt))
+        self.dlg_exc_rain.btn_cancel_log.clicked.connect(lambda: self.cancela_tarefa(
+            'exc_rain', self.dlg_exc_rain.te_logg, self.dlg_exc_rain.pg_par_exc_rain, self.dlg_exc_rain.pg_log_exc_rain))
+        self.dlg_flow_rout.btn_cancel_log.clicked.connect(lambda: self.cancela_tarefa(
+            'flow_rout', self.dlg_flow_rout.te_logg, self.dlg_flow_rout.pg_par_f_rout, self.dlg_flow_rout.pg_log_f_rout))
+
         # Conexoes da aba Flow Travel Time
         self.dlg_flow_tt.btn_6_pg3.clicked.connect(
             lambda: self.validator.validar_raster_bacia(
@@ -397,6 +460,48 @@ class Hidropixel:
             callback=self.run,
             parent=self.iface.mainWindow())
 
+        # Opcao do menu para trocar arquivos binarios com as rotinas externas
+        action = self.add_action(
+            icon_path,
+            text=self.tr(u'Binary exchange files'),
+            callback=self.alterna_formato_troca,
+            add_to_toolbar=False,
+            status_tip=self.tr(u'Exchange raw binary .rst files with the external routines instead of ascii'),
+            parent=self.iface.mainWindow())
+        action.setCheckable(True)
+        action.setChecked(self.formato_troca == FORMATO_BINARIO)
+
+        # Opcao do menu para recortar os rasters na extensao da bacia
+        action = self.add_action(
+            icon_path,
+            text=self.tr(u'Crop to watershed extent'),
+            callback=self.alterna_recorte_bacia,
+            add_to_toolbar=False,
+            status_tip=self.tr(u'Send only the watershed bounding box (plus a margin) to the external routines'),
+            parent=self.iface.mainWindow())
+        action.setCheckable(True)
+        action.setChecked(self.recorta_bacia)
+
+        # Opcao do menu para gerar as saidas como Cloud-Optimized GeoTIFF
+        action = self.add_action(
+            icon_path,
+            text=self.tr(u'Cloud-Optimized GeoTIFF outputs'),
+            callback=self.alterna_perfil_cog,
+            add_to_toolbar=False,
+            status_tip=self.tr(u'Write the output maps as Cloud-Optimized GeoTIFFs instead of tiled GeoTIFFs'),
+            parent=self.iface.mainWindow())
+        action.setCheckable(True)
+        action.setChecked(self.opcoes_geotiff.perfil == PERFIL_COG)
+
+        # Opcao do menu para apagar os arquivos convertidos armazenados na cache
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Clear conversion cache'),
+            callback=self.limpa_cache_conversao,
+            add_to_toolbar=False,
+            status_tip=self.tr(u'Delete the converted input rasters reused between the Hidropixel routines'),
+            parent=self.iface.mainWindow())
+
         # will be set False in run()
         self.first_start = False
 
@@ -430,12 +535,16 @@ class Hidropixel:
                 # ignore failures during shutdown
                 pass
 
-        # If you have background threads or subprocesses, signal them to stop here.
-        # Example:
-        # if hasattr(self, 'worker_thread'):
-        #     self.worker_thread.requestInterruption()
-        #     self.worker_thread.quit()
-        #     self.worker_thread.wait()
+        # Cancela as tarefas do Hidropixel ainda em execucao no gerenciador de tarefas do QGIS
+        for tarefa in [tarefa for tarefas in getattr(self, 'tarefas_ativas', {}).values() for tarefa in tarefas]:
+            try:
+                tarefa.cancel()
+            except Exception:
+                pass
+
+        # Encerra a thread de limpeza das areas de trabalho (as remocoes pendentes sao retomadas na proxima abertura)
+        if getattr(self, 'limpeza_trabalho', None) is not None:
+            self.limpeza_trabalho.encerra(aguardar=False)
 
         # Remove UI actions and toolbar icons
         try:
@@ -1636,15 +1745,15 @@ class Hidropixel:
                     if reply == QMessageBox.Ok:
                         break
 
-    def save_table_to_file(self, table):
+    def save_table_to_file(self, table, pasta):
         '''Esta funcao le as informacoes adicionadas as tabelas e as armazena em um arquivo, sendo essas para leitura do visual basic
             table == 1: a tabela de referencia e a tabelea das caracteristicas da rede de drenagem
-            table == 2 referencia a tabela das classes e coeficientes de manning.'''
+            table == 2 referencia a tabela das classes e coeficientes de manning.
+            pasta = pasta da area de trabalho da execucao, onde o arquivo e escrito'''
 
         if table == 1:
-            # Solicita um local de salvamento para o usuario
-            self.file_name_tb1 = self.diretorio_atual + \
-                r'\temp' + r'\segment_characteristics.txt'
+            # O arquivo e escrito na area de trabalho da execucao: execucoes simultaneas nao compartilham as tabelas
+            self.file_name_tb1 = os.path.join(pasta, 'segment_characteristics.txt')
             if self.file_name_tb1:
                 # seleciona as dimensoes da tabela
                 nlin_tb1 = self.dlg_flow_tt.tbw_1_pg2.rowCount()
@@ -1666,7 +1775,7 @@ class Hidropixel:
                         arquivo_txt_csv.write('\n')
 
         elif table == 2:
-            self.file_name_tb2 = self.diretorio_atual + r'\temp' + r'\surface_roughness.txt'
+            self.file_name_tb2 = os.path.join(pasta, 'surface_roughness.txt')
             if self.file_name_tb2:
                 # seleciona as dimensoes da tabela
                 nlin_tb1 = self.dlg_flow_tt.tbw_2_pg2.rowCount()
@@ -1922,135 +2031,162 @@ class Hidropixel:
             # nao sei o motivo de nao ter funcionado para a segunda tabela. mas funcionou e deixei assim
             a = True
 
+    def alterna_formato_troca(self, checked):
+        '''Esta funcao define o formato dos arquivos .rst trocados com as rotinas externas e salva a escolha nas configuracoes do QGIS'''
+        self.formato_troca = FORMATO_BINARIO if checked else FORMATO_ASCII
+        QSettings().setValue('hidropixel/exchange_format', self.formato_troca)
+
+    def alterna_recorte_bacia(self, checked):
+        '''Esta funcao ativa/desativa o recorte dos rasters na extensao da bacia e salva a escolha nas configuracoes do QGIS'''
+        self.recorta_bacia = bool(checked)
+        QSettings().setValue('hidropixel/crop_to_watershed', self.recorta_bacia)
+
+    def carrega_opcoes_geotiff(self):
+        '''Esta funcao le as opcoes de criacao dos GeoTIFFs salvas nas configuracoes do QGIS. Valores invalidos usam o perfil optimized'''
+        nodata = QSettings().value('hidropixel/geotiff_nodata', '')
+        try:
+            return OpcoesGeoTiff(
+                QSettings().value('hidropixel/geotiff_profile', PERFIL_OTIMIZADO),
+                QSettings().value('hidropixel/geotiff_compression', 'DEFLATE'),
+                float(nodata) if nodata not in ('', None) else None,
+                QSettings().value('hidropixel/geotiff_overviews', True, type=bool))
+        except ValueError:
+            return OpcoesGeoTiff()
+
+    def alterna_perfil_cog(self, checked):
+        '''Esta funcao alterna os GeoTIFFs de saida entre os perfis cog e optimized e salva a escolha nas configuracoes do QGIS'''
+        self.opcoes_geotiff.perfil = PERFIL_COG if checked else PERFIL_OTIMIZADO
+        QSettings().setValue('hidropixel/geotiff_profile', self.opcoes_geotiff.perfil)
+
+    def define_janela_recorte(self, arquivo_bacia):
+        '''Esta funcao define a janela de recorte (extensao da bacia mais a margem) usada na conversao de todos os rasters da rotina.
+            Sem a opcao de recorte, ou sem pixels da bacia, os rasters sao convertidos por completo'''
+        self.janela_recorte = None
+        if self.recorta_bacia:
+            self.janela_recorte = janela_bacia(arquivo_bacia, self.margem_recorte, self.linhas_por_bloco)
+
+    def limpa_cache_conversao(self):
+        '''Esta funcao apaga os arquivos convertidos armazenados na cache e informa o espaco liberado'''
+        liberado = self.cache_conversao.limpa()
+        if os.path.isdir(self.pasta_cache_pesos):
+            liberado += WeightsCache(self.pasta_cache_pesos).limpa()
+        QMessageBox.information(
+            None, "Information", f"Conversion cache cleared ({liberado / (1024 * 1024):.1f} MB freed).")
+
     def leh_geotiff_escreve_ascii(self, arquivo, arquivo2, int_float, mapa_classes='n'):
-        '''Esta funcao realiza a leitura do arquivo .tif enviado pelo user e o converte em .rst tipo ascii para leitura no visual basic
+        '''Esta funcao realiza a leitura do arquivo .tif enviado pelo user e o converte em .rst (ascii ou binario, conforme self.formato_troca) para leitura no visual basic
             arquivo1 = diretorio do arquivo arquivo raster tiff
-            arquivo2 = arquivo raster tipo rst ascii (sera criado)'''
-
-        # Le o arquivo .tiff enviado
-        raster_enviado = gdal.Open(arquivo)
-
-        # Lendo os dados raster como um array
-        dados_lidos = raster_enviado.GetRasterBand(1).ReadAsArray()
-
-        # Tratamento de erro: verifica se o arquivo foi aberto corretamente
-        if raster_enviado is not None:
-            # Obtencao da dimensao da imagem raster
-            self.rdc_vars.nlin = raster_enviado.RasterYSize
-            self.rdc_vars.ncol = raster_enviado.RasterXSize
-            self.rdc_vars.geotransform = raster_enviado.GetGeoTransform()
-            self.rdc_vars.projection = raster_enviado.GetProjection()
-
-            self.rdc_vars.resolucao = self.rdc_vars.geotransform[1]
-
-            # Coordenadas da celula lin = 0, col = 0
-            self.x_min = self.rdc_vars.geotransform[0]
-            self.y_max = self.rdc_vars.geotransform[3]
-
-            # Captura resolucoes espaciais da imagem (sentido vertical e horizontal)
-            self.dx = self.rdc_vars.geotransform[1]
-            self.dy = self.rdc_vars.geotransform[5]
-
-            # Coordenadas do canto inferior direito
-            self.x_max = self.x_min + (self.rdc_vars.ncol * self.dx)
-            self.y_min = self.y_max + (self.rdc_vars.nlin * self.dy)
-
-        # Leitura do arquivo ascii
-        if int_float == 'int':
-            with open(arquivo2, 'w') as arquivo_ascii:
-                for lin in range(0, self.rdc_vars.nlin):
-                    for col in range(0, self.rdc_vars.ncol):
-                        arquivo_ascii.write(
-                            f'{str(int(dados_lidos[lin,col]))}\n')
-
-        elif int_float == 'float':
-            with open(arquivo2, 'w') as arquivo_ascii:
-                for lin in range(self.rdc_vars.nlin):
-                    for col in range(self.rdc_vars.ncol):
-                        arquivo_ascii.write(
-                            f'{str(float(dados_lidos[lin,col]))}\n')
-
-        arquivo2_doc = arquivo2.replace('.rst', '.rdc')
-        with open(arquivo2_doc, 'w', encoding='utf-8') as arquivo_rdc:
-            arquivo_rdc.write('Raster Informations\n')
-            arquivo_rdc.write(f'Rows,{self.rdc_vars.nlin}\n')
-            arquivo_rdc.write(f'Columns,{self.rdc_vars.ncol}\n')
-            arquivo_rdc.write(
-                f'resolution,{np.abs(self.rdc_vars.resolucao)}\n')
-            arquivo_rdc.write(f'resolution (X),{self.dx}\n')
-            arquivo_rdc.write(f'resolution (Y),{self.dy}\n')
-            arquivo_rdc.write(f'Min_X,{self.x_min}\n')
-            arquivo_rdc.write(f'Max_X,{self.x_max}\n')
-            arquivo_rdc.write(f'Min_Y,{self.y_min}\n')
-            arquivo_rdc.write(f'Max_Y,{self.y_max}\n')
-            if mapa_classes == 'y':
-                # Determina quantidade de classes
-                qtd_classes = len(np.unique(dados_lidos[dados_lidos != 0]))
-                arquivo_rdc.write(f'watershed_classes,{qtd_classes}\n')
+            arquivo2 = arquivo raster tipo rst (sera criado)'''
+        info = converte_geotiff_rst(
+            arquivo, arquivo2, int_float, mapa_classes, self.formato_troca, self.cache_conversao, self.janela_recorte,
+            self.linhas_por_bloco)
+        self.aplica_info_raster(info)
+
+    def aplica_info_raster(self, info):
+        '''Esta funcao atualiza as variaveis do rdc com as informacoes da grade do raster convertido'''
+        # Obtencao da dimensao da imagem raster
+        self.rdc_vars.nlin = info.nlin
+        self.rdc_vars.ncol = info.ncol
+        self.rdc_vars.geotransform = info.geotransform
+        self.rdc_vars.projection = info.projection
+        self.rdc_vars.resolucao = info.geotransform[1]
+
+        # Grade completa: usada para colar os resultados de volta quando os rasters sao recortados
+        self.rdc_vars.janela = info.janela
+        self.rdc_vars.nlin_total = info.nlin_total
+        self.rdc_vars.ncol_total = info.ncol_total
+        self.rdc_vars.geotransform_total = info.geotransform_total
+
+        # Coordenadas dos cantos e resolucoes espaciais da imagem
+        self.x_min = info.x_min
+        self.y_max = info.y_max
+        self.dx = info.dx
+        self.dy = info.dy
+        self.x_max = info.x_max
+        self.y_min = info.y_min
+
+    def converte_entradas(self, conversoes, parent):
+        '''Esta funcao converte varios rasters de entrada ao mesmo tempo (as conversoes sao independentes)
+            conversoes = dicionario nome -> (raster tiff, arquivo rst, int_float[, mapa_classes]); o primeiro define a grade de referencia
+            parent = janela usada para informar os erros
+            Retorna False se alguma conversao falhar'''
+        tarefas = {}
+        for nome, args in conversoes.items():
+            mapa_classes = args[3] if len(args) > 3 else 'n'
+            tarefas[nome] = (args[0], args[1], args[2], mapa_classes, self.formato_troca,
+                             self.cache_conversao, self.janela_recorte, self.linhas_por_bloco)
+
+        resultados, erros = executa_em_paralelo(
+            converte_geotiff_rst, tarefas, self.num_workers, ao_aguardar=QApplication.processEvents)
+
+        if erros:
+            mensagem = '\n'.join(f'{nome}: {erro}' for nome, erro in erros.items())
+            QMessageBox.critical(parent, 'Conversion Error',
+                                 f'The following input rasters could not be converted:\n{mensagem}')
+            return False
+
+        self.aplica_info_raster(resultados[next(iter(conversoes))])
+        return True
+
+    def inicia_tarefa(self, modulo, tarefa):
+        '''Esta funcao registra uma tarefa (HidropixelTask) no gerenciador de tarefas do QGIS: a interface continua livre durante a execucao
+            modulo = nome do modulo, usado pelo botao cancel da pagina de log para encontrar a tarefa em execucao'''
+        # A referencia e mantida ate o fim da tarefa: evita que o objeto python seja destruido durante a execucao
+        self.tarefas_ativas.setdefault(modulo, set()).add(tarefa)
+        QgsApplication.taskManager().addTask(tarefa)
+
+    def encerra_tarefa(self, modulo, tarefa):
+        '''Esta funcao remove a referencia da tarefa concluida (ou cancelada) do modulo'''
+        self.tarefas_ativas.get(modulo, set()).discard(tarefa)
+
+    def cancela_tarefa(self, modulo, text_edit, pg_parameters, pg_logge):
+        '''Esta funcao configura o botao cancel da pagina de log: cancela as tarefas em execucao do modulo
+            A interface e liberada pela funcao de conclusao da tarefa (conclui_*/finaliza_*), quando o motor para de fato'''
+        tarefas = self.tarefas_ativas.get(modulo)
+        if not tarefas:
+            # Nenhuma tarefa em execucao: nada vai liberar a interface depois, entao ela e liberada aqui
+            pg_parameters.setEnabled(True)
+            pg_logge.setEnabled(False)
+            return
+        for tarefa in tarefas:
+            tarefa.cancel()
+        self.cancel_log_page(text_edit)
 
     def leh_rst_escreve_geotiff(self, arquivo1, arquivo2, file_type):
-        '''Esta funcao le os arquivos processados nas rotinas em visual basic, no formato .rst(ascii) e os escreve em geotiff (no diretorio informado)
-            arquivo1 = diretorio do arquivo raster tipo rst ascii
+        '''Esta funcao le os arquivos processados nas rotinas em visual basic, no formato .rst(ascii ou binario) e os escreve em geotiff (no diretorio informado)
+            arquivo1 = diretorio do arquivo raster tipo rst
             arquivo2 = arquivo raster tiff (sera criado)'''
-
-        # Convertendo arquivo ascii para geotiff
-        rst_to_raster = np.zeros((self.rdc_vars.nlin, self.rdc_vars.ncol))
-
-        # Leitura do arquivo ascii
-        if file_type == 'int':
-            with open(arquivo1, 'r') as arquivo_ascii:
-                for lin in range(self.rdc_vars.nlin):
-                    for col in range(self.rdc_vars.ncol):
-                        rst_to_raster[lin, col] = int(arquivo_ascii.readline())
-
-        elif file_type == 'float':
-            with open(arquivo1, 'r') as arquivo_ascii:
-                for lin in range(self.rdc_vars.nlin):
-                    for col in range(self.rdc_vars.ncol):
-                        rst_to_raster[lin, col] = float(
-                            arquivo_ascii.readline())
-
-        # Define os dados a serem escritos
-        if file_type == 'int':
-            tipo_dados = gdalconst.GDT_Int32
-        elif file_type == 'float':
-            tipo_dados = gdalconst.GDT_Float32
-
-        # Obtendo o driver para escrita do arquivo em GeoTiff
-        fn_geotiff = arquivo2
-        driver = gdal.GetDriverByName('GTiff')
-
-        # Cria arquivo final
-        dataset = driver.Create(
-            fn_geotiff, self.rdc_vars.ncol, self.rdc_vars.nlin, 1, tipo_dados)
-        dataset.SetGeoTransform(self.rdc_vars.geotransform)
-        dataset.SetProjection(self.rdc_vars.projection)
-
-        # Escreve os dados na banda do arquivo
-        banda = dataset.GetRasterBand(1)
-        banda.WriteArray(rst_to_raster)
-
-        # Fechando o arquivo
-        dataset = None
-        banda = None
-        driver = None
-        tipo_dados = None
+        info = InfoRaster(self.rdc_vars.nlin_total, self.rdc_vars.ncol_total,
+                          self.rdc_vars.geotransform_total, self.rdc_vars.projection, self.rdc_vars.janela)
+        converte_rst_geotiff(arquivo1, arquivo2, file_type, info, self.opcoes_geotiff)
+
+    def info_saidas(self):
+        '''Esta funcao retorna uma copia da grade atual usada na conversao das saidas: as threads nao dependem de alteracoes posteriores em self.rdc_vars'''
+        return InfoRaster(self.rdc_vars.nlin_total, self.rdc_vars.ncol_total,
+                          self.rdc_vars.geotransform_total, self.rdc_vars.projection, self.rdc_vars.janela)
+
+    def executa_conversao_saidas(self, conversoes, info):
+        '''Esta funcao converte varios arquivos de saida (.rst) em geotiff ao mesmo tempo, sem acessar a interface (chamada pelas tarefas)
+            conversoes = dicionario nome -> (arquivo rst, arquivo tiff, file_type)
+            info = grade das saidas (ver info_saidas)
+            Retorna (resultados, erros): dicionarios nome -> arquivo tiff e nome -> excecao gerada'''
+        tarefas = {nome: (*args, info, self.opcoes_geotiff) for nome, args in conversoes.items()}
+        return executa_em_paralelo(converte_rst_geotiff, tarefas, self.num_workers)
+
+    def informa_erros_conversao(self, erros, parent):
+        '''Esta funcao informa as saidas que nao puderam ser convertidas em geotiff'''
+        if erros:
+            mensagem = '\n'.join(f'{nome}: {erro}' for nome, erro in erros.items())
+            QMessageBox.critical(parent, 'Conversion Error',
+                                 f'The following outputs could not be converted to GeoTIFF:\n{mensagem}')
 
     def leh_asc_to_np_array(self, arquivo1):
         '''Esta funcao le os arquivos processados nas rotinas em visual basic, no formato .rst(ascii) e os escreve em geotiff (no diretorio informado)
             arquivo1 = diretorio do arquivo raster tipo rst ascii
             arquivo2 = arquivo raster tiff (sera criado)'''
-        # Convertendo arquivo ascii para um array numpy
-        rst_to_raster = np.zeros((self.rdc_vars.nlin, self.rdc_vars.ncol))
-        bobo = [0 for x in range(6)]
-
-        # Leitura do arquivo ascii
-        with open(arquivo1, 'r') as arquivo_ascii:
-            for i in range(6):
-                bobo[i] = arquivo_ascii.readline()
-            for lin in range(self.rdc_vars.nlin):
-                for col in range(self.rdc_vars.ncol):
-                    rst_to_raster[lin, col] = float(arquivo_ascii.readline())
+        # Convertendo arquivo ascii para um array numpy: ignora as 6 linhas de cabecalho
+        rst_to_raster = le_rst_ascii(
+            arquivo1, self.rdc_vars.nlin, self.rdc_vars.ncol, 'float', linhas_cabecalho=6)
 
         return rst_to_raster
 
@@ -2181,21 +2317,15 @@ class Hidropixel:
             self.dlg_exc_rain.tbtn_pg2_3.setEnabled(False)
             self.dlg_exc_rain.label_35.setEnabled(False)
 
-    def cancel_log_page(self, text_edit, pg_parameters, pg_logge):
-        '''Esta funcao configura o botao de cancelar da pagina de log'''
+    def cancel_log_page(self, text_edit):
+        '''Esta funcao configura o botao de cancelar da pagina de log: avisa que o processo esta sendo interrompido'''
         mensagem_log1 = None
         # Cria texto formatado para adicionar ao text edit? mensagem de aviso
-        mensagem_log1 = '<font>\nATTENTION: stopping FLOW TRAVEL TIME process...</font>'
+        mensagem_log1 = '<font>\nATTENTION: stopping the Hidropixel process...</font>'
 
         # Adiciona o texto formatado no QTextEdit
         text_edit.insertHtml(mensagem_log1)
 
-        # Reativa a pagina de parametros
-        pg_parameters.setEnabled(True)
-
-        # Desativa a pagina de logge
-        pg_logge.setEnabled(False)
-
     def cancel_rainfall_interpol(self):
         '''Esta configura o botao cancel da pagina run da funcao rainfall interpolation'''
         # Adiciona mensagem de cancelamento do processo
@@ -2203,99 +2333,6 @@ class Hidropixel:
             'BREAKING THE RAINFALL INTERPOLATION PROCESSING...')
         self.dlg_rain_interpl_run.close()
 
-    def apaga_arquivos_temp(self):
-        '''Esta funcao exclui os arquivos temporarios criados durante a execucao do plugin'''
-        # Muda para o diretorio temp
-        os.chdir(self.diretorio_atual + r'\temp')
-        # Obtem todos os arquivos com a extensao .txt, .rst, .rdc
-        arquivos_txt = glob.glob('*.txt')
-        arquivos_rst = glob.glob('*.rst')
-        arquivos_rdc = glob.glob('*.rdc')
-        arquivos_tif = glob.glob('*.tif')
-        arquivos_bin = glob.glob('*.bin')
-
-        # Apaga todos os arquivos
-        for txt in arquivos_txt:
-            os.remove(txt)
-
-        for rst in arquivos_rst:
-            os.remove(rst)
-
-        for rdc in arquivos_rdc:
-            os.remove(rdc)
-
-        for tif in arquivos_tif:
-            os.remove(tif)
-
-        for bin in arquivos_bin:
-            os.remove(bin)
-
-    def apaga_arquivos_tv(self):
-        '''Esta funcao exclui os arquivos temporarios criados durante a execucao do plugin'''
-        # Muda para o diretorio temp
-        os.chdir(self.diretorio_atual + r'\temp\tv_for_each_poi')
-        # Obtem todos os arquivos com a extensao .txt, .rst, .rdc
-        arquivos_rst = glob.glob('*.rst')
-        arquivos_tif = glob.glob('*.tif')
-
-        # Apaga todos os arquivos
-        for rst in arquivos_rst:
-            os.remove(rst)
-
-        for tif in arquivos_tif:
-            os.remove(tif)
-
-    def apaga_arquivos_maps(self):
-        '''Esta funcao exclui os arquivos temporarios criados durante a execucao do plugin'''
-        # Muda para o diretorio temp
-        os.chdir(self.diretorio_atual + r'\temp\maps')
-        # Obtem todos os arquivos com a extensao .txt, .rst, .rdc
-        arquivos_rst = glob.glob('*.rst')
-        arquivos_txt = glob.glob('*.txt')
-        arquivos_asc = glob.glob('*.asc')
-
-        # Apaga todos os arquivos
-        for rst in arquivos_rst:
-            os.remove(rst)
-
-        for txt in arquivos_txt:
-            os.remove(txt)
-
-        for asc in arquivos_asc:
-            os.remove(asc)
-
-    def apaga_arquivos_hydrographs(self):
-        '''Esta funcao exclui os arquivos temporarios criados durante a execucao do plugin'''
-        # Muda para o diretorio temp
-        os.chdir(self.diretorio_atual + r'\temp\hydrographs')
-        # Obtem todos os arquivos com a extensao .txt, .rst, .rdc
-        arquivos_txt = glob.glob('*.txt')
-        arquivos_tif = glob.glob('*.tif')
-
-        # Apaga todos os arquivos
-        for txt in arquivos_txt:
-            os.remove(txt)
-
-    def apaga_arquivos_tv_for_each_poi(self):
-        '''Esta funcao exclui os arquivos temporarios criados durante a execucao do plugin'''
-        # Muda para o diretorio temp
-        os.chdir(self.diretorio_atual + r'\temp\tv_for_each_poi')
-        # Obtem todos os arquivos com a extensao .txt, .rst, .rdc
-        arquivos_txt = glob.glob('*.txt')
-        arquivos_rdc = glob.glob('*.rdc')
-        arquivos_rst = glob.glob('*.rst')
-        arquivos_hpx = glob.glob('*.hpx')
-
-        # Apaga todos os arquivos
-        for txt in arquivos_txt:
-            os.remove(txt)
-        for rdc in arquivos_rdc:
-            os.remove(rdc)
-        for rst in arquivos_rst:
-            os.remove(rst)
-        for hpx in arquivos_hpx:
-            os.remove(hpx)
-
     def replace_tif_rst(self, arquivo1):
         '''Esta funcao modifica a extensao do parametro de .tif para .rst'''
         arquivo2 = arquivo1.replace('.tif', '.rst')
@@ -2316,122 +2353,101 @@ class Hidropixel:
             caminho = caminho + '.hpx'
         return caminho
 
-    def run_process_rainfall_interpol(self):
-        """Esta funcao configura a execucao da rotina Rainfall Interpolation do vb.net, gerando os arquivos necessarios a execucao daquela"""
-        # Captura diretorio dos arquivo txt (pasta temp)
-        direct_temp = self.diretorio_atual + r'\temp'
+    def run_process_rainfall_interpol(self, direct_temp):
+        """Esta funcao configura a execucao da rotina Rainfall Interpolation do vb.net, gerando os arquivos necessarios a execucao daquela
+            direct_temp = pasta da area de trabalho da execucao"""
+        # Define a janela de recorte na extensao da bacia (quando a opcao estiver ativa)
+        self.define_janela_recorte(self.dlg_exc_rain.cb_1_pg_ri.currentLayer().source())
 
-        # Chama funcoes para tranformacao do raster em geotiff para rst tipo ascii
-        bacia_file = direct_temp + r'\Watershed.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_exc_rain.cb_1_pg_ri.currentLayer().source(), bacia_file, 'int')
-
-        # Cria uma copia dos arquivos para a pasta temp: evita erros relacionados aos caracteries especiais
-        rain_gauges = direct_temp + r'\rain_gauges.txt'
-        shutil.copy(self.dlg_exc_rain.le_2_pg_ri.text(), rain_gauges)
-
-        rainfall_data = direct_temp + r'\rainfall_data.txt'
-        shutil.copy(self.dlg_exc_rain.le_3_pg_ri.text(), rainfall_data)
-
-        # Escreve arquivo txt com os diretorios e nome dos inputs enviados pelo user
-        direct_in_files = direct_temp + r'\input_files_config_rain_inte.txt'
-        with open(direct_in_files, 'w', encoding='utf-8') as arquivo_txt:
-            # Escreve cabecalho
-            arquivo_txt.write("Selected input file directory\n")
-            arquivo_txt.write(f"watershed,{bacia_file}\n")
-            arquivo_txt.write(f"rain_gauges,{rain_gauges}\n")
-            arquivo_txt.write(f"rainfall_data,{rainfall_data}\n")
-            arquivo_txt.write(f"map_condiction,{self.map_cond}")
-
-        # Organiza os caminhos dos arquivos de saida enviados pelo user: modifica a extensao de .tif para .rst
-        self.output1_ri = direct_temp + r'\rainfall_interpolated.bin'
-        map_output_path = direct_temp + r'\maps'
-
-        # Escreve aquivo txt contendo o diretorio informado pelo user: sera fornecido para a rotina em visual basic
-        direct_out_files = direct_temp + r'\output_files_config_rain_inte.txt'
-        with open(direct_out_files, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write("Select output file directory\n")
-            arquivo_txt.write(
-                f"rainfall_interpolated_file,{self.output1_ri}\n")
-            arquivo_txt.write(
-                f"rainfall_interpolated_maps_path,{map_output_path}")
+        # Configuracao da rotina: os arquivos de configuracao sao escritos pelo objeto de parametros
+        parametros = ParametrosRainfallInterpolation(
+            {'watershed': self.dlg_exc_rain.cb_1_pg_ri.currentLayer().source(),
+             'rain_gauges': self.dlg_exc_rain.le_2_pg_ri.text(),
+             'rainfall_data': self.dlg_exc_rain.le_3_pg_ri.text()},
+            {'rainfall_interpolated_file': '', 'rainfall_interpolated_maps_path': ''},
+            mapas=self.map_cond == 1)
+
+        # Chama funcoes para tranformacao do raster em geotiff para rst: no arquivo lido pela configuracao da rotina
+        arquivos = parametros.arquivos_temp(direct_temp)
+        self.leh_geotiff_escreve_ascii(parametros.entradas['watershed'], arquivos['watershed'], 'int')
+
+        # Cria uma copia dos arquivos na area de trabalho: evita erros relacionados aos caracteries especiais
+        for nome, arquivo in parametros.entradas_copiadas(direct_temp).items():
+            shutil.copy(parametros.entradas[nome], arquivo)
+
+        # Escreve os arquivos txt com os diretorios das entradas e saidas
+        arquivos = parametros.escreve_configuracao(direct_temp, self.formato_troca)
+        self.output1_ri = arquivos['rainfall_interpolated_file']
 
     def run_rainfall_interpolation(self, condicao):
         """Esta estrutura a ordem de execucao da rontina que gera a chuva interpolada por pixel da bacia hidrografica"""
         self.map_cond = condicao
-        self.run_process_rainfall_interpol()
-        self.apaga_arquivos_maps()
-        # Chama executavel vb para iniciar o processamento
-        rainfall_interpol_vb = self.diretorio_atual + r'\temp\rainfall_interpolation.exe'
-        rainfall_iterp_exe = subprocess.run([rainfall_interpol_vb])
+        # Area de trabalho da execucao: entradas convertidas, arquivos de configuracao, andamento e saidas do motor
+        area = self.limpeza_trabalho.nova_area('rain_inte')
+        self.run_process_rainfall_interpol(area.pasta)
+        # Arquivo onde o motor nativo escreve o seu andamento: lido pelo monitor da tarefa (barra de progresso e log)
+        arquivo_progresso = area.caminho('progress.txt')
+        # O motor nativo ou o executavel vb e executado em uma tarefa do QGIS: a interface continua livre
+        if self.dlg_exc_rain.ch_native_pg_ri.isChecked():
+            # A matriz de pesos e identificada na cache pelos arquivos enviados pelo user (nao pelas copias na area)
+            motor = executa_motor(executa_rainfall_interpolation, area.caminho('input_files_config_rain_inte.txt'),
+                                  area.caminho('output_files_config_rain_inte.txt'), self.pasta_cache_pesos,
+                                  arquivo_progresso=arquivo_progresso,
+                                  fontes_cache=(self.dlg_exc_rain.le_2_pg_ri.text(),
+                                                self.dlg_exc_rain.cb_1_pg_ri.currentLayer().source()))
+        else:
+            motor = executa_rotina_externa(
+                area.copia_executavel(self.diretorio_atual + r'\temp\rainfall_interpolation.exe'), area.pasta)
 
-        # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
-        # Caso nao, a execucao continua no python
-        if rainfall_iterp_exe.returncode == 0:
+        # Destino do arquivo da chuva interpolada: lido da interface antes do inicio da tarefa
+        mapas, output_ri = self.map_cond == 1, self.output1_ri
+        output_fin = self.caminho_completo(self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_4_pg_ri.text())
 
+        def move_saida(tarefa):
             # Se o usuario escolheu a opcao para gerar o arquivo da chuva interpolada em txt, ele sera salvo no caminho fornecido
-            if self.map_cond == 0 and os.path.isfile(self.output1_ri) == True:
-                output_fin = self.caminho_completo(
-                    self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_4_pg_ri.text())
-                shutil.move(self.output1_ri,
-                            output_fin)
-
-                QMessageBox.information(
-                    None, "Information", "Operation completed successfully!", )
-
-            # Se o usuario escolheu para gerar os mapas da precipitacao interpolada, eles serao enviados para a pasta informada
-            elif self.map_cond == 1:
-                # Chama funcao para gerar o video a partir dos mapas gerados
-                # create_precip_video(input_dir=self.diretorio_atual + r'\temp\maps',
-                #                     output_path=self.dlg_exc_rain.le_5_pg_ri.text())
-
-                QMessageBox.information(
-                    None, "Information", "Operation completed successfully!", )
+            if not mapas and os.path.isfile(output_ri):
+                shutil.move(output_ri, output_fin)
+                return True
+            # Se o usuario escolheu para gerar os mapas da precipitacao interpolada, eles sao copiados da area de
+            # trabalho (removida ao fim da execucao) para a pasta rainfall_maps, ao lado do arquivo informado
+            if mapas:
+                shutil.copytree(area.caminho('maps'), os.path.join(os.path.dirname(output_fin), 'rainfall_maps'),
+                                dirs_exist_ok=True)
+            return mapas
+
+        self.inicia_tarefa('rain_inte', HidropixelTask(
+            'Hidropixel: rainfall interpolation', [('engine', motor), ('outputs', move_saida)],
+            lambda tarefa, sucesso: self.conclui_rainfall_interpolation(tarefa, sucesso, area),
+            MonitorProgresso(arquivo_progresso)))
+
+    def conclui_rainfall_interpolation(self, tarefa, sucesso, area):
+        """Esta funcao finaliza a rotina rainfall interpolation na thread da interface, ao fim da tarefa
+            area = area de trabalho da execucao, liberada para a limpeza"""
+        self.encerra_tarefa('rain_inte', tarefa)
+        # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
+        if sucesso and tarefa.resultados['outputs']:
+            self.limpeza_trabalho.libera(area, True)
+            # Chama funcao para gerar o video a partir dos mapas gerados
+            # create_precip_video(input_dir=area.caminho('maps'),
+            #                     output_path=self.dlg_exc_rain.le_5_pg_ri.text())
+            QMessageBox.information(
+                None, "Information", "Operation completed successfully!", )
 
-            else:
-                QMessageBox.information(
-                    None, "Information", "The Hidropixel process has been canceled!", )
+        elif sucesso or tarefa.isCanceled():
+            # A area com os arquivos parciais do motor interrompido e mantida segundo a politica de retencao
+            self.limpeza_trabalho.libera(area, False)
+            QMessageBox.information(
+                None, "Information", "The Hidropixel process has been canceled!", )
 
         else:
+            self.limpeza_trabalho.libera(area, False)
+            if tarefa.erro is not None:
+                QMessageBox.critical(self.dlg_exc_rain, 'Engine Error', f"The engine failed:\n{tarefa.erro}")
             QMessageBox.information(
                 None, "Information", "There was an inconsistency, please verify if all files were sent!", )
 
-    def processa_arquivo_chuva_med(self, input_file, output_file):
-        # Le todo o conteudo do arquivo
-        with open(input_file, 'r', encoding='utf-8') as f:
-            linhas = f.readlines()
-
-        # Verifica se o arquivo nao esta vazio
-        if not linhas:
-            raise Exception("Arquivo vazio!")
-
-        # A primeira linha e o cabecalho
-        cabecalho = linhas[0].strip()
-
-        # Linhas de dados (excluindo o cabecalho)
-        dados = [linha.strip() for linha in linhas[1:] if linha.strip()]
-
-        # Numero de linhas de dados
-        num_linhas = len(dados)
-
-        # Calcula o delta_t a partir das duas primeiras linhas de dados
-        # Supondo que o arquivo esteja formatado como "Time(min),Rainfall(mm)"
-        if num_linhas >= 2:
-            primeiro_valor = float(dados[0].split(',')[0])
-            segundo_valor = float(dados[1].split(',')[0])
-            delta_t = segundo_valor - primeiro_valor
-        else:
-            delta_t = 0  # ou lanca excecao, caso seja necessario
-
-        # Escreve o novo arquivo com a primeira linha contendo "num_linhas,delta_t"
-        with open(output_file, 'w', encoding='utf-8') as f_out:
-            f_out.write(f"{num_linhas},{int(delta_t)}\n")
-            f_out.write(cabecalho + "\n")
-            for linha in dados:
-                f_out.write(linha + "\n")
-
-    def gera_exu_shp_txt(self):
-        """Esta funcao le o arquivo shp com os POIs e gera a linha e coluna de cada ponto com base na matriz da bacia hidrografica"""
+    def le_exutorios_shp(self):
+        """Esta funcao le o arquivo shp com os POIs e retorna a linha e coluna de cada ponto com base na matriz da bacia hidrografica"""
         # Abrir shapefile
         ds_shp = ogr.Open(
             self.dlg_flow_tt.cb_8_pg2.currentLayer().source())
@@ -2451,102 +2467,59 @@ class Hidropixel:
             lin = int((y - gt[3]) / gt[5])
 
             exutorios_pix[id_exu] = (lin, col)
-        # Exibir resultado
-        exutorio_txt = self.diretorio_atual + r'\temp' + r'\exutorios.txt'
-        with open(exutorio_txt, 'w') as file:
-            file.write(str(len(exutorios_pix))+"\n")
-            file.write("lin,col\n")
-            for id_exu, (lin, col) in exutorios_pix.items():
-                file.write(f"{lin},{col}\n")
-
-    def converte_tv_sub_POI_tif(self):
-        """Converte os arquivos ascii com o TV e sub-bacia para cada POI. A funcao tambem salva os arquivos na pasta envia pelo user"""
-        exu_path = self.diretorio_atual + r'\temp' + r'\tv_for_each_poi'
-        os.chdir(exu_path)
-        tvs = glob.glob('*.rst')
-        rst_to_raster = np.zeros((self.rdc_vars.nlin, self.rdc_vars.ncol))
-        cont = 0
-        for tv in tvs:
-            tv_basename = os.path.basename(tv)
-            tv_tif = self.dlg_flow_tt.le_13_pg4.text() + f"\{tv_basename}.tif"
-            # Chama funcao que leh rst e escreve geotif
-            if 'travel' in tv_basename:
-                self.leh_rst_escreve_geotiff(tv, tv_tif, 'float')
-            else:
-                self.leh_rst_escreve_geotiff(tv, tv_tif, 'int')
-
-    def run_process_excess_rainfall(self):
-        """Esta funcao organiza os arquivos enviados pelo user e os configura para serem lidos nas rotinas em visual basic"""
-        # Captura diretorio dos arquivo txt (pasta temp)
-        direct_temp = self.diretorio_atual + r'\temp'
-
-        # Chama funcoes para tranformacao do raster em geotiff para rst tipo ascii
-
-        # leh bacia tif gera bacia rst ascii
-        bacia_file = direct_temp + r'\Watershed.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_exc_rain.cb_1_pg2.currentLayer().source(), bacia_file, 'int')
+        return list(exutorios_pix.values())
 
-        # leh cn map tif gera cn map rst ascii
-        cn_file = direct_temp + r'\CN_map.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_exc_rain.cb_2_pg2.currentLayer().source(), cn_file, 'float')
-
-        # move arquivo da precipitacao para a pasta temp
-        if self.dlg_exc_rain.rb_1_pg1.isChecked():
-            chuva_media = direct_temp + r'\Areal_averaged_rainfall.txt'
-            self.processa_arquivo_chuva_med(
-                self.dlg_exc_rain.le_3_pg2.text(), chuva_media)
-
-        if self.dlg_exc_rain.rb_2_pg1.isChecked():
-            chuva_distribuida = direct_temp + r'\Spatially_distributed_rainfall.bin'
-            shutil.copy(self.dlg_exc_rain.le_4_pg2.text(), chuva_distribuida)
-
-        # Escreve arquivos de parametros
-        direct_parameters = direct_temp + r'\parameters_exc_rainf.txt'
-        with open(direct_parameters, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write(
-                f"Initial abstraction (λ),{self.dlg_exc_rain.le_1_pg1.text()}")
-
-        # gera arquivo contendo os diretorios dos inputs
-        direct_in_files = direct_temp + r'\input_files_config_exc_rainf.txt'
-        with open(direct_in_files, 'w', encoding='utf-8') as arquivo_txt:
-            # Escreve cabecalho
-            arquivo_txt.write("Selected input file directory\n")
-            arquivo_txt.write(
-                f'{1 if self.dlg_exc_rain.cb_1_pg2.currentText() !="" else 0},watershed,{bacia_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_exc_rain.cb_2_pg2.currentText() !="" else 0},curve_number_map,{cn_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_exc_rain.le_3_pg2.text() !="" else 0},Areal_averaged_rainfall,{chuva_media if self.dlg_exc_rain.rb_1_pg1.isChecked() == True else ""}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_exc_rain.le_4_pg2.text() !="" else 0},Spatially_distributed_rainfall,{chuva_distribuida if self.dlg_exc_rain.rb_2_pg1.isChecked() == True else ""}\n')
-            arquivo_txt.write(f'{1},parameters,{direct_parameters}\n')
-
-        # Escreve aquivos de saida
-        self.output1_exec_rain = direct_temp + r'\Map_of_watershed_pixels_ID.rst'
-        self.output2_exec_rain = direct_temp + \
-            r'\Map_of_maximum_potential_retention.rst'
-        self.output3_exec_rain = direct_temp + r'\Map_of_initial_abstraction.rst'
-        self.output4_exec_rain = direct_temp + r'\Map_of_total_rainfall.rst'
-        self.output5_exec_rain = direct_temp + r'\Map_of_total_excess_rainfall.rst'
-        self.output6_exec_rain = direct_temp + r'\Excess_hyetographs_per_pixel.bin'
-
-        direct_out_files = direct_temp + r'\output_files_config_exc_rainf.txt'
-        with open(direct_out_files, "w", encoding="utf-8") as arquivo_txt:
-            arquivo_txt.write("Select output file directory\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_1_pg4.isChecked() == True else 0},Map of watershed pixels ID,{self.output1_exec_rain}\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_2_pg4.isChecked() == True else 0},Map of maximum potential retention (mm),{self.output2_exec_rain}\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_3_pg4.isChecked() == True else 0},Map of initial abstraction (mm),{self.output3_exec_rain}\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_4_pg4.isChecked() == True else 0},Map of total rainfall (mm),{self.output4_exec_rain}\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_5_pg4.isChecked() == True else 0},Map of total excess rainfall (mm),{self.output5_exec_rain}\n")
-            arquivo_txt.write(
-                f"{1 if self.dlg_exc_rain.ch_6_pg4.isChecked() == True else 0},Excess hyetographs per pixel (mm),{self.output6_exec_rain}")
+    def conversoes_tv_POI(self, exu_path, pasta_saida):
+        """Retorna as conversoes (nome -> (rst, tif, tipo)) dos arquivos ascii com o TV e sub-bacia de cada POI para a pasta enviada pelo user
+            exu_path = pasta tv_for_each_poi da area de trabalho da execucao"""
+        conversoes = {}
+        for tv in glob.glob(os.path.join(exu_path, '*.rst')):
+            tv_basename = os.path.basename(tv)
+            tv_tif = pasta_saida + f"\\{tv_basename}.tif"
+            conversoes[tv_basename] = (tv, tv_tif, 'float' if 'travel' in tv_basename else 'int')
+        return conversoes
+
+    def run_process_excess_rainfall(self, direct_temp):
+        """Esta funcao organiza os arquivos enviados pelo user e os configura para serem lidos nas rotinas em visual basic
+            direct_temp = pasta da area de trabalho da execucao"""
+
+        # Define a janela de recorte na extensao da bacia (quando a opcao estiver ativa)
+        self.define_janela_recorte(self.dlg_exc_rain.cb_1_pg2.currentLayer().source())
+
+        # Configuracao da rotina: os arquivos de configuracao sao escritos pelo objeto de parametros
+        marcadas = (self.dlg_exc_rain.ch_1_pg4, self.dlg_exc_rain.ch_2_pg4, self.dlg_exc_rain.ch_3_pg4,
+                    self.dlg_exc_rain.ch_4_pg4, self.dlg_exc_rain.ch_5_pg4, self.dlg_exc_rain.ch_6_pg4)
+        parametros = ParametrosExcessRainfall(
+            {'watershed': self.dlg_exc_rain.cb_1_pg2.currentLayer().source(),
+             'curve_number_map': self.dlg_exc_rain.cb_2_pg2.currentLayer().source(),
+             'Areal_averaged_rainfall': self.dlg_exc_rain.le_3_pg2.text() if self.dlg_exc_rain.rb_1_pg1.isChecked() else None,
+             'Spatially_distributed_rainfall': self.dlg_exc_rain.le_4_pg2.text() if self.dlg_exc_rain.rb_2_pg1.isChecked() else None},
+            {nome: '' if marcada.isChecked() else None
+             for (nome, _, _), marcada in zip(ParametrosExcessRainfall.definicoes_saidas, marcadas)},
+            abstracao_inicial=self.dlg_exc_rain.le_1_pg1.text())
+
+        # Chama funcoes para tranformacao do raster em geotiff para rst: nos arquivos lidos pela configuracao da rotina
+        arquivos = parametros.arquivos_temp(direct_temp)
+        # leh bacia tif gera bacia rst
+        self.leh_geotiff_escreve_ascii(parametros.entradas['watershed'], arquivos['watershed'], 'int')
+        # leh cn map tif gera cn map rst
+        self.leh_geotiff_escreve_ascii(parametros.entradas['curve_number_map'], arquivos['curve_number_map'], 'float')
+
+        # move arquivo da precipitacao para a area de trabalho
+        if parametros.entradas['Areal_averaged_rainfall']:
+            processa_chuva_media(parametros.entradas['Areal_averaged_rainfall'], arquivos['Areal_averaged_rainfall'])
+
+        for nome, arquivo in parametros.entradas_copiadas(direct_temp).items():
+            shutil.copy(parametros.entradas[nome], arquivo)
+
+        # Escreve os arquivos de parametros e os arquivos txt com os diretorios das entradas e saidas
+        arquivos = parametros.escreve_configuracao(direct_temp, self.formato_troca)
+        self.output1_exec_rain = arquivos['Map of watershed pixels ID']
+        self.output2_exec_rain = arquivos['Map of maximum potential retention (mm)']
+        self.output3_exec_rain = arquivos['Map of initial abstraction (mm)']
+        self.output4_exec_rain = arquivos['Map of total rainfall (mm)']
+        self.output5_exec_rain = arquivos['Map of total excess rainfall (mm)']
+        self.output6_exec_rain = arquivos['Excess hyetographs per pixel (mm)']
 
     def run_excess_rainfall(self):
         '''Esta funcao ativa a pagina de log e configura a ordem de execucao das funcoes para o calculo da chuva excedente'''
@@ -2595,275 +2568,190 @@ class Hidropixel:
         mensagem_log1 += f"Algorithm started at: {datatime_started}\n"
         mensagem_log1 += "--------------------------------------------------------\n"
         self.dlg_exc_rain.progressBar.setValue(10)
-        # Cria condicao de parada da execucao: se o usuario clicar no botao cancel da pagina de log
-        while True:
-            # Metodo usado para permitir a iteracao do usuario enquanto o programa esta em execucao
-            QApplication.processEvents()
-            self.dlg_exc_rain.btn_cancel_log.clicked.connect(lambda: self.cancel_log_page(
-                self.dlg_exc_rain.te_logg, self.dlg_exc_rain.pg_par_exc_rain, self.dlg_exc_rain.pg_log_exc_rain))
-
-            # Se nao existir erros nas informacoes enviadas, sera mostrada a pagina de log e o programa sera executado
-            self.dlg_exc_rain.pg_par_exc_rain.setEnabled(False)
-
-            # Adiciona as mensagem de log ao text edit e configura a funcao run
-            self.dlg_exc_rain.te_logg.append(mensagem_log1)
-            for cont in range(1, 26):
-                self.dlg_exc_rain.progressBar.setValue(cont)
-
-            # Chama funcao que cria arquivos necessarios as rotinas em vb
-            self.run_process_excess_rainfall()
-            self.dlg_exc_rain.progressBar.setValue(40)
-
-            # Chama executavel vb para iniciar o processamento
-            exc_rain_vb = self.diretorio_atual + r'\temp\excess_rainfall.exe'
-            exc_rain_exe = subprocess.run([exc_rain_vb])
-
-            # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
-            # Caso nao, a execucao continua no python
-            if exc_rain_exe.returncode == 0:
-                self.dlg_exc_rain.progressBar.setValue(60)
-
-                # move o arquivo txt contendo o hietograma de chuva excedente para o diretorio informado
-                if self.dlg_exc_rain.ch_6_pg4.isChecked() and os.path.isfile(self.output6_exec_rain) == True:
-                    # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
-                    is_basename = self.is_basename_only(
-                        self.dlg_exc_rain.le_6_pg4.text())
-
-                    # Se for apenas basename, concatena working folder com valor informado (deve ter extensao)
-                    if is_basename == True:
-                        output_file = os.path.join(
-                            self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_6_pg4.text())
-                        shutil.move(self.output6_exec_rain, output_file)
-                    else:
-                        shutil.move(self.output6_exec_rain,
-                                    self.dlg_exc_rain.le_6_pg4.text())
-
-                    # Converte arquivos de saida de .rst ascii para geotif
-                    if os.path.isfile(self.output4_exec_rain) == True and os.path.isfile(self.output5_exec_rain) == True:
-                        if self.dlg_exc_rain.ch_1_pg4.isChecked():
-                            output_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_1_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output1_exec_rain, output_path, 'int')
-
-                        if self.dlg_exc_rain.ch_2_pg4.isChecked():
-                            output_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_2_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output2_exec_rain, output_path, 'float')
-
-                        if self.dlg_exc_rain.ch_3_pg4.isChecked():
-                            output_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_3_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output3_exec_rain, output_path, 'float')
-
-                        if self.dlg_exc_rain.ch_4_pg4.isChecked():
-                            output_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_4_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output4_exec_rain, output_path, 'float')
-
-                        if self.dlg_exc_rain.ch_5_pg4.isChecked():
-                            output_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_5_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output5_exec_rain, output_path, 'float')
-
-                        # Atualiza progressBar
-                        self.dlg_exc_rain.progressBar.setValue(80)
-
-                        # Adiciona layers ao QGIS
-                        if self.dlg_exc_rain.ch_7_pg4.isChecked():
-                            layer_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_1_pg4.text())
-                            self.adiciona_layer(layer_path)
-
-                        if self.dlg_exc_rain.ch_8_pg4.isChecked():
-                            layer_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_2_pg4.text())
-                            self.adiciona_layer(layer_path)
-
-                        if self.dlg_exc_rain.ch_9_pg4.isChecked():
-                            layer_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_3_pg4.text())
-                            self.adiciona_layer(layer_path)
-
-                        if self.dlg_exc_rain.ch_10_pg4.isChecked():
-                            layer_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_4_pg4.text())
-                            self.adiciona_layer(layer_path)
-
-                        if self.dlg_exc_rain.ch_11_pg4.isChecked():
-                            layer_path = self.caminho_completo(
-                                self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_5_pg4.text())
-                            self.adiciona_layer(layer_path)
-
-                        # Adiciona as informacao ao text edit
-                        self.dlg_exc_rain.te_logg.append(
-                            'Operation completed successfully!')
-                        QMessageBox.information(
-                            None, "Information", "Operation completed successfully!", )
-                        self.dlg_exc_rain.progressBar.setValue(100)
-                        self.dlg_exc_rain.pg_log_exc_rain.setEnabled(False)
-                        self.dlg_exc_rain.pg_par_exc_rain.setEnabled(True)
-                        self.dlg_exc_rain.te_logg.clear()
-                        break
-                else:
-                    # Finaliza execucao do programa e elimina os arquivos temporarios criados
-                    self.apaga_arquivos_temp()
-                    self.dlg_exc_rain.progressBar.setValue(0)
-                    self.dlg_exc_rain.te_logg.clear()
-                    self.dlg_exc_rain.pg_par_exc_rain.setEnabled(True)
-                    self.dlg_exc_rain.pg_log_exc_rain.setEnabled(False)
-                    end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-                    self.dlg_exc_rain.te_logg.append(end_msg)
-                    break
-
-    def run_process_flow_tt(self):
-        """Esta funcao configura a escrita dos arquivos txt para integracao com a linguagem visual basic"""
-
-        # Captura diretorio dos arquivo txt (pasta temp)
-        direct_temp = self.diretorio_atual + r'\temp'
-
-        # Escreve txt contendo codigo de direcoes de fluxo
-        flow_directions_code = direct_temp + r'\flow_directions_code.txt'
-        with open(flow_directions_code, 'w', encoding='utf-8') as arquivo_txt:
-            # Escreve cabecalho
-            arquivo_txt.write('Flow Directions Code\n')
-            arquivo_txt.write(f'A,{self.dlg_flow_tt.le_5_pg1.text()}\n')
-            arquivo_txt.write(f'B,{self.dlg_flow_tt.le_6_pg1.text()}\n')
-            arquivo_txt.write(f'C,{self.dlg_flow_tt.le_7_pg1.text()}\n')
-            arquivo_txt.write(f'D,{self.dlg_flow_tt.le_8_pg1.text()}\n')
-            arquivo_txt.write(f'E,{self.dlg_flow_tt.le_9_pg1.text()}\n')
-            arquivo_txt.write(f'F,{self.dlg_flow_tt.le_10_pg1.text()}\n')
-            arquivo_txt.write(f'G,{self.dlg_flow_tt.le_11_pg1.text()}\n')
-            arquivo_txt.write(f'H,{self.dlg_flow_tt.le_12_pg1.text()}')
-
-        # Escreve arquivo txt contento os parametros do modelo
-        parameters_file = direct_temp + r'\parameters_flow_tt.txt'
-        with open(parameters_file, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write('Regional curve method is checked,')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.groupBox_3.isChecked() == True else 0}\n')
-            arquivo_txt.write(
-                f'Manning coefficient for river segments without cross-section information,{self.dlg_flow_tt.le_14_pg1.text()}\n')
-            arquivo_txt.write(f'Sheet flow lenght (m),30.48\n')
-            arquivo_txt.write(
-                f'P24 - Rainfall depth for 24-hour duration and 2-year return period (mm),{self.dlg_flow_tt.le_11_pg2.text()}\n')
-            arquivo_txt.write(f'Mean depth of lake or reservoir (m),5\n')
-            arquivo_txt.write(
-                f'Regional curve coefficient c,{self.dlg_flow_tt.le_16_pg1.text()}\n')
-            arquivo_txt.write(
-                f'Regional curve coefficient d,{self.dlg_flow_tt.le_17_pg1.text()}\n')
-            arquivo_txt.write(
-                f'Regional curve coefficient g,{self.dlg_flow_tt.le_18_pg1.text()}\n')
-            arquivo_txt.write(
-                f'Regional curve coefficient h,{self.dlg_flow_tt.le_19_pg1.text()}\n')
-            arquivo_txt.write(
-                f'Maximum river segment lenght for river segments without cross-section information (m),{self.dlg_flow_tt.le_15_pg1.text()}\n')
-            arquivo_txt.write(
-                f'Minimum slope,{self.dlg_flow_tt.le_1_pg1.text()}')
-
-        # Escreve arquivos contendo as informacoes das tabelas referentes aos segmentos homogeneos da rede de drenagem e das caracteristicas do uso e cobertura do solo
-        if self.dlg_flow_tt.le_8_pg2.text() != '' or self.dlg_flow_tt.tbw_1_pg2.rowCount() != 0:
-            self.save_table_to_file(1)
-
-        self.save_table_to_file(2)
-
-        # Chama funcoes para tranformacao do raster em geotiff para rst tipo ascii
-        bacia_file = direct_temp + r'\Watershed.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_1_pg2.currentLayer().source(), bacia_file, 'int')
-
-        dem_file = direct_temp + r'\DEM.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_2_pg2.currentLayer().source(), dem_file, 'float')
-
-        Flow_Dir_file = direct_temp + r'\Flow_dir.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_3_pg2.currentLayer().source(), Flow_Dir_file, 'int')
-
-        drainage_file = direct_temp + r'\drainage.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_4_pg2.currentLayer().source(), drainage_file, 'int')
+        # Se nao existir erros nas informacoes enviadas, sera mostrada a pagina de log e o programa sera executado
+        self.dlg_exc_rain.pg_par_exc_rain.setEnabled(False)
+
+        # Adiciona as mensagem de log ao text edit e configura a funcao run
+        self.dlg_exc_rain.te_logg.append(mensagem_log1)
+
+        # Chama funcao que cria arquivos necessarios as rotinas em vb, na area de trabalho da execucao
+        area = self.limpeza_trabalho.nova_area('exc_rain')
+        self.run_process_excess_rainfall(area.pasta)
+
+        # Arquivo onde o motor nativo escreve o seu andamento: lido pelo monitor da tarefa (barra de progresso e log)
+        arquivo_progresso = area.caminho('progress.txt')
+        # O motor nativo ou o executavel vb e executado em uma tarefa do QGIS: a interface continua livre
+        if self.dlg_exc_rain.ch_native_pg1.isChecked():
+            motor = executa_motor(executa_excess_rainfall, area.caminho('input_files_config_exc_rainf.txt'),
+                                  area.caminho('output_files_config_exc_rainf.txt'),
+                                  arquivo_progresso=arquivo_progresso)
+        else:
+            motor = executa_rotina_externa(
+                area.copia_executavel(self.diretorio_atual + r'\temp\excess_rainfall.exe'), area.pasta)
+
+        # Destino do arquivo com os hietogramas excedentes: lido da interface antes do inicio da tarefa
+        move_hietogramas = self.dlg_exc_rain.ch_6_pg4.isChecked()
+        # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
+        if self.is_basename_only(self.dlg_exc_rain.le_6_pg4.text()) == True:
+            output_file = os.path.join(self.dlg_exc_rain.le_3_pg1.text(), self.dlg_exc_rain.le_6_pg4.text())
+        else:
+            output_file = self.dlg_exc_rain.le_6_pg4.text()
+
+        # Define os arquivos convertidos: nome -> (rst, geotiff, tipo) e nome -> checkbox que adiciona a layer ao QGIS
+        conversoes = {}
+        camadas = {}
+        for nome, marcado, arquivo_rst, line_edit, file_type, add_layer in (
+                ('Map of watershed pixels ID', self.dlg_exc_rain.ch_1_pg4, self.output1_exec_rain,
+                 self.dlg_exc_rain.le_1_pg4, 'int', self.dlg_exc_rain.ch_7_pg4),
+                ('Map of maximum potential retention', self.dlg_exc_rain.ch_2_pg4, self.output2_exec_rain,
+                 self.dlg_exc_rain.le_2_pg4, 'float', self.dlg_exc_rain.ch_8_pg4),
+                ('Map of initial abstraction', self.dlg_exc_rain.ch_3_pg4, self.output3_exec_rain,
+                 self.dlg_exc_rain.le_3_pg4, 'float', self.dlg_exc_rain.ch_9_pg4),
+                ('Map of total rainfall', self.dlg_exc_rain.ch_4_pg4, self.output4_exec_rain,
+                 self.dlg_exc_rain.le_4_pg4, 'float', self.dlg_exc_rain.ch_10_pg4),
+                ('Map of total excess rainfall', self.dlg_exc_rain.ch_5_pg4, self.output5_exec_rain,
+                 self.dlg_exc_rain.le_5_pg4, 'float', self.dlg_exc_rain.ch_11_pg4)):
+            if marcado.isChecked():
+                output_path = self.caminho_completo(
+                    self.dlg_exc_rain.le_3_pg1.text(), line_edit.text())
+                conversoes[nome] = (arquivo_rst, output_path, file_type)
+                camadas[nome] = add_layer
+        info = self.info_saidas()
+        output4, output5, output6 = self.output4_exec_rain, self.output5_exec_rain, self.output6_exec_rain
+
+        def entrega_saidas(tarefa):
+            # move o arquivo contendo o hietograma de chuva excedente para o diretorio informado
+            if not move_hietogramas or not os.path.isfile(output6):
+                return None
+            shutil.move(output6, output_file)
+            # Converte arquivos de saida de .rst para geotiff ao mesmo tempo
+            if not os.path.isfile(output4) or not os.path.isfile(output5):
+                return None
+            return self.executa_conversao_saidas(conversoes, info)
+
+        self.inicia_tarefa('exc_rain', HidropixelTask(
+            'Hidropixel: excess rainfall', [('engine', motor), ('outputs', entrega_saidas)],
+            lambda tarefa, sucesso: self.conclui_excess_rainfall(tarefa, sucesso, camadas, area),
+            MonitorProgresso(
+                arquivo_progresso, self.dlg_exc_rain.progressBar, self.dlg_exc_rain.te_logg)))
+
+    def conclui_excess_rainfall(self, tarefa, sucesso, camadas, area):
+        '''Esta funcao finaliza a rotina excess rainfall na thread da interface, ao fim da tarefa
+            camadas = dicionario nome -> checkbox que adiciona a saida convertida ao QGIS
+            area = area de trabalho da execucao, liberada para a limpeza'''
+        self.encerra_tarefa('exc_rain', tarefa)
+        # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
+        if sucesso and tarefa.resultados['outputs'] is not None:
+            self.limpeza_trabalho.libera(area, True)
+            convertidos, erros = tarefa.resultados['outputs']
+            self.informa_erros_conversao(erros, self.dlg_exc_rain)
+
+            # Adiciona layers ao QGIS
+            for nome, add_layer in camadas.items():
+                if nome in convertidos and add_layer.isChecked():
+                    self.adiciona_layer(convertidos[nome])
+
+            # Adiciona as informacao ao text edit
+            self.dlg_exc_rain.te_logg.append(
+                'Operation completed successfully!')
+            QMessageBox.information(
+                None, "Information", "Operation completed successfully!", )
+            self.dlg_exc_rain.progressBar.setValue(100)
+            self.dlg_exc_rain.pg_log_exc_rain.setEnabled(False)
+            self.dlg_exc_rain.pg_par_exc_rain.setEnabled(True)
+            self.dlg_exc_rain.te_logg.clear()
 
-        if self.dlg_flow_tt.cb_5_pg2.currentText() != '':
-            river_segments_file = direct_temp + r'\river_segments.rst'
-            self.leh_geotiff_escreve_ascii(
-                self.dlg_flow_tt.cb_5_pg2.currentLayer().source(), river_segments_file, 'int')
         else:
-            river_segments_file = 'No file'
+            if tarefa.erro is not None:
+                QMessageBox.critical(self.dlg_exc_rain, 'Engine Error', f"The engine failed:\n{tarefa.erro}")
+            # Finaliza execucao do programa e libera a area de trabalho (mantida segundo a politica de retencao)
+            self.limpeza_trabalho.libera(area, False)
+            self.dlg_exc_rain.progressBar.setValue(0)
+            self.dlg_exc_rain.te_logg.clear()
+            self.dlg_exc_rain.pg_par_exc_rain.setEnabled(True)
+            self.dlg_exc_rain.pg_log_exc_rain.setEnabled(False)
+            end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
+            self.dlg_exc_rain.te_logg.append(end_msg)
 
-        DA_km2_file = direct_temp + r'\DA_km2.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_6_pg2.currentLayer().source(), DA_km2_file, 'float')
+    def run_process_flow_tt(self, direct_temp):
+        """Esta funcao configura a escrita dos arquivos txt para integracao com a linguagem visual basic
+            direct_temp = pasta da area de trabalho da execucao"""
 
-        LULC_file = direct_temp + r'\LULC.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_tt.cb_7_pg2.currentLayer().source(), LULC_file, 'int')
-
-        # Escreve arquivo txt com os diretorios e nome dos inputs enviados pelo user
-        direct_in_files = direct_temp + r'\input_files_config_flow_tt.txt'
-        with open(direct_in_files, 'w', encoding='utf-8') as arquivo_txt:
-            # Escreve cabecalho
-            arquivo_txt.write("Selected input file directory\n")
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_1_pg2.currentText() !="" else 0},watershed,{bacia_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_2_pg2.currentText() !="" else 0},DEM,{dem_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_3_pg2.currentText() !="" else 0},Flow_Dir,{Flow_Dir_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_6_pg2.currentText() !="" else 0},DA_km2,{DA_km2_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_4_pg2.currentText() !="" else 0},drainage,{drainage_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_5_pg2.currentText() !=""  else 0},river_segments,{river_segments_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_5_pg2.currentText() !="" else 0},segment_characteristics,{self.file_name_tb1}\n')
-            # Arquivo obrigatorio, condicao apenas para manter o padrao e controle
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_7_pg2.currentText() !="" else 0},LULC,{LULC_file}\n')
-            # Arquivo obrigatorio, condicao apenas para manter o padrao e controle
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.cb_1_pg2.currentText() !="" else 0},surface_roughness,{self.file_name_tb2}\n')
-            arquivo_txt.write(f'{0},reservoirs,\n')
-            # Arquivo obrigatorio, condicao apenas para manter o padrao e controle
-            arquivo_txt.write(f'{1},parameters,{parameters_file}')
-
-        # Funcao que gera txt com os as coodenadas (lin,col) dos POIs
-        if (self.dlg_flow_tt.cb_8_pg2.currentText() != '' or self.dlg_flow_tt.cb_8_pg2.currentText() != None) and self.dlg_flow_tt.ch_12_pg4.isChecked() == True:
-            self.gera_exu_shp_txt()
-        else:
-            with open(direct_temp + r'\exutorios.txt', 'w') as file:
-                file.write("0")
-
-        # Organiza os caminhos dos arquivos de saida enviados pelo user: modifica a extensao de .tif para .rst
-        self.output1_flow_tt = direct_temp + r'\Slope.rst'
-        self.output2_flow_tt = direct_temp + r'\river_segments.rst'
-        self.output3_flow_tt = direct_temp + r'\Hydraulic_radius-roughness_and_slope.txt'
-        self.output4_flow_tt = direct_temp + r'\River_cross-sectional_area.rst'
-        self.output5_flow_tt = direct_temp + r'\River_bankfull_width.rst'
-        self.output6_flow_tt = direct_temp + r'\Flow_travel_time.rst'
-
-        # Escreve aquivo txt contendo o diretorio informado pelo user: sera fornecido para a rotina em visual basic
-        direct_out_files = direct_temp + r'\output_files_config_flow_tt.txt'
-        with open(direct_out_files, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write("Select output file directory\n")
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_6_pg4.isChecked() == True else 0},Slope,{self.output1_flow_tt}\n')  # rst
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_7_pg4.isChecked() == True else 0},river_segments,{self.output2_flow_tt}\n')  # rst
-            # txt: gerado diretamente nas rotinas vb
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_8_pg4.isChecked() == True else 0},Hydraulic_radius-roughness_and_slope,{self.output3_flow_tt}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_9_pg4.isChecked() == True else 0},River_cross-sectional_area,{self.output4_flow_tt}\n')  # rst
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_10_pg4.isChecked() == True else 0},River_bankfull_width,{self.output5_flow_tt}\n')  # rst
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_tt.ch_11_pg4.isChecked() == True else 0},Flow_travel_time,{self.output6_flow_tt}')  # rst
+        # Define a janela de recorte na extensao da bacia (quando a opcao estiver ativa)
+        self.define_janela_recorte(self.dlg_flow_tt.cb_1_pg2.currentLayer().source())
+
+        # Escreve arquivos contendo as informacoes das tabelas referentes aos segmentos homogeneos da rede de drenagem e das caracteristicas do uso e cobertura do solo
+        if self.dlg_flow_tt.le_8_pg2.text() != '' or self.dlg_flow_tt.tbw_1_pg2.rowCount() != 0:
+            self.save_table_to_file(1, direct_temp)
+
+        self.save_table_to_file(2, direct_temp)
+
+        # Pontos de interesse (lin,col): apenas quando a opcao de gerar o tempo de viagem para cada POI estiver marcada
+        le_poi = (self.dlg_flow_tt.cb_8_pg2.currentText() != '' or self.dlg_flow_tt.cb_8_pg2.currentText() != None) and self.dlg_flow_tt.ch_12_pg4.isChecked() == True
+
+        # Configuracao da rotina: os arquivos de configuracao sao escritos pelo objeto de parametros
+        segmentos = self.dlg_flow_tt.cb_5_pg2.currentText() != ''
+        marcadas = (self.dlg_flow_tt.ch_6_pg4, self.dlg_flow_tt.ch_7_pg4, self.dlg_flow_tt.ch_8_pg4,
+                    self.dlg_flow_tt.ch_9_pg4, self.dlg_flow_tt.ch_10_pg4, self.dlg_flow_tt.ch_11_pg4)
+        parametros = ParametrosTravelTime(
+            {'watershed': self.dlg_flow_tt.cb_1_pg2.currentLayer().source(),
+             'DEM': self.dlg_flow_tt.cb_2_pg2.currentLayer().source(),
+             'Flow_Dir': self.dlg_flow_tt.cb_3_pg2.currentLayer().source(),
+             'DA_km2': self.dlg_flow_tt.cb_6_pg2.currentLayer().source(),
+             'drainage': self.dlg_flow_tt.cb_4_pg2.currentLayer().source(),
+             'river_segments': self.dlg_flow_tt.cb_5_pg2.currentLayer().source() if segmentos else None,
+             'segment_characteristics': self.file_name_tb1 if segmentos else None,
+             'LULC': self.dlg_flow_tt.cb_7_pg2.currentLayer().source(),
+             'surface_roughness': self.file_name_tb2},
+            {nome: '' if marcada.isChecked() else None
+             for (nome, _, _), marcada in zip(ParametrosTravelTime.definicoes_saidas, marcadas)},
+            codigos_direcoes={letra: line_edit.text() for letra, line_edit in zip('ABCDEFGH', (
+                self.dlg_flow_tt.le_5_pg1, self.dlg_flow_tt.le_6_pg1, self.dlg_flow_tt.le_7_pg1,
+                self.dlg_flow_tt.le_8_pg1, self.dlg_flow_tt.le_9_pg1, self.dlg_flow_tt.le_10_pg1,
+                self.dlg_flow_tt.le_11_pg1, self.dlg_flow_tt.le_12_pg1))},
+            curva_regional=self.dlg_flow_tt.groupBox_3.isChecked(),
+            manning_rio=self.dlg_flow_tt.le_14_pg1.text(),
+            p24=self.dlg_flow_tt.le_11_pg2.text(),
+            coeficientes_curva=(self.dlg_flow_tt.le_16_pg1.text(), self.dlg_flow_tt.le_17_pg1.text(),
+                                self.dlg_flow_tt.le_18_pg1.text(), self.dlg_flow_tt.le_19_pg1.text()),
+            comprimento_maximo=self.dlg_flow_tt.le_15_pg1.text(),
+            declividade_minima=self.dlg_flow_tt.le_1_pg1.text())
+
+        # Chama funcoes para tranformacao do raster em geotiff para rst: as conversoes sao independentes e executadas ao mesmo tempo
+        arquivos = parametros.arquivos_temp(direct_temp)
+        conversoes = {
+            'Watershed': (parametros.entradas['watershed'], arquivos['watershed'], 'int'),
+            'DEM': (parametros.entradas['DEM'], arquivos['DEM'], 'float'),
+            'Flow directions': (parametros.entradas['Flow_Dir'], arquivos['Flow_Dir'], 'int'),
+            'Drainage network': (parametros.entradas['drainage'], arquivos['drainage'], 'int'),
+            'Drainage area (km2)': (parametros.entradas['DA_km2'], arquivos['DA_km2'], 'float'),
+            'LULC': (parametros.entradas['LULC'], arquivos['LULC'], 'int'),
+        }
+        if segmentos:
+            conversoes['River segments'] = (parametros.entradas['river_segments'], arquivos['river_segments'], 'int')
+
+        if not self.converte_entradas(conversoes, self.dlg_flow_tt):
+            return False
+
+        # As tabelas dos segmentos e da rugosidade ja foram escritas na area de trabalho: copia apenas as demais entradas
+        for nome, arquivo in parametros.entradas_copiadas(direct_temp).items():
+            if os.path.abspath(parametros.entradas[nome]) != os.path.abspath(arquivo):
+                shutil.copy(parametros.entradas[nome], arquivo)
+
+        # Funcao que le as coodenadas (lin,col) dos POIs: depende da grade da bacia convertida
+        if le_poi:
+            parametros.exutorios = self.le_exutorios_shp()
+
+        # Escreve os arquivos txt com os codigos das direcoes, os parametros, os POIs e os diretorios das entradas e saidas
+        arquivos = parametros.escreve_configuracao(direct_temp, self.formato_troca)
+
+        # Organiza os caminhos dos arquivos de saida gerados na pasta temp
+        self.output1_flow_tt = arquivos['Slope']
+        self.output2_flow_tt = arquivos['river_segments']
+        self.output3_flow_tt = arquivos['Hydraulic_radius-roughness_and_slope']
+        self.output4_flow_tt = arquivos['River_cross-sectional_area']
+        self.output5_flow_tt = arquivos['River_bankfull_width']
+        self.output6_flow_tt = arquivos['Flow_travel_time']
 
     def run_flow_tt(self):
         '''Esta funcao ativa a pagina de log e configura a ordem de execucao das funcoes para o calculo do tempo de viagem'''
@@ -2912,194 +2800,171 @@ class Hidropixel:
         mensagem_log1 += "--------------------------------------------------------\n"
         self.dlg_flow_tt.progressBar.setValue(10)
 
-        # Cria condicao de parada da execucao: se o usuario clicar no botao cancel da pagina de log
-        while True:
-            # Metodo usado para permitir a iteracao do usuario enquanto o programa esta em execucao
-            QApplication.processEvents()
-            self.dlg_flow_tt.btn_cancel_log.clicked.connect(lambda: self.cancel_log_page(
-                self.dlg_flow_tt.te_logg, self.dlg_flow_tt.pg_par_ftt, self.dlg_flow_tt.pg_log_ftt))
-
-            # Verifica a existencia de incoerencias nas informacoes (direcoes de fluxo) fornecidas pelo usuario
-            list_line_edit_value_pg1 = [self.dlg_flow_tt.le_5_pg1.text(),
-                                        self.dlg_flow_tt.le_6_pg1.text(),
-                                        self.dlg_flow_tt.le_7_pg1.text(),
-                                        self.dlg_flow_tt.le_8_pg1.text(),
-                                        self.dlg_flow_tt.le_9_pg1.text(),
-                                        self.dlg_flow_tt.le_10_pg1.text(),
-                                        self.dlg_flow_tt.le_11_pg1.text(),
-                                        self.dlg_flow_tt.le_12_pg1.text()
-                                        ]
-            duplicate = []
-            # Verifica se ha duplicatas no codigo
-            for i in range(len(list_line_edit_value_pg1)):
-                for j in range(i+1, len(list_line_edit_value_pg1)):
-                    if list_line_edit_value_pg1[i] == list_line_edit_value_pg1[j]:
-                        # Para os elementos iguais, armazena eles em uma lista
-                        duplicate.append(list_line_edit_value_pg1[i])
-
-            if any(item == '' for item in duplicate):
-                self.dlg_flow_tt.pages_flow_tt.setCurrentIndex(0)
-                # Vefica se os codigos das difercoes de drenagem foram corretamente enviados
-                QMessageBox.warning(self.dlg_flow_tt, 'Warning',
-                                    "Direction codes might not None.")
-                return
+        # Verifica a existencia de incoerencias nas informacoes (direcoes de fluxo) fornecidas pelo usuario
+        list_line_edit_value_pg1 = [self.dlg_flow_tt.le_5_pg1.text(),
+                                    self.dlg_flow_tt.le_6_pg1.text(),
+                                    self.dlg_flow_tt.le_7_pg1.text(),
+                                    self.dlg_flow_tt.le_8_pg1.text(),
+                                    self.dlg_flow_tt.le_9_pg1.text(),
+                                    self.dlg_flow_tt.le_10_pg1.text(),
+                                    self.dlg_flow_tt.le_11_pg1.text(),
+                                    self.dlg_flow_tt.le_12_pg1.text()
+                                    ]
+        duplicate = []
+        # Verifica se ha duplicatas no codigo
+        for i in range(len(list_line_edit_value_pg1)):
+            for j in range(i+1, len(list_line_edit_value_pg1)):
+                if list_line_edit_value_pg1[i] == list_line_edit_value_pg1[j]:
+                    # Para os elementos iguais, armazena eles em uma lista
+                    duplicate.append(list_line_edit_value_pg1[i])
+
+        if any(item == '' for item in duplicate):
+            self.dlg_flow_tt.pages_flow_tt.setCurrentIndex(0)
+            # Vefica se os codigos das difercoes de drenagem foram corretamente enviados
+            QMessageBox.warning(self.dlg_flow_tt, 'Warning',
+                                "Direction codes might not None.")
+            return
 
-            elif duplicate and all(item != '' for item in duplicate):
-                self.dlg_flow_tt.pages_flow_tt.setCurrentIndex(0)
-                # O usuario enviou 2 valores semelhantes, sera mostrado uma mensagem de erro
-                QMessageBox.warning(
-                    self.dlg_flow_tt, 'Warning', f"The value(s) '{duplicate}' is(are) (a) duplicate(s)! Direction codes do not accept duplicates.")
-                return
+        elif duplicate and all(item != '' for item in duplicate):
+            self.dlg_flow_tt.pages_flow_tt.setCurrentIndex(0)
+            # O usuario enviou 2 valores semelhantes, sera mostrado uma mensagem de erro
+            QMessageBox.warning(
+                self.dlg_flow_tt, 'Warning', f"The value(s) '{duplicate}' is(are) (a) duplicate(s)! Direction codes do not accept duplicates.")
+            return
 
-            else:
-                # Se nao existir erros nas informacoes enviadas, sera mostrada a pagina de log e o programa sera executado
-                self.dlg_flow_tt.pg_par_ftt.setEnabled(False)
-
-                # Adiciona as mensagem de log ao text edit e configura a funcao run
-                self.dlg_flow_tt.te_logg.append(mensagem_log1)
-                for cont in range(1, 26):
-                    self.dlg_flow_tt.progressBar.setValue(cont)
-
-                self.run_process_flow_tt()
-                self.dlg_flow_tt.progressBar.setValue(40)
-
-                # Chama executavel vb para iniciar o processamento
-                travel_time_vb = self.diretorio_atual + r'\temp\travel_time.exe'
-                flow_tt_exe = subprocess.run([travel_time_vb])
-
-                # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
-                # Caso nao, a execucao continua no python
-                if flow_tt_exe.returncode == 0:
-                    self.dlg_flow_tt.progressBar.setValue(60)
-
-                    # Move e renomeia arquivo txt com as caracteristicas dos trechos de rios semelhantes
-                    if self.dlg_flow_tt.ch_8_pg4.isChecked() == True and os.path.isfile(self.output3_flow_tt) == True:
-
-                        # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
-                        is_basename = self.is_basename_only(
-                            self.dlg_flow_tt.le_8_pg4.text())
-
-                        # Se for apenas basename, concatena working folder com valor informado (deve ter extensao)
-                        if is_basename == True:
-                            output_file_1 = os.path.join(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_8_pg4.text())
-                            shutil.copy(self.output3_flow_tt,
-                                        output_file_1)
-                        else:
-                            shutil.copy(self.output3_flow_tt,
-                                        self.dlg_flow_tt.le_8_pg4.text())
-
-                    if os.path.isfile(self.output6_flow_tt) == True:
-                        # Define parametros da funcao que transforma .rst(ascii) para geotiff: Cria arquivos de saida no diretorio fornecido pelo user
-                        # Slope
-                        if self.dlg_flow_tt.ch_6_pg4.isChecked():
-                            output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
-                                                                self.dlg_flow_tt.le_6_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output1_flow_tt, output_path, 'float')
-
-                        # River segments
-                        if self.dlg_flow_tt.ch_7_pg4.isChecked():
-                            output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
-                                                                self.dlg_flow_tt.le_7_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output2_flow_tt, output_path, 'int')
-
-                        # River cross-sectional area
-                        if self.dlg_flow_tt.ch_9_pg4.isChecked():
-                            output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
-                                                                self.dlg_flow_tt.le_9_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output4_flow_tt, output_path, 'float')
-
-                        # River bankfull width
-                        if self.dlg_flow_tt.ch_10_pg4.isChecked():
-                            output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
-                                                                self.dlg_flow_tt.le_10_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output5_flow_tt, output_path, 'float')
-
-                        # Flow travel time
-                        if self.dlg_flow_tt.ch_11_pg4.isChecked():
-                            output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
-                                                                self.dlg_flow_tt.le_11_pg4.text())
-                            self.leh_rst_escreve_geotiff(
-                                self.output6_flow_tt, output_path, 'float')
-
-                        # Salva tvs e sub-bacias para cada POI
-                        if (self.dlg_flow_tt.cb_8_pg2.currentText() != '' or self.dlg_flow_tt.cb_8_pg2.currentText() != None) and self.dlg_flow_tt.ch_12_pg4.isChecked() == True:
-                            self.converte_tv_sub_POI_tif()
-                            self.apaga_arquivos_tv()
-
-                        # Atualiza progressBar
-                        self.dlg_flow_tt.progressBar.setValue(80)
-
-                        # Adiciona arquivos ao QGIS
-                        if self.dlg_flow_tt.ch_17_pg4.isChecked():
-                            self.adiciona_layer(self.caminho_completo(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_6_pg4.text()))
-
-                        if self.dlg_flow_tt.ch_18_pg4.isChecked():
-                            self.adiciona_layer(self.caminho_completo(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_7_pg4.text()))
-
-                        if self.dlg_flow_tt.ch_20_pg4.isChecked():
-                            self.adiciona_layer(self.caminho_completo(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_9_pg4.text()))
-
-                        if self.dlg_flow_tt.ch_21_pg4.isChecked():
-                            self.adiciona_layer(self.caminho_completo(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_10_pg4.text()))
-
-                        if self.dlg_flow_tt.ch_22_pg4.isChecked():
-                            self.adiciona_layer(self.caminho_completo(
-                                self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_11_pg4.text()))
-
-                        # Adiciona as informacao ao text edit
-                        self.dlg_flow_tt.te_logg.append(
-                            'Operation completed successfully!')
-                        QMessageBox.information(
-                            None, "Information", "Operation completed successfully!", )
-                        self.dlg_flow_tt.progressBar.setValue(100)
-                        self.dlg_flow_tt.pg_log_ftt.setEnabled(False)
-                        self.dlg_flow_tt.pg_par_ftt.setEnabled(True)
-                        self.dlg_flow_tt.te_logg.clear()
-                        break
-                else:
-                    # Finaliza execucao do programa e elimina os arquivos temporarios criados
-                    self.dlg_flow_tt.te_logg.clear()
-                    self.dlg_flow_tt.progressBar.setValue(0)
-                    self.dlg_flow_tt.pg_par_ftt.setEnabled(True)
-                    self.dlg_flow_tt.pg_log_ftt.setEnabled(False)
-                    end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-                    self.dlg_flow_tt.te_logg.append(end_msg)
-                    self.apaga_arquivos_temp()
-                    break
+        # Se nao existir erros nas informacoes enviadas, sera mostrada a pagina de log e o programa sera executado
+        self.dlg_flow_tt.pg_par_ftt.setEnabled(False)
 
-            # Finaliza execucao do programa e elimina os arquivos temporarios criados
-            self.dlg_flow_tt.te_logg.clear()
-            self.dlg_flow_tt.progressBar.setValue(0)
-            self.dlg_flow_tt.pg_par_ftt.setEnabled(True)
-            self.dlg_flow_tt.pg_log_ftt.setEnabled(False)
-            end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-            self.dlg_flow_tt.te_logg.append(end_msg)
-            self.apaga_arquivos_temp()
-            break
+        # Adiciona as mensagem de log ao text edit e configura a funcao run
+        self.dlg_flow_tt.te_logg.append(mensagem_log1)
 
-    def move_hidrograma_POI(self):
-        """Esta funcao organiza o envio dos hidrogramas gerados para cada POI para o diretorio informado pelo user"""
-        try:
-            if (self.dlg_flow_rout.le_3_pg2.text() != '' or self.dlg_flow_rout.le_3_pg2.text() != None) and self.dlg_flow_rout.ch_13_pg4.isChecked() == True:
-                hydrograohs_dir = self.diretorio_atual + r'\temp\hydrographs'
-                os.chdir(hydrograohs_dir)
+        # Area de trabalho da execucao: entradas convertidas, arquivos de configuracao, andamento e saidas do motor
+        area = self.limpeza_trabalho.nova_area('flow_tt')
+        run = self.run_process_flow_tt(area.pasta)
+
+        if run == False:
+            self.finaliza_flow_tt(area)
+            return
+
+        # Arquivo onde o motor nativo escreve o seu andamento: lido pelo monitor da tarefa (barra de progresso e log)
+        arquivo_progresso = area.caminho('progress.txt')
+        # O motor nativo ou o executavel vb e executado em uma tarefa do QGIS: a interface continua livre
+        if self.dlg_flow_tt.ch_native_pg1.isChecked():
+            motor = executa_motor(executa_travel_time, area.caminho('input_files_config_flow_tt.txt'),
+                                  area.caminho('output_files_config_flow_tt.txt'),
+                                  area.caminho('flow_directions_code.txt'),
+                                  area.caminho('exutorios.txt'),
+                                  area.caminho('tv_for_each_poi'),
+                                  arquivo_progresso=arquivo_progresso)
+        else:
+            motor = executa_rotina_externa(
+                area.copia_executavel(self.diretorio_atual + r'\temp\travel_time.exe'), area.pasta)
+
+        # Destino do arquivo txt com as caracteristicas dos trechos de rios semelhantes: lido antes do inicio da tarefa
+        copia_trechos = self.dlg_flow_tt.ch_8_pg4.isChecked() == True
+        # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
+        if self.is_basename_only(self.dlg_flow_tt.le_8_pg4.text()) == True:
+            output_file_1 = os.path.join(self.dlg_flow_tt.le_21_pg1.text(), self.dlg_flow_tt.le_8_pg4.text())
+        else:
+            output_file_1 = self.dlg_flow_tt.le_8_pg4.text()
+
+        # Define os arquivos convertidos: nome -> (rst, geotiff, tipo) e nome -> checkbox que adiciona a layer ao QGIS
+        conversoes = {}
+        camadas = {}
+        for nome, marcado, arquivo_rst, line_edit, file_type, add_layer in (
+                ('Slope', self.dlg_flow_tt.ch_6_pg4, self.output1_flow_tt,
+                 self.dlg_flow_tt.le_6_pg4, 'float', self.dlg_flow_tt.ch_17_pg4),
+                ('River segments', self.dlg_flow_tt.ch_7_pg4, self.output2_flow_tt,
+                 self.dlg_flow_tt.le_7_pg4, 'int', self.dlg_flow_tt.ch_18_pg4),
+                ('River cross-sectional area', self.dlg_flow_tt.ch_9_pg4, self.output4_flow_tt,
+                 self.dlg_flow_tt.le_9_pg4, 'float', self.dlg_flow_tt.ch_20_pg4),
+                ('River bankfull width', self.dlg_flow_tt.ch_10_pg4, self.output5_flow_tt,
+                 self.dlg_flow_tt.le_10_pg4, 'float', self.dlg_flow_tt.ch_21_pg4),
+                ('Flow travel time', self.dlg_flow_tt.ch_11_pg4, self.output6_flow_tt,
+                 self.dlg_flow_tt.le_11_pg4, 'float', self.dlg_flow_tt.ch_22_pg4)):
+            if marcado.isChecked():
+                output_path = self.caminho_completo(self.dlg_flow_tt.le_21_pg1.text(),
+                                                    line_edit.text())
+                conversoes[nome] = (arquivo_rst, output_path, file_type)
+                camadas[nome] = add_layer
+
+        # Salva tvs e sub-bacias para cada POI
+        pasta_poi = self.dlg_flow_tt.le_13_pg4.text() if self.dlg_flow_tt.ch_12_pg4.isChecked() == True else None
+        info = self.info_saidas()
+        output3, output6 = self.output3_flow_tt, self.output6_flow_tt
+
+        def entrega_saidas(tarefa):
+            # Copia e renomeia arquivo txt com as caracteristicas dos trechos de rios semelhantes
+            if copia_trechos and os.path.isfile(output3):
+                shutil.copy(output3, output_file_1)
+            if not os.path.isfile(output6):
+                return None
+            # Converte os arquivos .rst (inclusive os tvs e sub-bacias de cada POI) em geotiff ao mesmo tempo
+            todas = dict(conversoes)
+            if pasta_poi is not None:
+                todas.update(self.conversoes_tv_POI(area.caminho('tv_for_each_poi'), pasta_poi))
+            return self.executa_conversao_saidas(todas, info)
+
+        self.inicia_tarefa('flow_tt', HidropixelTask(
+            'Hidropixel: flow travel time', [('engine', motor), ('outputs', entrega_saidas)],
+            lambda tarefa, sucesso: self.conclui_flow_tt(tarefa, sucesso, camadas, area),
+            MonitorProgresso(
+                arquivo_progresso, self.dlg_flow_tt.progressBar, self.dlg_flow_tt.te_logg)))
+
+    def conclui_flow_tt(self, tarefa, sucesso, camadas, area):
+        '''Esta funcao finaliza a rotina flow travel time na thread da interface, ao fim da tarefa
+            camadas = dicionario nome -> checkbox que adiciona a saida convertida ao QGIS
+            area = area de trabalho da execucao, liberada para a limpeza'''
+        self.encerra_tarefa('flow_tt', tarefa)
+        # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
+        if not sucesso or tarefa.resultados['outputs'] is None:
+            if tarefa.erro is not None:
+                QMessageBox.critical(self.dlg_flow_tt, 'Engine Error', f"The engine failed:\n{tarefa.erro}")
+            self.finaliza_flow_tt(area)
+            return
+
+        convertidos, erros = tarefa.resultados['outputs']
+        self.informa_erros_conversao(erros, self.dlg_flow_tt)
+        # As saidas (inclusive os tvs e sub-bacias de cada POI) ja foram convertidas para as pastas informadas
+        self.limpeza_trabalho.libera(area, True)
+
+        # Adiciona arquivos ao QGIS
+        for nome, add_layer in camadas.items():
+            if nome in convertidos and add_layer.isChecked():
+                self.adiciona_layer(convertidos[nome])
+
+        # Adiciona as informacao ao text edit
+        self.dlg_flow_tt.te_logg.append(
+            'Operation completed successfully!')
+        QMessageBox.information(
+            None, "Information", "Operation completed successfully!", )
+        self.dlg_flow_tt.progressBar.setValue(100)
+        self.dlg_flow_tt.pg_log_ftt.setEnabled(False)
+        self.dlg_flow_tt.pg_par_ftt.setEnabled(True)
+        self.dlg_flow_tt.te_logg.clear()
 
-                arquivos_tif = glob.glob('*.txt')
+    def finaliza_flow_tt(self, area):
+        '''Finaliza execucao do programa, libera a interface grafica e a area de trabalho da execucao'''
+        self.dlg_flow_tt.te_logg.clear()
+        self.dlg_flow_tt.progressBar.setValue(0)
+        self.dlg_flow_tt.pg_par_ftt.setEnabled(True)
+        self.dlg_flow_tt.pg_log_ftt.setEnabled(False)
+        end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
+        self.dlg_flow_tt.te_logg.append(end_msg)
+        self.limpeza_trabalho.libera(area, False)
+
+    def move_hidrograma_POI(self, hydrograohs_dir, pasta_destino):
+        """Esta funcao organiza o envio dos hidrogramas gerados para cada POI para o diretorio informado pelo user
+            hydrograohs_dir = pasta hydrographs da area de trabalho da execucao
+            pasta_destino = diretorio informado pelo user, lido da interface antes do inicio da tarefa (None: nao copia)"""
+        try:
+            if pasta_destino is not None:
+                arquivos_tif = glob.glob(os.path.join(hydrograohs_dir, '*.txt'))
 
                 # Move cada hidrograma para a pasta indicada
                 for file in arquivos_tif:
                     file_base_name = os.path.basename(file)
-                    new_file_dir = os.path.join(
-                        self.dlg_flow_rout.le_9_pg4.text(), file_base_name)
+                    new_file_dir = os.path.join(pasta_destino, file_base_name)
                     shutil.copy2(file, new_file_dir)
 
         except OSError as e:
@@ -3119,25 +2984,24 @@ class Hidropixel:
                 )
                 return False
 
-    def run_process_flow_rout(self):
-        """Esta funcao organiza os arquivos de entrada para as rotinas em vb apartir do plugin qgis"""
-        # Captura diretorio dos arquivo txt (pasta temp)
-        direct_temp = self.diretorio_atual + r'\temp'
+    def run_process_flow_rout(self, direct_temp):
+        """Esta funcao organiza os arquivos de entrada para as rotinas em vb apartir do plugin qgis
+            direct_temp = pasta da area de trabalho da execucao"""
+
+        # Define a janela de recorte na extensao da bacia (quando a opcao estiver ativa)
+        self.define_janela_recorte(self.dlg_flow_rout.cb_1_pg2.currentLayer().source())
 
         # Logica para conexao com VB
         try:
             if (self.dlg_flow_rout.le_3_pg2.text() != '' or self.dlg_flow_rout.le_3_pg2.text() != None) and self.dlg_flow_rout.ch_13_pg4.isChecked() == True:
-                self.apaga_arquivos_tv()
-                os.chdir(self.dlg_flow_rout.le_3_pg2.text())
-
-                arquivos_tif = glob.glob('*.tif')
-                cont = 0
+                # A listagem gera OSError se a pasta informada nao existir
+                arquivos_tif = [os.path.join(self.dlg_flow_rout.le_3_pg2.text(), arquivo)
+                                for arquivo in os.listdir(self.dlg_flow_rout.le_3_pg2.text()) if arquivo.endswith('.tif')]
 
-                # Converte para .rst e move para a pasta tv_for_each_poi
+                # Converte para .rst e move para a pasta tv_for_each_poi da area de trabalho
                 for file in arquivos_tif:
                     file_basename = os.path.basename(file)
-                    tv_file = direct_temp + \
-                        fr"\tv_for_each_poi\{file_basename.replace('.tif', '.rst')}"
+                    tv_file = os.path.join(direct_temp, 'tv_for_each_poi', file_basename.replace('.tif', '.rst'))
                     self.leh_geotiff_escreve_ascii(file, tv_file, "float")
 
         except OSError as e:
@@ -3157,91 +3021,49 @@ class Hidropixel:
                 )
                 return False
 
-        # Escreve arquivos de parametros
-        parameters_flow_rout = direct_temp + r'\parameters_flow_rout.txt'
-        with open(parameters_flow_rout, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write(
-                f"Rainfall time step (min),{self.dlg_flow_rout.le_2_pg1.text()}\n")
-            arquivo_txt.write(
-                f"Parameter β,{self.dlg_flow_rout.le_5_pg1.text()}\n")
-            arquivo_txt.write(
-                f"L/s,{1 if self.dlg_flow_rout.rb_3_pg4.isChecked() == True else 0}\n")
-            arquivo_txt.write(
-                f"m3/s,{1 if self.dlg_flow_rout.rb_4_pg4.isChecked() == True else 0}")
+        # Configuracao da rotina: os arquivos de configuracao sao escritos pelo objeto de parametros
+        classes = self.dlg_flow_rout.groupBox_2.isChecked() == True
+        marcadas = (self.dlg_flow_rout.ch_4_pg4, self.dlg_flow_rout.ch_5_pg4, self.dlg_flow_rout.ch_6_pg4)
+        parametros = ParametrosFlowRouting(
+            {'watershed': self.dlg_flow_rout.cb_1_pg2.currentLayer().source(),
+             'flow_travel_time': self.dlg_flow_rout.cb_3_pg2.currentLayer().source(),
+             'excess_hyetographs': self.dlg_flow_rout.le_4_pg2.text(),
+             'total_excess_rainfall': self.dlg_flow_rout.cb_5_pg2.currentLayer().source(),
+             'watershed_into_classes': self.dlg_flow_rout.cb_4_pg2.currentLayer().source() if classes else None},
+            {nome: '' if marcada.isChecked() else None
+             for (nome, _, _), marcada in zip(ParametrosFlowRouting.definicoes_saidas, marcadas)},
+            discretizacao=self.dlg_flow_rout.le_2_pg1.text(),
+            beta=self.dlg_flow_rout.le_5_pg1.text(),
+            litros=self.dlg_flow_rout.rb_3_pg4.isChecked(),
+            # Versao TUH+: disponivel apenas no motor nativo
+            tuh=self.dlg_flow_rout.rb_2_pg1.isChecked())
 
         # Chama funcoes para tranformacao do raster em geotiff para rst tipo ascii
-        bacia_file = direct_temp + r'\Watershed.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_rout.cb_1_pg2.currentLayer().source(), bacia_file, 'int')
-
-        # Versao TUH
-        # pixels_id_file = direct_temp + r'\map_pixels_id.rst'
-        # self.leh_geotiff_escreve_ascii(
-        #     self.dlg_flow_rout.le_2_pg2.text(), pixels_id_file, 'int')
-
-        flow_tt_file = direct_temp + r'\flow_tt.rst'
+        arquivos = parametros.arquivos_temp(direct_temp)
+        self.leh_geotiff_escreve_ascii(parametros.entradas['watershed'], arquivos['watershed'], 'int')
+        self.leh_geotiff_escreve_ascii(parametros.entradas['flow_travel_time'], arquivos['flow_travel_time'], 'float')
+        shutil.copy2(parametros.entradas['excess_hyetographs'], arquivos['excess_hyetographs'])
         self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_rout.cb_3_pg2.currentLayer().source(), flow_tt_file, 'float')
-
-        hietograma_file = direct_temp + r'\excess_hyetographs.bin'
-        shutil.copy2(self.dlg_flow_rout.le_4_pg2.text(), hietograma_file)
-
-        total_exc_rain_file = direct_temp + r'\total_excess_rainfall.rst'
-        self.leh_geotiff_escreve_ascii(
-            self.dlg_flow_rout.cb_5_pg2.currentLayer().source(), total_exc_rain_file, 'float')
-
-        if self.dlg_flow_rout.groupBox_2.isChecked() == True:
-            watershed_into_classes = direct_temp + r'\watershed_into_classes.rst'
-            self.leh_geotiff_escreve_ascii(
-                self.dlg_flow_rout.cb_4_pg2.currentLayer().source(), watershed_into_classes, 'int', mapa_classes='y')
-        else:
-            watershed_into_classes = ""
-
-        # Escreve txt contendo codigo de direcoes de fluxo
-        flow_directions_code = direct_temp + r'\input_files_config_flow_rout.txt'
-        with open(flow_directions_code, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write("Selected input files directory\n")
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.cb_1_pg2.currentText() !="" else 0},watershed,{bacia_file}\n')
-            # Versao TUH
-            # arquivo_txt.write(
-            #     f'{1 if self.dlg_flow_rout.le_2_pg2.text() !="" else 0},map_pixels_id,{pixels_id_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.cb_3_pg2.currentText() !="" else 0},flow_travel_time,{flow_tt_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.le_4_pg2.text() !="" else 0},excess_hyetographs,{hietograma_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.cb_5_pg2.currentText() !="" else 0},total_excess_rainfall,{total_exc_rain_file}\n')
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.cb_4_pg2.currentText() !="" else 0},watershed_into_classes,{watershed_into_classes}\n')
-            arquivo_txt.write(f'{1},parameters,{parameters_flow_rout}')
-
-        self.output1_flow_rout = direct_temp + r'\map_of_resulting_peak_discharge.rst'
-        self.output2_flow_rout = direct_temp + r'\map_of_resulting_runoff_volume.rst'
-        self.output3_flow_rout = direct_temp + r'\resulting_watershed_hydrograph.txt'
-
-        # Escreve aquivo txt contendo o diretorio informado pelo user: sera fornecido para a rotina em visual basic
-        direct_out_files = direct_temp + r'\output_files_config_flow_rout.txt'
-        with open(direct_out_files, 'w', encoding='utf-8') as arquivo_txt:
-            arquivo_txt.write("Selected output files directory\n")
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.ch_4_pg4.isChecked() == True else 0},map_of_resulting_peak_discharge,{self.output1_flow_rout}\n')  # rst
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.ch_5_pg4.isChecked() == True else 0},map_of_resulting_runoff_volume,{self.output2_flow_rout}\n')  # rst
-            arquivo_txt.write(
-                f'{1 if self.dlg_flow_rout.ch_6_pg4.isChecked() == True else 0},resulting_watershed_hydrograph,{self.output3_flow_rout}')  # txt
-
-    def plot_hidrogramas_e_metricas(self):
-        """Esta funcao gera o hidrograma calculado vs observado e adiciona as metricas de comparacao"""
+            parametros.entradas['total_excess_rainfall'], arquivos['total_excess_rainfall'], 'float')
+        if classes:
+            self.leh_geotiff_escreve_ascii(parametros.entradas['watershed_into_classes'],
+                                           arquivos['watershed_into_classes'], 'int', mapa_classes='y')
+
+        # Escreve os arquivos de parametros e os arquivos txt com os diretorios das entradas e saidas
+        arquivos = parametros.escreve_configuracao(direct_temp, self.formato_troca)
+        self.output1_flow_rout = arquivos['map_of_resulting_peak_discharge']
+        self.output2_flow_rout = arquivos['map_of_resulting_runoff_volume']
+        self.output3_flow_rout = arquivos['resulting_watershed_hydrograph']
+
+    def plot_hidrogramas_e_metricas(self, hidrograma_calc, hidrograma_obs):
+        """Esta funcao gera o hidrograma calculado vs observado e adiciona as metricas de comparacao
+            hidrograma_calc = hidrograma resultante da execucao
+            hidrograma_obs = hidrograma observado, lido da interface antes do inicio da tarefa (None: plota apenas o calculado)"""
 
         # leh hidrograma observado
         cont = 0
-        # Plota, se marcado, o hidrograma calculado e o observado e calcula as metricas
-        if self.dlg_flow_rout.ch_12_pg4.isChecked() == True and self.dlg_flow_rout.le_6_pg4.text() != '' and self.dlg_flow_rout.le_7_pg4.text() != '':
-            hidrograma_obs = self.caminho_completo(
-                self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_7_pg4.text())
-            hidrograma_calc = self.output3_flow_rout
-
+        # Plota, se informado, o hidrograma calculado e o observado e calcula as metricas
+        if hidrograma_obs is not None:
             # Leitura do hidrograma observado
             with open(hidrograma_obs, 'r', encoding='ISO-8859-1') as f:
                 header_obs = f.readline().strip().split(',')
@@ -3321,8 +3143,6 @@ class Hidropixel:
             plt.show()
 
         else:
-            hidrograma_calc = self.output3_flow_rout
-
             with open(hidrograma_calc, 'r', encoding='ISO-8859-1') as f:
                 header = f.readline().strip().split(',')
 
@@ -3400,123 +3220,131 @@ class Hidropixel:
         mensagem_log1 += f"Algorithm started at: {datatime_started}\n"
         mensagem_log1 += "--------------------------------------------------------\n"
         self.dlg_flow_rout.progressBar.setValue(10)
-        # Cria condicao de parada da execucao: se o usuario clicar no botao cancel da pagina de log
-        while True:
-            # Metodo usado para permitir a iteracao do usuario enquanto o programa esta em execucao
-            QApplication.processEvents()
-            self.dlg_flow_rout.btn_cancel_log.clicked.connect(lambda: self.cancel_log_page(
-                self.dlg_flow_rout.te_logg, self.dlg_flow_rout.pg_par_f_rout, self.dlg_flow_rout.pg_log_f_rout))
-            self.dlg_flow_rout.pg_par_f_rout.setEnabled(False)
+        self.dlg_flow_rout.pg_par_f_rout.setEnabled(False)
 
-            # Adiciona as mensagem de log ao text edit e configura a funcao run
-            self.dlg_flow_rout.te_logg.append(mensagem_log1)
-            for cont in range(1, 26):
-                self.dlg_flow_rout.progressBar.setValue(cont)
+        # Adiciona as mensagem de log ao text edit e configura a funcao run
+        self.dlg_flow_rout.te_logg.append(mensagem_log1)
 
-            run = self.run_process_flow_rout()
+        # Area de trabalho da execucao: entradas convertidas, arquivos de configuracao, andamento e saidas do motor
+        area = self.limpeza_trabalho.nova_area('flow_rout')
+        run = self.run_process_flow_rout(area.pasta)
 
-            if run == False:
-                self.dlg_flow_rout.te_logg.clear()
-                self.dlg_flow_rout.progressBar.setValue(0)
-                self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
-                self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
-                end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-                self.dlg_flow_rout.te_logg.append(end_msg)
-                self.apaga_arquivos_temp()
-                break
-
-            self.dlg_flow_rout.progressBar.setValue(40)
-
-            # Chama executavel vb para iniciar o processamento
-            flow_rout_vb = self.diretorio_atual + r'\temp\flow_routing.exe'
-            flow_rout_exe = subprocess.run([flow_rout_vb])
-
-            # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
-            # Caso nao, a execucao continua no python
-            if flow_rout_exe.returncode == 0:
-                self.dlg_flow_rout.progressBar.setValue(60)
-
-                # Copia e renomeia arquivo txt do hidrograma final
-                if self.dlg_flow_rout.ch_6_pg4.isChecked() == True and os.path.isfile(self.output3_flow_rout) == True:
-
-                    # Define parametros da funcao que transforma .rst(ascii) para geotiff: Cria arquivos de saida no diretorio fornecido pelo user
-                    # Peak discharge
-                    if self.dlg_flow_rout.ch_4_pg4.isChecked():
-                        output_path = self.caminho_completo(
-                            self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_4_pg4.text())
-                        self.leh_rst_escreve_geotiff(
-                            self.output1_flow_rout, output_path, 'float')
-
-                    # Runoff volume
-                    if self.dlg_flow_rout.ch_5_pg4.isChecked():
-                        output_path = self.caminho_completo(
-                            self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_5_pg4.text())
-                        self.leh_rst_escreve_geotiff(
-                            self.output2_flow_rout, output_path, 'float')
-
-                    # Adicao dos arquivos gerados ao QGIS
-                    if self.dlg_flow_rout.ch_10_pg4.isChecked():
-                        layer_path = self.caminho_completo(
-                            self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_4_pg4.text())
-                        self.adiciona_layer(layer_path)
-
-                    if self.dlg_flow_rout.ch_11_pg4.isChecked():
-                        layer_path = self.caminho_completo(
-                            self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_5_pg4.text())
-                        self.adiciona_layer(layer_path)
-
-                    # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
-                    is_basename = self.is_basename_only(
-                        self.dlg_flow_rout.le_6_pg4.text())
-
-                    # Se for apenas basename, concatena working folder com valor informado (deve ter extensao)
-                    if is_basename == True:
-                        output_file_1 = os.path.join(
-                            self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_6_pg4.text())
-                        shutil.copy2(self.output3_flow_rout, output_file_1)
+        if run == False:
+            self.finaliza_flow_routing(area)
+            return
 
-                    else:
-                        shutil.copy2(self.output3_flow_rout,
-                                     self.dlg_flow_rout.le_6_pg4.text())
-
-                    # Chama funcao para plot dos hidrogramas se opcao for selecionada
-                    if self.dlg_flow_rout.ch_12_pg4.isChecked() == True:
-                        self.plot_hidrogramas_e_metricas()
-
-                    # move hidrogramas por POI para a pasta indicada pelo user
-                    self.move_hidrograma_POI()
-
-                    # Adiciona as informacao ao text edit
-                    self.dlg_flow_rout.te_logg.append(
-                        'Operation completed successfully!')
-                    QMessageBox.information(
-                        None, "Information", "Operation completed successfully!", )
-                    self.dlg_flow_rout.progressBar.setValue(100)
-                    self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
-                    self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
-                    self.dlg_flow_rout.te_logg.clear()
-                    break
+        # Arquivo onde o motor nativo escreve o seu andamento: lido pelo monitor da tarefa (barra de progresso e log)
+        arquivo_progresso = area.caminho('progress.txt')
+        # O motor nativo ou o executavel vb e executado em uma tarefa do QGIS (a versao TUH+ so existe no motor nativo)
+        if self.dlg_flow_rout.ch_native_pg1.isChecked() or self.dlg_flow_rout.rb_2_pg1.isChecked():
+            # Hidrogramas dos POIs apenas quando a opcao estiver marcada
+            poi = self.dlg_flow_rout.ch_13_pg4.isChecked()
+            motor = executa_motor(executa_flow_routing, area.caminho('input_files_config_flow_rout.txt'),
+                                  area.caminho('output_files_config_flow_rout.txt'),
+                                  area.caminho('tv_for_each_poi') if poi else None,
+                                  area.caminho('hydrographs') if poi else None,
+                                  arquivo_progresso=arquivo_progresso)
+        else:
+            motor = executa_rotina_externa(
+                area.copia_executavel(self.diretorio_atual + r'\temp\flow_routing.exe'), area.pasta)
+
+        # Define os arquivos convertidos: nome -> (rst, geotiff, tipo) e nome -> checkbox que adiciona a layer ao QGIS
+        conversoes = {}
+        camadas = {}
+        for nome, marcado, arquivo_rst, line_edit, add_layer in (
+                ('Peak discharge', self.dlg_flow_rout.ch_4_pg4, self.output1_flow_rout,
+                 self.dlg_flow_rout.le_4_pg4, self.dlg_flow_rout.ch_10_pg4),
+                ('Runoff volume', self.dlg_flow_rout.ch_5_pg4, self.output2_flow_rout,
+                 self.dlg_flow_rout.le_5_pg4, self.dlg_flow_rout.ch_11_pg4)):
+            if marcado.isChecked():
+                output_path = self.caminho_completo(
+                    self.dlg_flow_rout.le_3_pg1.text(), line_edit.text())
+                conversoes[nome] = (arquivo_rst, output_path, 'float')
+                camadas[nome] = add_layer
+
+        # Destino do hidrograma final: lido da interface antes do inicio da tarefa
+        copia_hidrograma = self.dlg_flow_rout.ch_6_pg4.isChecked() == True
+        # Verifica se o user enviou o diretorio do arquivo ou apenas o nome (nesse caso, working folder != '')
+        if self.is_basename_only(self.dlg_flow_rout.le_6_pg4.text()) == True:
+            output_file_1 = os.path.join(self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_6_pg4.text())
+        else:
+            output_file_1 = self.dlg_flow_rout.le_6_pg4.text()
+        info = self.info_saidas()
+        output3 = self.output3_flow_rout
+        # Opcoes de plot (hidrograma observado, quando informado) e pasta dos hidrogramas dos POIs (None: nao copia)
+        plota_hidrograma = self.dlg_flow_rout.ch_12_pg4.isChecked() == True
+        hidrograma_obs = None
+        if plota_hidrograma and self.dlg_flow_rout.le_6_pg4.text() != '' and self.dlg_flow_rout.le_7_pg4.text() != '':
+            hidrograma_obs = self.caminho_completo(
+                self.dlg_flow_rout.le_3_pg1.text(), self.dlg_flow_rout.le_7_pg4.text())
+        pasta_poi = self.dlg_flow_rout.le_9_pg4.text() if self.dlg_flow_rout.ch_13_pg4.isChecked() == True else None
+
+        def entrega_saidas(tarefa):
+            if not copia_hidrograma or not os.path.isfile(output3):
+                return None
+            # Converte os arquivos ao mesmo tempo e copia o hidrograma final
+            convertidos = self.executa_conversao_saidas(conversoes, info)
+            shutil.copy2(output3, output_file_1)
+            return convertidos
+
+        self.inicia_tarefa('flow_rout', HidropixelTask(
+            'Hidropixel: flow routing', [('engine', motor), ('outputs', entrega_saidas)],
+            lambda tarefa, sucesso: self.conclui_flow_routing(
+                tarefa, sucesso, camadas, area, (output3, hidrograma_obs) if plota_hidrograma else None, pasta_poi),
+            MonitorProgresso(
+                arquivo_progresso, self.dlg_flow_rout.progressBar, self.dlg_flow_rout.te_logg)))
+
+    def conclui_flow_routing(self, tarefa, sucesso, camadas, area, hidrogramas_plot, pasta_poi):
+        '''Esta funcao finaliza a rotina flow routing na thread da interface, ao fim da tarefa
+            camadas = dicionario nome -> checkbox que adiciona a saida convertida ao QGIS
+            area = area de trabalho da execucao, liberada para a limpeza
+            hidrogramas_plot = (hidrograma resultante, hidrograma observado) desta execucao, ou None se o plot nao foi marcado
+            pasta_poi = pasta dos hidrogramas dos POIs informada pelo user (None: nao copia)
+            As opcoes sao lidas antes do inicio da tarefa: alteracoes na interface durante a execucao nao as afetam'''
+        self.encerra_tarefa('flow_rout', tarefa)
+        # verifica se houve algum erro no processamento das rotinas no vb ou se o usuario clicou em cancelar
+        if not sucesso or tarefa.resultados['outputs'] is None:
+            if tarefa.erro is not None:
+                QMessageBox.critical(self.dlg_flow_rout, 'Engine Error', f"The engine failed:\n{tarefa.erro}")
+            self.finaliza_flow_routing(area)
+            return
 
-                else:
-                    # Caso nenhuma das condicoes acima sejam verdadeira, libera a interface grafica e limpa os arquivos
-                    self.dlg_flow_rout.te_logg.clear()
-                    self.dlg_flow_rout.progressBar.setValue(0)
-                    self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
-                    self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
-                    end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-                    self.dlg_flow_rout.te_logg.append(end_msg)
-                    self.apaga_arquivos_temp()
-                    break
+        convertidos, erros = tarefa.resultados['outputs']
+        self.informa_erros_conversao(erros, self.dlg_flow_rout)
+
+        # Adicao dos arquivos gerados ao QGIS
+        for nome, add_layer in camadas.items():
+            if nome in convertidos and add_layer.isChecked():
+                self.adiciona_layer(convertidos[nome])
+
+        # Chama funcao para plot dos hidrogramas se opcao for selecionada
+        if hidrogramas_plot is not None:
+            self.plot_hidrogramas_e_metricas(*hidrogramas_plot)
+
+        # move hidrogramas por POI para a pasta indicada pelo user
+        self.move_hidrograma_POI(area.caminho('hydrographs'), pasta_poi)
+        # O hidrograma final e os hidrogramas dos POIs ja foram lidos da area de trabalho
+        self.limpeza_trabalho.libera(area, True)
+
+        # Adiciona as informacao ao text edit
+        self.dlg_flow_rout.te_logg.append(
+            'Operation completed successfully!')
+        QMessageBox.information(
+            None, "Information", "Operation completed successfully!", )
+        self.dlg_flow_rout.progressBar.setValue(100)
+        self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
+        self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
+        self.dlg_flow_rout.te_logg.clear()
 
-            # Caso nenhuma das condicoes acima sejam verdadeira, libera a interface grafica e limpa os arquivos
-            self.dlg_flow_rout.te_logg.clear()
-            self.dlg_flow_rout.progressBar.setValue(0)
-            self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
-            self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
-            end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
-            self.dlg_flow_rout.te_logg.append(end_msg)
-            self.apaga_arquivos_temp()
-            break
+    def finaliza_flow_routing(self, area):
+        '''Caso a rotina nao seja concluida, libera a interface grafica e a area de trabalho da execucao'''
+        self.dlg_flow_rout.te_logg.clear()
+        self.dlg_flow_rout.progressBar.setValue(0)
+        self.dlg_flow_rout.pg_par_f_rout.setEnabled(True)
+        self.dlg_flow_rout.pg_log_f_rout.setEnabled(False)
+        end_msg = "The Hidropixel process has been canceled... Take a breath and go back to work!"
+        self.dlg_flow_rout.te_logg.append(end_msg)
+        self.limpeza_trabalho.libera(area, False)
 
     def ativa_objetos_run_ftt(self):
         """Esta funcao ativia objetos da pagina run do modulo flow travel time se o usuario selecionar a opcao correspondente."""
@@ -4477,12 +4305,8 @@ class Hidropixel:
                 lambda: self.close_gui(3))
 
             '''Menu Q-Hidropixel'''
-            # Elimina os arquivos criados durante a execucao do hidropixel
-            self.apaga_arquivos_temp()
-            self.apaga_arquivos_maps()
-            self.apaga_arquivos_tv()
-            self.apaga_arquivos_hydrographs()
-            self.apaga_arquivos_tv_for_each_poi()
+            # Remove, em segundo plano, as areas de trabalho expiradas (inclusive as deixadas por execucoes interrompidas)
+            self.limpeza_trabalho.agenda()
 
             # Run the dialog event loop
             self.dlg_hidropixel.exec_()
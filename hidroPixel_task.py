@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ HidropixelTask
+                                 A QGIS plugin
+ Runs the Hidropixel engines in the QGIS task manager
+                             -------------------
+        begin                : 2023-11-29
+        copyright            : (C) 2023 by João Vitor & Adriano Rolim
+        email                : jvds@academico.ufpb.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import time
+
+from qgis.core import QgsTask
+from qgis.PyQt.QtCore import QTimer
+
+from .modulos_files.engine_progress import (
+    ExecucaoCancelada, LeitorProgresso, descreve_estado, descreve_etapa, formata_tempo)
+from .modulos_files.process_supervisor import SupervisorProcesso
+
+# Intervalo (ms) entre as leituras do arquivo de andamento do motor
+INTERVALO_LEITURA_MS = 500
+
+# Faixa da barra de progresso ocupada pelo motor: antes dela as entradas sao preparadas e depois as saidas convertidas
+FAIXA_MOTOR = (10, 90)
+
+
+class HidropixelTask(QgsTask):
+    """Background task that runs the steps of a Hidropixel module (engine and output conversions).
+
+    The steps run in order in the task thread and must not touch the widgets; the completion callback runs in the
+    interface thread, where the layers are added and the messages are shown.
+    """
+
+    def __init__(self, descricao, etapas, ao_concluir, monitor=None):
+        '''descricao = texto mostrado no gerenciador de tarefas do QGIS
+            etapas = lista de (nome, funcao): cada funcao recebe a tarefa e seu retorno e guardado em self.resultados[nome]
+            ao_concluir = funcao chamada na thread da interface ao fim da tarefa: ao_concluir(tarefa, sucesso)
+            monitor = MonitorProgresso que mostra o andamento do motor enquanto a tarefa e executada (opcional)'''
+        super().__init__(descricao, QgsTask.CanCancel)
+        self.etapas = etapas
+        self.ao_concluir = ao_concluir
+        self.monitor = monitor
+        self.resultados = {}
+        self.erro = None
+        self.etapa_atual = None
+        if monitor is not None:
+            monitor.inicia(self)
+
+    def run(self):
+        '''Executa as etapas em ordem (thread da tarefa); retorna False no primeiro erro ou se a tarefa for cancelada'''
+        for indice, (nome, funcao) in enumerate(self.etapas):
+            if self.isCanceled():
+                return False
+            self.etapa_atual = nome
+            try:
+                self.resultados[nome] = funcao(self)
+            except ExecucaoCancelada:
+                return False
+            except Exception as erro:
+                self.erro = erro
+                return False
+            # Sem monitor, o progresso da tarefa avanca a cada etapa concluida
+            if self.monitor is None:
+                self.setProgress(100.0 * (indice + 1) / len(self.etapas))
+        return True
+
+    def finished(self, sucesso):
+        '''Chamada pelo QGIS na thread da interface quando a tarefa termina, falha ou e cancelada'''
+        if self.monitor is not None:
+            self.monitor.encerra()
+        self.ao_concluir(self, sucesso)
+
+
+class MonitorProgresso:
+    """Polls the progress file of the running engine and shows it on the progress bar and on the log of a dialog.
+
+    The file is read by a timer of the interface thread, so the widgets are only touched by that thread. The
+    external (VB) routines do not write the file: for them only the elapsed time is shown.
+    """
+
+    def __init__(self, arquivo, barra=None, log=None, faixa=FAIXA_MOTOR, intervalo=INTERVALO_LEITURA_MS):
+        '''arquivo = arquivo de andamento escrito pelo motor (ver engine_progress)
+            barra = barra de progresso do dialogo (opcional)
+            log = text edit da pagina de log, onde o inicio e o fim de cada etapa sao informados (opcional)
+            faixa = valores da barra de progresso no inicio e no fim do motor'''
+        self.leitor = LeitorProgresso(arquivo)
+        self.barra = barra
+        self.log = log
+        self.faixa = faixa
+        self.tarefa = None
+        self.inicio = time.monotonic()
+        self.etapas_informadas = set()
+        self.timer = QTimer()
+        self.timer.setInterval(intervalo)
+        self.timer.timeout.connect(self.atualiza)
+
+    def inicia(self, tarefa):
+        '''Comeca a leitura periodica do arquivo de andamento da tarefa'''
+        self.tarefa = tarefa
+        self.inicio = time.monotonic()
+        self.timer.start()
+
+    def encerra(self):
+        '''Le as ultimas linhas do arquivo e para a leitura periodica'''
+        self.timer.stop()
+        self.atualiza()
+        if self.barra is not None:
+            self.barra.setFormat('%p%')
+
+    def atualiza(self):
+        '''Le as novas linhas do arquivo de andamento e atualiza a barra de progresso e o log'''
+        for estado in self.leitor.le():
+            chave = (estado.indice, estado.etapa)
+            if self.log is not None and chave not in self.etapas_informadas:
+                self.etapas_informadas.add(chave)
+                self.log.append(f'{descreve_etapa(estado)} started')
+            if self.log is not None and estado.concluido == estado.total and estado.total > 1:
+                self.log.append(descreve_estado(estado))
+
+        estado = self.leitor.estado
+        if self.tarefa is not None and self.tarefa.etapa_atual not in (None, 'engine'):
+            # Motor concluido: a tarefa converte as saidas
+            fracao, texto = 1.0, 'Converting outputs'
+        elif estado is None:
+            fracao, texto = 0.0, f'Engine running (elapsed {formata_tempo(time.monotonic() - self.inicio)})'
+        else:
+            fracao, texto = estado.fracao, descreve_estado(estado)
+
+        if self.barra is not None:
+            self.barra.setValue(int(self.faixa[0] + fracao * (self.faixa[1] - self.faixa[0])))
+            self.barra.setFormat(f'%p% - {texto}')
+        if self.tarefa is not None:
+            self.tarefa.setProgress(100.0 * fracao)
+
+
+def executa_motor(funcao, *args, **kwargs):
+    '''Retorna a etapa que executa um motor nativo (Python) com os arquivos de configuracao informados
+        O motor verifica o cancelamento da tarefa a cada atualizacao do seu andamento e para na etapa em curso'''
+    return lambda tarefa: funcao(*args, cancelado=tarefa.isCanceled, **kwargs)
+
+
+def executa_rotina_externa(executavel, pasta=None):
+    '''Retorna a etapa que executa uma rotina externa (vb): a arvore de processos e encerrada se a tarefa for cancelada
+        pasta = diretorio de trabalho da rotina (area de trabalho da execucao)'''
+    def etapa(tarefa):
+        codigo = SupervisorProcesso([executavel], pasta=pasta).executa(tarefa.isCanceled)
+        if codigo != 0:
+            raise RuntimeError(f'{os.path.basename(executavel)} finished with exit code {codigo}')
+        return codigo
+    return etapa
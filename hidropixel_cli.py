@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ Hidropixel command line runner
+                                 A QGIS plugin
+ Runs the Hidropixel modules without QGIS (no dialog is created).
+                             -------------------
+        begin                : 2023-11-29
+        copyright            : (C) 2023 by João Vitor & Adriano Rolim
+        email                : jvds@academico.ufpb.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Usage:
+    python hidropixel_cli.py basin.json [--stages flow_routing] [--temp scratch_root] [--keep-scratch] [--report report.json]
+    python hidropixel_cli.py basin.json --events storms_folder [storm.txt ...] [--workers 4] [--results results_folder]
+
+The format of the JSON file is described in modulos_files/pipeline.py. The exit code is 0 when every stage finishes,
+1 when a stage (or an event of the batch) fails and 2 when the configuration file is invalid.
+"""
+import sys
+
+from modulos_files.pipeline import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -43,6 +43,12 @@ class RDCVariables:
         self.projection = None
         self.projection = ""
 
+        # Recorte na extensao da bacia: janela (xoff, yoff, xsize, ysize) e grade completa do raster de origem
+        self.janela = None
+        self.geotransform_total = []
+        self.nlin_total = 0
+        self.ncol_total = 0
+
         # Int's variables declaration
         self.i = 0
         self.narq = 0
@@ -0,0 +1,215 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE RAINFALL EVENT BATCHES \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for running a batch of rainfall events (design or historical storms) against the
+same watershed: the excess rainfall and flow routing stages of the JSON file (see pipeline.py) are the template of every
+event, and only the rainfall input changes. The rasters shared by the events are converted once; then each event runs
+both stages in its own workspace, in a pool of processes, and the outlet hydrographs of all events are collected in a
+single table indexed by event, outlet and time.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import copy
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from . import excess_rainfall as er
+from . import flow_routing as fr
+from .pipeline import ETAPA_EXCESS_RAINFALL, ETAPA_FLOW_ROUTING, carrega_configuracao, executa_etapa, prepara_entradas
+from .scratch_workspace import (ESTADO_CONCLUIDO, ESTADO_FALHOU, AreaTrabalho, LimpezaAreas, PoliticaRetencao,
+                                raiz_trabalho)
+
+# Extensoes aceitas como arquivos de chuva de um evento: .bin = chuva distribuida (rainfall interpolation); as demais
+# sao hietogramas da chuva media na bacia ("Time(min),Rainfall(mm)")
+EXTENSOES_CHUVA = ('.bin', '.txt', '.csv')
+
+# Nome do exutorio da bacia na tabela dos hidrogramas (os POIs usam o nome do arquivo do seu hidrograma)
+EXUTORIO_BACIA = 'watershed'
+
+
+def lista_eventos(entradas):
+    '''Retorna a lista de (nome do evento, arquivo de chuva) a partir de arquivos e pastas (todos os arquivos de chuva
+        da pasta, em ordem alfabetica). Nomes repetidos recebem um sufixo numerico'''
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            arquivos.extend(os.path.join(entrada, nome) for nome in sorted(os.listdir(entrada))
+                            if os.path.splitext(nome)[1].lower() in EXTENSOES_CHUVA)
+        elif os.path.isfile(entrada):
+            arquivos.append(entrada)
+        else:
+            raise ValueError(f"Rainfall event '{entrada}' not found.")
+
+    eventos, usados = [], set()
+    for arquivo in arquivos:
+        nome = base = os.path.splitext(os.path.basename(arquivo))[0]
+        sufixo = 1
+        while nome in usados:
+            sufixo += 1
+            nome = f'{base}_{sufixo}'
+        usados.add(nome)
+        eventos.append((nome, arquivo))
+    if not eventos:
+        raise ValueError('No rainfall event was found.')
+    return eventos
+
+
+def prepara_comum(parametros_er, parametros_fr, pasta_comum, formato_troca):
+    '''Converte uma unica vez os rasters usados por todos os eventos (bacia, CN, tempo de viagem, classes e tempos dos POIs)
+        Retorna os objetos de parametros modelo dos eventos, com essas entradas apontando para os arquivos convertidos'''
+    if parametros_er.combinacoes():
+        raise ValueError('The batch mode does not run λ or CN multiplier sweeps: each event has one excess rainfall.')
+    modelo_er = copy.deepcopy(parametros_er)
+    modelo_fr = copy.deepcopy(parametros_fr)
+    # A chuva e os hietogramas excedentes mudam a cada evento: nao sao preparados aqui
+    for nome in (er.ENTRADA_CHUVA_MEDIA, er.ENTRADA_CHUVA_DISTRIBUIDA):
+        modelo_er.entradas[nome] = None
+    for nome in (fr.ENTRADA_HIETOGRAMAS, fr.ENTRADA_EXCEDENTE_TOTAL):
+        modelo_fr.entradas[nome] = None
+
+    for modelo in (modelo_er, modelo_fr):
+        prepara_entradas(modelo, pasta_comum, formato_troca)
+        arquivos = modelo.arquivos_temp(pasta_comum)
+        for nome, _, file_type in modelo.definicoes_entradas:
+            if file_type is not None and modelo.entradas.get(nome):
+                modelo.entradas[nome] = arquivos[nome]
+    if modelo_fr.tempos_poi:
+        modelo_fr.tempos_poi = os.path.join(pasta_comum, 'tv_for_each_poi')
+
+    # Saidas de cada evento: apenas os hietogramas excedentes e o hidrograma, mantidos na area do evento (sem o mapa
+    # do volume escoado, o flow routing nao le a chuva excedente total)
+    modelo_er.saidas = {er.SAIDA_HIETOGRAMAS: ''}
+    modelo_fr.saidas = {fr.SAIDA_HIDROGRAMA: ''}
+    modelo_fr.hidrogramas_poi = None
+    return modelo_er, modelo_fr
+
+
+def le_hidrograma(arquivo):
+    '''Le a coluna total de um hidrograma escrito pelo flow routing. Retorna (tempos (min), vazoes, nome da coluna)'''
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        coluna = arquivo_txt.readline().strip().split(',')[1]
+    dados = np.loadtxt(arquivo, delimiter=',', skiprows=1, ndmin=2)
+    return dados[:, 0], dados[:, 1], coluna
+
+
+def executa_evento(evento, arquivo_chuva, modelo_er, modelo_fr, raiz, formato_troca):
+    '''Executa as etapas excess rainfall e flow routing de um evento na sua propria area de trabalho (processo do pool)
+        Retorna o dicionario {event, exit_code, seconds, error, workspace, hydrographs}; hydrographs = dicionario
+        exutorio -> (tempos, vazoes, nome da coluna)'''
+    inicio = time.perf_counter()
+    area = AreaTrabalho.cria(raiz, f'event_{evento}')
+    resultado = {'event': evento, 'exit_code': 0, 'seconds': 0.0, 'error': None, 'workspace': area.pasta,
+                 'hydrographs': {}}
+    try:
+        parametros_er = copy.deepcopy(modelo_er)
+        chave = er.ENTRADA_CHUVA_DISTRIBUIDA if arquivo_chuva.lower().endswith('.bin') else er.ENTRADA_CHUVA_MEDIA
+        parametros_er.entradas[chave] = arquivo_chuva
+        executa_etapa(parametros_er, area.pasta, formato_troca)
+
+        # Os hietogramas excedentes sao renomeados para a entrada do flow routing na mesma area (sem copia)
+        parametros_fr = copy.deepcopy(modelo_fr)
+        hietogramas = parametros_fr.arquivos_temp(area.pasta)[fr.ENTRADA_HIETOGRAMAS]
+        os.replace(parametros_er.arquivos_temp(area.pasta)[er.SAIDA_HIETOGRAMAS], hietogramas)
+        parametros_fr.entradas[fr.ENTRADA_HIETOGRAMAS] = hietogramas
+        executa_etapa(parametros_fr, area.pasta, formato_troca)
+
+        hidrogramas = resultado['hydrographs']
+        hidrogramas[EXUTORIO_BACIA] = le_hidrograma(parametros_fr.arquivos_temp(area.pasta)[fr.SAIDA_HIDROGRAMA])
+        pasta_poi = area.caminho('hydrographs')
+        for nome in sorted(os.listdir(pasta_poi)):
+            hidrogramas[os.path.splitext(nome)[0]] = le_hidrograma(os.path.join(pasta_poi, nome))
+    except Exception as erro:  # o evento falha, mas os demais eventos continuam
+        resultado['exit_code'] = 1
+        resultado['error'] = f'{type(erro).__name__}: {erro}'
+    resultado['seconds'] = time.perf_counter() - inicio
+    area.define_estado(ESTADO_FALHOU if resultado['exit_code'] else ESTADO_CONCLUIDO)
+    return resultado
+
+
+def escreve_tabela_hidrogramas(arquivo, resultados):
+    '''Escreve os hidrogramas de todos os eventos em uma tabela indexada por evento, exutorio e tempo'''
+    with open(arquivo, 'w', encoding='utf-8') as arquivo_txt:
+        coluna = next((hidrograma[2] for resultado in resultados for hidrograma in resultado['hydrographs'].values()),
+                      'Total')
+        arquivo_txt.write(f"event,outlet,Time (min),{coluna.replace('Total', 'Discharge')}\n")
+        for resultado in resultados:
+            for exutorio, (tempos, vazoes, _) in resultado['hydrographs'].items():
+                for t, vazao in zip(tempos, vazoes):
+                    arquivo_txt.write(f"{resultado['event']},{exutorio},{t:g},{vazao:.6f}\n")
+
+
+def escreve_resumo(arquivo, resultados):
+    '''Escreve uma linha por evento com o codigo de saida, o tempo de execucao e o pico do hidrograma no exutorio'''
+    with open(arquivo, 'w', encoding='utf-8') as arquivo_txt:
+        arquivo_txt.write('event,exit_code,seconds,peak_discharge,time_to_peak (min),error\n')
+        for resultado in resultados:
+            pico = tempo_pico = ''
+            if EXUTORIO_BACIA in resultado['hydrographs']:
+                tempos, vazoes, _ = resultado['hydrographs'][EXUTORIO_BACIA]
+                if vazoes.size:
+                    pico, tempo_pico = f'{vazoes.max():.6f}', f'{tempos[np.argmax(vazoes)]:g}'
+            erro = (resultado['error'] or '').replace(',', ';')
+            arquivo_txt.write(f"{resultado['event']},{resultado['exit_code']},{resultado['seconds']:.3f},{pico},"
+                              f"{tempo_pico},{erro}\n")
+
+
+def executa_lote(arquivo_json, eventos, pasta_resultados, raiz=None, processos=None, saida=None,
+                 politica=PoliticaRetencao()):
+    '''Executa os eventos de chuva em um pool de processos, com as etapas excess rainfall e flow routing do arquivo JSON
+        eventos = arquivos de chuva e/ou pastas com os arquivos de chuva (ver lista_eventos)
+        pasta_resultados = pasta onde a tabela dos hidrogramas (hydrographs.csv) e o resumo (summary.csv) sao escritos
+        raiz = pasta raiz das areas de trabalho (ver raiz_trabalho)
+        processos = quantidade de processos do pool (None = quantidade de processadores)
+        saida = arquivo onde o resultado de cada evento e escrito ao fim do evento (None = nada e escrito)
+        politica = PoliticaRetencao das areas de trabalho; as areas dos eventos com falha deste lote sao sempre mantidas
+        ate o fim do lote (a politica volta a valer para elas na proxima limpeza)
+        Retorna a lista dos resultados dos eventos (ver executa_evento), na ordem dos eventos'''
+    formato_troca, parametros = carrega_configuracao(arquivo_json)
+    parametros = dict(parametros)
+    faltando = [etapa for etapa in (ETAPA_EXCESS_RAINFALL, ETAPA_FLOW_ROUTING) if etapa not in parametros]
+    if faltando:
+        raise ValueError(f"The batch mode needs the stages: {', '.join(faltando)}.")
+    eventos = lista_eventos(eventos)
+
+    raiz = raiz_trabalho(raiz)
+    # As areas com falha mantidas antes do lote continuam mantidas, mais uma por evento do lote
+    limpeza = LimpezaAreas(raiz, politica._replace(manter_falhas=politica.manter_falhas + len(eventos)))
+    limpeza.agenda()
+    area_comum = limpeza.nova_area('batch')
+    resultados = {}
+    try:
+        modelo_er, modelo_fr = prepara_comum(
+            parametros[ETAPA_EXCESS_RAINFALL], parametros[ETAPA_FLOW_ROUTING], area_comum.pasta, formato_troca)
+        # Processos iniciados com spawn em todos os sistemas: o processo principal tem a thread de limpeza em execucao
+        with ProcessPoolExecutor(max_workers=processos or None, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = {pool.submit(executa_evento, evento, arquivo, modelo_er, modelo_fr, raiz, formato_troca): evento
+                       for evento, arquivo in eventos}
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                resultados[futuros[futuro]] = resultado
+                # Remove a area do evento concluido enquanto os demais eventos sao executados
+                limpeza.agenda()
+                if saida is not None:
+                    saida.write(f"{resultado['event']:<24} exit code {resultado['exit_code']}  "
+                                f"{resultado['seconds']:9.2f} s\n")
+                    if resultado['error']:
+                        saida.write(f"    {resultado['error']}\n    workspace kept in {resultado['workspace']}\n")
+                    saida.flush()
+        limpeza.libera(area_comum, True)
+    except BaseException:
+        limpeza.libera(area_comum, False)
+        raise
+    finally:
+        limpeza.encerra()
+
+    resultados = [resultados[evento] for evento, _ in eventos]
+    os.makedirs(pasta_resultados, exist_ok=True)
+    escreve_tabela_hidrogramas(os.path.join(pasta_resultados, 'hydrographs.csv'), resultados)
+    escreve_resumo(os.path.join(pasta_resultados, 'summary.csv'), resultados)
+    return resultados
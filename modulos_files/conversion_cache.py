@@ -0,0 +1,157 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE CONVERSION CACHE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for caching the .rst/.rdc files converted from the GeoTIFF inputs, so that the same
+raster is not converted again by each module (or on each re-run) while the source file does not change.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# Tamanho maximo padrao da cache (MB)
+TAMANHO_MAXIMO_PADRAO_MB = 1024
+
+# Nome do arquivo de indice salvo na pasta da cache
+ARQUIVO_INDICE = 'cache_index.json'
+
+
+class ConversionCache:
+    """
+    This class stores converted .rst/.rdc pairs indexed by the source raster and the conversion options. The least
+    recently used entries are removed when the cache grows beyond its size limit.
+    """
+
+    def __init__(self, pasta, tamanho_maximo_mb=TAMANHO_MAXIMO_PADRAO_MB):
+        """
+        pasta = diretorio onde os arquivos da cache sao armazenados (sera criado)
+        tamanho_maximo_mb = limite do tamanho total dos arquivos armazenados
+        """
+        self.pasta = pasta
+        self.tamanho_maximo = int(tamanho_maximo_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+        self._indice = self._carrega_indice()
+
+    def chave(self, arquivo, geotransform, *opcoes):
+        '''Retorna a chave da conversao de um raster, ou None caso a origem nao seja um arquivo local
+            arquivo = diretorio do raster de origem
+            geotransform = geotransform do raster de origem
+            opcoes = opcoes que alteram o arquivo convertido (ex.: int/float, mapa de classes, formato de troca)'''
+        if not os.path.isfile(arquivo):
+            return None
+
+        info = os.stat(arquivo)
+        conteudo = json.dumps([
+            os.path.normcase(os.path.abspath(arquivo)),
+            info.st_size,
+            info.st_mtime_ns,
+            [float(valor) for valor in geotransform],
+            [str(opcao) for opcao in opcoes],
+        ])
+        return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+    def busca(self, chave, arquivo_rst):
+        '''Copia o .rst/.rdc armazenados para arquivo_rst (e o .rdc de mesmo nome). Retorna False se nao houver entrada'''
+        if chave is None:
+            return False
+
+        with self._lock:
+            if chave not in self._indice:
+                return False
+            rst_cache, rdc_cache = self._arquivos(chave)
+            if not (os.path.isfile(rst_cache) and os.path.isfile(rdc_cache)):
+                # Entrada corrompida (arquivos apagados fora da cache): descarta
+                self._remove(chave)
+                self._salva_indice()
+                return False
+
+            # Copia: as rotinas externas podem sobrescrever os arquivos da pasta temp
+            shutil.copyfile(rst_cache, arquivo_rst)
+            shutil.copyfile(rdc_cache, self._rdc(arquivo_rst))
+            self._indice[chave]['ultimo_uso'] = time.time()
+            self._salva_indice()
+            return True
+
+    def armazena(self, chave, arquivo_rst):
+        '''Armazena uma copia de arquivo_rst (e do .rdc de mesmo nome) e remove as entradas menos usadas se necessario'''
+        if chave is None:
+            return
+
+        arquivo_rdc = self._rdc(arquivo_rst)
+        tamanho = os.path.getsize(arquivo_rst) + os.path.getsize(arquivo_rdc)
+        if tamanho > self.tamanho_maximo:
+            return
+
+        with self._lock:
+            rst_cache, rdc_cache = self._arquivos(chave)
+            shutil.copyfile(arquivo_rst, rst_cache)
+            shutil.copyfile(arquivo_rdc, rdc_cache)
+            self._indice[chave] = {'tamanho': tamanho, 'ultimo_uso': time.time()}
+            self._libera_espaco()
+            self._salva_indice()
+
+    def tamanho_total(self):
+        '''Retorna o tamanho total (bytes) dos arquivos armazenados'''
+        with self._lock:
+            return sum(entrada['tamanho'] for entrada in self._indice.values())
+
+    def limpa(self):
+        '''Apaga todos os arquivos da cache e retorna a quantidade de bytes liberados'''
+        with self._lock:
+            liberado = 0
+            for arquivo in os.listdir(self.pasta):
+                caminho = os.path.join(self.pasta, arquivo)
+                if os.path.isfile(caminho):
+                    liberado += os.path.getsize(caminho)
+                    os.remove(caminho)
+            self._indice = {}
+            return liberado
+
+    def _libera_espaco(self):
+        # Remove as entradas menos usadas recentemente ate respeitar o limite
+        total = sum(entrada['tamanho'] for entrada in self._indice.values())
+        for chave in sorted(self._indice, key=lambda c: self._indice[c]['ultimo_uso']):
+            if total <= self.tamanho_maximo:
+                break
+            total -= self._indice[chave]['tamanho']
+            self._remove(chave)
+
+    def _remove(self, chave):
+        for arquivo in self._arquivos(chave):
+            if os.path.isfile(arquivo):
+                os.remove(arquivo)
+        self._indice.pop(chave, None)
+
+    def _arquivos(self, chave):
+        return os.path.join(self.pasta, f'{chave}.rst'), os.path.join(self.pasta, f'{chave}.rdc')
+
+    @staticmethod
+    def _rdc(arquivo_rst):
+        return os.path.splitext(arquivo_rst)[0] + '.rdc'
+
+    def _carrega_indice(self):
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo_json:
+                indice = json.load(arquivo_json)
+        except (OSError, ValueError):
+            return {}
+        # Mantem apenas as entradas cujos arquivos ainda existem
+        return {
+            chave: entrada for chave, entrada in indice.items()
+            if all(os.path.isfile(arquivo) for arquivo in self._arquivos(chave))
+        }
+
+    def _salva_indice(self):
+        # Escreve em arquivo temporario e substitui: evita indice corrompido caso o QGIS seja fechado no meio da escrita
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo_json:
+            json.dump(self._indice, arquivo_json)
+        os.replace(caminho + '.tmp', caminho)
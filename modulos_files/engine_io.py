@@ -0,0 +1,144 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE NATIVE ENGINES I/O \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for reading and writing the files exchanged with the Hidropixel routines (input and
+output config files, parameter files, .rst/.rdc maps and hyetograph .bin files), so that the native (Python) engines
+read the same inputs and write the same outputs as the external routines.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+import struct
+
+import numpy as np
+
+from .rst_io import FORMATO_ASCII, FORMATO_BINARIO, escreve_rst_ascii, escreve_rst_binario, le_rdc, le_rst
+
+# Cabecalho dos arquivos de hietogramas: numero de pixels, numero de blocos, discretizacao e duracao
+FORMATO_CABECALHO_HIETOGRAMA = '<iiff'
+TAMANHO_CABECALHO_HIETOGRAMA = struct.calcsize(FORMATO_CABECALHO_HIETOGRAMA)
+
+# Chaves do .rdc que descrevem apenas o arquivo de origem e nao sao copiadas para os mapas de saida
+CHAVES_ARQUIVO_RDC = ('watershed_classes', 'file_format', 'data_type')
+
+
+def le_config_arquivos(arquivo):
+    '''Le um arquivo de configuracao de entradas ou saidas (input/output_files_config_*.txt)
+        Linhas "ativo,nome,diretorio" ou "nome,diretorio"; a linha exchange_format define o formato dos .rst
+        Retorna (arquivos, formato_troca): arquivos e um dicionario nome -> diretorio, apenas com as linhas ativas'''
+    arquivos = {}
+    formato_troca = FORMATO_ASCII
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        # A primeira linha e o cabecalho
+        arquivo_txt.readline()
+        for linha in arquivo_txt:
+            partes = linha.rstrip('\r\n').split(',')
+            if len(partes) < 2:
+                continue
+            if partes[0] == 'exchange_format':
+                formato_troca = partes[1]
+            elif partes[0] in ('0', '1') and len(partes) >= 3:
+                if partes[0] == '1' and ','.join(partes[2:]):
+                    arquivos[partes[1]] = ','.join(partes[2:])
+            else:
+                arquivos[partes[0]] = ','.join(partes[1:])
+    return arquivos, formato_troca
+
+
+def le_parametros(arquivo):
+    '''Le um arquivo de parametros (linhas "nome,valor") e retorna um dicionario nome -> valor (float)
+        Parametros vazios ou nao numericos (ex.: campos opcionais nao preenchidos) nao sao incluidos'''
+    parametros = {}
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        for linha in arquivo_txt:
+            nome, _, valor = linha.strip().rpartition(',')
+            try:
+                parametros[nome] = float(valor)
+            except ValueError:
+                continue
+    return parametros
+
+
+def parametro(parametros, nome):
+    '''Retorna um parametro obrigatorio lido por le_parametros'''
+    if nome not in parametros:
+        raise ValueError(f"Parameter '{nome}' is missing or is not a number.")
+    return parametros[nome]
+
+
+def le_lista_parametro(arquivo, nome):
+    '''Le um parametro com varios valores (linha "nome,valor1,valor2,...") de um arquivo de parametros
+        Retorna a lista de valores (float) ou None quando a linha nao existe ou esta vazia'''
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        for linha in arquivo_txt:
+            partes = [parte.strip() for parte in linha.strip().split(',')]
+            if partes[0] != nome:
+                continue
+            valores = [parte for parte in partes[1:] if parte]
+            try:
+                return [float(valor) for valor in valores] or None
+            except ValueError:
+                raise ValueError(f"Parameter '{nome}' has values that are not numbers.") from None
+    return None
+
+
+def dimensoes_rst(arquivo_rst):
+    '''Retorna (nlin, ncol, informacoes do .rdc) do .rst informado'''
+    informacoes = le_rdc(os.path.splitext(arquivo_rst)[0] + '.rdc')
+    return int(informacoes['Rows']), int(informacoes['Columns']), informacoes
+
+
+def le_mapa(arquivo_rst, file_type):
+    '''Le um mapa .rst (ascii ou binario, conforme o .rdc) com as dimensoes declaradas no .rdc'''
+    nlin, ncol, _ = dimensoes_rst(arquivo_rst)
+    return le_rst(arquivo_rst, nlin, ncol, file_type,
+                  dtype=np.int32 if file_type == 'int' else np.float64)
+
+
+def escreve_mapa(arquivo_rst, dados, file_type, formato_troca, arquivo_referencia):
+    '''Escreve um mapa de saida no formato de troca e o .rdc com a grade do mapa de referencia (ex.: a bacia)'''
+    _, _, informacoes = dimensoes_rst(arquivo_referencia)
+    if formato_troca == FORMATO_BINARIO:
+        data_type = escreve_rst_binario(arquivo_rst, dados, file_type)
+    else:
+        escreve_rst_ascii(arquivo_rst, dados, file_type)
+
+    with open(os.path.splitext(arquivo_rst)[0] + '.rdc', 'w', encoding='utf-8') as rdc:
+        rdc.write('Raster Informations\n')
+        for chave, valor in informacoes.items():
+            if chave not in CHAVES_ARQUIVO_RDC:
+                rdc.write(f'{chave},{valor}\n')
+        if formato_troca == FORMATO_BINARIO:
+            rdc.write(f'file_format,{FORMATO_BINARIO}\n')
+            rdc.write(f'data_type,{data_type}\n')
+
+
+def le_cabecalho_hietograma(arquivo_bin):
+    '''Retorna (n_pixels, n_blocos, discretizacao, duracao) do cabecalho de um arquivo de hietogramas .bin'''
+    with open(arquivo_bin, 'rb') as arquivo:
+        cabecalho = arquivo.read(TAMANHO_CABECALHO_HIETOGRAMA)
+    if len(cabecalho) != TAMANHO_CABECALHO_HIETOGRAMA:
+        raise ValueError(f"File '{arquivo_bin}' is too short to be a hyetograph file.")
+    return struct.unpack(FORMATO_CABECALHO_HIETOGRAMA, cabecalho)
+
+
+def le_hietogramas(arquivo_bin):
+    '''Abre um arquivo de hietogramas .bin sem carrega-lo na memoria
+        Os valores (float32) sao gravados pixel a pixel: os n_blocos valores de cada pixel da bacia sao continuos
+        Retorna (cabecalho, matriz (n_pixels, n_blocos) mapeada do disco)'''
+    cabecalho = le_cabecalho_hietograma(arquivo_bin)
+    n_pixels, n_blocos = cabecalho[0], cabecalho[1]
+    esperado = TAMANHO_CABECALHO_HIETOGRAMA + n_pixels * n_blocos * 4
+    if os.path.getsize(arquivo_bin) < esperado:
+        raise ValueError(
+            f"File '{arquivo_bin}' declares {n_pixels} pixels x {n_blocos} blocks, but it has fewer values.")
+    valores = np.memmap(arquivo_bin, dtype='<f4', mode='r', offset=TAMANHO_CABECALHO_HIETOGRAMA,
+                        shape=(n_pixels, n_blocos))
+    return cabecalho, valores
+
+
+def escreve_cabecalho_hietograma(arquivo, n_pixels, n_blocos, discretizacao, duracao):
+    '''Escreve o cabecalho de um arquivo de hietogramas .bin (arquivo aberto em modo binario)'''
+    arquivo.write(struct.pack(FORMATO_CABECALHO_HIETOGRAMA, n_pixels, n_blocos, discretizacao, duracao))
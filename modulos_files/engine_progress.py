@@ -0,0 +1,154 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE ENGINE PROGRESS CHANNEL \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the progress channel between the engines and the plugin. An engine writes its
+progress to a text file (one line per update: stage,index,number of stages,done,total,seconds since the start of the
+run) and the plugin reads the new lines of the file while the engine runs, without blocking the interface, to show the
+progress, the elapsed time and the ETA of each stage. The same calls let the plugin cancel a native engine between two
+progress updates.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+import time
+from collections import namedtuple
+
+# Intervalo minimo (s) entre duas linhas de andamento de uma mesma etapa (o inicio e o fim sao sempre escritos)
+INTERVALO_ESCRITA = 0.5
+
+# Estado de uma etapa: decorrido e eta em segundos (eta None enquanto nada foi concluido)
+EstadoProgresso = namedtuple('EstadoProgresso', 'etapa indice n_etapas concluido total decorrido eta fracao')
+
+
+class ExecucaoCancelada(Exception):
+    """Raised when the run of an engine is cancelled by the user."""
+
+
+class ProgressoMotor:
+    """
+    This class writes the progress of an engine run to the progress file. Without a file nothing is written, so the
+    engines report their progress unconditionally. Each call also checks whether the run was cancelled.
+    """
+
+    def __init__(self, arquivo=None, etapas=(), intervalo=INTERVALO_ESCRITA, cancelado=None):
+        """
+        arquivo = arquivo de andamento (sera recriado); None desativa a escrita
+        etapas = nomes das etapas do motor, na ordem em que sao executadas
+        intervalo = intervalo minimo (s) entre as linhas de andamento de uma etapa
+        cancelado = funcao que retorna True quando a execucao foi cancelada (ExecucaoCancelada e gerada)
+        """
+        self.arquivo = arquivo
+        self.cancelado = cancelado
+        self.etapas = list(etapas)
+        self.intervalo = intervalo
+        self.inicio = time.monotonic()
+        self.etapa_atual = None
+        self.total = 0
+        self.ultima_escrita = 0.0
+        if arquivo:
+            os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+            open(arquivo, 'w', encoding='utf-8').close()
+
+    def etapa(self, nome, total=1):
+        '''Inicia a etapa informada, com total unidades de trabalho (pixels, blocos, mapas...)'''
+        self.verifica_cancelamento()
+        self.etapa_atual = nome
+        self.total = max(int(total), 1)
+        self._escreve(0)
+
+    def avanca(self, concluido):
+        '''Informa quantas unidades da etapa atual ja foram concluidas'''
+        self.verifica_cancelamento()
+        if self.arquivo is None or self.etapa_atual is None:
+            return
+        concluido = min(int(concluido), self.total)
+        if concluido == self.total or time.monotonic() - self.ultima_escrita >= self.intervalo:
+            self._escreve(concluido)
+
+    def verifica_cancelamento(self):
+        '''Gera ExecucaoCancelada se a execucao do motor foi cancelada'''
+        if self.cancelado is not None and self.cancelado():
+            raise ExecucaoCancelada(f'The run was cancelled during the stage {self.etapa_atual}.')
+
+    def _escreve(self, concluido):
+        if self.arquivo is None:
+            return
+        self.ultima_escrita = time.monotonic()
+        indice = self.etapas.index(self.etapa_atual) + 1 if self.etapa_atual in self.etapas else 0
+        with open(self.arquivo, 'a', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write(f'{self.etapa_atual},{indice},{len(self.etapas)},{concluido},{self.total},'
+                              f'{self.ultima_escrita - self.inicio:.3f}\n')
+
+
+class LeitorProgresso:
+    """
+    This class reads the progress file of a running engine. Each call reads only the complete lines written since
+    the previous call and returns the state of the stages they describe.
+    """
+
+    def __init__(self, arquivo):
+        """
+        arquivo = arquivo de andamento escrito pelo motor (pode ainda nao existir)
+        """
+        self.arquivo = arquivo
+        self.posicao = 0
+        self.inicio_etapas = {}
+        self.estado = None
+
+    def le(self):
+        '''Le as novas linhas do arquivo e retorna a lista dos estados atualizados (vazia se nada mudou)'''
+        # Leitura binaria: a posicao e contada em bytes, independente das quebras de linha do sistema
+        try:
+            with open(self.arquivo, 'rb') as arquivo_txt:
+                # Arquivo menor que a posicao lida: foi recriado por uma nova execucao do motor
+                if os.fstat(arquivo_txt.fileno()).st_size < self.posicao:
+                    self.posicao = 0
+                    self.inicio_etapas = {}
+                arquivo_txt.seek(self.posicao)
+                conteudo = arquivo_txt.read()
+        except OSError:
+            return []
+        # Uma linha sem quebra no final ainda esta sendo escrita: e lida na proxima chamada
+        completo = conteudo[:conteudo.rfind(b'\n') + 1]
+        self.posicao += len(completo)
+
+        estados = []
+        for linha in completo.decode('utf-8').splitlines():
+            campos = linha.split(',')
+            if len(campos) != 6:
+                continue
+            etapa = campos[0]
+            indice, n_etapas, concluido, total = (int(valor) for valor in campos[1:5])
+            segundos = float(campos[5])
+            inicio = self.inicio_etapas.setdefault((indice, etapa), segundos)
+            decorrido = segundos - inicio
+            eta = decorrido * (total - concluido) / concluido if concluido > 0 else None
+            fracao = concluido / total if total > 0 else 0.0
+            if n_etapas > 0 and indice > 0:
+                fracao = (indice - 1 + fracao) / n_etapas
+            self.estado = EstadoProgresso(etapa, indice, n_etapas, concluido, total, decorrido, eta, fracao)
+            estados.append(self.estado)
+        return estados
+
+
+def formata_tempo(segundos):
+    '''Formata um intervalo em segundos como hh:mm:ss'''
+    segundos = int(round(segundos))
+    return f'{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}'
+
+
+def descreve_etapa(estado):
+    '''Nome da etapa com a sua posicao entre as etapas do motor (ex.: Stage 2/3: routing)'''
+    return f'Stage {estado.indice}/{estado.n_etapas}: {estado.etapa}' if estado.indice else estado.etapa
+
+
+def descreve_estado(estado):
+    '''Texto de uma linha com a etapa, o percentual concluido, o tempo decorrido e o ETA da etapa'''
+    etapa = descreve_etapa(estado)
+    percentual = 100.0 * estado.concluido / estado.total if estado.total else 0.0
+    texto = f'{etapa} - {percentual:.0f}% (elapsed {formata_tempo(estado.decorrido)}'
+    if estado.concluido < estado.total and estado.eta is not None:
+        texto += f', ETA {formata_tempo(estado.eta)}'
+    return texto + ')'
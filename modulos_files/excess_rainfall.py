@@ -0,0 +1,229 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE NATIVE EXCESS RAINFALL ENGINE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the native (NumPy) version of the excess rainfall routine (SCS-CN method). It
+reads the same config, parameter and .rst files written for excess_rainfall.exe and writes the same five maps and the
+excess hyetographs .bin file, so the module can run where the external routine is not available (ex.: Linux). For
+sensitivity studies the parameter file may also list several λ values and/or CN multipliers: every combination is
+computed in the same pass over the rainfall, and the maps that depend on the parameters are written for each one.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import itertools
+import os
+
+import numpy as np
+
+from .engine_io import escreve_cabecalho_hietograma, escreve_mapa, le_config_arquivos, le_hietogramas, \
+    le_lista_parametro, le_mapa, le_parametros, parametro
+from .engine_progress import ProgressoMotor
+
+# Quantidade aproximada de valores (pixels x blocos de chuva) processados por vez: limita a memoria usada
+VALORES_POR_BLOCO = 4 << 20
+
+# Com a chuva media, a chuva excedente depende apenas do CN do pixel: e calculada uma vez por valor de CN (e espalhada
+# para os pixels) quando os hietogramas dos valores de CN (valores x blocos x combinacoes) cabem neste limite
+VALORES_POR_CN = 64 << 20
+
+# Etapas informadas no arquivo de andamento
+ETAPAS = ('reading inputs', 'excess rainfall', 'writing maps')
+
+# Nomes das entradas e saidas nos arquivos de configuracao
+ENTRADA_BACIA = 'watershed'
+ENTRADA_CN = 'curve_number_map'
+ENTRADA_CHUVA_MEDIA = 'Areal_averaged_rainfall'
+ENTRADA_CHUVA_DISTRIBUIDA = 'Spatially_distributed_rainfall'
+ENTRADA_PARAMETROS = 'parameters'
+PARAMETRO_LAMBDA = 'Initial abstraction (λ)'
+# Parametros opcionais da varredura (linhas "nome,valor1,valor2,..."): substituem o λ e multiplicam o mapa de CN
+PARAMETRO_VARREDURA_LAMBDA = 'Initial abstraction sweep (λ)'
+PARAMETRO_MULTIPLICADORES_CN = 'CN multipliers'
+SAIDA_IDS = 'Map of watershed pixels ID'
+SAIDA_RETENCAO = 'Map of maximum potential retention (mm)'
+SAIDA_ABSTRACAO = 'Map of initial abstraction (mm)'
+SAIDA_CHUVA_TOTAL = 'Map of total rainfall (mm)'
+SAIDA_EXCEDENTE_TOTAL = 'Map of total excess rainfall (mm)'
+SAIDA_HIETOGRAMAS = 'Excess hyetographs per pixel (mm)'
+
+# Saidas que dependem de λ ou do CN: na varredura, uma por combinacao (ver arquivo_combinacao)
+SAIDAS_COMBINACAO = (SAIDA_RETENCAO, SAIDA_ABSTRACAO, SAIDA_EXCEDENTE_TOTAL, SAIDA_HIETOGRAMAS)
+
+
+def retencao_potencial(cn):
+    '''Retencao potencial maxima S (mm) do metodo SCS-CN'''
+    cn = np.asarray(cn, dtype=np.float64)
+    if np.any((cn <= 0) | (cn > 100) | ~np.isfinite(cn)):
+        raise ValueError('The curve number map has values outside the interval (0, 100] inside the watershed.')
+    return 25400.0 / cn - 254.0
+
+
+def chuva_excedente_acumulada(chuva_acumulada, retencao, abstracao):
+    '''Chuva excedente acumulada Q = (P - Ia)^2 / (P - Ia + S) para P > Ia, e 0 caso contrario
+        Os argumentos sao combinados por broadcasting (ex.: chuva (pixels, blocos) e S, Ia (pixels, 1))'''
+    efetiva = np.maximum(chuva_acumulada - abstracao, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        excedente = efetiva * efetiva / (efetiva + retencao)
+    # S = 0 (CN = 100) e P <= Ia geram 0/0: nao ha chuva excedente
+    return np.nan_to_num(excedente, nan=0.0, copy=False)
+
+
+def combinacoes_varredura(lambdas, multiplicadores_cn):
+    '''Combinacoes (λ, multiplicador do CN) da varredura, com λ variando mais devagar'''
+    return [(float(lamb), float(multiplicador))
+            for lamb, multiplicador in itertools.product(lambdas, multiplicadores_cn)]
+
+
+def arquivo_combinacao(arquivo, lamb, multiplicador_cn):
+    '''Arquivo de uma saida da varredura: o arquivo configurado com o sufixo _lambda<λ>_cn<multiplicador>'''
+    nome, extensao = os.path.splitext(arquivo)
+    return f'{nome}_lambda{lamb:g}_cn{multiplicador_cn:g}{extensao}'
+
+
+def le_chuva_media(arquivo):
+    '''Le o arquivo da chuva media na bacia (primeira linha "num_linhas,delta_t", cabecalho e linhas "tempo,chuva")
+        Retorna (chuva por bloco, discretizacao)'''
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        num_linhas, delta_t = arquivo_txt.readline().strip().split(',')[:2]
+        arquivo_txt.readline()
+        chuva = [float(linha.split(',')[1]) for linha in arquivo_txt if linha.strip()]
+    if len(chuva) != int(num_linhas):
+        raise ValueError(f"File '{arquivo}' declares {num_linhas} rainfall blocks, but has {len(chuva)}.")
+    return np.array(chuva, dtype=np.float64), float(delta_t)
+
+
+def executa_excess_rainfall(arquivo_entradas, arquivo_saidas, arquivo_progresso=None, cancelado=None):
+    '''Executa a rotina excess rainfall a partir dos arquivos de configuracao de entradas e saidas
+        arquivo_entradas = input_files_config_exc_rainf.txt
+        arquivo_saidas = output_files_config_exc_rainf.txt
+        arquivo_progresso = arquivo onde o andamento de cada etapa e escrito (opcional, ver engine_progress)
+        cancelado = funcao que retorna True quando o usuario cancela a execucao (o motor para na etapa em andamento)'''
+    progresso = ProgressoMotor(arquivo_progresso, ETAPAS, cancelado=cancelado)
+    progresso.etapa('reading inputs')
+    entradas, formato_troca = le_config_arquivos(arquivo_entradas)
+    saidas, _ = le_config_arquivos(arquivo_saidas)
+
+    arquivo_bacia = entradas[ENTRADA_BACIA]
+    bacia = le_mapa(arquivo_bacia, 'int') == 1
+    n_pixels = int(np.count_nonzero(bacia))
+
+    # Combinacoes de λ e do multiplicador do CN: sem varredura, apenas o λ informado e o CN do mapa
+    arquivo_parametros = entradas[ENTRADA_PARAMETROS]
+    lambdas = le_lista_parametro(arquivo_parametros, PARAMETRO_VARREDURA_LAMBDA)
+    multiplicadores = le_lista_parametro(arquivo_parametros, PARAMETRO_MULTIPLICADORES_CN)
+    varredura = lambdas is not None or multiplicadores is not None
+    if lambdas is None:
+        lambdas = [parametro(le_parametros(arquivo_parametros), PARAMETRO_LAMBDA)]
+    multiplicadores = np.array(multiplicadores or [1.0])
+    if np.any(multiplicadores <= 0):
+        raise ValueError('The CN multipliers must be greater than 0.')
+    combinacoes = combinacoes_varredura(lambdas, multiplicadores)
+
+    # Parametros do SCS-CN de cada valor de CN do mapa: uma linha por combinacao
+    valores_cn, indices_cn = np.unique(le_mapa(entradas[ENTRADA_CN], 'float')[bacia], return_inverse=True)
+    # O mapa e validado antes da multiplicacao: os CNs multiplicados sao limitados a 100
+    retencao_potencial(valores_cn)
+    retencao_cn = np.tile(
+        retencao_potencial(np.minimum(multiplicadores[:, np.newaxis] * valores_cn, 100.0)), (len(lambdas), 1))
+    abstracao_cn = np.array([lamb for lamb, _ in combinacoes])[:, np.newaxis] * retencao_cn
+    # Parametros dos pixels da bacia (ordem linha a linha, a mesma dos hietogramas)
+    retencao = retencao_cn[:, indices_cn]
+    abstracao = abstracao_cn[:, indices_cn]
+
+    def arquivo_saida(nome, indice):
+        # Arquivo de uma saida na combinacao indice (o arquivo configurado quando nao ha varredura)
+        return arquivo_combinacao(saidas[nome], *combinacoes[indice]) if varredura else saidas[nome]
+
+    # Chuva: hietograma medio (igual para todos os pixels) ou um hietograma por pixel
+    if ENTRADA_CHUVA_MEDIA in entradas:
+        chuva_media, discretizacao = le_chuva_media(entradas[ENTRADA_CHUVA_MEDIA])
+        chuva_media_acumulada = np.cumsum(chuva_media)
+        n_blocos = chuva_media.size
+        chuva_pixels = None
+    elif ENTRADA_CHUVA_DISTRIBUIDA in entradas:
+        (n_pixels_chuva, n_blocos, discretizacao, _), chuva_pixels = le_hietogramas(entradas[ENTRADA_CHUVA_DISTRIBUIDA])
+        if n_pixels_chuva != n_pixels:
+            raise ValueError(
+                f'The rainfall file has {n_pixels_chuva} pixels, but the watershed has {n_pixels} pixels.')
+    else:
+        raise ValueError('No rainfall input was informed.')
+
+    n_combinacoes = len(combinacoes)
+    chuva_total = np.empty(n_pixels)
+    excedente_total = np.empty((n_combinacoes, n_pixels))
+    arquivos_hietogramas = []
+    try:
+        if SAIDA_HIETOGRAMAS in saidas:
+            for indice in range(n_combinacoes):
+                arquivos_hietogramas.append(open(arquivo_saida(SAIDA_HIETOGRAMAS, indice), 'wb'))
+                escreve_cabecalho_hietograma(
+                    arquivos_hietogramas[-1], n_pixels, n_blocos, discretizacao, n_blocos * discretizacao)
+
+        progresso.etapa('excess rainfall', n_pixels)
+        if chuva_pixels is None and valores_cn.size < n_pixels and \
+                valores_cn.size * n_blocos * n_combinacoes <= VALORES_POR_CN:
+            # Chuva media: hietogramas calculados por valor de CN e copiados para os pixels pelo indice do valor
+            hietogramas_cn = np.empty((n_combinacoes, valores_cn.size, n_blocos if arquivos_hietogramas else 0),
+                                      dtype='<f4')
+            excedente_total_cn = np.zeros((n_combinacoes, valores_cn.size))
+            passo = max(1, VALORES_POR_BLOCO // max(n_blocos * n_combinacoes, 1))
+            for inicio in range(0, valores_cn.size, passo):
+                fim = min(inicio + passo, valores_cn.size)
+                excedente = chuva_excedente_acumulada(chuva_media_acumulada[np.newaxis, :],
+                                                      retencao_cn[:, inicio:fim, np.newaxis],
+                                                      abstracao_cn[:, inicio:fim, np.newaxis])
+                if n_blocos:
+                    excedente_total_cn[:, inicio:fim] = excedente[:, :, -1]
+                if arquivos_hietogramas:
+                    hietogramas_cn[:, inicio:fim] = np.diff(excedente, axis=2, prepend=0.0)
+            chuva_total[:] = chuva_media_acumulada[-1] if n_blocos else 0.0
+            excedente_total[:] = excedente_total_cn[:, indices_cn]
+
+            passo = max(1, VALORES_POR_BLOCO // max(n_blocos, 1)) if arquivos_hietogramas else n_pixels
+            for inicio in range(0, n_pixels, passo):
+                fim = min(inicio + passo, n_pixels)
+                for hietogramas, arquivo_hietogramas in zip(hietogramas_cn, arquivos_hietogramas):
+                    hietogramas[indices_cn[inicio:fim]].tofile(arquivo_hietogramas)
+                progresso.avanca(fim)
+        else:
+            # Processa os pixels em grupos: cada grupo gera uma matriz (combinacoes, pixels, blocos) de chuva
+            # excedente, calculada para todas as combinacoes com a chuva lida uma unica vez
+            passo = max(1, VALORES_POR_BLOCO // max(n_blocos * n_combinacoes, 1))
+            for inicio in range(0, n_pixels, passo):
+                fim = min(inicio + passo, n_pixels)
+                if chuva_pixels is None:
+                    chuva_acumulada = chuva_media_acumulada[np.newaxis, :]
+                else:
+                    chuva_acumulada = np.cumsum(chuva_pixels[inicio:fim], axis=1, dtype=np.float64)
+
+                excedente = chuva_excedente_acumulada(
+                    chuva_acumulada, retencao[:, inicio:fim, np.newaxis], abstracao[:, inicio:fim, np.newaxis])
+                chuva_total[inicio:fim] = chuva_acumulada[:, -1] if n_blocos else 0.0
+                excedente_total[:, inicio:fim] = excedente[:, :, -1] if n_blocos else 0.0
+
+                for excedente_combinacao, arquivo_hietogramas in zip(excedente, arquivos_hietogramas):
+                    # Chuva excedente de cada bloco: diferenca entre os valores acumulados
+                    np.diff(excedente_combinacao, axis=1, prepend=0.0).astype('<f4').tofile(arquivo_hietogramas)
+                progresso.avanca(fim)
+    finally:
+        for arquivo_hietogramas in arquivos_hietogramas:
+            arquivo_hietogramas.close()
+
+    # Mapas de saida: valores nos pixels da bacia e 0 fora dela
+    ids = np.zeros(bacia.shape, dtype=np.int32)
+    ids[bacia] = np.arange(1, n_pixels + 1)
+    mapas = [(saidas[nome], valores, file_type) for nome, valores, file_type in (
+        (SAIDA_IDS, ids, 'int'), (SAIDA_CHUVA_TOTAL, chuva_total, 'float')) if nome in saidas]
+    for indice in range(n_combinacoes):
+        mapas += [(arquivo_saida(nome, indice), valores[indice], 'float')
+                  for nome, valores in ((SAIDA_RETENCAO, retencao), (SAIDA_ABSTRACAO, abstracao),
+                                        (SAIDA_EXCEDENTE_TOTAL, excedente_total)) if nome in saidas]
+    progresso.etapa('writing maps', len(mapas))
+    for numero, (arquivo, valores, file_type) in enumerate(mapas, start=1):
+        if valores.shape != bacia.shape:
+            mapa = np.zeros(bacia.shape)
+            mapa[bacia] = valores
+            valores = mapa
+        escreve_mapa(arquivo, valores, file_type, formato_troca, arquivo_bacia)
+        progresso.avanca(numero)
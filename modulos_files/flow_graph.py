@@ -0,0 +1,127 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE FLOW DIRECTIONS GRAPH \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for building the downstream graph of the watershed pixels from the D8 flow directions
+raster. The pixels are ordered topologically (from the divides to the outlet) once, so values can be accumulated along
+the flow paths with one vectorized step per level instead of walking the path of each pixel.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import numpy as np
+
+# Deslocamento (lin, col) de cada letra do arquivo flow_directions_code.txt: A = nordeste, em sentido horario
+DESLOCAMENTOS = {
+    'A': (-1, 1),
+    'B': (0, 1),
+    'C': (1, 1),
+    'D': (1, 0),
+    'E': (1, -1),
+    'F': (0, -1),
+    'G': (-1, -1),
+    'H': (-1, 0),
+}
+
+
+def le_codigos_direcoes(arquivo):
+    '''Le o arquivo flow_directions_code.txt (cabecalho e linhas "letra,codigo")
+        Retorna um dicionario codigo do raster -> deslocamento (lin, col)'''
+    codigos = {}
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        arquivo_txt.readline()
+        for linha in arquivo_txt:
+            letra, _, codigo = linha.strip().partition(',')
+            if letra in DESLOCAMENTOS:
+                codigos[int(float(codigo))] = DESLOCAMENTOS[letra]
+    if len(codigos) != len(DESLOCAMENTOS):
+        raise ValueError(f"File '{arquivo}' must define 8 different flow direction codes.")
+    return codigos
+
+
+class GrafoFluxo:
+    """
+    This class stores the downstream graph of the watershed pixels. The pixels are numbered in row-major order (the same
+    order used in the hyetograph files); jusante holds the number of the downstream pixel (-1 at the outlets) and
+    niveis the topological levels, each one holding pixels whose upstream pixels are all in previous levels.
+    """
+
+    def __init__(self, direcoes, bacia, codigos, dx, dy):
+        '''
+        direcoes = matriz das direcoes de fluxo
+        bacia = matriz booleana dos pixels da bacia
+        codigos = dicionario codigo -> deslocamento (lin, col), ver le_codigos_direcoes
+        dx, dy = resolucao espacial (m) nos sentidos horizontal e vertical
+        '''
+        self.forma = bacia.shape
+        nlin, ncol = self.forma
+        self.pixels = np.flatnonzero(bacia)
+        self.n = self.pixels.size
+
+        # Posicao de cada celula da grade no vetor dos pixels da bacia (-1 fora da bacia)
+        self.posicao = np.full(bacia.size, -1, dtype=np.int64)
+        self.posicao[self.pixels] = np.arange(self.n)
+
+        lin, col = np.divmod(self.pixels, ncol)
+        codigo = np.asarray(direcoes).ravel()[self.pixels]
+        desl_lin = np.zeros(self.n, dtype=np.int64)
+        desl_col = np.zeros(self.n, dtype=np.int64)
+        for valor, (di, dj) in codigos.items():
+            mesmo = codigo == valor
+            desl_lin[mesmo] = di
+            desl_col[mesmo] = dj
+
+        # Pixel de jusante: direcoes desconhecidas ou que saem da grade/bacia definem um exutorio
+        lin_jus = lin + desl_lin
+        col_jus = col + desl_col
+        direcao_valida = (desl_lin != 0) | (desl_col != 0)
+        dentro = direcao_valida & (lin_jus >= 0) & (lin_jus < nlin) & (col_jus >= 0) & (col_jus < ncol)
+        self.jusante = np.full(self.n, -1, dtype=np.int64)
+        self.jusante[dentro] = self.posicao[lin_jus[dentro] * ncol + col_jus[dentro]]
+
+        # Distancia percorrida ate o pixel de jusante (diagonal ou ortogonal)
+        self.comprimento = np.where(
+            (desl_lin != 0) & (desl_col != 0), np.hypot(dx, dy), np.where(desl_lin != 0, abs(dy), abs(dx)))
+
+        self.niveis = self._ordena()
+
+    def _ordena(self):
+        # Ordenacao topologica (Kahn) nivel a nivel: comeca pelos pixels sem contribuicao de montante
+        com_jusante = self.jusante >= 0
+        entradas = np.bincount(self.jusante[com_jusante], minlength=self.n)
+        atual = np.flatnonzero(entradas == 0)
+        niveis = []
+        ordenados = 0
+        while atual.size:
+            niveis.append(atual)
+            ordenados += atual.size
+            destino = self.jusante[atual]
+            destino = destino[destino >= 0]
+            entradas -= np.bincount(destino, minlength=self.n)
+            candidatos = np.unique(destino)
+            atual = candidatos[entradas[candidatos] == 0]
+
+        if ordenados != self.n:
+            raise ValueError(
+                f'The flow directions have loops: {self.n - ordenados} watershed pixels never reach an outlet.')
+        return niveis
+
+    def acumula_jusante(self, valores):
+        '''Soma os valores ao longo do caminho de cada pixel ate o exutorio: C(p) = valores(p) + C(jusante(p))'''
+        total = np.zeros(self.n + 1, dtype=np.float64)
+        # Os niveis de jusante sao processados primeiro; o indice -1 aponta para a ultima posicao (sempre 0)
+        for nivel in reversed(self.niveis):
+            total[nivel] = valores[nivel] + total[self.jusante[nivel]]
+        return total[:self.n]
+
+    def drena_para(self, pixel):
+        '''Retorna a mascara (vetor dos pixels da bacia) dos pixels cujo caminho passa pelo pixel informado'''
+        indicador = np.zeros(self.n)
+        indicador[pixel] = 1.0
+        return self.acumula_jusante(indicador) > 0
+
+    def mapa(self, valores, dtype=np.float64):
+        '''Escreve os valores dos pixels da bacia em uma matriz da grade (0 fora da bacia)'''
+        grade = np.zeros(self.forma[0] * self.forma[1], dtype=dtype)
+        grade[self.pixels] = valores
+        return grade.reshape(self.forma)
@@ -0,0 +1,345 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE NATIVE FLOW ROUTING ENGINE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the native (NumPy) version of the flow routing routine. In the Hidropixel - DLR
+version (Distributed Linear Reservoirs) the excess hyetograph of each watershed pixel is translated by its travel time
+and routed through a linear reservoir with storage constant K = β x travel time, and the pixel outflows are summed at
+the outlet. The recurrence of
+the reservoirs is computed for all pixels of a group at once, one time step at a time. In the Hidropixel - TUH+ version
+each pixel responds with a triangular unit hydrograph (SCS) built from its travel time: the pixels are grouped by
+travel time class, and the excess volumes of each class are convolved (FFT) with the unit hydrograph of the class.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import glob
+import os
+
+import numpy as np
+
+from .engine_io import dimensoes_rst, escreve_mapa, le_config_arquivos, le_hietogramas, le_mapa, le_parametros, \
+    parametro
+from .engine_progress import ProgressoMotor
+
+# Quantidade aproximada de valores (pixels x blocos de chuva) lidos por vez do arquivo de hietogramas
+VALORES_POR_BLOCO = 4 << 20
+
+# O hidrograma continua apos o fim da chuva ate o armazenamento do reservatorio mais lento cair abaixo dessa fracao
+FRACAO_RESIDUAL = 1e-3
+
+# Largura das classes de tempo de viagem da versao TUH+, em fracao da discretizacao da chuva
+FRACAO_CLASSE_TEMPO = 0.1
+
+# Hidrograma unitario triangular do SCS: tempo de pico = D/2 + 0.6 tc e tempo de base = 2.67 x tempo de pico
+FATOR_RETARDO = 0.6
+FATOR_BASE = 2.67
+
+# Etapas informadas no arquivo de andamento
+ETAPAS = ('reading inputs', 'routing', 'writing outputs', 'points of interest')
+
+# Nomes das entradas, parametros e saidas nos arquivos de configuracao
+ENTRADA_BACIA = 'watershed'
+ENTRADA_TEMPO = 'flow_travel_time'
+ENTRADA_HIETOGRAMAS = 'excess_hyetographs'
+ENTRADA_EXCEDENTE_TOTAL = 'total_excess_rainfall'
+ENTRADA_CLASSES = 'watershed_into_classes'
+ENTRADA_PARAMETROS = 'parameters'
+PARAMETRO_DISCRETIZACAO = 'Rainfall time step (min)'
+PARAMETRO_BETA = 'Parameter β'
+PARAMETRO_LITROS = 'L/s'
+PARAMETRO_TUH = 'TUH+'
+SAIDA_PICO = 'map_of_resulting_peak_discharge'
+SAIDA_VOLUME = 'map_of_resulting_runoff_volume'
+SAIDA_HIDROGRAMA = 'resulting_watershed_hydrograph'
+
+
+def coeficientes_reservatorio(tempo_viagem, beta, discretizacao):
+    '''Coeficientes da recorrencia do reservatorio linear de cada pixel (K = beta x tempo de viagem, em minutos)
+        Retorna (recessao, fracao): Q(t + dt) = recessao Q(t) + (1 - recessao) I e a vazao media no passo e
+        I + fracao (Q(t) - I), onde fracao = K (1 - recessao) / dt (0 quando K = 0: a saida e igual a entrada)'''
+    armazenamento = beta * np.asarray(tempo_viagem, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        recessao = np.where(armazenamento > 0, np.exp(-discretizacao / armazenamento), 0.0)
+    fracao = armazenamento * (1.0 - recessao) / discretizacao
+    return recessao, fracao
+
+
+def translacao(tempo_viagem, discretizacao):
+    '''Atraso de cada pixel em passos: parte inteira e fracao (o bloco j ocupa os passos j + atraso e j + atraso + 1)'''
+    atraso = np.asarray(tempo_viagem, dtype=np.float64) / discretizacao
+    inteiro = np.floor(atraso).astype(np.int64)
+    return inteiro, atraso - inteiro
+
+
+def passos_hidrograma(n_blocos, atraso_maximo, armazenamento_maximo, discretizacao):
+    '''Quantidade de passos do hidrograma: duracao da chuva, translacao do pixel mais distante e tempo de esvaziamento
+        do reservatorio mais lento'''
+    passos = n_blocos + int(atraso_maximo) + 1
+    if armazenamento_maximo <= 0:
+        return passos
+    return passos + int(np.ceil(-np.log(FRACAO_RESIDUAL) * armazenamento_maximo / discretizacao))
+
+
+def linhas_hietogramas(hietogramas, indices):
+    '''Linhas dos pixels informados; indices continuos sao lidos como uma fatia (sem copia do arquivo inteiro)'''
+    if indices.size and indices[-1] - indices[0] + 1 == indices.size:
+        return hietogramas[indices[0]:indices[-1] + 1]
+    return hietogramas[indices]
+
+
+def propaga_reservatorios(hietogramas, indices, area, atraso, fracao_atraso, recessao, fracao, discretizacao, n_passos,
+                          grupos=None, n_grupos=1, ao_avancar=None):
+    '''Translada os hietogramas excedentes (mm) dos pixels informados e os propaga pelos seus reservatorios lineares
+        hietogramas = matriz (pixels, blocos) do arquivo de hietogramas (pode estar mapeada do disco)
+        indices = pixels propagados (linhas de hietogramas); os demais argumentos por pixel se referem a esses pixels
+        atraso, fracao_atraso = translacao de cada pixel (ver translacao)
+        recessao, fracao = coeficientes do reservatorio de cada pixel (ver coeficientes_reservatorio)
+        grupos = grupo (0 a n_grupos - 1) de cada pixel, para hidrogramas separados por classe (opcional)
+        ao_avancar = funcao chamada com o numero de pixels ja propagados (opcional)
+        Retorna (hidrograma (passos, grupos) em m3/s, vazao de pico de cada pixel em m3/s)'''
+    n_blocos = hietogramas.shape[1]
+    hidrograma = np.zeros((n_passos, n_grupos))
+    pico = np.zeros(indices.size)
+    # Lamina (mm) no passo -> vazao (m3/s) no pixel
+    conversao = area / 1000.0 / (discretizacao * 60.0)
+
+    # Os valores transladados ocupam n_passos linhas por pixel: o grupo de pixels e limitado por esse tamanho
+    passo = max(1, VALORES_POR_BLOCO // max(n_passos, 1))
+    for inicio in range(0, indices.size, passo):
+        fim = min(inicio + passo, indices.size)
+        # Pixels do grupo ordenados pelo atraso: os pixels de mesmo atraso ficam em colunas vizinhas
+        ordem = inicio + np.argsort(atraso[inicio:fim], kind='stable')
+        chuva = np.asarray(linhas_hietogramas(hietogramas, indices[inicio:fim]), dtype=np.float64).T[:, ordem - inicio]
+        chuva *= conversao
+        n, f = atraso[ordem], fracao_atraso[ordem]
+
+        # Vazao de entrada transladada (passos, pixels): o bloco j de cada pixel contribui para os passos j + atraso
+        # e j + atraso + 1, proporcionalmente a sobreposicao; cada atraso e somado com fatias da matriz
+        afluentes = np.zeros((n_passos + 1, fim - inicio))
+        atrasos, inicios = np.unique(n, return_index=True)
+        for d, primeira, ultima in zip(atrasos, inicios, np.append(inicios[1:], fim - inicio)):
+            colunas = slice(primeira, ultima)
+            afluentes[d:d + n_blocos, colunas] += (1.0 - f[colunas]) * chuva[:, colunas]
+            afluentes[d + 1:d + 1 + n_blocos, colunas] += f[colunas] * chuva[:, colunas]
+
+        a, c = recessao[ordem], fracao[ordem]
+        grupo = None if grupos is None else grupos[ordem]
+        vazao = np.zeros(fim - inicio)
+        pico_grupo = np.zeros(fim - inicio)
+        for t in range(n_passos):
+            afluente = afluentes[t]
+            vazao_media = afluente + c * (vazao - afluente)
+            vazao = a * vazao + (1.0 - a) * afluente
+            np.maximum(pico_grupo, vazao_media, out=pico_grupo)
+            if grupo is None:
+                hidrograma[t, 0] += vazao_media.sum()
+            else:
+                hidrograma[t] += np.bincount(grupo, weights=vazao_media, minlength=n_grupos)
+        pico[ordem] = pico_grupo
+        if ao_avancar is not None:
+            ao_avancar(fim)
+    return hidrograma, pico
+
+
+def integral_triangulo(t, tempo_pico, tempo_base):
+    '''Integral, de 0 a t, da fracao do volume que ja saiu de um hidrograma unitario triangular'''
+    t = np.maximum(t, 0.0)
+    subida = t ** 3 / (3 * tempo_pico * tempo_base)
+    descida = tempo_pico ** 2 / (3 * tempo_base) + (t - tempo_pico) + (
+        (tempo_base - t) ** 3 - (tempo_base - tempo_pico) ** 3) / (3 * tempo_base * (tempo_base - tempo_pico))
+    # Apos o tempo de base todo o volume ja saiu: a integral cresce 1 por unidade de tempo
+    depois = (2 * tempo_base - tempo_pico) / 3 + (t - tempo_base)
+    return np.where(t < tempo_pico, subida, np.where(t < tempo_base, descida, depois))
+
+
+def parametros_tuh(tempo_viagem, discretizacao):
+    '''Tempo de pico e tempo de base (min) do hidrograma unitario triangular de cada tempo de viagem (min)'''
+    tempo_pico = discretizacao / 2 + FATOR_RETARDO * np.asarray(tempo_viagem, dtype=np.float64)
+    return tempo_pico, FATOR_BASE * tempo_pico
+
+
+def nucleos_tuh(tempo_viagem, discretizacao, n_passos):
+    '''Fracao do volume de um bloco de chuva (distribuido uniformemente no passo 0) que sai em cada passo
+        Retorna uma matriz (tempos de viagem, n_passos); cada linha soma 1 quando n_passos cobre o tempo de base'''
+    tempo_pico, tempo_base = (valor[:, np.newaxis] for valor in parametros_tuh(tempo_viagem, discretizacao))
+    t = discretizacao * np.arange(n_passos + 1)
+    # Fracao acumulada na saida: media da resposta ao impulso sobre a duracao do bloco
+    acumulada = (integral_triangulo(t, tempo_pico, tempo_base) -
+                 integral_triangulo(t - discretizacao, tempo_pico, tempo_base)) / discretizacao
+    return np.diff(acumulada, axis=1)
+
+
+def passos_tuh(n_blocos, tempo_viagem_maximo, discretizacao):
+    '''Quantidade de passos do hidrograma: duracao da chuva mais o tempo de base do pixel mais lento'''
+    _, tempo_base = parametros_tuh(tempo_viagem_maximo, discretizacao)
+    return n_blocos + int(np.ceil(tempo_base / discretizacao)) + 1
+
+
+def agrupa_por_tempo(tempo_viagem, discretizacao, grupos):
+    '''Agrupa os pixels em classes de tempo de viagem (separadas por grupo)
+        Retorna (classe de cada pixel, grupo de cada classe, tempo de viagem medio de cada classe)'''
+    classe_tempo = np.floor(tempo_viagem / (FRACAO_CLASSE_TEMPO * discretizacao)).astype(np.int64)
+    chaves, classe = np.unique(np.stack([grupos, classe_tempo]), axis=1, return_inverse=True)
+    classe = classe.ravel()
+    media = np.bincount(classe, weights=tempo_viagem) / np.bincount(classe)
+    return classe, chaves[0], media
+
+
+def propaga_tuh(hietogramas, indices, area, tempo_viagem, discretizacao, grupos=None, n_grupos=1, picos=False,
+                ao_avancar=None):
+    '''Propaga os hietogramas excedentes (mm) dos pixels informados pelos hidrogramas unitarios triangulares
+        Os volumes excedentes sao somados por classe de tempo de viagem e cada classe e convoluida (FFT) com o seu
+        hidrograma unitario: o custo depende do numero de classes, e nao do numero de pixels
+        picos = True tambem calcula a vazao de pico de cada pixel (convolucao pixel a pixel, mais lenta)
+        ao_avancar = funcao chamada com o numero de pixels ja processados (ate 2 x pixels quando picos = True)
+        Retorna (hidrograma (passos, grupos) em m3/s, vazao de pico de cada pixel em m3/s ou None)'''
+    n_blocos = hietogramas.shape[1]
+    if grupos is None:
+        grupos = np.zeros(indices.size, dtype=np.int64)
+    n_passos = passos_tuh(n_blocos, float(np.max(tempo_viagem, initial=0.0)), discretizacao)
+    n_fft = 1 << int(np.ceil(np.log2(n_blocos + n_passos)))
+    classe, grupo_classe, tempo_classe = agrupa_por_tempo(tempo_viagem, discretizacao, grupos)
+
+    # Volume excedente (m3) de cada classe em cada bloco de chuva: as linhas de cada classe sao somadas de uma vez
+    volumes = np.zeros((tempo_classe.size, n_blocos))
+    passo = max(1, VALORES_POR_BLOCO // max(n_blocos, 1))
+    for inicio in range(0, indices.size, passo):
+        fim = min(inicio + passo, indices.size)
+        bloco = np.asarray(linhas_hietogramas(hietogramas, indices[inicio:fim]), dtype=np.float64)
+        ordem = np.argsort(classe[inicio:fim], kind='stable')
+        classes_bloco, inicios = np.unique(classe[inicio:fim][ordem], return_index=True)
+        volumes[classes_bloco] += np.add.reduceat(bloco[ordem], inicios, axis=0)
+        if ao_avancar is not None:
+            ao_avancar(fim)
+    volumes *= area / 1000.0
+
+    # Convolucao no dominio da frequencia: as classes de um mesmo grupo sao somadas antes da transformada inversa
+    espectro = np.zeros((n_grupos, n_fft // 2 + 1), dtype=np.complex128)
+    passo_classes = max(1, VALORES_POR_BLOCO // n_fft)
+    for inicio in range(0, tempo_classe.size, passo_classes):
+        fim = min(inicio + passo_classes, tempo_classe.size)
+        produto = np.fft.rfft(volumes[inicio:fim], n_fft) * np.fft.rfft(
+            nucleos_tuh(tempo_classe[inicio:fim], discretizacao, n_passos), n_fft)
+        for grupo in np.unique(grupo_classe[inicio:fim]):
+            espectro[grupo] += produto[grupo_classe[inicio:fim] == grupo].sum(axis=0)
+    hidrograma = np.fft.irfft(espectro, n_fft)[:, :n_passos].T / (discretizacao * 60.0)
+
+    pico = None
+    if picos:
+        pico = np.zeros(indices.size)
+        passo_pixels = max(1, VALORES_POR_BLOCO // n_fft)
+        for inicio in range(0, indices.size, passo_pixels):
+            fim = min(inicio + passo_pixels, indices.size)
+            bloco = np.asarray(linhas_hietogramas(hietogramas, indices[inicio:fim]), dtype=np.float64)
+            resposta = np.fft.irfft(np.fft.rfft(bloco, n_fft) * np.fft.rfft(
+                nucleos_tuh(tempo_classe[classe[inicio:fim]], discretizacao, n_passos), n_fft), n_fft)
+            pico[inicio:fim] = resposta[:, :n_passos].max(axis=1) * area / 1000.0 / (discretizacao * 60.0)
+            if ao_avancar is not None:
+                ao_avancar(indices.size + fim)
+    return hidrograma, pico
+
+
+def escreve_hidrograma(arquivo, hidrograma, discretizacao, unidade, classes=()):
+    '''Escreve o hidrograma (tempo em minutos e uma coluna de vazoes por serie) em um arquivo txt'''
+    with open(arquivo, 'w', encoding='utf-8') as arquivo_txt:
+        colunas = [f'Total ({unidade})'] + [f'Class {classe} ({unidade})' for classe in classes]
+        arquivo_txt.write('Time (min),' + ','.join(colunas) + '\n')
+        for t, vazoes in enumerate(hidrograma, start=1):
+            arquivo_txt.write(f'{t * discretizacao:g},' + ','.join(f'{vazao:.6f}' for vazao in vazoes) + '\n')
+
+
+def executa_flow_routing(arquivo_entradas, arquivo_saidas, pasta_exutorios=None, pasta_hidrogramas=None,
+                         arquivo_progresso=None, cancelado=None):
+    '''Executa a rotina flow routing (versoes DLR e TUH+) a partir dos arquivos de configuracao de entradas e saidas
+        arquivo_entradas = input_files_config_flow_rout.txt
+        arquivo_saidas = output_files_config_flow_rout.txt
+        pasta_exutorios = pasta com os mapas de tempo de viagem de cada ponto de interesse (opcional)
+        pasta_hidrogramas = pasta onde os hidrogramas de cada ponto de interesse sao escritos
+        arquivo_progresso = arquivo onde o andamento de cada etapa e escrito (opcional, ver engine_progress)
+        cancelado = funcao que retorna True quando o usuario cancela a execucao (o motor para na etapa em andamento)'''
+    progresso = ProgressoMotor(arquivo_progresso, ETAPAS, cancelado=cancelado)
+    progresso.etapa('reading inputs')
+    entradas, formato_troca = le_config_arquivos(arquivo_entradas)
+    saidas, _ = le_config_arquivos(arquivo_saidas)
+    parametros = le_parametros(entradas[ENTRADA_PARAMETROS])
+    tuh = parametros.get(PARAMETRO_TUH, 0) == 1
+    # O parametro beta e usado apenas na versao DLR
+    beta = None if tuh else parametro(parametros, PARAMETRO_BETA)
+    fator, unidade = (1000.0, 'L/s') if parametros.get(PARAMETRO_LITROS, 0) == 1 else (1.0, 'm3/s')
+
+    arquivo_bacia = entradas[ENTRADA_BACIA]
+    _, _, rdc = dimensoes_rst(arquivo_bacia)
+    area = abs(float(rdc.get('resolution (X)', rdc['resolution'])) *
+               float(rdc.get('resolution (Y)', rdc['resolution'])))
+    bacia = le_mapa(arquivo_bacia, 'int') == 1
+    n_pixels = int(np.count_nonzero(bacia))
+
+    (n_pixels_chuva, n_blocos, discretizacao_arquivo, _), hietogramas = le_hietogramas(entradas[ENTRADA_HIETOGRAMAS])
+    if n_pixels_chuva != n_pixels:
+        raise ValueError(
+            f'The excess hyetographs file has {n_pixels_chuva} pixels, but the watershed has {n_pixels} pixels.')
+    discretizacao = parametros.get(PARAMETRO_DISCRETIZACAO, discretizacao_arquivo)
+    if discretizacao <= 0:
+        raise ValueError('The rainfall time step must be greater than 0.')
+
+    def propaga(tempo_viagem, indices, grupos=None, n_grupos=1, picos=False, ao_avancar=None):
+        if tuh:
+            return propaga_tuh(hietogramas, indices, area, tempo_viagem, discretizacao, grupos, n_grupos, picos,
+                               ao_avancar)
+        atraso, fracao_atraso = translacao(tempo_viagem, discretizacao)
+        recessao, fracao = coeficientes_reservatorio(tempo_viagem, beta, discretizacao)
+        tempo_maximo = float(np.max(tempo_viagem, initial=0.0))
+        n_passos = passos_hidrograma(n_blocos, tempo_maximo / discretizacao, beta * tempo_maximo, discretizacao)
+        return propaga_reservatorios(hietogramas, indices, area, atraso, fracao_atraso, recessao, fracao,
+                                     discretizacao, n_passos, grupos, n_grupos, ao_avancar)
+
+    # Hidrograma no exutorio: total e, se informado o mapa de classes, a contribuicao de cada classe
+    classes = ()
+    grupos = None
+    if ENTRADA_CLASSES in entradas and os.path.isfile(entradas[ENTRADA_CLASSES]):
+        mapa_classes = le_mapa(entradas[ENTRADA_CLASSES], 'int')[bacia]
+        classes = np.unique(mapa_classes[mapa_classes != 0])
+        # Grupo 0 = total; pixels sem classe contribuem apenas para o total
+        grupos = np.searchsorted(classes, mapa_classes) + 1
+        grupos[mapa_classes == 0] = 0
+    tempo_viagem = le_mapa(entradas[ENTRADA_TEMPO], 'float')[bacia]
+    # Na versao TUH+ os picos de cada pixel sao calculados em uma segunda passagem pelos pixels
+    progresso.etapa('routing', n_pixels * (2 if tuh and SAIDA_PICO in saidas else 1))
+    hidrograma, pico = propaga(tempo_viagem, np.arange(n_pixels), grupos, len(classes) + 1, SAIDA_PICO in saidas,
+                               progresso.avanca)
+    if grupos is not None:
+        hidrograma[:, 0] = hidrograma.sum(axis=1)
+
+    progresso.etapa('writing outputs')
+    if SAIDA_HIDROGRAMA in saidas:
+        escreve_hidrograma(saidas[SAIDA_HIDROGRAMA], hidrograma * fator, discretizacao, unidade, classes)
+    if SAIDA_PICO in saidas:
+        mapa = np.zeros(bacia.shape)
+        mapa[bacia] = pico * fator
+        escreve_mapa(saidas[SAIDA_PICO], mapa, 'float', formato_troca, arquivo_bacia)
+    if SAIDA_VOLUME in saidas:
+        # Volume escoado (m3): lamina excedente total de cada pixel vezes a area do pixel
+        if ENTRADA_EXCEDENTE_TOTAL in entradas and os.path.isfile(entradas[ENTRADA_EXCEDENTE_TOTAL]):
+            lamina = le_mapa(entradas[ENTRADA_EXCEDENTE_TOTAL], 'float')[bacia]
+        else:
+            lamina = hietogramas.sum(axis=1, dtype=np.float64)
+        mapa = np.zeros(bacia.shape)
+        mapa[bacia] = lamina / 1000.0 * area
+        escreve_mapa(saidas[SAIDA_VOLUME], mapa, 'float', formato_troca, arquivo_bacia)
+    progresso.avanca(1)
+
+    # Hidrogramas dos pontos de interesse: tempo de viagem ate o ponto (0 fora da sub-bacia)
+    if pasta_exutorios and pasta_hidrogramas:
+        arquivos_tempo = [arquivo for arquivo in sorted(glob.glob(os.path.join(pasta_exutorios, '*.rst')))
+                          if 'travel' in os.path.splitext(os.path.basename(arquivo))[0]]
+        progresso.etapa('points of interest', len(arquivos_tempo))
+        for numero, arquivo_tempo in enumerate(arquivos_tempo, start=1):
+            nome = os.path.splitext(os.path.basename(arquivo_tempo))[0]
+            tempo_poi = le_mapa(arquivo_tempo, 'float')[bacia]
+            indices = np.flatnonzero(tempo_poi > 0)
+            hidrograma_poi, _ = propaga(tempo_poi[indices], indices)
+            os.makedirs(pasta_hidrogramas, exist_ok=True)
+            escreve_hidrograma(os.path.join(pasta_hidrogramas, f'hydrograph_{nome}.txt'), hidrograma_poi * fator,
+                               discretizacao, unidade)
+            progresso.avanca(numero)
@@ -0,0 +1,181 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR GEOTIFF WRITING \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for writing the GeoTIFF outputs of the plugin with the creation options of the
+selected profile: plain (stripped and uncompressed), optimized (tiled, compressed, with overviews) or Cloud-Optimized
+GeoTIFF. Tiled and compressed files with overviews open and pan faster in QGIS and take less disk.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import numpy as np
+from osgeo import gdal, gdalconst
+
+# Perfis de criacao dos GeoTIFFs
+PERFIL_SIMPLES = 'plain'
+PERFIL_OTIMIZADO = 'optimized'
+PERFIL_COG = 'cog'
+PERFIS_GEOTIFF = (PERFIL_SIMPLES, PERFIL_OTIMIZADO, PERFIL_COG)
+
+# Compressoes aceitas (ZSTD depende da versao do GDAL instalada com o QGIS)
+COMPRESSOES = ('DEFLATE', 'ZSTD', 'LZW')
+
+# Tipos das saidas inteiras, do menor para o maior: o primeiro que comporta os valores e usado
+TIPOS_INTEIROS = (
+    (gdalconst.GDT_Byte, np.uint8),
+    (gdalconst.GDT_UInt16, np.uint16),
+    (gdalconst.GDT_Int16, np.int16),
+    (gdalconst.GDT_Int32, np.int32),
+)
+
+# Lado dos blocos (tiles) e menor dimensao das overviews, em pixels
+TAMANHO_BLOCO = 256
+
+
+class OpcoesGeoTiff:
+    """
+    This class stores the options used to create the GeoTIFF outputs: profile, compression, nodata value and whether
+    overviews are built.
+    """
+
+    def __init__(self, perfil=PERFIL_OTIMIZADO, compressao='DEFLATE', nodata=None, overviews=True):
+        '''
+        perfil = 'plain', 'optimized' ou 'cog'
+        compressao = 'DEFLATE', 'ZSTD' ou 'LZW' (ignorada no perfil plain)
+        nodata = valor sem dados gravado na banda (None = nao definido)
+        overviews = True para gerar as overviews (ignorado no perfil plain)
+        '''
+        if perfil not in PERFIS_GEOTIFF:
+            raise ValueError(f"Unknown GeoTIFF profile '{perfil}'. Use one of: {', '.join(PERFIS_GEOTIFF)}.")
+        compressao = str(compressao).upper()
+        if compressao not in COMPRESSOES:
+            raise ValueError(f"Unknown GeoTIFF compression '{compressao}'. Use one of: {', '.join(COMPRESSOES)}.")
+
+        self.perfil = perfil
+        self.compressao = compressao
+        self.nodata = nodata
+        self.overviews = overviews
+
+    def compressao_suportada(self, driver):
+        '''Retorna a compressao escolhida, ou DEFLATE caso o driver nao a suporte (ex.: ZSTD em versoes antigas do GDAL)'''
+        lista = driver.GetMetadataItem('DMD_CREATIONOPTIONLIST') or ''
+        return self.compressao if self.compressao in lista else 'DEFLATE'
+
+    def opcoes_criacao(self, tipo_dados, driver=None):
+        '''Retorna a lista de opcoes de criacao do driver GTiff para o perfil escolhido
+            tipo_dados = tipo GDAL da banda: define o preditor (2 para inteiros, 3 para reais)'''
+        if self.perfil == PERFIL_SIMPLES:
+            return []
+
+        compressao = self.compressao_suportada(driver) if driver is not None else self.compressao
+        preditor = 3 if tipo_dados in (gdalconst.GDT_Float32, gdalconst.GDT_Float64) else 2
+        return [
+            'TILED=YES',
+            f'BLOCKXSIZE={TAMANHO_BLOCO}',
+            f'BLOCKYSIZE={TAMANHO_BLOCO}',
+            f'COMPRESS={compressao}',
+            f'PREDICTOR={preditor}',
+            'BIGTIFF=IF_SAFER',
+        ]
+
+    def opcoes_cog(self, tipo_dados, driver):
+        '''Retorna a lista de opcoes de criacao do driver COG'''
+        return [
+            f'BLOCKSIZE={TAMANHO_BLOCO}',
+            f'COMPRESS={self.compressao_suportada(driver)}',
+            'PREDICTOR=YES',
+            'BIGTIFF=IF_SAFER',
+            f'RESAMPLING={reamostragem(tipo_dados)}',
+            f"OVERVIEWS={'AUTO' if self.overviews else 'NONE'}",
+        ]
+
+
+def tipo_saida(dados, file_type, nodata=None):
+    '''Define o menor tipo que grava os dados sem perdas: Byte/UInt16/Int16/Int32 para mapas inteiros e Float32 para reais
+        nodata = valor sem dados, que tambem precisa caber no tipo escolhido
+        Retorna (tipo GDAL, tipo numpy)'''
+    if file_type != 'int':
+        return gdalconst.GDT_Float32, np.float32
+
+    # A grade completa sempre contem 0 fora da janela de recorte; 0 cabe em todos os tipos
+    vmin, vmax = (int(dados.min()), int(dados.max())) if dados.size else (0, 0)
+    if nodata is not None:
+        vmin, vmax = min(vmin, nodata), max(vmax, nodata)
+    for tipo_gdal, tipo_numpy in TIPOS_INTEIROS:
+        limites = np.iinfo(tipo_numpy)
+        if limites.min <= vmin and vmax <= limites.max:
+            return tipo_gdal, tipo_numpy
+    raise ValueError(f'Values between {vmin} and {vmax} do not fit in a 32-bit integer raster.')
+
+
+def reamostragem(tipo_dados):
+    '''Metodo das overviews: media para mapas reais e vizinho mais proximo para mapas inteiros (classes e codigos)'''
+    return 'AVERAGE' if tipo_dados in (gdalconst.GDT_Float32, gdalconst.GDT_Float64) else 'NEAREST'
+
+
+def fatores_overview(nlin, ncol):
+    '''Retorna os fatores de reducao (2, 4, 8, ...) ate que a maior dimensao fique menor que um bloco'''
+    fatores = []
+    fator = 2
+    while max(nlin, ncol) / fator >= TAMANHO_BLOCO:
+        fatores.append(fator)
+        fator *= 2
+    return fatores
+
+
+def escreve_geotiff(arquivo_tif, dados, nlin, ncol, geotransform, projection, tipo_dados, opcoes=None,
+                    xoff=0, yoff=0):
+    '''Cria um GeoTIFF de uma banda com as opcoes do perfil escolhido e escreve os dados
+        dados = array escrito a partir da coluna xoff e da linha yoff (o restante da grade permanece 0)
+        nlin, ncol, geotransform, projection = grade do arquivo criado
+        tipo_dados = tipo GDAL da banda
+        opcoes = OpcoesGeoTiff (None = perfil optimized)
+        Retorna o diretorio do GeoTIFF criado'''
+    opcoes = opcoes or OpcoesGeoTiff()
+    driver_tif = gdal.GetDriverByName('GTiff')
+
+    if opcoes.perfil == PERFIL_COG:
+        # O COG e gerado por copia: a grade e montada em memoria e copiada com as overviews no inicio do arquivo
+        dataset = _cria_dataset(gdal.GetDriverByName('MEM'), '', dados, nlin, ncol, geotransform, projection,
+                                tipo_dados, opcoes, [], xoff, yoff)
+        driver_cog = gdal.GetDriverByName('COG')
+        if driver_cog is not None:
+            copia = driver_cog.CreateCopy(arquivo_tif, dataset, options=opcoes.opcoes_cog(tipo_dados, driver_cog))
+        else:
+            # GDAL anterior a 3.1: GeoTIFF tiled com as overviews copiadas da grade em memoria
+            fatores = fatores_overview(nlin, ncol) if opcoes.overviews else []
+            if fatores:
+                dataset.BuildOverviews(reamostragem(tipo_dados), fatores)
+            copia = driver_tif.CreateCopy(
+                arquivo_tif, dataset, options=opcoes.opcoes_criacao(tipo_dados, driver_tif) + ['COPY_SRC_OVERVIEWS=YES'])
+        if copia is None:
+            raise ValueError(f"Could not create the raster '{arquivo_tif}'.")
+        copia = None
+        dataset = None
+        return arquivo_tif
+
+    dataset = _cria_dataset(driver_tif, arquivo_tif, dados, nlin, ncol, geotransform, projection, tipo_dados, opcoes,
+                            opcoes.opcoes_criacao(tipo_dados, driver_tif), xoff, yoff)
+    if opcoes.perfil == PERFIL_OTIMIZADO and opcoes.overviews:
+        fatores = fatores_overview(nlin, ncol)
+        if fatores:
+            dataset.BuildOverviews(reamostragem(tipo_dados), fatores)
+    dataset = None
+
+    return arquivo_tif
+
+
+def _cria_dataset(driver, arquivo, dados, nlin, ncol, geotransform, projection, tipo_dados, opcoes, opcoes_criacao,
+                  xoff, yoff):
+    dataset = driver.Create(arquivo, ncol, nlin, 1, tipo_dados, options=opcoes_criacao)
+    if dataset is None:
+        raise ValueError(f"Could not create the raster '{arquivo}'.")
+    dataset.SetGeoTransform(geotransform)
+    dataset.SetProjection(projection)
+
+    banda = dataset.GetRasterBand(1)
+    if opcoes.nodata is not None:
+        banda.SetNoDataValue(opcoes.nodata)
+    banda.WriteArray(dados, xoff, yoff)
+    return dataset
@@ -0,0 +1,705 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE STAGE PIPELINE (HEADLESS RUNS) \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the configuration of the four Hidropixel modules (flow travel time, rainfall
+interpolation, excess rainfall and flow routing) without the dialogs. Each module is described by a plain parameter
+object, which writes the configuration files read by the engines in the workspace of the run: the dialogs fill the
+objects from their widgets and the command line runner (hidropixel_cli.py) fills them from a JSON file, runs the native
+engines in sequence (each stage in its own workspace, see scratch_workspace.py) and reports the time and the exit code of
+each stage. In batch mode (--events, see batch_runner.py) the excess rainfall and flow routing stages are run once for
+each rainfall event, in a pool of processes.
+
+JSON file: {"exchange_format": "ascii", "stages": {"<stage>": {<arguments of the parameter object>}, ...}}, with the
+stages 'flow_travel_time', 'rainfall_interpolation', 'excess_rainfall' and 'flow_routing' (run in this order). The
+"entradas" of a stage are the source files (GeoTIFF or .rst/.rdc rasters, .txt and .bin files) and the "saidas" are the
+destination of each output (.tif outputs are converted to GeoTIFF; the other files are copied).
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from abc import ABC, abstractmethod
+
+from . import excess_rainfall as er
+from . import flow_routing as fr
+from . import rainfall_interpolation as ri
+from . import travel_time as tt
+from .rst_io import FORMATO_ASCII, FORMATO_BINARIO, FORMATOS_TROCA
+from .scratch_workspace import LimpezaAreas, PoliticaRetencao, raiz_trabalho
+
+# Nomes das etapas (chaves do arquivo JSON), na ordem de execucao
+ETAPA_TRAVEL_TIME = 'flow_travel_time'
+ETAPA_RAINFALL_INTERPOLATION = 'rainfall_interpolation'
+ETAPA_EXCESS_RAINFALL = 'excess_rainfall'
+ETAPA_FLOW_ROUTING = 'flow_routing'
+ORDEM_ETAPAS = (ETAPA_TRAVEL_TIME, ETAPA_RAINFALL_INTERPOLATION, ETAPA_EXCESS_RAINFALL, ETAPA_FLOW_ROUTING)
+
+# Codigos das direcoes de fluxo no padrao do ArcGIS (A = nordeste, em sentido horario)
+CODIGOS_DIRECOES_PADRAO = {'A': 128, 'B': 1, 'C': 2, 'D': 4, 'E': 8, 'F': 16, 'G': 32, 'H': 64}
+
+# Entradas de cada rotina, na ordem dos arquivos de configuracao: (nome, arquivo na pasta temp, tipo do raster ou None)
+ENTRADAS_TRAVEL_TIME = (
+    (tt.ENTRADA_BACIA, 'Watershed.rst', 'int'),
+    (tt.ENTRADA_MDE, 'DEM.rst', 'float'),
+    (tt.ENTRADA_DIRECOES, 'Flow_dir.rst', 'int'),
+    (tt.ENTRADA_AREA, 'DA_km2.rst', 'float'),
+    (tt.ENTRADA_REDE, 'drainage.rst', 'int'),
+    (tt.ENTRADA_SEGMENTOS, 'river_segments.rst', 'int'),
+    (tt.ENTRADA_CARACTERISTICAS, 'segment_characteristics.txt', None),
+    (tt.ENTRADA_USO, 'LULC.rst', 'int'),
+    (tt.ENTRADA_RUGOSIDADE, 'surface_roughness.txt', None),
+)
+ENTRADAS_RAINFALL_INTERPOLATION = (
+    (ri.ENTRADA_BACIA, 'Watershed.rst', 'int'),
+    (ri.ENTRADA_POSTOS, 'rain_gauges.txt', None),
+    (ri.ENTRADA_DADOS, 'rainfall_data.txt', None),
+)
+ENTRADAS_EXCESS_RAINFALL = (
+    (er.ENTRADA_BACIA, 'Watershed.rst', 'int'),
+    (er.ENTRADA_CN, 'CN_map.rst', 'float'),
+    (er.ENTRADA_CHUVA_MEDIA, 'Areal_averaged_rainfall.txt', None),
+    (er.ENTRADA_CHUVA_DISTRIBUIDA, 'Spatially_distributed_rainfall.bin', None),
+)
+ENTRADAS_FLOW_ROUTING = (
+    (fr.ENTRADA_BACIA, 'Watershed.rst', 'int'),
+    (fr.ENTRADA_TEMPO, 'flow_tt.rst', 'float'),
+    (fr.ENTRADA_HIETOGRAMAS, 'excess_hyetographs.bin', None),
+    (fr.ENTRADA_EXCEDENTE_TOTAL, 'total_excess_rainfall.rst', 'float'),
+    (fr.ENTRADA_CLASSES, 'watershed_into_classes.rst', 'int'),
+)
+
+# Saidas de cada rotina, na ordem dos arquivos de configuracao: (nome, arquivo na pasta temp, tipo do raster ou None)
+SAIDAS_TRAVEL_TIME = (
+    (tt.SAIDA_DECLIVIDADE, 'Slope.rst', 'float'),
+    (tt.SAIDA_SEGMENTOS, 'river_segments.rst', 'int'),
+    (tt.SAIDA_TABELA, 'Hydraulic_radius-roughness_and_slope.txt', None),
+    (tt.SAIDA_AREA, 'River_cross-sectional_area.rst', 'float'),
+    (tt.SAIDA_LARGURA, 'River_bankfull_width.rst', 'float'),
+    (tt.SAIDA_TEMPO, 'Flow_travel_time.rst', 'float'),
+)
+SAIDAS_RAINFALL_INTERPOLATION = (
+    (ri.SAIDA_ARQUIVO, 'rainfall_interpolated.bin', None),
+    (ri.SAIDA_MAPAS, 'maps', None),
+)
+SAIDAS_EXCESS_RAINFALL = (
+    (er.SAIDA_IDS, 'Map_of_watershed_pixels_ID.rst', 'int'),
+    (er.SAIDA_RETENCAO, 'Map_of_maximum_potential_retention.rst', 'float'),
+    (er.SAIDA_ABSTRACAO, 'Map_of_initial_abstraction.rst', 'float'),
+    (er.SAIDA_CHUVA_TOTAL, 'Map_of_total_rainfall.rst', 'float'),
+    (er.SAIDA_EXCEDENTE_TOTAL, 'Map_of_total_excess_rainfall.rst', 'float'),
+    (er.SAIDA_HIETOGRAMAS, 'Excess_hyetographs_per_pixel.bin', None),
+)
+SAIDAS_FLOW_ROUTING = (
+    (fr.SAIDA_PICO, 'map_of_resulting_peak_discharge.rst', 'float'),
+    (fr.SAIDA_VOLUME, 'map_of_resulting_runoff_volume.rst', 'float'),
+    (fr.SAIDA_HIDROGRAMA, 'resulting_watershed_hydrograph.txt', None),
+)
+
+
+def escreve_formato_troca(arquivo_txt, formato_troca, nova_linha=True):
+    '''Informa, nos arquivos de configuracao, que os arquivos .rst sao binarios (no formato ascii nada e escrito)
+        nova_linha = True quando a ultima linha escrita no arquivo nao termina com quebra de linha'''
+    if formato_troca == FORMATO_BINARIO:
+        if nova_linha:
+            arquivo_txt.write('\n')
+        arquivo_txt.write(f'exchange_format,{FORMATO_BINARIO}')
+
+
+def processa_chuva_media(arquivo_entrada, arquivo_saida):
+    '''Escreve o arquivo da chuva media lido pelas rotinas: primeira linha "numero de passos,discretizacao (min)",
+        seguida do arquivo enviado pelo usuario ("Time(min),Rainfall(mm)") sem as linhas vazias'''
+    with open(arquivo_entrada, 'r', encoding='utf-8') as arquivo_txt:
+        linhas = arquivo_txt.readlines()
+
+    if not linhas:
+        raise ValueError(f"File '{arquivo_entrada}' is empty.")
+
+    cabecalho = linhas[0].strip()
+    dados = [linha.strip() for linha in linhas[1:] if linha.strip()]
+
+    # Discretizacao a partir das duas primeiras linhas de dados
+    if len(dados) >= 2:
+        delta_t = float(dados[1].split(',')[0]) - float(dados[0].split(',')[0])
+    else:
+        delta_t = 0
+
+    with open(arquivo_saida, 'w', encoding='utf-8') as arquivo_txt:
+        arquivo_txt.write(f"{len(dados)},{int(delta_t)}\n")
+        arquivo_txt.write(cabecalho + "\n")
+        for linha in dados:
+            arquivo_txt.write(linha + "\n")
+
+
+def escreve_exutorios(arquivo, exutorios):
+    '''Escreve o arquivo dos pontos de interesse (POIs): quantidade, cabecalho e "lin,col" de cada ponto ("0" sem POIs)'''
+    with open(arquivo, 'w', encoding='utf-8') as arquivo_txt:
+        if not exutorios:
+            arquivo_txt.write("0")
+            return
+        arquivo_txt.write(f"{len(exutorios)}\n")
+        arquivo_txt.write("lin,col\n")
+        for lin, col in exutorios:
+            arquivo_txt.write(f"{int(lin)},{int(col)}\n")
+
+
+def escreve_linhas_entradas(arquivo_txt, definicoes, entradas, arquivos, sem_arquivo=None):
+    '''Escreve as linhas "flag,nome,arquivo na pasta temp" das entradas (flag = 1 quando a entrada foi informada)
+        sem_arquivo = dicionario nome -> texto escrito no lugar do arquivo quando a entrada nao foi informada'''
+    sem_arquivo = sem_arquivo or {}
+    for nome, _, _ in definicoes:
+        informada = bool(entradas.get(nome))
+        arquivo_txt.write(f"{1 if informada else 0},{nome},{arquivos[nome] if informada else sem_arquivo.get(nome, '')}\n")
+
+
+class ParametrosEtapa(ABC):
+    """
+    This class stores what is common to the parameter objects of the modules: the source of each input, the destination
+    of each output (None = output not requested) and the native engine used in the run.
+    """
+
+    etapa = None
+    definicoes_entradas = ()
+    definicoes_saidas = ()
+
+    def __init__(self, entradas, saidas=None):
+        '''
+        entradas = dicionario nome da entrada -> arquivo de origem (None ou '' = nao informada)
+        saidas = dicionario nome da saida -> destino (None = saida nao solicitada; '' = mantida apenas na pasta temp)
+        '''
+        nomes_entradas = {nome for nome, _, _ in self.definicoes_entradas}
+        nomes_saidas = {nome for nome, _, _ in self.definicoes_saidas}
+        desconhecidas = (set(entradas) - nomes_entradas) | (set(saidas or {}) - nomes_saidas)
+        if desconhecidas:
+            raise ValueError(f"Unknown inputs or outputs for the stage '{self.etapa}': {', '.join(sorted(desconhecidas))}.")
+        self.entradas = dict(entradas)
+        self.saidas = dict(saidas or {})
+
+    def arquivos_temp(self, pasta_temp):
+        '''Retorna o dicionario nome -> arquivo na pasta temp das entradas e saidas da rotina'''
+        return {nome: os.path.join(pasta_temp, arquivo)
+                for nome, arquivo, _ in self.definicoes_entradas + self.definicoes_saidas}
+
+    @abstractmethod
+    def escreve_configuracao(self, pasta_temp, formato_troca=FORMATO_ASCII):
+        '''Escreve os arquivos de configuracao na pasta temp e retorna o dicionario nome -> arquivo na pasta temp'''
+
+    @abstractmethod
+    def executa_motor(self, pasta_temp, pasta_cache=None):
+        '''Executa o motor nativo com os arquivos de configuracao escritos em pasta_temp'''
+
+    def entradas_copiadas(self, pasta_temp):
+        '''Entradas copiadas (ou processadas) para a pasta temp sem conversao: nome -> arquivo na pasta temp'''
+        arquivos = self.arquivos_temp(pasta_temp)
+        return {nome: arquivos[nome] for nome, _, file_type in self.definicoes_entradas
+                if file_type is None and self.entradas.get(nome)}
+
+
+class ParametrosTravelTime(ParametrosEtapa):
+    """
+    This class stores the configuration of the flow travel time module.
+    """
+
+    etapa = ETAPA_TRAVEL_TIME
+    definicoes_entradas = ENTRADAS_TRAVEL_TIME
+    definicoes_saidas = SAIDAS_TRAVEL_TIME
+
+    def __init__(self, entradas, saidas=None, codigos_direcoes=None, curva_regional=False, manning_rio=0.05, p24=0.0,
+                 coeficientes_curva=(0.0, 0.0, 0.0, 0.0), comprimento_maximo=0.0, declividade_minima=0.0,
+                 exutorios=None):
+        '''
+        codigos_direcoes = dicionario direcao (A a H) -> codigo no mapa de direcoes de fluxo
+        curva_regional = True quando as secoes dos rios sao estimadas pelas curvas regionais
+        manning_rio = coeficiente de Manning dos segmentos sem informacao da secao transversal
+        p24 = chuva de 24 h e 2 anos de tempo de retorno (mm)
+        coeficientes_curva = coeficientes c, d, g e h das curvas regionais
+        comprimento_maximo = comprimento maximo dos segmentos gerados (m)
+        declividade_minima = declividade minima (m/m)
+        exutorios = lista de (lin, col) dos pontos de interesse (POIs)
+        '''
+        super().__init__(entradas, saidas)
+        self.codigos_direcoes = dict(codigos_direcoes or CODIGOS_DIRECOES_PADRAO)
+        self.curva_regional = curva_regional
+        self.manning_rio = manning_rio
+        self.p24 = p24
+        self.coeficientes_curva = tuple(coeficientes_curva)
+        self.comprimento_maximo = comprimento_maximo
+        self.declividade_minima = declividade_minima
+        self.exutorios = list(exutorios or [])
+
+    def escreve_configuracao(self, pasta_temp, formato_troca=FORMATO_ASCII):
+        arquivos = self.arquivos_temp(pasta_temp)
+        arquivos['flow_directions_code'] = os.path.join(pasta_temp, 'flow_directions_code.txt')
+        arquivos['parameters'] = os.path.join(pasta_temp, 'parameters_flow_tt.txt')
+        arquivos['exutorios'] = os.path.join(pasta_temp, 'exutorios.txt')
+        arquivos['tv_for_each_poi'] = os.path.join(pasta_temp, 'tv_for_each_poi')
+        arquivos['input_config'] = os.path.join(pasta_temp, 'input_files_config_flow_tt.txt')
+        arquivos['output_config'] = os.path.join(pasta_temp, 'output_files_config_flow_tt.txt')
+
+        with open(arquivos['flow_directions_code'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write('Flow Directions Code\n')
+            arquivo_txt.write('\n'.join(f'{letra},{self.codigos_direcoes[letra]}' for letra in 'ABCDEFGH'))
+
+        c, d, g, h = self.coeficientes_curva
+        with open(arquivos['parameters'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write(f'{tt.PARAMETRO_CURVA_REGIONAL},{1 if self.curva_regional else 0}\n')
+            arquivo_txt.write(f'{tt.PARAMETRO_MANNING_RIO},{self.manning_rio}\n')
+            arquivo_txt.write(f'{tt.PARAMETRO_LAMINA},30.48\n')
+            arquivo_txt.write(f'{tt.PARAMETRO_P24},{self.p24}\n')
+            arquivo_txt.write('Mean depth of lake or reservoir (m),5\n')
+            for nome, valor in zip(tt.PARAMETROS_CURVA, (c, d, g, h)):
+                arquivo_txt.write(f'{nome},{valor}\n')
+            arquivo_txt.write(f'{tt.PARAMETRO_COMPRIMENTO},{self.comprimento_maximo}\n')
+            arquivo_txt.write(f'{tt.PARAMETRO_DECLIVIDADE},{self.declividade_minima}')
+
+        with open(arquivos['input_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Selected input file directory\n")
+            escreve_linhas_entradas(arquivo_txt, self.definicoes_entradas, self.entradas, arquivos,
+                                    {tt.ENTRADA_SEGMENTOS: 'No file'})
+            arquivo_txt.write('0,reservoirs,\n')
+            arquivo_txt.write(f"1,{tt.ENTRADA_PARAMETROS},{arquivos['parameters']}")
+            escreve_formato_troca(arquivo_txt, formato_troca)
+
+        escreve_exutorios(arquivos['exutorios'], self.exutorios)
+
+        with open(arquivos['output_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Select output file directory\n")
+            arquivo_txt.write('\n'.join(f'{0 if self.saidas.get(nome) is None else 1},{nome},{arquivos[nome]}'
+                                        for nome, _, _ in self.definicoes_saidas))
+            escreve_formato_troca(arquivo_txt, formato_troca)
+        return arquivos
+
+    def executa_motor(self, pasta_temp, pasta_cache=None):
+        tt.executa_travel_time(os.path.join(pasta_temp, 'input_files_config_flow_tt.txt'),
+                               os.path.join(pasta_temp, 'output_files_config_flow_tt.txt'),
+                               os.path.join(pasta_temp, 'flow_directions_code.txt'),
+                               os.path.join(pasta_temp, 'exutorios.txt'),
+                               os.path.join(pasta_temp, 'tv_for_each_poi'))
+
+
+class ParametrosRainfallInterpolation(ParametrosEtapa):
+    """
+    This class stores the configuration of the rainfall interpolation module.
+    """
+
+    etapa = ETAPA_RAINFALL_INTERPOLATION
+    definicoes_entradas = ENTRADAS_RAINFALL_INTERPOLATION
+    definicoes_saidas = SAIDAS_RAINFALL_INTERPOLATION
+
+    def __init__(self, entradas, saidas=None, mapas=False):
+        '''mapas = True para gerar um mapa por passo de tempo no lugar do arquivo .bin da chuva interpolada'''
+        super().__init__(entradas, saidas)
+        self.mapas = mapas
+
+    def escreve_configuracao(self, pasta_temp, formato_troca=FORMATO_ASCII):
+        arquivos = self.arquivos_temp(pasta_temp)
+        arquivos['input_config'] = os.path.join(pasta_temp, 'input_files_config_rain_inte.txt')
+        arquivos['output_config'] = os.path.join(pasta_temp, 'output_files_config_rain_inte.txt')
+
+        with open(arquivos['input_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Selected input file directory\n")
+            for nome, _, _ in self.definicoes_entradas:
+                arquivo_txt.write(f"{nome},{arquivos[nome]}\n")
+            arquivo_txt.write(f"{ri.ENTRADA_CONDICAO_MAPAS},{1 if self.mapas else 0}")
+            escreve_formato_troca(arquivo_txt, formato_troca)
+
+        with open(arquivos['output_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Select output file directory\n")
+            arquivo_txt.write('\n'.join(f'{nome},{arquivos[nome]}' for nome, _, _ in self.definicoes_saidas))
+            escreve_formato_troca(arquivo_txt, formato_troca)
+        return arquivos
+
+    def executa_motor(self, pasta_temp, pasta_cache=None):
+        # A matriz de pesos e identificada na cache pelos arquivos de origem, e nao pelas copias na area de trabalho
+        fontes = (self.entradas[ri.ENTRADA_POSTOS], self.entradas[ri.ENTRADA_BACIA])
+        ri.executa_rainfall_interpolation(os.path.join(pasta_temp, 'input_files_config_rain_inte.txt'),
+                                          os.path.join(pasta_temp, 'output_files_config_rain_inte.txt'), pasta_cache,
+                                          fontes_cache=fontes)
+
+
+class ParametrosExcessRainfall(ParametrosEtapa):
+    """
+    This class stores the configuration of the excess rainfall module (SCS-CN).
+    """
+
+    etapa = ETAPA_EXCESS_RAINFALL
+    definicoes_entradas = ENTRADAS_EXCESS_RAINFALL
+    definicoes_saidas = SAIDAS_EXCESS_RAINFALL
+
+    def __init__(self, entradas, saidas=None, abstracao_inicial=0.2, varredura_lambda=None, multiplicadores_cn=None):
+        '''
+        abstracao_inicial = coeficiente λ da abstracao inicial (Ia = λ S)
+        varredura_lambda = lista de valores de λ calculados na mesma execucao (substitui abstracao_inicial)
+        multiplicadores_cn = lista de fatores aplicados ao mapa de CN, calculados na mesma execucao
+        Com varredura_lambda ou multiplicadores_cn, as saidas que dependem dos parametros sao escritas uma vez por
+        combinacao, com o sufixo _lambda<λ>_cn<multiplicador> (ver excess_rainfall.arquivo_combinacao)
+        '''
+        super().__init__(entradas, saidas)
+        self.abstracao_inicial = abstracao_inicial
+        self.varredura_lambda = varredura_lambda
+        self.multiplicadores_cn = multiplicadores_cn
+
+    def combinacoes(self):
+        '''Combinacoes (λ, multiplicador do CN) da varredura; lista vazia quando nao ha varredura'''
+        if not self.varredura_lambda and not self.multiplicadores_cn:
+            return []
+        return er.combinacoes_varredura(self.varredura_lambda or [self.abstracao_inicial],
+                                        self.multiplicadores_cn or [1.0])
+
+    def entradas_copiadas(self, pasta_temp):
+        # A chuva media e reescrita com a quantidade de passos e a discretizacao na primeira linha
+        copiadas = super().entradas_copiadas(pasta_temp)
+        copiadas.pop(er.ENTRADA_CHUVA_MEDIA, None)
+        return copiadas
+
+    def escreve_configuracao(self, pasta_temp, formato_troca=FORMATO_ASCII):
+        arquivos = self.arquivos_temp(pasta_temp)
+        arquivos['parameters'] = os.path.join(pasta_temp, 'parameters_exc_rainf.txt')
+        arquivos['input_config'] = os.path.join(pasta_temp, 'input_files_config_exc_rainf.txt')
+        arquivos['output_config'] = os.path.join(pasta_temp, 'output_files_config_exc_rainf.txt')
+
+        with open(arquivos['parameters'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write(f"{er.PARAMETRO_LAMBDA},{self.abstracao_inicial}")
+            for nome, valores in ((er.PARAMETRO_VARREDURA_LAMBDA, self.varredura_lambda),
+                                  (er.PARAMETRO_MULTIPLICADORES_CN, self.multiplicadores_cn)):
+                if valores:
+                    arquivo_txt.write(f"\n{nome},{','.join(str(valor) for valor in valores)}")
+
+        with open(arquivos['input_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Selected input file directory\n")
+            escreve_linhas_entradas(arquivo_txt, self.definicoes_entradas, self.entradas, arquivos)
+            arquivo_txt.write(f"1,{er.ENTRADA_PARAMETROS},{arquivos['parameters']}\n")
+            escreve_formato_troca(arquivo_txt, formato_troca, nova_linha=False)
+
+        with open(arquivos['output_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Select output file directory\n")
+            arquivo_txt.write('\n'.join(f'{0 if self.saidas.get(nome) is None else 1},{nome},{arquivos[nome]}'
+                                        for nome, _, _ in self.definicoes_saidas))
+            escreve_formato_troca(arquivo_txt, formato_troca)
+        return arquivos
+
+    def executa_motor(self, pasta_temp, pasta_cache=None):
+        er.executa_excess_rainfall(os.path.join(pasta_temp, 'input_files_config_exc_rainf.txt'),
+                                   os.path.join(pasta_temp, 'output_files_config_exc_rainf.txt'))
+
+
+class ParametrosFlowRouting(ParametrosEtapa):
+    """
+    This class stores the configuration of the flow routing module (DLR or TUH+ versions).
+    """
+
+    etapa = ETAPA_FLOW_ROUTING
+    definicoes_entradas = ENTRADAS_FLOW_ROUTING
+    definicoes_saidas = SAIDAS_FLOW_ROUTING
+
+    def __init__(self, entradas, saidas=None, discretizacao=10.0, beta=1.0, litros=False, tuh=False,
+                 tempos_poi=None, hidrogramas_poi=None):
+        '''
+        discretizacao = passo de tempo da chuva (min)
+        beta = parametro β do reservatorio linear (K = β x tempo de viagem)
+        litros = True para as vazoes em L/s (False: m3/s)
+        tuh = True para a versao TUH+ (False: DLR)
+        tempos_poi = pasta com os mapas do tempo de viagem ate cada POI (GeoTIFF ou .rst, nomes contendo 'travel')
+        hidrogramas_poi = pasta de destino dos hidrogramas dos POIs
+        '''
+        super().__init__(entradas, saidas)
+        self.discretizacao = discretizacao
+        self.beta = beta
+        self.litros = litros
+        self.tuh = tuh
+        self.tempos_poi = tempos_poi
+        self.hidrogramas_poi = hidrogramas_poi
+
+    def escreve_configuracao(self, pasta_temp, formato_troca=FORMATO_ASCII):
+        arquivos = self.arquivos_temp(pasta_temp)
+        arquivos['parameters'] = os.path.join(pasta_temp, 'parameters_flow_rout.txt')
+        arquivos['tv_for_each_poi'] = os.path.join(pasta_temp, 'tv_for_each_poi')
+        arquivos['hydrographs'] = os.path.join(pasta_temp, 'hydrographs')
+        arquivos['input_config'] = os.path.join(pasta_temp, 'input_files_config_flow_rout.txt')
+        arquivos['output_config'] = os.path.join(pasta_temp, 'output_files_config_flow_rout.txt')
+
+        with open(arquivos['parameters'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write(f"{fr.PARAMETRO_DISCRETIZACAO},{self.discretizacao}\n")
+            arquivo_txt.write(f"{fr.PARAMETRO_BETA},{self.beta}\n")
+            arquivo_txt.write(f"{fr.PARAMETRO_LITROS},{1 if self.litros else 0}\n")
+            arquivo_txt.write(f"m3/s,{0 if self.litros else 1}\n")
+            # Versao TUH+: disponivel apenas no motor nativo
+            arquivo_txt.write(f"{fr.PARAMETRO_TUH},{1 if self.tuh else 0}")
+
+        with open(arquivos['input_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Selected input files directory\n")
+            escreve_linhas_entradas(arquivo_txt, self.definicoes_entradas, self.entradas, arquivos)
+            arquivo_txt.write(f"1,{fr.ENTRADA_PARAMETROS},{arquivos['parameters']}")
+            escreve_formato_troca(arquivo_txt, formato_troca)
+
+        with open(arquivos['output_config'], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write("Selected output files directory\n")
+            arquivo_txt.write('\n'.join(f'{0 if self.saidas.get(nome) is None else 1},{nome},{arquivos[nome]}'
+                                        for nome, _, _ in self.definicoes_saidas))
+            escreve_formato_troca(arquivo_txt, formato_troca)
+        return arquivos
+
+    def executa_motor(self, pasta_temp, pasta_cache=None):
+        poi = bool(self.tempos_poi)
+        fr.executa_flow_routing(os.path.join(pasta_temp, 'input_files_config_flow_rout.txt'),
+                                os.path.join(pasta_temp, 'output_files_config_flow_rout.txt'),
+                                os.path.join(pasta_temp, 'tv_for_each_poi') if poi else None,
+                                os.path.join(pasta_temp, 'hydrographs') if poi else None)
+
+
+# Objeto de parametros de cada etapa
+PARAMETROS_ETAPAS = {
+    ETAPA_TRAVEL_TIME: ParametrosTravelTime,
+    ETAPA_RAINFALL_INTERPOLATION: ParametrosRainfallInterpolation,
+    ETAPA_EXCESS_RAINFALL: ParametrosExcessRainfall,
+    ETAPA_FLOW_ROUTING: ParametrosFlowRouting,
+}
+
+
+def copia_rst(origem, destino):
+    '''Copia um .rst e o .rdc de mesmo nome'''
+    if os.path.abspath(origem) != os.path.abspath(destino):
+        shutil.copyfile(origem, destino)
+        shutil.copyfile(os.path.splitext(origem)[0] + '.rdc', os.path.splitext(destino)[0] + '.rdc')
+
+
+def eh_geotiff(arquivo):
+    return os.path.splitext(arquivo)[1].lower() in ('.tif', '.tiff')
+
+
+def prepara_entradas(parametros, pasta_temp, formato_troca=FORMATO_ASCII):
+    '''Converte (GeoTIFF) ou copia (.rst/.rdc) os rasters e copia os demais arquivos de entrada para a pasta temp
+        Retorna o InfoRaster da bacia (None quando a bacia ja e um .rst)'''
+    arquivos = parametros.arquivos_temp(pasta_temp)
+    info_bacia = None
+    for nome, _, file_type in parametros.definicoes_entradas:
+        origem = parametros.entradas.get(nome)
+        if not origem or file_type is None:
+            continue
+        if eh_geotiff(origem):
+            # O GDAL e importado apenas quando ha GeoTIFFs: as execucoes com .rst nao dependem dele
+            from .raster_conversion import converte_geotiff_rst
+            info = converte_geotiff_rst(origem, arquivos[nome], file_type,
+                                        'y' if nome == fr.ENTRADA_CLASSES else 'n', formato_troca)
+            if nome == tt.ENTRADA_BACIA:
+                info_bacia = info
+        else:
+            copia_rst(origem, arquivos[nome])
+
+    for nome, arquivo in parametros.entradas_copiadas(pasta_temp).items():
+        if os.path.abspath(parametros.entradas[nome]) != os.path.abspath(arquivo):
+            shutil.copyfile(parametros.entradas[nome], arquivo)
+    if isinstance(parametros, ParametrosExcessRainfall) and parametros.entradas.get(er.ENTRADA_CHUVA_MEDIA):
+        processa_chuva_media(parametros.entradas[er.ENTRADA_CHUVA_MEDIA], arquivos[er.ENTRADA_CHUVA_MEDIA])
+
+    if isinstance(parametros, ParametrosFlowRouting) and parametros.tempos_poi:
+        # Mapas do tempo de viagem ate cada POI: convertidos ou copiados para a pasta tv_for_each_poi
+        pasta_poi = os.path.join(pasta_temp, 'tv_for_each_poi')
+        shutil.rmtree(pasta_poi, ignore_errors=True)
+        os.makedirs(pasta_poi)
+        for arquivo in sorted(os.listdir(parametros.tempos_poi)):
+            origem = os.path.join(parametros.tempos_poi, arquivo)
+            destino = os.path.join(pasta_poi, os.path.splitext(arquivo)[0] + '.rst')
+            if eh_geotiff(arquivo):
+                from .raster_conversion import converte_geotiff_rst
+                converte_geotiff_rst(origem, destino, 'float', 'n', formato_troca)
+            elif arquivo.endswith('.rst'):
+                copia_rst(origem, destino)
+    return info_bacia
+
+
+def entrega_arquivo(nome, origem, destino, file_type, info_bacia=None, opcoes_geotiff=None):
+    '''Copia uma saida da pasta temp para o destino informado (.tif: conversao para GeoTIFF com a grade da bacia)'''
+    pasta_destino = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(pasta_destino, exist_ok=True)
+    if os.path.isdir(origem):
+        shutil.copytree(origem, destino, dirs_exist_ok=True)
+    elif file_type is not None and eh_geotiff(destino):
+        if info_bacia is None:
+            raise ValueError(f"The output '{nome}' can only be written as GeoTIFF when the watershed is a GeoTIFF.")
+        from .raster_conversion import converte_rst_geotiff
+        converte_rst_geotiff(origem, destino, file_type, info_bacia, opcoes_geotiff)
+    elif file_type is not None:
+        copia_rst(origem, destino)
+    else:
+        shutil.copyfile(origem, destino)
+
+
+def entrega_saidas(parametros, arquivos, info_bacia=None, opcoes_geotiff=None):
+    '''Copia as saidas solicitadas para os destinos informados (ver entrega_arquivo)
+        Retorna a lista dos arquivos entregues'''
+    entregues = []
+    combinacoes = parametros.combinacoes() if isinstance(parametros, ParametrosExcessRainfall) else []
+    for nome, _, file_type in parametros.definicoes_saidas:
+        destino = parametros.saidas.get(nome)
+        if not destino:
+            continue
+        if combinacoes and nome in er.SAIDAS_COMBINACAO:
+            # Varredura de λ e do CN: uma saida por combinacao, com o sufixo da combinacao tambem no destino
+            pares = [(er.arquivo_combinacao(arquivos[nome], *combinacao), er.arquivo_combinacao(destino, *combinacao))
+                     for combinacao in combinacoes]
+        else:
+            pares = [(arquivos[nome], destino)]
+        for origem, destino_saida in pares:
+            if os.path.exists(origem):
+                entrega_arquivo(nome, origem, destino_saida, file_type, info_bacia, opcoes_geotiff)
+                entregues.append(destino_saida)
+
+    if isinstance(parametros, ParametrosFlowRouting) and parametros.tempos_poi and parametros.hidrogramas_poi:
+        pasta_hidrogramas = os.path.join(os.path.dirname(arquivos['input_config']), 'hydrographs')
+        if os.path.isdir(pasta_hidrogramas):
+            shutil.copytree(pasta_hidrogramas, parametros.hidrogramas_poi, dirs_exist_ok=True)
+            entregues.append(parametros.hidrogramas_poi)
+    return entregues
+
+
+def executa_etapa(parametros, pasta_temp, formato_troca=FORMATO_ASCII, pasta_cache=None):
+    '''Executa uma etapa completa: prepara as entradas, escreve a configuracao, executa o motor nativo e entrega as saidas
+        Retorna a lista dos arquivos entregues'''
+    os.makedirs(pasta_temp, exist_ok=True)
+    info_bacia = prepara_entradas(parametros, pasta_temp, formato_troca)
+    arquivos = parametros.escreve_configuracao(pasta_temp, formato_troca)
+    parametros.executa_motor(pasta_temp, pasta_cache)
+    return entrega_saidas(parametros, arquivos, info_bacia)
+
+
+def carrega_configuracao(arquivo_json):
+    '''Le o arquivo JSON da execucao. Retorna (formato de troca, lista de (etapa, objeto de parametros)) na ordem das etapas
+        Os caminhos relativos sao considerados a partir da pasta do arquivo JSON'''
+    with open(arquivo_json, 'r', encoding='utf-8') as arquivo:
+        configuracao = json.load(arquivo)
+
+    pasta = os.path.dirname(os.path.abspath(arquivo_json))
+
+    def caminho(valor):
+        return os.path.join(pasta, valor) if isinstance(valor, str) and valor else valor
+
+    formato_troca = configuracao.get('exchange_format', FORMATO_ASCII)
+    if formato_troca not in FORMATOS_TROCA:
+        raise ValueError(f"Unknown exchange format '{formato_troca}'. Use one of: {', '.join(FORMATOS_TROCA)}.")
+
+    etapas = configuracao.get('stages', {})
+    desconhecidas = set(etapas) - set(ORDEM_ETAPAS)
+    if desconhecidas:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(desconhecidas))}. Use: {', '.join(ORDEM_ETAPAS)}.")
+
+    parametros = []
+    for etapa in ORDEM_ETAPAS:
+        if etapa not in etapas:
+            continue
+        argumentos = dict(etapas[etapa])
+        argumentos['entradas'] = {nome: caminho(valor) for nome, valor in argumentos.get('entradas', {}).items()}
+        argumentos['saidas'] = {nome: caminho(valor) for nome, valor in (argumentos.get('saidas') or {}).items()}
+        for chave in ('tempos_poi', 'hidrogramas_poi'):
+            if chave in argumentos:
+                argumentos[chave] = caminho(argumentos[chave])
+        try:
+            parametros.append((etapa, PARAMETROS_ETAPAS[etapa](**argumentos)))
+        except TypeError as erro:
+            raise ValueError(f"Invalid configuration for the stage '{etapa}': {erro}") from erro
+    return formato_troca, parametros
+
+
+def executa_pipeline(arquivo_json, raiz=None, etapas=None, pasta_cache=None, saida=None, politica=PoliticaRetencao()):
+    '''Executa as etapas do arquivo JSON em sequencia, parando na primeira que falhar
+        raiz = pasta raiz das areas de trabalho: cada etapa e executada em uma pasta propria (ver raiz_trabalho)
+        etapas = lista das etapas executadas (None = todas as etapas do arquivo)
+        saida = arquivo onde o tempo e o codigo de saida de cada etapa sao escritos (None = nada e escrito)
+        politica = PoliticaRetencao das areas de trabalho (por padrao, apenas as das etapas com falha sao mantidas)
+        Retorna a lista de dicionarios {stage, exit_code, seconds, error, outputs, workspace} das etapas executadas'''
+    formato_troca, parametros = carrega_configuracao(arquivo_json)
+    limpeza = LimpezaAreas(raiz_trabalho(raiz), politica)
+    # Remove as areas expiradas das execucoes anteriores (inclusive as deixadas por execucoes interrompidas)
+    limpeza.agenda()
+    resultados = []
+    try:
+        for etapa, parametros_etapa in parametros:
+            if etapas and etapa not in etapas:
+                continue
+            inicio = time.perf_counter()
+            area = limpeza.nova_area(etapa)
+            resultado = {'stage': etapa, 'exit_code': 0, 'seconds': 0.0, 'error': None, 'outputs': [],
+                         'workspace': area.pasta}
+            try:
+                resultado['outputs'] = executa_etapa(parametros_etapa, area.pasta, formato_troca, pasta_cache)
+            except Exception as erro:  # a etapa falha, mas o relatorio das anteriores e mantido
+                resultado['exit_code'] = 1
+                resultado['error'] = f'{type(erro).__name__}: {erro}'
+            resultado['seconds'] = time.perf_counter() - inicio
+            resultados.append(resultado)
+            limpeza.libera(area, resultado['exit_code'] == 0)
+
+            if saida is not None:
+                saida.write(f"{etapa:<24} exit code {resultado['exit_code']}  {resultado['seconds']:9.2f} s\n")
+                if resultado['error']:
+                    saida.write(f"    {resultado['error']}\n    workspace kept in {area.pasta}\n")
+                saida.flush()
+            if resultado['exit_code'] != 0:
+                break
+    finally:
+        # Aguarda as remocoes agendadas: o processo da linha de comando termina em seguida
+        limpeza.encerra()
+    return resultados
+
+
+def main(argv=None):
+    '''Ponto de entrada da linha de comando. Retorna o codigo de saida (0 = todas as etapas concluidas)'''
+    parser = argparse.ArgumentParser(
+        description='Runs the Hidropixel modules without QGIS, from a JSON configuration file.')
+    parser.add_argument('config', help='JSON configuration file')
+    parser.add_argument('--temp', help='scratch root: each stage runs in its own folder inside it, which can be on a '
+                                       'tmpfs or a local SSD (default: $HIDROPIXEL_SCRATCH or the system temp folder)')
+    parser.add_argument('--keep-scratch', action='store_true',
+                        help='keep the folders of the finished stages (by default only the failed ones are kept)')
+    parser.add_argument('--stages', nargs='+', choices=ORDEM_ETAPAS, help='stages to run (default: all in the file)')
+    parser.add_argument('--cache', help='folder of the rainfall interpolation weights cache')
+    parser.add_argument('--report', help='JSON file where the per-stage timings and exit codes are written')
+    parser.add_argument('--events', nargs='+',
+                        help='batch mode: rainfall files and/or folders of rainfall files, each one run as an event '
+                             'through the excess_rainfall and flow_routing stages of the file')
+    parser.add_argument('--workers', type=int, help='batch mode: number of worker processes (default: number of CPUs)')
+    parser.add_argument('--results', help='batch mode: folder of the hydrograph table and the summary '
+                                          '(default: batch_results next to the JSON file)')
+    argumentos = parser.parse_args(argv)
+
+    politica = PoliticaRetencao(manter_concluidas=argumentos.keep_scratch)
+    if argumentos.events:
+        return main_lote(argumentos, politica)
+    try:
+        resultados = executa_pipeline(argumentos.config, argumentos.temp, argumentos.stages, argumentos.cache, sys.stdout,
+                                      politica)
+    except (OSError, ValueError) as erro:
+        sys.stderr.write(f'Invalid configuration: {erro}\n')
+        return 2
+
+    if argumentos.report:
+        with open(argumentos.report, 'w', encoding='utf-8') as arquivo:
+            json.dump({'config': os.path.abspath(argumentos.config), 'stages': resultados}, arquivo, indent=2)
+    return 1 if any(resultado['exit_code'] for resultado in resultados) else 0
+
+
+def main_lote(argumentos, politica):
+    '''Modo lote da linha de comando (--events): executa cada evento de chuva em um pool de processos'''
+    # Importado aqui: o modulo do lote importa este modulo
+    from .batch_runner import executa_lote
+    pasta_resultados = argumentos.results or os.path.join(os.path.dirname(os.path.abspath(argumentos.config)),
+                                                          'batch_results')
+    try:
+        resultados = executa_lote(argumentos.config, argumentos.events, pasta_resultados, argumentos.temp,
+                                  argumentos.workers, sys.stdout, politica)
+    except (OSError, ValueError) as erro:
+        sys.stderr.write(f'Invalid configuration: {erro}\n')
+        return 2
+
+    if argumentos.report:
+        with open(argumentos.report, 'w', encoding='utf-8') as arquivo:
+            eventos = [{chave: valor for chave, valor in resultado.items() if chave != 'hydrographs'}
+                       for resultado in resultados]
+            json.dump({'config': os.path.abspath(argumentos.config), 'results': os.path.abspath(pasta_resultados),
+                       'events': eventos}, arquivo, indent=2)
+    return 1 if any(resultado['exit_code'] for resultado in resultados) else 0
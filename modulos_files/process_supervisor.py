@@ -0,0 +1,87 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE EXTERNAL ENGINE SUPERVISOR \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for running the external (VB) engines. Each engine is started with Popen in its own
+process group, so that a cancellation stops the engine and every process it started: the tree is asked to terminate
+and is killed if it is still running after a grace period.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+import signal
+import subprocess
+import time
+
+from .engine_progress import ExecucaoCancelada
+
+# Tempo (s) entre o pedido de termino da arvore de processos e o seu encerramento forcado
+TEMPO_TERMINO = 3.0
+
+# Intervalo (s) entre as verificacoes de cancelamento enquanto o processo esta em execucao
+INTERVALO_VERIFICACAO = 0.2
+
+
+class SupervisorProcesso:
+    """
+    This class starts an external engine and waits for it, stopping the whole process tree when the run is cancelled.
+    """
+
+    def __init__(self, comando, tempo_termino=TEMPO_TERMINO, intervalo=INTERVALO_VERIFICACAO, pasta=None):
+        """
+        comando = lista com o executavel e os seus argumentos
+        pasta = diretorio de trabalho do processo (None = diretorio atual)
+        tempo_termino = tempo (s) dado a arvore de processos para terminar antes do encerramento forcado
+        intervalo = intervalo (s) entre as verificacoes de cancelamento
+        """
+        self.comando = list(comando)
+        self.tempo_termino = tempo_termino
+        self.intervalo = intervalo
+        self.pasta = pasta
+        self.processo = None
+
+    def inicia(self):
+        '''Inicia o processo em um novo grupo de processos (a arvore pode ser encerrada de uma vez)'''
+        if os.name == 'nt':
+            self.processo = subprocess.Popen(self.comando, cwd=self.pasta,
+                                             creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            self.processo = subprocess.Popen(self.comando, cwd=self.pasta, start_new_session=True)
+        return self.processo
+
+    def executa(self, cancelado=None):
+        '''Executa o processo ate o fim e retorna o seu codigo de saida
+            cancelado = funcao verificada periodicamente: se retornar True, a arvore de processos e encerrada e
+            ExecucaoCancelada e gerada'''
+        if self.processo is None:
+            self.inicia()
+        while self.processo.poll() is None:
+            if cancelado is not None and cancelado():
+                self.encerra()
+                raise ExecucaoCancelada(f'{os.path.basename(self.comando[0])} was cancelled.')
+            time.sleep(self.intervalo)
+        return self.processo.returncode
+
+    def encerra(self):
+        '''Encerra a arvore de processos: pede o termino e, apos tempo_termino, forca o encerramento'''
+        if self.processo is None or self.processo.poll() is not None:
+            return
+        self._sinaliza(forcado=False)
+        try:
+            self.processo.wait(self.tempo_termino)
+        except subprocess.TimeoutExpired:
+            self._sinaliza(forcado=True)
+            self.processo.wait()
+
+    def _sinaliza(self, forcado):
+        pid = self.processo.pid
+        if os.name == 'nt':
+            # taskkill /T inclui os processos filhos; /F forca o encerramento
+            comando = ['taskkill', '/PID', str(pid), '/T'] + (['/F'] if forcado else [])
+            subprocess.run(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+        try:
+            os.killpg(os.getpgid(pid), signal.SIGKILL if forcado else signal.SIGTERM)
+        except ProcessLookupError:
+            pass
@@ -0,0 +1,262 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE NATIVE RAINFALL INTERPOLATION ENGINE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the native (NumPy) version of the rainfall interpolation routine. The rainfall of
+the rain gauges is interpolated to the watershed pixels by the inverse distance weighting method (IDW). As the gauges do
+not move between time steps, the weights of each pixel are computed once (a pixels x gauges matrix) and every time step
+is obtained with a matrix product. The output is the spatially distributed rainfall .bin file read by the excess
+rainfall routine or, optionally, one map per time step.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .engine_io import dimensoes_rst, escreve_cabecalho_hietograma, le_config_arquivos, le_mapa
+from .engine_progress import ProgressoMotor
+from .weights_cache import WeightsCache
+
+# Quantidade aproximada de valores (pixels x passos de tempo) calculados por vez
+VALORES_POR_BLOCO = 4 << 20
+
+# Metodo de interpolacao e expoente da distancia no IDW (fazem parte da chave da cache de pesos)
+METODO_INTERPOLACAO = 'IDW'
+POTENCIA_IDW = 2.0
+
+# Quantidade maxima de padroes de postos disponiveis com a normalizacao dos pesos mantida em memoria
+TAMANHO_LRU_DISPONIBILIDADE = 64
+
+# Etapas informadas no arquivo de andamento
+ETAPAS = ('interpolation weights', 'interpolation')
+
+# Nomes das entradas e saidas nos arquivos de configuracao
+ENTRADA_BACIA = 'watershed'
+ENTRADA_POSTOS = 'rain_gauges'
+ENTRADA_DADOS = 'rainfall_data'
+ENTRADA_CONDICAO_MAPAS = 'map_condiction'
+SAIDA_ARQUIVO = 'rainfall_interpolated_file'
+SAIDA_MAPAS = 'rainfall_interpolated_maps_path'
+
+
+def le_postos(arquivo):
+    '''Le o arquivo dos postos pluviometricos (cabecalho e linhas "id,x,y", no sistema de coordenadas da bacia)
+        Retorna (identificadores, coordenadas (postos, 2))'''
+    ids = []
+    coordenadas = []
+    with open(arquivo, 'r', encoding='utf-8-sig') as arquivo_txt:
+        arquivo_txt.readline()
+        for linha in arquivo_txt:
+            partes = [parte.strip() for parte in linha.strip().split(',')]
+            if len(partes) >= 3 and partes[0] != '':
+                ids.append(partes[0])
+                coordenadas.append((float(partes[1]), float(partes[2])))
+    if not ids:
+        raise ValueError(f"File '{arquivo}' has no rain gauges.")
+    return ids, np.array(coordenadas, dtype=np.float64)
+
+
+def le_dados_chuva(arquivo, ids_postos):
+    '''Le as chuvas dos postos (cabecalho "tempo,id_1,id_2,..." e linhas "tempo,chuva_1,chuva_2,...")
+        As colunas sao associadas aos postos pelo identificador do cabecalho ou, se eles nao coincidirem, pela ordem
+        Falhas (campo vazio, texto ou valor negativo, ex.: -999) sao retornadas como NaN
+        Retorna (tempos, chuva (passos, postos) na ordem de ids_postos)'''
+    with open(arquivo, 'r', encoding='utf-8-sig') as arquivo_txt:
+        cabecalho = [parte.strip() for parte in arquivo_txt.readline().strip().split(',')]
+        dados = np.atleast_2d(np.genfromtxt(arquivo_txt, delimiter=',', dtype=np.float64))
+    tempos, chuva = dados[:, 0], dados[:, 1:]
+    chuva[chuva < 0] = np.nan
+
+    if set(ids_postos) <= set(cabecalho[1:]):
+        chuva = chuva[:, [cabecalho[1:].index(posto) for posto in ids_postos]]
+    elif chuva.shape[1] != len(ids_postos):
+        raise ValueError(
+            f"File '{arquivo}' has {chuva.shape[1]} rainfall columns, but {len(ids_postos)} rain gauges were given.")
+    return tempos, chuva
+
+
+def coordenadas_pixels(informacoes, pixels, ncol):
+    '''Coordenadas (x, y) do centro dos pixels informados (indices da grade em ordem linha a linha)'''
+    dx = abs(float(informacoes.get('resolution (X)', informacoes['resolution'])))
+    dy = abs(float(informacoes.get('resolution (Y)', informacoes['resolution'])))
+    lin, col = np.divmod(pixels, ncol)
+    return np.column_stack((float(informacoes['Min_X']) + (col + 0.5) * dx,
+                            float(informacoes['Max_Y']) - (lin + 0.5) * dy))
+
+
+def pesos_idw(coordenadas_pixels, coordenadas_postos, potencia=POTENCIA_IDW):
+    '''Matriz (pixels, postos) dos pesos do IDW: cada linha soma 1
+        Um posto no centro de um pixel recebe todo o peso desse pixel'''
+    pesos = np.empty((coordenadas_pixels.shape[0], coordenadas_postos.shape[0]))
+    passo = max(1, VALORES_POR_BLOCO // coordenadas_postos.shape[0])
+    for inicio in range(0, coordenadas_pixels.shape[0], passo):
+        fim = min(inicio + passo, coordenadas_pixels.shape[0])
+        distancia = np.hypot(coordenadas_pixels[inicio:fim, 0, np.newaxis] - coordenadas_postos[:, 0],
+                             coordenadas_pixels[inicio:fim, 1, np.newaxis] - coordenadas_postos[:, 1])
+        coincide = distancia == 0
+        with np.errstate(divide='ignore'):
+            bloco = np.where(coincide, 0.0, distancia ** -potencia)
+        linhas_coincidentes = coincide.any(axis=1)
+        bloco[linhas_coincidentes] = coincide[linhas_coincidentes]
+        pesos[inicio:fim] = bloco / bloco.sum(axis=1, keepdims=True)
+    return pesos
+
+
+def pesos_bacia(informacoes, pixels, ncol, coordenadas_postos, cache=None, origem=None):
+    '''Matriz de pesos dos pixels da bacia, lida da cache quando os postos, a grade e o metodo nao mudaram
+        cache = WeightsCache (opcional); origem = identificador do par arquivo de postos e bacia na cache'''
+    if cache is None:
+        return pesos_idw(coordenadas_pixels(informacoes, pixels, ncol), coordenadas_postos)
+
+    grade = [ncol, informacoes['Rows'], informacoes['Min_X'], informacoes['Max_Y'],
+             informacoes.get('resolution (X)', informacoes['resolution']),
+             informacoes.get('resolution (Y)', informacoes['resolution'])]
+    chave = cache.chave(coordenadas_postos, grade, pixels, METODO_INTERPOLACAO, POTENCIA_IDW)
+    pesos = cache.busca(origem, chave)
+    if pesos is None or pesos.shape != (pixels.size, coordenadas_postos.shape[0]):
+        pesos = pesos_idw(coordenadas_pixels(informacoes, pixels, ncol), coordenadas_postos)
+        cache.armazena(origem, chave, pesos)
+    return pesos
+
+
+class PesosDisponibilidade:
+    """
+    This class adapts the weight matrix of all the gauges to the gauges reporting in each time step. As the missing
+    gauges have zero rainfall in the product, the weights of a pattern only need one factor per pixel (1 / sum of the
+    weights of the available gauges); the pixels at the centre of a missing gauge get new weights from the distances to
+    the available ones. The normalization of the most recently used patterns is kept in memory.
+    """
+
+    def __init__(self, pesos, coordenadas_pixels, coordenadas_postos, capacidade=TAMANHO_LRU_DISPONIBILIDADE):
+        '''
+        pesos = matriz (pixels, postos) dos pesos normalizados com todos os postos
+        coordenadas_pixels = funcao que retorna as coordenadas (n, 2) dos pixels de indices informados
+        coordenadas_postos = coordenadas (postos, 2) dos postos
+        capacidade = quantidade maxima de padroes mantidos em memoria
+        '''
+        self.pesos = pesos
+        self.coordenadas_pixels = coordenadas_pixels
+        self.coordenadas_postos = coordenadas_postos
+        self.capacidade = max(1, int(capacidade))
+        self._padroes = OrderedDict()
+
+    def normalizacao(self, disponiveis):
+        '''Retorna (fator (pixels,), linhas substituidas, pesos (linhas, postos) das linhas substituidas) do padrao de
+            postos disponiveis informado (vetor booleano)'''
+        chave = np.packbits(disponiveis).tobytes()
+        if chave in self._padroes:
+            self._padroes.move_to_end(chave)
+            return self._padroes[chave]
+
+        soma = self.pesos[:, disponiveis].sum(axis=1)
+        linhas = np.flatnonzero(soma == 0) if disponiveis.any() else np.empty(0, dtype=np.int64)
+        with np.errstate(divide='ignore'):
+            fator = np.where(soma > 0, 1.0 / soma, 0.0)
+        pesos_linhas = np.zeros((linhas.size, disponiveis.size))
+        if linhas.size:
+            # Pixels no centro de um posto com falha: pesos recalculados apenas com os postos disponiveis
+            pesos_linhas[:, disponiveis] = pesos_idw(self.coordenadas_pixels(linhas),
+                                                     self.coordenadas_postos[disponiveis])
+
+        self._padroes[chave] = (fator, linhas, pesos_linhas)
+        if len(self._padroes) > self.capacidade:
+            self._padroes.popitem(last=False)
+        return self._padroes[chave]
+
+
+def interpola(pesos, chuva, inicio, fim, disponibilidade=None):
+    '''Chuva interpolada (pixels inicio:fim, passos): um produto de matrizes para todos os passos de tempo
+        disponibilidade = PesosDisponibilidade usado quando a chuva tem falhas (NaN); os passos sao agrupados pelo
+        padrao de postos disponiveis e cada padrao e normalizado uma vez. Passos sem nenhum posto resultam em 0'''
+    falhas = np.isnan(chuva)
+    if disponibilidade is None or not falhas.any():
+        return pesos[inicio:fim] @ chuva.T
+
+    valores = pesos[inicio:fim] @ np.where(falhas, 0.0, chuva).T
+    padroes, grupos = np.unique(~falhas, axis=0, return_inverse=True)
+    grupos = grupos.ravel()
+    for indice, disponiveis in enumerate(padroes):
+        if disponiveis.all():
+            continue
+        passos = np.flatnonzero(grupos == indice)
+        fator, linhas, pesos_linhas = disponibilidade.normalizacao(disponiveis)
+        valores[:, passos] *= fator[inicio:fim, np.newaxis]
+        selecao = (linhas >= inicio) & (linhas < fim)
+        if selecao.any():
+            chuva_passos = np.where(falhas[passos], 0.0, chuva[passos])
+            valores[np.ix_(linhas[selecao] - inicio, passos)] = pesos_linhas[selecao] @ chuva_passos.T
+    return valores
+
+
+def escreve_mapa_asc(arquivo, dados, informacoes):
+    '''Escreve um mapa no formato ASCII grid (.asc) com a grade do .rdc informado'''
+    dx = abs(float(informacoes.get('resolution (X)', informacoes['resolution'])))
+    with open(arquivo, 'w', encoding='utf-8') as arquivo_txt:
+        arquivo_txt.write(f'ncols        {dados.shape[1]}\n')
+        arquivo_txt.write(f'nrows        {dados.shape[0]}\n')
+        arquivo_txt.write(f"xllcorner    {informacoes['Min_X']}\n")
+        arquivo_txt.write(f"yllcorner    {informacoes['Min_Y']}\n")
+        arquivo_txt.write(f'cellsize     {dx}\n')
+        np.savetxt(arquivo_txt, dados, fmt='%.4f')
+
+
+def executa_rainfall_interpolation(arquivo_entradas, arquivo_saidas, pasta_cache=None, arquivo_progresso=None,
+                                   cancelado=None, fontes_cache=None):
+    '''Executa a rotina rainfall interpolation a partir dos arquivos de configuracao de entradas e saidas
+        arquivo_entradas = input_files_config_rain_inte.txt
+        arquivo_saidas = output_files_config_rain_inte.txt
+        pasta_cache = pasta da cache das matrizes de pesos (None: os pesos sao sempre calculados)
+        fontes_cache = (arquivo de postos, bacia) enviados pelo usuario, que identificam a matriz na cache: as entradas
+            da configuracao sao copias na area de trabalho de cada execucao (None: usa os arquivos da configuracao)
+        arquivo_progresso = arquivo onde o andamento de cada etapa e escrito (opcional, ver engine_progress)
+        cancelado = funcao que retorna True quando o usuario cancela a execucao (o motor para na etapa em andamento)
+        map_condiction = 0 escreve o arquivo .bin da chuva interpolada; 1 escreve um mapa por passo de tempo'''
+    progresso = ProgressoMotor(arquivo_progresso, ETAPAS, cancelado=cancelado)
+    progresso.etapa('interpolation weights')
+    entradas, _ = le_config_arquivos(arquivo_entradas)
+    saidas, _ = le_config_arquivos(arquivo_saidas)
+
+    arquivo_bacia = entradas[ENTRADA_BACIA]
+    nlin, ncol, informacoes = dimensoes_rst(arquivo_bacia)
+    pixels = np.flatnonzero(le_mapa(arquivo_bacia, 'int') == 1)
+
+    ids_postos, coordenadas_postos = le_postos(entradas[ENTRADA_POSTOS])
+    tempos, chuva = le_dados_chuva(entradas[ENTRADA_DADOS], ids_postos)
+    discretizacao = float(tempos[1] - tempos[0]) if tempos.size > 1 else 0.0
+    cache = WeightsCache(pasta_cache) if pasta_cache else None
+    pesos = pesos_bacia(informacoes, pixels, ncol, coordenadas_postos, cache,
+                        WeightsCache.origem(*(fontes_cache or (entradas[ENTRADA_POSTOS], arquivo_bacia))))
+    disponibilidade = PesosDisponibilidade(
+        pesos, lambda linhas: coordenadas_pixels(informacoes, pixels[linhas], ncol), coordenadas_postos)
+
+    progresso.avanca(1)
+
+    passo = max(1, VALORES_POR_BLOCO // max(tempos.size, 1))
+    if entradas.get(ENTRADA_CONDICAO_MAPAS, '0').strip() == '1':
+        # Um mapa por passo de tempo (0 fora da bacia)
+        progresso.etapa('interpolation', tempos.size)
+        pasta = saidas[SAIDA_MAPAS]
+        os.makedirs(pasta, exist_ok=True)
+        passo_tempo = max(1, VALORES_POR_BLOCO // max(pixels.size, 1))
+        for inicio in range(0, tempos.size, passo_tempo):
+            fim = min(inicio + passo_tempo, tempos.size)
+            valores = interpola(pesos, chuva[inicio:fim], 0, pixels.size, disponibilidade)
+            for t in range(inicio, fim):
+                mapa = np.zeros(nlin * ncol)
+                mapa[pixels] = valores[:, t - inicio]
+                escreve_mapa_asc(os.path.join(pasta, f'rainfall_{t + 1}.asc'), mapa.reshape(nlin, ncol),
+                                 informacoes)
+            progresso.avanca(fim)
+    else:
+        # Arquivo .bin: cabecalho e os valores de cada pixel da bacia em sequencia (ordem linha a linha)
+        progresso.etapa('interpolation', pixels.size)
+        with open(saidas[SAIDA_ARQUIVO], 'wb') as arquivo_bin:
+            escreve_cabecalho_hietograma(arquivo_bin, pixels.size, tempos.size, discretizacao,
+                                         tempos.size * discretizacao)
+            for inicio in range(0, pixels.size, passo):
+                fim = min(inicio + passo, pixels.size)
+                interpola(pesos, chuva, inicio, fim, disponibilidade).astype('<f4').tofile(arquivo_bin)
+                progresso.avanca(fim)
@@ -0,0 +1,274 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR RASTER CONVERSION \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for converting the GeoTIFF inputs into the .rst/.rdc files read by the external
+engines, and the .rst outputs of the engines back into GeoTIFF. The conversions do not depend on the plugin interface,
+so independent files can be converted concurrently.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from osgeo import gdal, gdalconst
+
+from .geotiff_io import escreve_geotiff, tipo_saida
+from .rst_io import FORMATO_ASCII, FORMATO_BINARIO, escreve_rst_ascii_blocos, escreve_rst_binario_blocos, le_rst, \
+    tipo_binario
+
+# Intervalo (s) entre as chamadas de ao_aguardar enquanto as conversoes estao em andamento
+INTERVALO_ESPERA = 0.05
+
+# Quantidade aproximada de pixels lidos do raster por vez: limita a memoria usada na conversao de rasters grandes
+PIXELS_POR_BLOCO = 4 << 20
+
+# Tipos GDAL cujos valores sempre cabem em int16
+TIPOS_GDAL_INT16 = tuple(
+    tipo for tipo in (gdalconst.GDT_Byte, getattr(gdalconst, 'GDT_Int8', None), gdalconst.GDT_Int16)
+    if tipo is not None)
+
+
+class InfoRaster:
+    """
+    This class stores the grid information of a converted raster (the values written in the .rdc file). When a window
+    (xoff, yoff, xsize, ysize) is given, the grid describes only the window and the full extent is kept in the *_total
+    attributes, used to paste the outputs back into the original grid.
+    """
+
+    def __init__(self, nlin, ncol, geotransform, projection, janela=None):
+        self.projection = projection
+        self.janela = janela
+
+        # Grade completa do raster de origem
+        self.nlin_total = nlin
+        self.ncol_total = ncol
+        self.geotransform_total = geotransform
+
+        if janela is None:
+            self.nlin = nlin
+            self.ncol = ncol
+            self.geotransform = geotransform
+        else:
+            xoff, yoff, xsize, ysize = janela
+            self.nlin = ysize
+            self.ncol = xsize
+            self.geotransform = (
+                geotransform[0] + xoff * geotransform[1] + yoff * geotransform[2], geotransform[1], geotransform[2],
+                geotransform[3] + xoff * geotransform[4] + yoff * geotransform[5], geotransform[4], geotransform[5])
+
+        # Coordenadas da celula lin = 0, col = 0 e resolucoes espaciais (sentido horizontal e vertical)
+        self.x_min = self.geotransform[0]
+        self.y_max = self.geotransform[3]
+        self.dx = self.geotransform[1]
+        self.dy = self.geotransform[5]
+
+        # Coordenadas do canto inferior direito
+        self.x_max = self.x_min + (self.ncol * self.dx)
+        self.y_min = self.y_max + (self.nlin * self.dy)
+
+
+def numero_workers(max_workers, n_tarefas):
+    '''Define a quantidade de threads: max_workers <= 0 usa a quantidade de processadores, limitada ao numero de tarefas'''
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(max_workers, n_tarefas))
+
+
+def linhas_por_bloco(banda, ncol, linhas=0):
+    '''Define a altura das faixas lidas do raster: linhas > 0 fixa a altura; senao usa um multiplo da altura do bloco
+        nativo do arquivo com aproximadamente PIXELS_POR_BLOCO pixels'''
+    if linhas and linhas > 0:
+        return linhas
+    altura = max(1, banda.GetBlockSize()[1])
+    return altura * max(1, PIXELS_POR_BLOCO // (altura * max(ncol, 1)))
+
+
+def itera_blocos(banda, janela=None, linhas=0):
+    '''Le a banda (ou apenas a janela) em faixas de linhas inteiras, de cima para baixo
+        janela = (xoff, yoff, xsize, ysize) (opcional)
+        linhas = altura das faixas (0 = definida pelo bloco nativo do arquivo)'''
+    if janela is None:
+        xoff, yoff, xsize, ysize = 0, 0, banda.XSize, banda.YSize
+    else:
+        xoff, yoff, xsize, ysize = janela
+
+    passo = linhas_por_bloco(banda, xsize, linhas)
+    for lin in range(0, ysize, passo):
+        yield banda.ReadAsArray(xoff, yoff + lin, xsize, min(passo, ysize - lin))
+
+
+def janela_bacia(arquivo_bacia, margem=0, linhas=0):
+    '''Retorna a janela (xoff, yoff, xsize, ysize) que envolve os pixels da bacia (valor 1) mais uma margem em pixels,
+        limitada a grade do raster. Retorna None se o raster nao possuir pixels da bacia'''
+    raster_bacia = gdal.Open(arquivo_bacia)
+    if raster_bacia is None:
+        raise ValueError(f"Could not open the raster '{arquivo_bacia}'.")
+
+    banda = raster_bacia.GetRasterBand(1)
+    nlin, ncol = banda.YSize, banda.XSize
+
+    # Percorre o raster em faixas: guarda apenas quais linhas e colunas possuem pixels da bacia
+    linhas_bacia = np.zeros(nlin, dtype=bool)
+    colunas_bacia = np.zeros(ncol, dtype=bool)
+    lin = 0
+    for bloco in itera_blocos(banda, linhas=linhas):
+        bacia = bloco == 1
+        linhas_bacia[lin:lin + bloco.shape[0]] = bacia.any(axis=1)
+        colunas_bacia |= bacia.any(axis=0)
+        lin += bloco.shape[0]
+
+    linhas = np.flatnonzero(linhas_bacia)
+    colunas = np.flatnonzero(colunas_bacia)
+    if linhas.size == 0:
+        return None
+
+    lin_ini = max(0, int(linhas[0]) - margem)
+    lin_fim = min(nlin, int(linhas[-1]) + 1 + margem)
+    col_ini = max(0, int(colunas[0]) - margem)
+    col_fim = min(ncol, int(colunas[-1]) + 1 + margem)
+    return col_ini, lin_ini, col_fim - col_ini, lin_fim - lin_ini
+
+
+def tipo_binario_banda(banda, int_float, janela=None, linhas=0):
+    '''Define o tipo binario da banda (ou da janela) sem carregar o raster inteiro: os tipos GDAL ate 16 bits usam int16;
+        os demais sao percorridos em faixas para verificar se os valores cabem em int16'''
+    if int_float == 'float':
+        return 'float32'
+    if banda.DataType in TIPOS_GDAL_INT16:
+        return 'int16'
+
+    for bloco in itera_blocos(banda, janela, linhas):
+        if tipo_binario(bloco, int_float) == 'int32':
+            return 'int32'
+    return 'int16'
+
+
+def converte_geotiff_rst(arquivo, arquivo_rst, int_float, mapa_classes='n', formato_troca=FORMATO_ASCII, cache=None,
+                         janela=None, linhas=0):
+    '''Converte um raster GeoTIFF em .rst (ascii ou binario) e escreve o .rdc de mesmo nome
+        arquivo = diretorio do raster de origem
+        arquivo_rst = arquivo raster tipo rst (sera criado)
+        int_float = 'int' ou 'float'
+        mapa_classes = 'y' para informar a quantidade de classes no .rdc
+        cache = ConversionCache usada para reaproveitar conversoes anteriores (opcional)
+        janela = (xoff, yoff, xsize, ysize): converte apenas esse recorte do raster (opcional)
+        linhas = altura das faixas lidas do raster (0 = definida pelo bloco nativo do arquivo)
+        Retorna um InfoRaster com as informacoes da grade do raster'''
+    raster_enviado = gdal.Open(arquivo)
+    if raster_enviado is None:
+        raise ValueError(f"Could not open the raster '{arquivo}'.")
+
+    if janela is not None:
+        xoff, yoff, xsize, ysize = janela
+        if xoff + xsize > raster_enviado.RasterXSize or yoff + ysize > raster_enviado.RasterYSize:
+            raise ValueError(f"The raster '{arquivo}' does not have the same dimensions as the watershed raster.")
+
+    info = InfoRaster(raster_enviado.RasterYSize, raster_enviado.RasterXSize,
+                      raster_enviado.GetGeoTransform(), raster_enviado.GetProjection(), janela)
+
+    # Reaproveita a conversao armazenada na cache, caso o arquivo de origem e as opcoes nao tenham mudado
+    chave_cache = None
+    if cache is not None:
+        chave_cache = cache.chave(arquivo, info.geotransform_total, int_float, mapa_classes, formato_troca, janela)
+        if cache.busca(chave_cache, arquivo_rst):
+            return info
+
+    # Le o raster em faixas de linhas (apenas a janela, quando informada): a memoria fica limitada ao tamanho da faixa
+    banda = raster_enviado.GetRasterBand(1)
+    classes = set()
+
+    def blocos():
+        for bloco in itera_blocos(banda, janela, linhas):
+            if mapa_classes == 'y':
+                classes.update(np.unique(bloco[bloco != 0]).tolist())
+            yield bloco
+
+    if formato_troca == FORMATO_BINARIO:
+        # Escrita do arquivo binario: vetor little-endian com o menor tipo que representa os dados
+        data_type = tipo_binario_banda(banda, int_float, janela, linhas)
+        escreve_rst_binario_blocos(arquivo_rst, blocos(), int_float, data_type)
+    else:
+        # Escrita do arquivo ascii: formata blocos de linhas inteiras de uma vez
+        escreve_rst_ascii_blocos(arquivo_rst, blocos(), int_float)
+    banda = None
+    raster_enviado = None
+
+    arquivo_rdc = arquivo_rst.replace('.rst', '.rdc')
+    with open(arquivo_rdc, 'w', encoding='utf-8') as rdc:
+        rdc.write('Raster Informations\n')
+        rdc.write(f'Rows,{info.nlin}\n')
+        rdc.write(f'Columns,{info.ncol}\n')
+        rdc.write(f'resolution,{np.abs(info.geotransform[1])}\n')
+        rdc.write(f'resolution (X),{info.dx}\n')
+        rdc.write(f'resolution (Y),{info.dy}\n')
+        rdc.write(f'Min_X,{info.x_min}\n')
+        rdc.write(f'Max_X,{info.x_max}\n')
+        rdc.write(f'Min_Y,{info.y_min}\n')
+        rdc.write(f'Max_Y,{info.y_max}\n')
+        if mapa_classes == 'y':
+            # Quantidade de classes encontradas durante a leitura
+            rdc.write(f'watershed_classes,{len(classes)}\n')
+        if formato_troca == FORMATO_BINARIO:
+            rdc.write(f'file_format,{FORMATO_BINARIO}\n')
+            rdc.write(f'data_type,{data_type}\n')
+
+    if cache is not None:
+        cache.armazena(chave_cache, arquivo_rst)
+
+    return info
+
+
+def converte_rst_geotiff(arquivo_rst, arquivo_tif, file_type, info, opcoes=None):
+    '''Converte um .rst gerado pelas rotinas externas (ascii ou binario) em GeoTIFF
+        arquivo_rst = diretorio do arquivo raster tipo rst
+        arquivo_tif = arquivo raster tiff (sera criado)
+        file_type = 'int' ou 'float'
+        info = InfoRaster da grade convertida: quando ha recorte, o GeoTIFF e criado na grade completa e os valores
+            sao colados na posicao da janela (o restante permanece 0)
+        opcoes = OpcoesGeoTiff com o perfil de criacao do GeoTIFF (None = perfil optimized)
+        Retorna o diretorio do GeoTIFF criado'''
+    # Leitura do arquivo rst: o formato e definido pelo .rdc gerado pela rotina (ascii, caso nao seja informado).
+    # A matriz ja e alocada em 32 bits (int32 ou float32), sem passar por float64
+    rst_to_raster = le_rst(arquivo_rst, info.nlin, info.ncol, file_type,
+                           dtype=np.int32 if file_type == 'int' else np.float32)
+
+    # Define o menor tipo que representa os dados sem perdas (ex.: segmentos de rio e classes em Byte/UInt16)
+    tipo_dados, tipo_numpy = tipo_saida(rst_to_raster, file_type, opcoes.nodata if opcoes is not None else None)
+    rst_to_raster = rst_to_raster.astype(tipo_numpy, copy=False)
+
+    # Cria arquivo final e escreve os dados na posicao da janela
+    xoff, yoff = (info.janela[0], info.janela[1]) if info.janela is not None else (0, 0)
+    return escreve_geotiff(arquivo_tif, rst_to_raster, info.nlin_total, info.ncol_total, info.geotransform_total,
+                           info.projection, tipo_dados, opcoes, xoff, yoff)
+
+
+def executa_em_paralelo(funcao, tarefas, max_workers=0, ao_aguardar=None):
+    '''Executa funcao(*args) para cada tarefa em um conjunto limitado de threads
+        tarefas = dicionario nome -> tupla de argumentos
+        ao_aguardar = funcao chamada periodicamente enquanto as tarefas estao em andamento (ex.: processEvents da interface)
+        Retorna (resultados, erros): dicionarios nome -> retorno da funcao e nome -> excecao gerada'''
+    resultados = {}
+    erros = {}
+    if not tarefas:
+        return resultados, erros
+
+    with ThreadPoolExecutor(max_workers=numero_workers(max_workers, len(tarefas))) as executor:
+        futuros = {executor.submit(funcao, *args): nome for nome, args in tarefas.items()}
+        pendentes = set(futuros)
+        while pendentes:
+            concluidos, pendentes = wait(
+                pendentes, timeout=INTERVALO_ESPERA if ao_aguardar is not None else None,
+                return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = futuros[futuro]
+                try:
+                    resultados[nome] = futuro.result()
+                except Exception as erro:
+                    erros[nome] = erro
+            if pendentes and ao_aguardar is not None:
+                ao_aguardar()
+
+    return resultados, erros
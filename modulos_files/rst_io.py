@@ -0,0 +1,268 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR RST EXCHANGE FILES \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for writing and reading the .rst files exchanged between the Hidropixel Plugin and
+the external engines (travel_time, excess_rainfall, flow_routing and rainfall_interpolation).
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+
+import numpy as np
+
+# Formatos de troca dos arquivos .rst: o ascii (um valor por linha) continua sendo o padrao
+FORMATO_ASCII = 'ascii'
+FORMATO_BINARIO = 'binary'
+FORMATOS_TROCA = (FORMATO_ASCII, FORMATO_BINARIO)
+
+# Tipos aceitos no formato binario (sempre little-endian), declarados no .rdc pela chave data_type
+TIPOS_BINARIOS = {
+    'int16': np.dtype('<i2'),
+    'int32': np.dtype('<i4'),
+    'float32': np.dtype('<f4'),
+}
+
+# Quantidade aproximada de valores formatados por bloco de escrita: limita o tamanho do buffer de texto
+VALORES_POR_BLOCO = 1 << 20
+
+# Quantidade aproximada de bytes lidos por vez ao reconstruir as matrizes a partir dos arquivos .rst ascii
+BYTES_POR_LEITURA = 16 << 20
+
+# Amostra usada para decidir se vale a pena formatar os valores distintos uma unica vez (mapas de classes)
+TAMANHO_AMOSTRA = 4096
+
+
+def _junta_linhas(textos):
+    '''Junta os textos ja formatados, um valor por linha (inclusive o ultimo)'''
+    return '\n'.join(textos) + '\n'
+
+
+def _formata_inteiros(valores):
+    '''Formata inteiros como str(int(v)); usa tabela de textos quando a amplitude dos valores e pequena'''
+    vmin = int(valores.min())
+    vmax = int(valores.max())
+    if vmax - vmin < 2 * valores.size:
+        tabela = np.array([str(v) for v in range(vmin, vmax + 1)], dtype=object)
+        return _junta_linhas(tabela[valores - vmin].tolist())
+    return _junta_linhas(map(str, valores.tolist()))
+
+
+def _formata_reais(valores):
+    '''Formata reais como str(float(v)); mapas com poucos valores distintos sao formatados via tabela'''
+    # Compara os bits dos valores: 0.0 e -0.0 geram textos diferentes e nao podem ser agrupados
+    bits = valores.view(np.uint32 if valores.itemsize == 4 else np.uint64)
+    amostra = bits[:TAMANHO_AMOSTRA]
+    if len(np.unique(amostra)) <= amostra.size // 4:
+        distintos, indices = np.unique(bits, return_inverse=True)
+        if distintos.size <= bits.size // 4:
+            tabela = np.array(
+                [str(v) for v in distintos.view(valores.dtype).astype(np.float64).tolist()], dtype=object)
+            return _junta_linhas(tabela[indices.ravel()].tolist())
+    return _junta_linhas(map(str, valores.astype(np.float64).tolist()))
+
+
+def _valida_tipo(int_float):
+    if int_float not in ('int', 'float'):
+        raise ValueError(f"Invalid value type '{int_float}': use 'int' or 'float'.")
+
+
+def _valores_inteiros(dados):
+    '''Converte os dados para inteiros como int(v) faria (trunca os reais e recusa nan/inf)'''
+    if dados.dtype.kind == 'f':
+        if not np.all(np.isfinite(dados)):
+            raise ValueError('cannot convert float NaN or infinity to integer')
+        dados = np.trunc(dados)
+    return dados
+
+
+def _formata_bloco(bloco, int_float):
+    '''Formata um bloco de valores exatamente como str(int(v)) ou str(float(v)) fariam, um valor por linha'''
+    if int_float == 'int':
+        # int() de nan/inf levanta erro: mantem o mesmo comportamento da escrita valor a valor
+        return _formata_inteiros(_valores_inteiros(bloco).astype(np.int64))
+
+    if bloco.dtype not in (np.float32, np.float64):
+        bloco = bloco.astype(np.float64)
+    # tolist devolve float do python, cuja str() e identica a da escrita valor a valor
+    return _formata_reais(np.ascontiguousarray(bloco))
+
+
+def escreve_rst_ascii(arquivo, dados, int_float, valores_por_bloco=VALORES_POR_BLOCO):
+    '''Escreve uma matriz no formato .rst ascii (um valor por linha, percorrendo linha a linha)
+        arquivo = diretorio do arquivo rst ascii (sera criado)
+        dados = matriz (nlin, ncol) lida do raster
+        int_float = 'int' ou 'float': define a formatacao dos valores'''
+    escreve_rst_ascii_blocos(arquivo, [dados], int_float, valores_por_bloco)
+
+
+def escreve_rst_ascii_blocos(arquivo, blocos, int_float, valores_por_bloco=VALORES_POR_BLOCO):
+    '''Escreve no formato .rst ascii uma sequencia de faixas de linhas inteiras (ex.: lidas aos poucos do raster),
+        sem manter a matriz completa em memoria
+        blocos = iteravel de matrizes (linhas, ncol), na ordem das linhas do raster'''
+    _valida_tipo(int_float)
+
+    with open(arquivo, 'w') as arquivo_ascii:
+        for dados in blocos:
+            dados = np.asarray(dados)
+            if dados.ndim == 1:
+                dados = dados.reshape(1, -1)
+            nlin = dados.shape[0]
+            ncol = dados.shape[1]
+
+            # Agrupa linhas inteiras da matriz em cada bloco formatado
+            linhas_por_bloco = max(1, valores_por_bloco // max(ncol, 1))
+            for lin in range(0, nlin, linhas_por_bloco):
+                bloco = dados[lin:lin + linhas_por_bloco].ravel()
+                if bloco.size:
+                    arquivo_ascii.write(_formata_bloco(bloco, int_float))
+
+
+def le_rst_ascii(arquivo, nlin, ncol, file_type, linhas_cabecalho=0, dtype=np.float64, bytes_por_leitura=BYTES_POR_LEITURA):
+    '''Le um arquivo .rst ascii (um valor por linha) diretamente para uma matriz pre-alocada
+        arquivo = diretorio do arquivo rst ascii
+        nlin, ncol = dimensoes esperadas da matriz (rdc_vars.nlin, rdc_vars.ncol)
+        file_type = 'int' ou 'float': define como os valores sao interpretados
+        linhas_cabecalho = quantidade de linhas ignoradas no inicio do arquivo'''
+    _valida_tipo(file_type)
+
+    total = nlin * ncol
+    valores = np.empty(total, dtype=dtype)
+    tipo_leitura = np.int64 if file_type == 'int' else np.float64
+    pos = 0
+
+    with open(arquivo, 'r') as arquivo_ascii:
+        for _ in range(linhas_cabecalho):
+            arquivo_ascii.readline()
+
+        while True:
+            linhas = arquivo_ascii.readlines(bytes_por_leitura)
+            if not linhas:
+                break
+
+            try:
+                bloco = np.array(linhas, dtype=tipo_leitura)
+            except ValueError:
+                # Linhas em branco (ex.: no final do arquivo) sao ignoradas; qualquer outro texto invalido gera erro
+                linhas = [linha for linha in linhas if linha.strip()]
+                bloco = np.array(linhas, dtype=tipo_leitura)
+
+            if pos + bloco.size > total:
+                raise ValueError(
+                    f"File '{arquivo}' has more values than expected: "
+                    f"the raster has {nlin} rows x {ncol} columns = {total} pixels.")
+
+            valores[pos:pos + bloco.size] = bloco
+            pos += bloco.size
+
+    if pos != total:
+        raise ValueError(
+            f"File '{arquivo}' has {pos} values, but the raster has "
+            f"{nlin} rows x {ncol} columns = {total} pixels.")
+
+    return valores.reshape(nlin, ncol)
+
+
+def tipo_binario(dados, int_float):
+    '''Define o menor tipo binario que representa os dados sem perdas: int16/int32 para inteiros e float32 para reais'''
+    _valida_tipo(int_float)
+    if int_float == 'float':
+        return 'float32'
+
+    dados = _valores_inteiros(np.asarray(dados))
+    if dados.size == 0:
+        return 'int16'
+    return tipo_binario_limites(dados.min(), dados.max(), int_float)
+
+
+def tipo_binario_limites(vmin, vmax, int_float):
+    '''Define o menor tipo binario a partir dos valores minimo e maximo dos dados'''
+    _valida_tipo(int_float)
+    if int_float == 'float':
+        return 'float32'
+
+    for nome in ('int16', 'int32'):
+        limites = np.iinfo(TIPOS_BINARIOS[nome])
+        if limites.min <= vmin and vmax <= limites.max:
+            return nome
+    raise ValueError(f'Values between {vmin} and {vmax} do not fit in a 32-bit integer raster.')
+
+
+def escreve_rst_binario(arquivo, dados, int_float):
+    '''Escreve uma matriz no formato .rst binario (vetor little-endian continuo, percorrendo linha a linha)
+        arquivo = diretorio do arquivo rst binario (sera criado)
+        dados = matriz (nlin, ncol) lida do raster
+        int_float = 'int' ou 'float': define o tipo gravado
+        Retorna o nome do tipo gravado (int16, int32 ou float32), que deve ser declarado no .rdc'''
+    dados = np.asarray(dados)
+    nome_tipo = tipo_binario(dados, int_float)
+    escreve_rst_binario_blocos(arquivo, [dados], int_float, nome_tipo)
+    return nome_tipo
+
+
+def escreve_rst_binario_blocos(arquivo, blocos, int_float, data_type):
+    '''Escreve no formato .rst binario uma sequencia de faixas de linhas inteiras, sem manter a matriz completa em memoria
+        blocos = iteravel de matrizes (linhas, ncol), na ordem das linhas do raster
+        data_type = tipo gravado (int16, int32 ou float32); valores inteiros fora do tipo geram erro'''
+    _valida_tipo(int_float)
+    tipo = TIPOS_BINARIOS[data_type]
+
+    with open(arquivo, 'wb') as arquivo_bin:
+        for dados in blocos:
+            dados = np.asarray(dados)
+            if int_float == 'int':
+                dados = _valores_inteiros(dados)
+                if dados.size and tipo.kind == 'i':
+                    limites = np.iinfo(tipo)
+                    if dados.min() < limites.min or dados.max() > limites.max:
+                        raise ValueError(
+                            f'Values between {dados.min()} and {dados.max()} do not fit in {data_type}.')
+            np.ascontiguousarray(dados, dtype=tipo).tofile(arquivo_bin)
+
+
+def le_rst_binario(arquivo, nlin, ncol, data_type, dtype=np.float64):
+    '''Le um arquivo .rst binario para uma matriz (nlin, ncol)
+        arquivo = diretorio do arquivo rst binario
+        nlin, ncol = dimensoes esperadas da matriz (rdc_vars.nlin, rdc_vars.ncol)
+        data_type = tipo declarado no .rdc (int16, int32 ou float32)'''
+    if data_type not in TIPOS_BINARIOS:
+        raise ValueError(
+            f"Invalid binary data type '{data_type}': use {', '.join(TIPOS_BINARIOS)}.")
+
+    tipo = TIPOS_BINARIOS[data_type]
+    total = nlin * ncol
+    tamanho = os.path.getsize(arquivo)
+    if tamanho != total * tipo.itemsize:
+        raise ValueError(
+            f"File '{arquivo}' has {tamanho} bytes, but the raster has {nlin} rows x {ncol} columns = "
+            f"{total} pixels of {data_type} ({total * tipo.itemsize} bytes).")
+
+    valores = np.fromfile(arquivo, dtype=tipo, count=total)
+    return valores.astype(dtype, copy=False).reshape(nlin, ncol)
+
+
+def le_rdc(arquivo):
+    '''Le um arquivo .rdc (linhas chave,valor) e retorna um dicionario; o cabecalho sem virgula e ignorado'''
+    informacoes = {}
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_rdc:
+        for linha in arquivo_rdc:
+            chave, separador, valor = linha.strip().partition(',')
+            if separador:
+                informacoes[chave.strip()] = valor.strip()
+    return informacoes
+
+
+def le_rst(arquivo, nlin, ncol, file_type, dtype=np.float64):
+    '''Le um arquivo .rst no formato declarado no .rdc de mesmo nome (file_format e data_type).
+        Sem .rdc, ou sem a chave file_format, o arquivo e lido como ascii'''
+    arquivo_rdc = os.path.splitext(arquivo)[0] + '.rdc'
+    informacoes = le_rdc(arquivo_rdc) if os.path.isfile(arquivo_rdc) else {}
+
+    formato = informacoes.get('file_format', FORMATO_ASCII)
+    if formato == FORMATO_BINARIO:
+        data_type = informacoes.get('data_type', 'int32' if file_type == 'int' else 'float32')
+        return le_rst_binario(arquivo, nlin, ncol, data_type, dtype=dtype)
+    if formato != FORMATO_ASCII:
+        raise ValueError(f"File '{arquivo_rdc}' declares an unknown file_format '{formato}'.")
+    return le_rst_ascii(arquivo, nlin, ncol, file_type, dtype=dtype)
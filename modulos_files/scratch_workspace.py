@@ -0,0 +1,236 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE RUN WORKSPACES \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the scratch folders of the engine runs. Each run writes its converted inputs,
+configuration files, progress file and outputs in its own folder, created inside a scratch root that can point to a
+fast local disk (tmpfs, SSD): two runs never share a file, so they can execute at the same time. The folders are removed
+in a background thread according to a retention policy, which also removes the folders left behind by crashed runs.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Variavel de ambiente com a pasta raiz das areas de trabalho (ex.: /dev/shm/hidropixel ou uma pasta em um SSD local)
+VARIAVEL_RAIZ = 'HIDROPIXEL_SCRATCH'
+
+# Arquivo que identifica uma area de trabalho e guarda o seu estado
+ARQUIVO_ESTADO = '.hidropixel_run'
+ESTADO_EXECUTANDO = 'running'
+ESTADO_CONCLUIDO = 'done'
+ESTADO_FALHOU = 'failed'
+
+# Consulta do estado de um processo no Windows (OpenProcess / GetExitCodeProcess)
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+
+# Subpastas usadas pelas rotinas (mapas da chuva interpolada, hidrogramas e tempos de viagem de cada POI)
+SUBPASTAS = ('maps', 'hydrographs', 'tv_for_each_poi')
+
+# Politica de retencao das areas de trabalho:
+#   manter_concluidas = True mantem as areas das execucoes concluidas (por padrao sao removidas ao fim da execucao)
+#   manter_falhas = quantidade de areas de execucoes com falha (ou canceladas) mantidas para consulta, as mais recentes
+#   idade_maxima = idade (s) a partir da qual as areas sao removidas, inclusive as abandonadas por execucoes interrompidas
+#   (as areas no estado running cujo processo ainda esta ativo nunca sao removidas)
+PoliticaRetencao = namedtuple('PoliticaRetencao', 'manter_concluidas manter_falhas idade_maxima',
+                              defaults=(False, 3, 24 * 3600.0))
+
+
+def raiz_trabalho(raiz=None, padrao=None):
+    '''Retorna a pasta raiz das areas de trabalho: a raiz informada, a variavel HIDROPIXEL_SCRATCH, a pasta padrao ou a
+        pasta hidropixel na pasta temporaria do sistema (nesta ordem)'''
+    return raiz or os.environ.get(VARIAVEL_RAIZ) or padrao or os.path.join(tempfile.gettempdir(), 'hidropixel')
+
+
+class AreaTrabalho:
+    """
+    This class is the scratch folder of one engine run. The state file marks the folder as a Hidropixel workspace:
+    folders without it are never removed by the cleanup.
+    """
+
+    def __init__(self, pasta):
+        '''pasta = diretorio da area de trabalho'''
+        self.pasta = pasta
+
+    @classmethod
+    def cria(cls, raiz, modulo):
+        '''Cria uma nova area de trabalho vazia para uma execucao do modulo na pasta raiz'''
+        os.makedirs(raiz, exist_ok=True)
+        area = cls(tempfile.mkdtemp(prefix=f"{modulo}_{time.strftime('%Y%m%d-%H%M%S')}_", dir=raiz))
+        for subpasta in SUBPASTAS:
+            os.makedirs(area.caminho(subpasta))
+        area.define_estado(ESTADO_EXECUTANDO)
+        return area
+
+    def caminho(self, *partes):
+        '''Retorna o caminho de um arquivo (ou subpasta) da area de trabalho'''
+        return os.path.join(self.pasta, *partes)
+
+    def copia_executavel(self, executavel):
+        '''Copia uma rotina externa (vb) para a area de trabalho: a rotina le os arquivos de configuracao da sua pasta'''
+        destino = self.caminho(os.path.basename(executavel))
+        shutil.copy2(executavel, destino)
+        return destino
+
+    def define_estado(self, estado):
+        '''Grava o estado da execucao (e o pid do processo) no arquivo de estado da area'''
+        with open(self.caminho(ARQUIVO_ESTADO), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'{estado},{os.getpid()}')
+
+    @property
+    def estado(self):
+        '''Estado da execucao (running, done ou failed); None se a pasta nao for uma area de trabalho'''
+        return le_estado(self.pasta)
+
+
+def le_estado(pasta):
+    '''Le o estado de uma area de trabalho; None se a pasta nao tiver o arquivo de estado'''
+    return le_arquivo_estado(pasta)[0]
+
+
+def le_arquivo_estado(pasta):
+    '''Le o arquivo de estado de uma area de trabalho. Retorna (estado, pid do processo da execucao); (None, None) se a
+        pasta nao tiver o arquivo de estado'''
+    try:
+        with open(os.path.join(pasta, ARQUIVO_ESTADO), 'r', encoding='utf-8') as arquivo:
+            estado, _, pid = arquivo.read().partition(',')
+    except OSError:
+        return None, None
+    try:
+        return estado, int(pid)
+    except ValueError:
+        return estado, None
+
+
+def processo_ativo(pid):
+    '''Verifica se o processo pid ainda esta em execucao (nesta maquina)'''
+    if pid is None or pid <= 0:
+        return False
+    if os.name == 'nt':
+        # No Windows, os.kill encerraria o processo: o estado e consultado pela API do sistema
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        processo = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not processo:
+            return False
+        try:
+            codigo = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(processo, ctypes.byref(codigo))) and codigo.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(processo)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # O processo existe, mas pertence a outro usuario
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def areas_expiradas(raiz, politica=PoliticaRetencao(), agora=None):
+    '''Retorna as areas de trabalho da pasta raiz que devem ser removidas segundo a politica de retencao'''
+    agora = time.time() if agora is None else agora
+    try:
+        nomes = os.listdir(raiz)
+    except OSError:
+        return []
+
+    expiradas, falhas = [], []
+    for nome in nomes:
+        pasta = os.path.join(raiz, nome)
+        estado, pid = le_arquivo_estado(pasta)
+        try:
+            idade = agora - os.path.getmtime(os.path.join(pasta, ARQUIVO_ESTADO))
+        except OSError:
+            # Nao e uma area de trabalho (ou acabou de ser removida por outra execucao)
+            continue
+        if estado == ESTADO_EXECUTANDO and processo_ativo(pid):
+            # Execucao em andamento (ainda que longa): a area nunca e removida enquanto o processo estiver ativo
+            continue
+        if idade > politica.idade_maxima:
+            # Inclui as areas que ficaram no estado running: o processo da execucao terminou sem finalizar a area
+            expiradas.append(pasta)
+        elif estado == ESTADO_CONCLUIDO and not politica.manter_concluidas:
+            expiradas.append(pasta)
+        elif estado == ESTADO_FALHOU:
+            falhas.append((idade, pasta))
+
+    # Das areas com falha, apenas as mais recentes sao mantidas
+    falhas.sort()
+    expiradas.extend(pasta for _, pasta in falhas[max(int(politica.manter_falhas), 0):])
+    return expiradas
+
+
+def remove_area(pasta):
+    '''Remove uma area de trabalho. O arquivo de estado e o ultimo a ser apagado: se algum arquivo estiver em uso, a
+        pasta continua identificada e e removida em uma proxima limpeza'''
+    for nome in os.listdir(pasta):
+        if nome == ARQUIVO_ESTADO:
+            continue
+        caminho = os.path.join(pasta, nome)
+        if os.path.isdir(caminho) and not os.path.islink(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)
+        else:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+    if os.listdir(pasta) == [ARQUIVO_ESTADO]:
+        os.remove(os.path.join(pasta, ARQUIVO_ESTADO))
+        os.rmdir(pasta)
+        return True
+    return False
+
+
+class LimpezaAreas:
+    """
+    This class removes the workspaces of a scratch root in a background thread, so the interface (or the next run) does
+    not wait for the files to be deleted. The removals run one at a time, in the order they were requested.
+    """
+
+    def __init__(self, raiz, politica=PoliticaRetencao()):
+        '''
+        raiz = pasta raiz das areas de trabalho
+        politica = PoliticaRetencao aplicada a cada limpeza
+        '''
+        self.raiz = raiz
+        self.politica = politica
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hidropixel-cleanup')
+
+    def nova_area(self, modulo):
+        '''Cria a area de trabalho de uma nova execucao do modulo'''
+        return AreaTrabalho.cria(self.raiz, modulo)
+
+    def libera(self, area, sucesso):
+        '''Finaliza a area de trabalho de uma execucao e agenda a limpeza da pasta raiz'''
+        area.define_estado(ESTADO_CONCLUIDO if sucesso else ESTADO_FALHOU)
+        return self.agenda()
+
+    def agenda(self):
+        '''Agenda a remocao das areas expiradas; retorna o Future com a lista das pastas removidas'''
+        return self._executor.submit(self.limpa)
+
+    def limpa(self):
+        '''Remove as areas expiradas segundo a politica de retencao e retorna a lista das pastas removidas'''
+        removidas = []
+        for pasta in areas_expiradas(self.raiz, self.politica):
+            try:
+                if remove_area(pasta):
+                    removidas.append(pasta)
+            except OSError:
+                # Pasta removida por outra execucao (ou em uso): tentada novamente na proxima limpeza
+                continue
+        return removidas
+
+    def encerra(self, aguardar=True):
+        '''Encerra a thread de limpeza (aguardar = True espera as remocoes agendadas)'''
+        self._executor.shutdown(wait=aguardar)
@@ -0,0 +1,291 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE NATIVE TRAVEL TIME ENGINE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for the native (NumPy) version of the flow travel time routine. It reads the same
+config, parameter, table and .rst files written for travel_time.exe and computes, for each watershed pixel, the travel
+time to the outlet: sheet flow (NRCS TR-55) over the first meters of the path, shallow concentrated flow on the
+hillslopes and Manning flow in the river segments. The times are accumulated along the flow paths with the
+topologically ordered downstream graph (flow_graph.py).
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import os
+
+import numpy as np
+
+from .engine_io import dimensoes_rst, escreve_mapa, le_config_arquivos, le_mapa, le_parametros, parametro
+from .engine_progress import ProgressoMotor
+from .flow_graph import GrafoFluxo, le_codigos_direcoes
+
+# Coeficiente da equacao do escoamento em lamina (TR-55) com comprimento em m, P24 em mm e tempo em horas
+COEFICIENTE_LAMINA = 0.0913
+
+# Etapas informadas no arquivo de andamento
+ETAPAS = ('flow graph', 'travel time', 'writing maps', 'points of interest')
+
+# Nomes das entradas, parametros e saidas nos arquivos de configuracao
+ENTRADA_BACIA = 'watershed'
+ENTRADA_MDE = 'DEM'
+ENTRADA_DIRECOES = 'Flow_Dir'
+ENTRADA_AREA = 'DA_km2'
+ENTRADA_REDE = 'drainage'
+ENTRADA_SEGMENTOS = 'river_segments'
+ENTRADA_CARACTERISTICAS = 'segment_characteristics'
+ENTRADA_USO = 'LULC'
+ENTRADA_RUGOSIDADE = 'surface_roughness'
+ENTRADA_PARAMETROS = 'parameters'
+PARAMETRO_CURVA_REGIONAL = 'Regional curve method is checked'
+PARAMETRO_MANNING_RIO = 'Manning coefficient for river segments without cross-section information'
+PARAMETRO_LAMINA = 'Sheet flow lenght (m)'
+PARAMETRO_P24 = 'P24 - Rainfall depth for 24-hour duration and 2-year return period (mm)'
+PARAMETROS_CURVA = ('Regional curve coefficient c', 'Regional curve coefficient d',
+                    'Regional curve coefficient g', 'Regional curve coefficient h')
+PARAMETRO_COMPRIMENTO = 'Maximum river segment lenght for river segments without cross-section information (m)'
+PARAMETRO_DECLIVIDADE = 'Minimum slope'
+SAIDA_DECLIVIDADE = 'Slope'
+SAIDA_SEGMENTOS = 'river_segments'
+SAIDA_TABELA = 'Hydraulic_radius-roughness_and_slope'
+SAIDA_AREA = 'River_cross-sectional_area'
+SAIDA_LARGURA = 'River_bankfull_width'
+SAIDA_TEMPO = 'Flow_travel_time'
+
+
+def le_tabela(arquivo, colunas):
+    '''Le uma tabela (cabecalho e linhas separadas por virgula) e retorna um dicionario codigo -> valores das colunas'''
+    tabela = {}
+    with open(arquivo, 'r', encoding='utf-8') as arquivo_txt:
+        arquivo_txt.readline()
+        for linha in arquivo_txt:
+            partes = linha.strip().split(',')
+            if len(partes) > max(colunas) and partes[0] != '':
+                tabela[int(float(partes[0]))] = tuple(float(partes[coluna]) for coluna in colunas)
+    return tabela
+
+
+def valores_por_classe(classes, tabela, nome):
+    '''Retorna, para cada pixel, os valores da tabela da sua classe (matriz pixels x colunas)'''
+    codigos = np.array(sorted(tabela))
+    valores = np.array([tabela[codigo] for codigo in codigos])
+    indice = np.searchsorted(codigos, classes)
+    indice = np.minimum(indice, codigos.size - 1)
+    faltando = codigos[indice] != classes
+    if np.any(faltando):
+        raise ValueError(f'The {nome} table has no values for the classes {sorted(set(classes[faltando].tolist()))}.')
+    return valores[indice]
+
+
+def gera_segmentos(grafo, rio, segmentos, comprimento_maximo):
+    '''Divide a rede de drenagem sem segmento informado em trechos: um novo trecho comeca nas nascentes, nas confluencias,
+        no pixel de jusante de um trecho informado e sempre que o comprimento maximo e ultrapassado
+        Retorna os identificadores dos trechos de cada pixel (0 fora da rede)'''
+    segmentos = segmentos.copy()
+    gerar = rio & (segmentos == 0)
+    if not np.any(gerar):
+        return segmentos
+
+    # Pixel de montante na rede: so e herdado quando e unico (fora das confluencias)
+    jusante = grafo.jusante
+    liga = rio & (jusante >= 0)
+    liga[liga] = rio[jusante[liga]]
+    n_montante = np.bincount(jusante[liga], minlength=grafo.n)
+    montante = np.full(grafo.n, -1, dtype=np.int64)
+    montante[jusante[liga]] = np.flatnonzero(liga)
+
+    distancia = np.zeros(grafo.n)
+    proximo = int(segmentos.max(initial=0)) + 1
+    for nivel in grafo.niveis:
+        selecao = nivel[gerar[nivel]]
+        if not selecao.size:
+            continue
+        anterior = montante[selecao]
+        herda = (n_montante[selecao] == 1) & gerar[np.maximum(anterior, 0)]
+        acumulada = distancia[np.maximum(anterior, 0)] + grafo.comprimento[selecao]
+        herda &= acumulada <= comprimento_maximo
+
+        segmentos[selecao[herda]] = segmentos[anterior[herda]]
+        distancia[selecao[herda]] = acumulada[herda]
+        novos = selecao[~herda]
+        segmentos[novos] = np.arange(proximo, proximo + novos.size)
+        distancia[novos] = grafo.comprimento[novos]
+        proximo += novos.size
+    return segmentos
+
+
+def tempo_lamina(grafo, rio, tempo_pixel, declividade, manning, comprimento_lamina, p24):
+    '''Tempo (s) do escoamento em lamina nos primeiros metros do caminho de cada pixel de encosta, e o tempo de
+        escoamento concentrado que ele substitui (trecho ja incluido no tempo acumulado ao longo do caminho)'''
+    encosta = np.flatnonzero(~rio)
+    percorrido = np.zeros(encosta.size)
+    substituido = np.zeros(encosta.size)
+    atual = encosta.copy()
+    ativo = np.ones(encosta.size, dtype=bool)
+
+    # Percorre o caminho de todos os pixels ao mesmo tempo ate completar o comprimento ou alcancar a rede
+    while np.any(ativo):
+        indice = np.flatnonzero(ativo)
+        pixel = atual[indice]
+        fracao = np.minimum(comprimento_lamina - percorrido[indice], grafo.comprimento[pixel])
+        percorrido[indice] += fracao
+        substituido[indice] += tempo_pixel[pixel] * fracao / grafo.comprimento[pixel]
+
+        proximo = grafo.jusante[pixel]
+        continua = (percorrido[indice] < comprimento_lamina) & (proximo >= 0)
+        continua[continua] = ~rio[proximo[continua]]
+        atual[indice[continua]] = proximo[continua]
+        ativo[indice[~continua]] = False
+
+    tempo = np.zeros(grafo.n)
+    horas = COEFICIENTE_LAMINA * (manning[encosta] * percorrido) ** 0.8 / (
+        np.sqrt(p24) * declividade[encosta] ** 0.4)
+    tempo[encosta] = horas * 3600.0 - substituido
+    return tempo
+
+
+def executa_travel_time(arquivo_entradas, arquivo_saidas, arquivo_direcoes, arquivo_exutorios=None,
+                        pasta_exutorios=None, arquivo_progresso=None, cancelado=None):
+    '''Executa a rotina flow travel time a partir dos arquivos de configuracao de entradas e saidas
+        arquivo_entradas = input_files_config_flow_tt.txt
+        arquivo_saidas = output_files_config_flow_tt.txt
+        arquivo_direcoes = flow_directions_code.txt
+        arquivo_exutorios = exutorios.txt com (lin, col) dos pontos de interesse (opcional)
+        pasta_exutorios = pasta dos mapas de tempo de viagem e sub-bacia de cada ponto de interesse
+        arquivo_progresso = arquivo onde o andamento de cada etapa e escrito (opcional, ver engine_progress)
+        cancelado = funcao que retorna True quando o usuario cancela a execucao (o motor para na etapa em andamento)'''
+    progresso = ProgressoMotor(arquivo_progresso, ETAPAS, cancelado=cancelado)
+    progresso.etapa('flow graph')
+    entradas, formato_troca = le_config_arquivos(arquivo_entradas)
+    saidas, _ = le_config_arquivos(arquivo_saidas)
+    parametros = le_parametros(entradas[ENTRADA_PARAMETROS])
+    declividade_minima = parametro(parametros, PARAMETRO_DECLIVIDADE)
+
+    arquivo_bacia = entradas[ENTRADA_BACIA]
+    _, _, rdc = dimensoes_rst(arquivo_bacia)
+    dx = abs(float(rdc.get('resolution (X)', rdc['resolution'])))
+    dy = abs(float(rdc.get('resolution (Y)', rdc['resolution'])))
+
+    bacia = le_mapa(arquivo_bacia, 'int') == 1
+    grafo = GrafoFluxo(le_mapa(entradas[ENTRADA_DIRECOES], 'int'), bacia, le_codigos_direcoes(arquivo_direcoes),
+                       dx, dy)
+    pixels = grafo.pixels
+    progresso.avanca(1)
+
+    def valores_bacia(nome, file_type):
+        return le_mapa(entradas[nome], file_type).ravel()[pixels]
+
+    # Declividade de cada pixel ate o pixel de jusante (nos exutorios, a declividade minima)
+    progresso.etapa('travel time')
+    cota = valores_bacia(ENTRADA_MDE, 'float')
+    com_jusante = grafo.jusante >= 0
+    declividade = np.full(grafo.n, declividade_minima)
+    declividade[com_jusante] = (cota[com_jusante] - cota[grafo.jusante[com_jusante]]) / grafo.comprimento[com_jusante]
+    declividade = np.maximum(declividade, declividade_minima)
+
+    # Trechos de rio: informados pelo usuario e/ou gerados na rede sem informacao
+    rio = valores_bacia(ENTRADA_REDE, 'int') == 1
+    segmentos = np.zeros(grafo.n, dtype=np.int64)
+    if ENTRADA_SEGMENTOS in entradas and os.path.isfile(entradas[ENTRADA_SEGMENTOS]):
+        segmentos[rio] = np.maximum(valores_bacia(ENTRADA_SEGMENTOS, 'int')[rio], 0)
+    comprimento_maximo = parametros.get(PARAMETRO_COMPRIMENTO, 0) or np.inf
+    segmentos = gera_segmentos(grafo, rio, segmentos, comprimento_maximo)
+    caracteristicas = {}
+    if ENTRADA_CARACTERISTICAS in entradas and os.path.isfile(entradas[ENTRADA_CARACTERISTICAS]):
+        caracteristicas = le_tabela(entradas[ENTRADA_CARACTERISTICAS], (1, 2, 3))
+
+    # Secao transversal pelas curvas regionais: A = c DA^d, B = g DA^h e secao retangular
+    area_secao = np.zeros(grafo.n)
+    largura = np.zeros(grafo.n)
+    raio_pixel = np.zeros(grafo.n)
+    if parametros.get(PARAMETRO_CURVA_REGIONAL, 0) == 1:
+        c, d, g, h = (parametro(parametros, nome) for nome in PARAMETROS_CURVA)
+        area_drenagem = valores_bacia(ENTRADA_AREA, 'float')[rio]
+        area_secao[rio] = c * area_drenagem ** d
+        largura[rio] = g * area_drenagem ** h
+        profundidade = area_secao[rio] / largura[rio]
+        raio_pixel[rio] = area_secao[rio] / (largura[rio] + 2 * profundidade)
+
+    # Caracteristicas de cada trecho: tabela do usuario ou valores medios dos pixels (ponderados pelo comprimento)
+    ids = np.unique(segmentos[rio])
+    posicao = np.searchsorted(ids, segmentos[rio])
+    comprimento_trecho = np.bincount(posicao, weights=grafo.comprimento[rio], minlength=ids.size)
+    raio_trecho = np.bincount(posicao, weights=raio_pixel[rio] * grafo.comprimento[rio], minlength=ids.size) / \
+        comprimento_trecho
+    declividade_trecho = np.maximum(np.bincount(
+        posicao, weights=declividade[rio] * grafo.comprimento[rio], minlength=ids.size) / comprimento_trecho,
+        declividade_minima)
+    manning_trecho = np.full(ids.size, parametros.get(PARAMETRO_MANNING_RIO, 0.0))
+    for i, trecho in enumerate(ids):
+        if trecho in caracteristicas:
+            raio_trecho[i], manning_trecho[i], declividade_trecho[i] = caracteristicas[trecho]
+    if np.any(raio_trecho <= 0):
+        raise ValueError(
+            'River segments without cross-section information need the regional curve method: segments '
+            f'{ids[raio_trecho <= 0].tolist()[:10]}.')
+
+    # Velocidades (m/s): Manning nos trechos de rio e escoamento concentrado (V = k S^0.5) nas encostas
+    uso = valores_por_classe(valores_bacia(ENTRADA_USO, 'int'), le_tabela(entradas[ENTRADA_RUGOSIDADE], (2, 3)),
+                             'surface roughness')
+    velocidade = uso[:, 1] * np.sqrt(declividade)
+    velocidade[rio] = raio_trecho[posicao] ** (2 / 3) * np.sqrt(declividade_trecho[posicao]) / manning_trecho[posicao]
+    if np.any(velocidade <= 0):
+        raise ValueError('The surface roughness or the river segment tables produce non-positive flow velocities.')
+
+    # Tempo de travessia de cada pixel, acumulado ate o exutorio, e correcao do escoamento em lamina nas encostas
+    tempo_pixel = grafo.comprimento / velocidade
+    tempo_acumulado = grafo.acumula_jusante(tempo_pixel)
+    tempo_viagem = tempo_acumulado + tempo_lamina(
+        grafo, rio, tempo_pixel, declividade, uso[:, 0], parametro(parametros, PARAMETRO_LAMINA),
+        parametro(parametros, PARAMETRO_P24))
+    progresso.avanca(1)
+
+    # Mapas de saida (tempo de viagem em minutos)
+    mapas = (
+        (SAIDA_DECLIVIDADE, declividade, 'float'),
+        (SAIDA_SEGMENTOS, segmentos, 'int'),
+        (SAIDA_AREA, area_secao, 'float'),
+        (SAIDA_LARGURA, largura, 'float'),
+        (SAIDA_TEMPO, tempo_viagem / 60.0, 'float'),
+    )
+    progresso.etapa('writing maps', len(mapas))
+    for numero, (nome, valores, file_type) in enumerate(mapas, start=1):
+        if nome in saidas:
+            escreve_mapa(saidas[nome], grafo.mapa(valores), file_type, formato_troca, arquivo_bacia)
+        progresso.avanca(numero)
+
+    if SAIDA_TABELA in saidas:
+        with open(saidas[SAIDA_TABELA], 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write('Trecho,Rh (m),n,S (m/m)\n')
+            for trecho, raio, manning, declive in zip(ids, raio_trecho, manning_trecho, declividade_trecho):
+                arquivo_txt.write(f'{trecho},{raio},{manning},{declive}\n')
+
+    if arquivo_exutorios and pasta_exutorios and os.path.isfile(arquivo_exutorios):
+        escreve_exutorios(grafo, tempo_viagem, tempo_acumulado - tempo_pixel, arquivo_exutorios, pasta_exutorios,
+                          formato_troca, arquivo_bacia, progresso)
+
+
+def escreve_exutorios(grafo, tempo_viagem, tempo_jusante, arquivo_exutorios, pasta_exutorios, formato_troca,
+                      arquivo_bacia, progresso=None):
+    '''Escreve, para cada ponto de interesse (exutorios.txt), a sub-bacia e o tempo de viagem (min) ate o ponto'''
+    with open(arquivo_exutorios, 'r', encoding='utf-8') as arquivo_txt:
+        linhas = [linha.strip() for linha in arquivo_txt if linha.strip()]
+    if not linhas or int(linhas[0]) == 0:
+        return
+    progresso = progresso or ProgressoMotor()
+    progresso.etapa('points of interest', int(linhas[0]))
+
+    os.makedirs(pasta_exutorios, exist_ok=True)
+    ncol = grafo.forma[1]
+    for numero, linha in enumerate(linhas[2:2 + int(linhas[0])], start=1):
+        lin, col = (int(valor) for valor in linha.split(',')[:2])
+        pixel = grafo.posicao[lin * ncol + col] if 0 <= lin < grafo.forma[0] and 0 <= col < ncol else -1
+        if pixel < 0:
+            raise ValueError(f'Point of interest {numero} ({lin}, {col}) is outside the watershed.')
+
+        sub_bacia = grafo.drena_para(pixel)
+        tempo = np.where(sub_bacia, (tempo_viagem - tempo_jusante[pixel]) / 60.0, 0.0)
+        escreve_mapa(os.path.join(pasta_exutorios, f'sub_watershed_POI_{numero}.rst'),
+                     grafo.mapa(sub_bacia.astype(np.int32)), 'int', formato_troca, arquivo_bacia)
+        escreve_mapa(os.path.join(pasta_exutorios, f'travel_time_POI_{numero}.rst'),
+                     grafo.mapa(tempo), 'float', formato_troca, arquivo_bacia)
+        progresso.avanca(numero)
@@ -0,0 +1,122 @@
+"""
+\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\ MODULE FOR THE INTERPOLATION WEIGHTS CACHE \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+
+Objective: This file is responsible for storing the gauge-to-pixel weight matrices of the rainfall interpolation, so
+that the distances are not computed again while the rain gauges, the watershed grid and the interpolation method do not
+change. Each gauge file and watershed pair keeps only its latest matrix: the previous one is removed as soon as the
+gauges or the grid change.
+Author: João Vitor Dias
+Supervisor: Adriano Rolim
+
+"""
+# IMPORTING libs
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Nome do arquivo de indice salvo na pasta da cache
+ARQUIVO_INDICE = 'weights_index.json'
+
+
+class WeightsCache:
+    """
+    This class stores the interpolation weight matrices (.npy) indexed by the gauge coordinates, the watershed grid and
+    the interpolation method. The index keeps the latest key of each gauge file and watershed pair.
+    """
+
+    def __init__(self, pasta):
+        '''pasta = diretorio onde as matrizes de pesos sao armazenadas (sera criado)'''
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+        self._indice = self._carrega_indice()
+
+    @staticmethod
+    def origem(arquivo_postos, arquivo_bacia):
+        '''Identifica o par arquivo de postos e bacia: cada origem mantem apenas uma matriz armazenada'''
+        return '|'.join(os.path.normcase(os.path.abspath(arquivo)) for arquivo in (arquivo_postos, arquivo_bacia))
+
+    @staticmethod
+    def chave(coordenadas_postos, grade, pixels, *metodo):
+        '''Retorna a chave de uma matriz de pesos
+            coordenadas_postos = coordenadas (postos, 2) dos postos pluviometricos
+            grade = valores que definem a grade da bacia (linhas, colunas, origem e resolucao)
+            pixels = indices dos pixels da bacia
+            metodo = metodo de interpolacao e seus parametros (ex.: 'IDW', potencia)'''
+        resumo = hashlib.sha1()
+        resumo.update(np.ascontiguousarray(coordenadas_postos, dtype='<f8').tobytes())
+        resumo.update(np.ascontiguousarray(pixels, dtype='<i8').tobytes())
+        resumo.update(json.dumps([[str(valor) for valor in grade], [str(opcao) for opcao in metodo]]).encode('utf-8'))
+        return resumo.hexdigest()
+
+    def busca(self, origem, chave):
+        '''Retorna a matriz de pesos armazenada ou None. Uma chave diferente da armazenada para a origem indica que os
+            postos ou a grade mudaram: a entrada antiga e removida'''
+        with self._lock:
+            atual = self._indice.get(origem)
+            if atual is None:
+                return None
+            if atual != chave:
+                self._remove(origem)
+                self._salva_indice()
+                return None
+            try:
+                return np.load(self._arquivo(chave))
+            except (OSError, ValueError):
+                # Entrada corrompida (arquivo apagado ou incompleto): descarta
+                self._remove(origem)
+                self._salva_indice()
+                return None
+
+    def armazena(self, origem, chave, pesos):
+        '''Armazena a matriz de pesos da origem, substituindo a anterior'''
+        with self._lock:
+            if self._indice.get(origem, chave) != chave:
+                self._remove(origem)
+            # Escreve em arquivo temporario e substitui: um arquivo incompleto nunca e lido como entrada valida
+            arquivo = self._arquivo(chave)
+            with open(arquivo + '.tmp', 'wb') as arquivo_npy:
+                np.save(arquivo_npy, pesos)
+            os.replace(arquivo + '.tmp', arquivo)
+            self._indice[origem] = chave
+            self._salva_indice()
+
+    def limpa(self):
+        '''Apaga todas as matrizes armazenadas e retorna a quantidade de bytes liberados'''
+        with self._lock:
+            liberado = 0
+            for arquivo in os.listdir(self.pasta):
+                caminho = os.path.join(self.pasta, arquivo)
+                if os.path.isfile(caminho):
+                    liberado += os.path.getsize(caminho)
+                    os.remove(caminho)
+            self._indice = {}
+            return liberado
+
+    def _remove(self, origem):
+        chave = self._indice.pop(origem, None)
+        # A mesma matriz pode estar associada a outra origem (ex.: copia do arquivo de postos)
+        if chave is not None and chave not in self._indice.values() and os.path.isfile(self._arquivo(chave)):
+            os.remove(self._arquivo(chave))
+
+    def _arquivo(self, chave):
+        return os.path.join(self.pasta, f'{chave}.npy')
+
+    def _carrega_indice(self):
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo_json:
+                indice = json.load(arquivo_json)
+        except (OSError, ValueError):
+            return {}
+        # Mantem apenas as entradas cujos arquivos ainda existem
+        return {origem: chave for origem, chave in indice.items() if os.path.isfile(self._arquivo(chave))}
+
+    def _salva_indice(self):
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo_json:
+            json.dump(self._indice, arquivo_json)
+        os.replace(caminho + '.tmp', caminho)
@@ -0,0 +1,161 @@
+# coding=utf-8
+"""Rainfall event batch test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.batch_runner import executa_lote, lista_eventos
+from modulos_files.pipeline import executa_pipeline, main
+from modulos_files.rst_io import escreve_rst_ascii
+from modulos_files.scratch_workspace import PoliticaRetencao
+
+CN = np.array([[70.0, 75.0, 80.0, 85.0], [90.0, 95.0, 90.0, 85.0], [80.0, 75.0, 70.0, 65.0]])
+TEMPO = np.array([[25.0, 18.0, 12.0, 8.0], [20.0, 14.0, 8.0, 2.0], [25.0, 18.0, 12.0, 8.0]])
+
+# Eventos de chuva media na bacia ("Time(min),Rainfall(mm)")
+EVENTOS = {
+    'storm_a': 'Time(min),Rainfall(mm)\n10,5\n20,40\n30,10\n',
+    'storm_b': 'Time(min),Rainfall(mm)\n10,20\n20,60\n30,30\n40,5\n',
+    'storm_c': 'Time(min),Rainfall(mm)\n10,nan?\n',
+}
+
+
+class BatchRunnerTest(unittest.TestCase):
+    """Test the batch of rainfall events run in a pool of processes."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, *partes):
+        return os.path.join(self.pasta.name, *partes)
+
+    def escreve_mapa(self, nome, dados, file_type):
+        escreve_rst_ascii(self.caminho(nome), dados, file_type)
+        with open(self.caminho(nome.replace('.rst', '.rdc')), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,{dados.shape[0]}\nColumns,{dados.shape[1]}\nresolution,30.0\n')
+            rdc.write('Min_X,0.0\nMax_X,120.0\nMin_Y,0.0\nMax_Y,90.0\n')
+        return nome
+
+    def escreve_configuracao(self):
+        """JSON file of the excess rainfall and flow routing stages, with the first event as the areal rainfall."""
+        os.makedirs(self.caminho('eventos'))
+        for evento, conteudo in EVENTOS.items():
+            with open(self.caminho('eventos', f'{evento}.txt'), 'w', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo)
+        bacia = self.escreve_mapa('bacia.rst', np.ones((3, 4), dtype=int), 'int')
+        configuracao = {
+            'exchange_format': 'ascii',
+            'stages': {
+                'excess_rainfall': {
+                    'entradas': {'watershed': bacia, 'curve_number_map': self.escreve_mapa('cn.rst', CN, 'float'),
+                                 'Areal_averaged_rainfall': 'eventos/storm_a.txt'},
+                    'saidas': {'Excess hyetographs per pixel (mm)': 'saidas/excedente.bin',
+                               'Map of total excess rainfall (mm)': 'saidas/excedente_total.rst'}},
+                'flow_routing': {
+                    'entradas': {'watershed': bacia, 'flow_travel_time': self.escreve_mapa('tempo.rst', TEMPO, 'float'),
+                                 'excess_hyetographs': 'saidas/excedente.bin',
+                                 'total_excess_rainfall': 'saidas/excedente_total.rst'},
+                    'saidas': {'resulting_watershed_hydrograph': 'saidas/hidrograma.txt'},
+                    'discretizacao': 10, 'beta': 0.6},
+            },
+        }
+        arquivo = self.caminho('bacia.json')
+        with open(arquivo, 'w', encoding='utf-8') as arquivo_json:
+            json.dump(configuracao, arquivo_json)
+        return arquivo
+
+    def test_batch_of_events(self):
+        """Each event gives the same hydrograph as a sequential run; a failing event does not stop the others."""
+        arquivo = self.escreve_configuracao()
+        self.assertEqual([evento for evento, _ in lista_eventos([self.caminho('eventos'), self.caminho('eventos')])],
+                         ['storm_a', 'storm_b', 'storm_c', 'storm_a_2', 'storm_b_2', 'storm_c_2'])
+
+        saida = io.StringIO()
+        resultados = executa_lote(arquivo, [self.caminho('eventos')], self.caminho('resultados'),
+                                  self.caminho('temp'), processos=2, saida=saida)
+        self.assertEqual([resultado['event'] for resultado in resultados], ['storm_a', 'storm_b', 'storm_c'])
+        self.assertEqual([resultado['exit_code'] for resultado in resultados], [0, 0, 1])
+        self.assertEqual(len(saida.getvalue().splitlines()), 5)
+        # Apenas a area do evento com falha e mantida
+        self.assertEqual(os.listdir(self.caminho('temp')), [os.path.basename(resultados[2]['workspace'])])
+
+        # Tabela indexada por evento, exutorio e tempo
+        with open(self.caminho('resultados', 'hydrographs.csv'), 'r', encoding='utf-8') as tabela:
+            cabecalho = tabela.readline().strip().split(',')
+            linhas = [linha.strip().split(',') for linha in tabela]
+        self.assertEqual(cabecalho[:3], ['event', 'outlet', 'Time (min)'])
+        self.assertEqual({(linha[0], linha[1]) for linha in linhas}, {('storm_a', 'watershed'), ('storm_b', 'watershed')})
+
+        executa_pipeline(arquivo, self.caminho('temp'))
+        sequencial = np.loadtxt(self.caminho('saidas', 'hidrograma.txt'), skiprows=1, delimiter=',', ndmin=2)
+        lote = np.array([[float(linha[2]), float(linha[3])] for linha in linhas if linha[0] == 'storm_a'])
+        np.testing.assert_allclose(lote, sequencial[:, :2], atol=1e-5)
+
+        with open(self.caminho('resultados', 'summary.csv'), 'r', encoding='utf-8') as resumo:
+            resumo = [linha.rstrip('\n').split(',') for linha in resumo][1:]
+        self.assertEqual([linha[0] for linha in resumo], ['storm_a', 'storm_b', 'storm_c'])
+        picos = [float(linha[3]) for linha in resumo[:2]]
+        self.assertGreater(picos[1], picos[0])
+        self.assertAlmostEqual(picos[0], sequencial[:, 1].max(), places=5)
+        self.assertEqual(resumo[2][3], '')
+        self.assertTrue(resumo[2][5])
+
+    def test_failed_workspaces_kept(self):
+        """The workspaces of all failed events are kept until the batch ends, whatever the retention policy."""
+        arquivo = self.escreve_configuracao()
+        for evento in ('storm_d', 'storm_e'):
+            with open(self.caminho('eventos', f'{evento}.txt'), 'w', encoding='utf-8') as arquivo_txt:
+                arquivo_txt.write(EVENTOS['storm_c'])
+
+        resultados = executa_lote(arquivo, [self.caminho('eventos')], self.caminho('resultados'),
+                                  self.caminho('temp'), processos=1, politica=PoliticaRetencao(manter_falhas=1))
+        falhas = [os.path.basename(resultado['workspace']) for resultado in resultados if resultado['exit_code']]
+        self.assertEqual(len(falhas), 3)
+        self.assertEqual(sorted(os.listdir(self.caminho('temp'))), sorted(falhas))
+
+    def test_command_line(self):
+        """The --events option runs the batch; a configuration without flow routing is invalid."""
+        arquivo = self.escreve_configuracao()
+        relatorio = self.caminho('relatorio.json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main([arquivo, '--events', self.caminho('eventos', 'storm_b.txt'), '--workers', '1',
+                                   '--temp', self.caminho('temp'), '--report', relatorio]), 0)
+        self.assertTrue(os.path.isfile(self.caminho('batch_results', 'hydrographs.csv')))
+        with open(relatorio, 'r', encoding='utf-8') as arquivo_json:
+            self.assertEqual([evento['event'] for evento in json.load(arquivo_json)['events']], ['storm_b'])
+
+        with open(arquivo, 'r', encoding='utf-8') as arquivo_json:
+            configuracao = json.load(arquivo_json)
+        del configuracao['stages']['flow_routing']
+        with open(arquivo, 'w', encoding='utf-8') as arquivo_json:
+            json.dump(configuracao, arquivo_json)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main([arquivo, '--events', self.caminho('eventos')]), 2)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(BatchRunnerTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,100 @@
+# coding=utf-8
+"""Conversion cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import time
+import unittest
+
+from modulos_files.conversion_cache import ConversionCache
+
+GEOTRANSFORM = (500000.0, 30.0, 0.0, 9200000.0, 0.0, -30.0)
+
+
+class ConversionCacheTest(unittest.TestCase):
+    """Test the cache of converted .rst/.rdc files."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.cache = ConversionCache(os.path.join(self.pasta.name, 'cache'))
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def cria_arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.pasta.name, nome)
+        with open(caminho, 'w') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def converte(self, nome, conteudo):
+        """Writes a fake converted pair (.rst and .rdc) and returns the .rst path."""
+        self.cria_arquivo(nome.replace('.rst', '.rdc'), f'Raster Informations\nRows,{len(conteudo)}\n')
+        return self.cria_arquivo(nome, conteudo)
+
+    def test_hit_and_miss(self):
+        """A stored conversion is copied back while the source and options do not change."""
+        origem = self.cria_arquivo('bacia.tif', 'tif')
+        chave = self.cache.chave(origem, GEOTRANSFORM, 'int', 'n', 'ascii')
+        destino = os.path.join(self.pasta.name, 'Watershed.rst')
+        self.assertFalse(self.cache.busca(chave, destino))
+
+        self.cache.armazena(chave, self.converte('convertido.rst', '1\n2\n'))
+        self.assertTrue(self.cache.busca(chave, destino))
+        with open(destino) as rst, open(destino.replace('.rst', '.rdc')) as rdc:
+            self.assertEqual(rst.read(), '1\n2\n')
+            self.assertIn('Rows,4', rdc.read())
+
+        # Opcoes diferentes ou arquivo modificado geram outra chave
+        self.assertNotEqual(chave, self.cache.chave(origem, GEOTRANSFORM, 'float', 'n', 'ascii'))
+        self.assertNotEqual(chave, self.cache.chave(origem, GEOTRANSFORM, 'int', 'n', 'binary'))
+        os.utime(origem, ns=(0, 10 ** 9))
+        self.assertNotEqual(chave, self.cache.chave(origem, GEOTRANSFORM, 'int', 'n', 'ascii'))
+        self.assertIsNone(self.cache.chave(os.path.join(self.pasta.name, 'nao_existe.tif'), GEOTRANSFORM))
+
+    def test_lru_eviction(self):
+        """The least recently used entries are removed when the size limit is exceeded."""
+        cache = ConversionCache(os.path.join(self.pasta.name, 'pequena'), tamanho_maximo_mb=200 / (1024 * 1024))
+        rst = self.converte('convertido.rst', 'x' * 50)
+        destino = os.path.join(self.pasta.name, 'destino.rst')
+
+        for chave in ('a', 'b', 'c'):
+            cache.armazena(chave, rst)
+            time.sleep(0.01)
+        self.assertFalse(cache.busca('a', destino))
+        self.assertTrue(cache.busca('b', destino))
+        time.sleep(0.01)
+        cache.armazena('d', rst)
+        self.assertTrue(cache.busca('b', destino))
+        self.assertFalse(cache.busca('c', destino))
+        self.assertLessEqual(cache.tamanho_total(), 200)
+
+        # O indice salvo em disco e recuperado por uma nova instancia
+        reaberta = ConversionCache(cache.pasta, tamanho_maximo_mb=200 / (1024 * 1024))
+        self.assertTrue(reaberta.busca('d', destino))
+
+    def test_clear(self):
+        """Clearing removes every stored file."""
+        self.cache.armazena('a', self.converte('convertido.rst', '1\n'))
+        self.assertGreater(self.cache.limpa(), 0)
+        self.assertEqual(self.cache.tamanho_total(), 0)
+        self.assertFalse(self.cache.busca('a', os.path.join(self.pasta.name, 'destino.rst')))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ConversionCacheTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,88 @@
+# coding=utf-8
+"""Engine progress channel test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+from modulos_files.engine_progress import (
+    EstadoProgresso, LeitorProgresso, ProgressoMotor, descreve_estado, formata_tempo)
+
+
+class EngineProgressTest(unittest.TestCase):
+    """Test the progress file written by the engines and read by the plugin."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.pasta.name, 'progress.txt')
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def test_stages(self):
+        """Only the new lines are read on each call, and the stages fill the overall fraction in order."""
+        progresso = ProgressoMotor(self.arquivo, ('reading inputs', 'routing'), intervalo=0.0)
+        leitor = LeitorProgresso(self.arquivo)
+        self.assertEqual(leitor.le(), [])
+
+        progresso.etapa('reading inputs')
+        progresso.avanca(1)
+        progresso.etapa('routing', 200)
+        progresso.avanca(50)
+        estados = leitor.le()
+        self.assertEqual([(estado.etapa, estado.concluido) for estado in estados],
+                         [('reading inputs', 0), ('reading inputs', 1), ('routing', 0), ('routing', 50)])
+        self.assertAlmostEqual(estados[-1].fracao, (1 + 50 / 200) / 2)
+        self.assertIsNotNone(estados[-1].eta)
+
+        progresso.avanca(200)
+        self.assertEqual([(estado.concluido, estado.fracao) for estado in leitor.le()], [(200, 1.0)])
+        self.assertEqual(leitor.le(), [])
+
+    def test_partial_line_and_new_run(self):
+        """A line still being written is left for the next call; a recreated file is read from the start."""
+        with open(self.arquivo, 'w', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write('routing,1,1,0,100,1.0\nrouting,1,1,10,100,2.0\nrouting,1,1,20')
+        leitor = LeitorProgresso(self.arquivo)
+        self.assertEqual([estado.concluido for estado in leitor.le()], [0, 10])
+        with open(self.arquivo, 'a', encoding='utf-8') as arquivo_txt:
+            arquivo_txt.write(',100,4.0\n')
+        estado, = leitor.le()
+        self.assertEqual((estado.concluido, estado.decorrido), (20, 3.0))
+        # ETA da etapa: 3 s para 20 pixels -> 12 s para os 80 restantes
+        self.assertAlmostEqual(estado.eta, 12.0)
+
+        ProgressoMotor(self.arquivo, ('writing maps',)).etapa('writing maps', 5)
+        self.assertEqual([estado.etapa for estado in leitor.le()], ['writing maps'])
+
+    def test_disabled_and_description(self):
+        """Without a file the reporter writes nothing; the description shows the elapsed time and the ETA."""
+        progresso = ProgressoMotor(None, ('routing',))
+        progresso.etapa('routing', 10)
+        progresso.avanca(5)
+        self.assertFalse(os.path.exists(self.arquivo))
+
+        self.assertEqual(formata_tempo(3725.4), '01:02:05')
+        estado = EstadoProgresso('routing', 2, 3, 25, 100, 60.0, 180.0, 0.5)
+        self.assertEqual(descreve_estado(estado), 'Stage 2/3: routing - 25% (elapsed 00:01:00, ETA 00:03:00)')
+        self.assertEqual(descreve_estado(estado._replace(concluido=100)),
+                         'Stage 2/3: routing - 100% (elapsed 00:01:00)')
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(EngineProgressTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
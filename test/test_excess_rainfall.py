@@ -0,0 +1,199 @@
+# coding=utf-8
+"""Native excess rainfall engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modulos_files.engine_io import escreve_cabecalho_hietograma, le_hietogramas, le_mapa
+from modulos_files import excess_rainfall
+from modulos_files.engine_progress import LeitorProgresso
+from modulos_files.excess_rainfall import arquivo_combinacao, executa_excess_rainfall
+from modulos_files.rst_io import escreve_rst_ascii, escreve_rst_binario
+
+BACIA = np.array([[0, 1, 1, 0], [1, 1, 1, 0], [0, 0, 1, 1]])
+CN = np.array([[50, 60, 70, 80], [75.5, 85, 90, 100], [40, 55, 65, 100]])
+CHUVA = [0.0, 5.0, 12.5, 30.0, 8.0, 0.0, 2.0]
+
+
+def excedente_pixel(chuva, cn, lamb):
+    """Reference SCS-CN computation for a single pixel."""
+    s = 25400 / cn - 254
+    ia = lamb * s
+    acumulada, anterior, excedentes = 0.0, 0.0, []
+    for p in chuva:
+        acumulada += p
+        q = (acumulada - ia) ** 2 / (acumulada - ia + s) if acumulada > ia else 0.0
+        excedentes.append(q - anterior)
+        anterior = q
+    return s, ia, acumulada, anterior, excedentes
+
+
+class ExcessRainfallTest(unittest.TestCase):
+    """Test the native SCS-CN engine against a pixel by pixel computation."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, nome)
+
+    def escreve_mapa(self, nome, dados, file_type, formato):
+        arquivo = self.caminho(nome)
+        with open(arquivo.replace('.rst', '.rdc'), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,{dados.shape[0]}\nColumns,{dados.shape[1]}\nresolution,30.0\n')
+            if formato == 'binary':
+                rdc.write(f'file_format,binary\ndata_type,{escreve_rst_binario(arquivo, dados, file_type)}\n')
+        if formato == 'ascii':
+            escreve_rst_ascii(arquivo, dados, file_type)
+        return arquivo
+
+    def executa(self, formato, chuva_distribuida, arquivo_progresso=None, parametros_txt='Initial abstraction (λ),0.2'):
+        """Writes the inputs like run_process_excess_rainfall and runs the engine."""
+        bacia = self.escreve_mapa('Watershed.rst', BACIA, 'int', formato)
+        cn = self.escreve_mapa('CN_map.rst', CN, 'float', formato)
+        parametros = self.caminho('parameters_exc_rainf.txt')
+        with open(parametros, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(parametros_txt)
+
+        chuva_media = self.caminho('Areal_averaged_rainfall.txt')
+        chuva_pixels = self.caminho('Spatially_distributed_rainfall.bin')
+        if chuva_distribuida:
+            n_pixels = int(BACIA.sum())
+            with open(chuva_pixels, 'wb') as arquivo:
+                escreve_cabecalho_hietograma(arquivo, n_pixels, len(CHUVA), 10.0, 10.0 * len(CHUVA))
+                np.tile(np.array(CHUVA, dtype='<f4'), (n_pixels, 1)).tofile(arquivo)
+        else:
+            with open(chuva_media, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(f'{len(CHUVA)},10\nTime(min),Rainfall(mm)\n')
+                arquivo.writelines(f'{10 * (i + 1)},{p}\n' for i, p in enumerate(CHUVA))
+
+        entradas = self.caminho('input_files_config_exc_rainf.txt')
+        with open(entradas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Selected input file directory\n')
+            arquivo.write(f'1,watershed,{bacia}\n1,curve_number_map,{cn}\n')
+            arquivo.write(f'1,Areal_averaged_rainfall,{"" if chuva_distribuida else chuva_media}\n')
+            arquivo.write(f'1,Spatially_distributed_rainfall,{chuva_pixels if chuva_distribuida else ""}\n')
+            arquivo.write(f'1,parameters,{parametros}\n')
+            if formato == 'binary':
+                arquivo.write('exchange_format,binary')
+
+        saidas = self.caminho('output_files_config_exc_rainf.txt')
+        nomes = ('Map of watershed pixels ID', 'Map of maximum potential retention (mm)',
+                 'Map of initial abstraction (mm)', 'Map of total rainfall (mm)', 'Map of total excess rainfall (mm)')
+        with open(saidas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Select output file directory\n')
+            for i, nome in enumerate(nomes):
+                arquivo.write(f'1,{nome},{self.caminho(f"saida_{i}.rst")}\n')
+            arquivo.write(f'1,Excess hyetographs per pixel (mm),{self.caminho("hietogramas.bin")}')
+            if formato == 'binary':
+                arquivo.write('\nexchange_format,binary')
+
+        executa_excess_rainfall(entradas, saidas, arquivo_progresso)
+
+    def le_saidas(self):
+        """Reads the five maps written by the engine."""
+        return [le_mapa(self.caminho(f'saida_{i}.rst'), 'int' if i == 0 else 'float') for i in range(5)]
+
+    def test_scs_cn(self):
+        """The maps and the hyetographs match the pixel by pixel SCS-CN computation."""
+        for formato in ('ascii', 'binary'):
+            for chuva_distribuida in (False, True):
+                self.executa(formato, chuva_distribuida)
+                ids, retencao, abstracao, chuva_total, excedente_total = self.le_saidas()
+                (n_pixels, n_blocos, discretizacao, duracao), hietogramas = le_hietogramas(
+                    self.caminho('hietogramas.bin'))
+                self.assertEqual((n_pixels, n_blocos, discretizacao, duracao), (7, 7, 10.0, 70.0))
+
+                pixels = list(zip(*np.nonzero(BACIA)))
+                for pixel_id, (lin, col) in enumerate(pixels, start=1):
+                    s, ia, total, excedente, excedentes = excedente_pixel(CHUVA, CN[lin, col], 0.2)
+                    self.assertEqual(ids[lin, col], pixel_id)
+                    # Tolerancia do float32 usado nos arquivos binarios
+                    np.testing.assert_allclose(
+                        [retencao[lin, col], abstracao[lin, col], chuva_total[lin, col], excedente_total[lin, col]],
+                        [s, ia, total, excedente], rtol=1e-6, atol=1e-5)
+                    np.testing.assert_allclose(hietogramas[pixel_id - 1], excedentes, atol=1e-4)
+                self.assertTrue(np.all(ids[BACIA == 0] == 0))
+                self.assertTrue(np.all(excedente_total[BACIA == 0] == 0))
+                del hietogramas
+
+    def test_parameter_sweep(self):
+        """Each λ and CN multiplier combination of a sweep matches its pixel by pixel SCS-CN computation."""
+        for chuva_distribuida in (False, True):
+            self.executa('ascii', chuva_distribuida, parametros_txt='Initial abstraction (λ),0.2\n'
+                         'Initial abstraction sweep (λ),0.05,0.2\nCN multipliers,0.9,1,1.1')
+            self.verifica_varredura()
+        self.assertFalse(os.path.exists(self.caminho('hietogramas.bin')))
+        self.assertFalse(os.path.exists(self.caminho('saida_4.rst')))
+        # Mapas que nao dependem dos parametros: escritos uma unica vez
+        self.assertTrue(os.path.exists(self.caminho('saida_3.rst')))
+
+        with self.assertRaises(ValueError):
+            self.executa('ascii', False, parametros_txt='Initial abstraction (λ),0.2\nCN multipliers,1,0')
+
+    def verifica_varredura(self):
+        """Compares the outputs of each combination of the sweep with the pixel by pixel computation."""
+        pixels = list(zip(*np.nonzero(BACIA)))
+        for lamb in (0.05, 0.2):
+            for multiplicador in (0.9, 1.0, 1.1):
+                excedente_total = le_mapa(arquivo_combinacao(self.caminho('saida_4.rst'), lamb, multiplicador), 'float')
+                abstracao = le_mapa(arquivo_combinacao(self.caminho('saida_2.rst'), lamb, multiplicador), 'float')
+                _, hietogramas = le_hietogramas(
+                    arquivo_combinacao(self.caminho('hietogramas.bin'), lamb, multiplicador))
+                for pixel_id, (lin, col) in enumerate(pixels, start=1):
+                    # Os CNs multiplicados sao limitados a 100
+                    _, ia, _, excedente, excedentes = excedente_pixel(
+                        CHUVA, min(CN[lin, col] * multiplicador, 100.0), lamb)
+                    np.testing.assert_allclose([abstracao[lin, col], excedente_total[lin, col]], [ia, excedente],
+                                               rtol=1e-6, atol=1e-5)
+                    np.testing.assert_allclose(hietogramas[pixel_id - 1], excedentes, atol=1e-4)
+                del hietogramas
+
+    def test_cn_classes(self):
+        """With the areal rainfall, the computation per CN value gives the same outputs as the pixel by pixel one."""
+        saidas = []
+        for valores_por_cn in (excess_rainfall.VALORES_POR_CN, 0):
+            with mock.patch.object(excess_rainfall, 'VALORES_POR_CN', valores_por_cn):
+                self.executa('binary', False)
+            with open(self.caminho('hietogramas.bin'), 'rb') as arquivo:
+                saidas.append((arquivo.read(), self.le_saidas()))
+        self.assertEqual(saidas[0][0], saidas[1][0])
+        for mapa_cn, mapa_pixels in zip(saidas[0][1], saidas[1][1]):
+            np.testing.assert_array_equal(mapa_cn, mapa_pixels)
+
+    def test_progress_file(self):
+        """The engine reports each of its stages in the progress file, ending with all the maps written."""
+        arquivo_progresso = self.caminho('progress_exc_rain.txt')
+        self.executa('ascii', True, arquivo_progresso)
+        estados = LeitorProgresso(arquivo_progresso).le()
+        self.assertEqual([estado.etapa for estado in estados if estado.concluido == 0],
+                         ['reading inputs', 'excess rainfall', 'writing maps'])
+        self.assertEqual((estados[-1].indice, estados[-1].n_etapas, estados[-1].concluido, estados[-1].total),
+                         (3, 3, 5, 5))
+        self.assertEqual(estados[-1].fracao, 1.0)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ExcessRainfallTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
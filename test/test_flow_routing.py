@@ -0,0 +1,201 @@
+# coding=utf-8
+"""Native flow routing (DLR and TUH+) engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.engine_io import escreve_cabecalho_hietograma, le_mapa
+from modulos_files.flow_routing import executa_flow_routing
+from modulos_files.rst_io import escreve_rst_ascii, escreve_rst_binario
+
+BACIA = np.array([[0, 1, 1], [1, 1, 1], [0, 1, 0]])
+TEMPO = np.array([[0.0, 40.0, 25.0], [55.0, 30.0, 10.0], [0.0, 5.0, 0.0]])
+CLASSES = np.array([[0, 1, 1], [2, 2, 1], [0, 2, 0]])
+DT, BETA, AREA = 10.0, 0.6, 900.0
+
+
+def hietogramas():
+    """Excess hyetographs (mm) of the watershed pixels, in row-major order."""
+    rng = np.random.default_rng(7)
+    return rng.random((int(BACIA.sum()), 6)) * 5
+
+
+def reservatorio_pixel(chuva, tempo_viagem, n_passos):
+    """Reference DLR pixel: translation by the travel time, then a linear reservoir (K = beta x travel time).
+    Returns the mean outflow (m3/s) of each step for piecewise constant inflow."""
+    k = BETA * tempo_viagem
+    atraso = tempo_viagem / DT
+    q, saidas = 0.0, []
+    for t in range(n_passos):
+        # Parte de cada bloco de chuva transladado que cai no passo t
+        i = 0.0
+        for j, p in enumerate(chuva):
+            sobreposicao = min(t + 1, j + 1 + atraso) - max(t, j + atraso)
+            i += max(sobreposicao, 0.0) * p * AREA / 1000 / (DT * 60)
+        if k == 0:
+            media, q = i, i
+        else:
+            a = math.exp(-DT / k)
+            media = i + (q - i) * k * (1 - a) / DT
+            q = a * q + (1 - a) * i
+        saidas.append(media)
+    return np.array(saidas)
+
+
+def nucleo_triangular(tempo_viagem, n_passos):
+    """Reference TUH response to a block: triangle CDF averaged over the block duration with a fine grid."""
+    tp = DT / 2 + 0.6 * tempo_viagem
+    tb = 2.67 * tp
+
+    def acumulada(t):
+        t = np.clip(t, 0, tb)
+        return np.where(t < tp, t ** 2 / (tp * tb), 1 - (tb - t) ** 2 / (tb * (tb - tp)))
+
+    deslocamentos = (np.arange(4000) + 0.5) / 4000 * DT
+    saida = [acumulada(k * DT - deslocamentos).mean() for k in range(n_passos + 1)]
+    return np.diff(saida)
+
+
+class FlowRoutingTest(unittest.TestCase):
+    """Test the native routing engine against pixel by pixel computations."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, nome)
+
+    def escreve_mapa(self, arquivo, dados, file_type, formato):
+        with open(arquivo.replace('.rst', '.rdc'), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,{dados.shape[0]}\nColumns,{dados.shape[1]}\nresolution,30.0\n')
+            if formato == 'binary':
+                rdc.write(f'file_format,binary\ndata_type,{escreve_rst_binario(arquivo, dados, file_type)}\n')
+        if formato == 'ascii':
+            escreve_rst_ascii(arquivo, dados, file_type)
+        return arquivo
+
+    def executa(self, formato, litros=False, classes=False, poi=False, tuh=False):
+        """Writes the inputs like run_process_flow_rout and runs the engine."""
+        bacia = self.escreve_mapa(self.caminho('Watershed.rst'), BACIA, 'int', formato)
+        tempo = self.escreve_mapa(self.caminho('flow_tt.rst'), TEMPO, 'float', formato)
+        mapa_classes = self.escreve_mapa(self.caminho('classes.rst'), CLASSES, 'int', formato)
+        chuva = self.caminho('excess_hyetographs.bin')
+        with open(chuva, 'wb') as arquivo:
+            escreve_cabecalho_hietograma(arquivo, int(BACIA.sum()), 6, DT, 6 * DT)
+            hietogramas().astype('<f4').tofile(arquivo)
+        parametros = self.caminho('parameters_flow_rout.txt')
+        with open(parametros, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Rainfall time step (min),{DT}\nParameter β,{BETA}\n')
+            arquivo.write(f'L/s,{int(litros)}\nm3/s,{int(not litros)}\nTUH+,{int(tuh)}')
+
+        entradas = self.caminho('input_files_config_flow_rout.txt')
+        with open(entradas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Selected input files directory\n')
+            arquivo.write(f'1,watershed,{bacia}\n1,flow_travel_time,{tempo}\n1,excess_hyetographs,{chuva}\n')
+            arquivo.write(f'0,total_excess_rainfall,\n{int(classes)},watershed_into_classes,{mapa_classes}\n')
+            arquivo.write(f'1,parameters,{parametros}')
+            if formato == 'binary':
+                arquivo.write('\nexchange_format,binary')
+
+        saidas = self.caminho('output_files_config_flow_rout.txt')
+        with open(saidas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Selected output files directory\n')
+            arquivo.write(f'1,map_of_resulting_peak_discharge,{self.caminho("pico.rst")}\n')
+            arquivo.write(f'1,map_of_resulting_runoff_volume,{self.caminho("volume.rst")}\n')
+            arquivo.write(f'1,resulting_watershed_hydrograph,{self.caminho("hidrograma.txt")}')
+
+        pasta_poi = None
+        if poi:
+            # Tempo de viagem ate o POI (pixel (1, 1)): apenas os pixels (0, 1), (1, 0) e (1, 1)
+            pasta_poi = self.caminho('tv_for_each_poi')
+            os.makedirs(pasta_poi)
+            tempo_poi = np.where(np.isin(np.arange(9).reshape(3, 3), [1, 3, 4]), TEMPO - 20.0, 0.0)
+            self.escreve_mapa(os.path.join(pasta_poi, 'travel_time_POI_1.rst'), tempo_poi, 'float', formato)
+        executa_flow_routing(entradas, saidas, pasta_poi, self.caminho('hydrographs'))
+
+        dados = np.loadtxt(self.caminho('hidrograma.txt'), skiprows=1, delimiter=',', ndmin=2)
+        return dados, le_mapa(self.caminho('pico.rst'), 'float'), le_mapa(self.caminho('volume.rst'), 'float')
+
+    def referencia(self, tempos, n_passos):
+        chuva = hietogramas().astype('<f4').astype(np.float64)
+        return np.array([reservatorio_pixel(chuva[i], tempos[i], n_passos) for i in range(chuva.shape[0])])
+
+    def test_outlet_hydrograph(self):
+        """The outlet hydrograph and the maps match the pixel by pixel reservoirs."""
+        for formato in ('ascii', 'binary'):
+            dados, pico, volume = self.executa(formato)
+            saidas = self.referencia(TEMPO[BACIA == 1], dados.shape[0])
+            np.testing.assert_allclose(dados[:, 0], DT * np.arange(1, dados.shape[0] + 1))
+            np.testing.assert_allclose(dados[:, 1], saidas.sum(axis=0), atol=1e-5)
+            np.testing.assert_allclose(pico[BACIA == 1], saidas.max(axis=1), rtol=1e-5)
+            np.testing.assert_allclose(volume[BACIA == 1], hietogramas().sum(axis=1) / 1000 * AREA, rtol=1e-5)
+            self.assertTrue(np.all(pico[BACIA == 0] == 0))
+
+            # O hidrograma termina com quase todo o volume escoado
+            escoado = dados[:, 1].sum() * DT * 60
+            self.assertAlmostEqual(escoado / volume.sum(), 1.0, delta=2e-3)
+
+    def test_units_and_classes(self):
+        """L/s scales the discharges and the class columns add up to the total."""
+        dados_m3, pico_m3, _ = self.executa('ascii')
+        dados, pico, _ = self.executa('ascii', litros=True, classes=True)
+        with open(self.caminho('hidrograma.txt'), 'r', encoding='utf-8') as arquivo:
+            self.assertEqual(arquivo.readline().strip(),
+                             'Time (min),Total (L/s),Class 1 (L/s),Class 2 (L/s)')
+        np.testing.assert_allclose(dados[:, 1], dados_m3[:, 1] * 1000, rtol=1e-5, atol=1e-3)
+        np.testing.assert_allclose(dados[:, 2] + dados[:, 3], dados[:, 1], rtol=1e-5, atol=1e-3)
+        np.testing.assert_allclose(pico, pico_m3 * 1000, rtol=1e-5)
+
+    def test_points_of_interest(self):
+        """Each POI gets the hydrograph of the pixels draining to it, with the travel time to the POI."""
+        self.executa('binary', poi=True)
+        arquivo = os.path.join(self.caminho('hydrographs'), 'hydrograph_travel_time_POI_1.txt')
+        dados = np.loadtxt(arquivo, skiprows=1, delimiter=',', ndmin=2)
+        chuva = hietogramas().astype('<f4').astype(np.float64)
+        # Pixels (0, 1), (1, 0) e (1, 1) sao os pixels 0, 2 e 3 da bacia
+        esperado = sum(reservatorio_pixel(chuva[i], t, dados.shape[0])
+                       for i, t in ((0, 20.0), (2, 35.0), (3, 10.0)))
+        np.testing.assert_allclose(dados[:, 1], esperado, atol=1e-5)
+
+
+    def test_tuh(self):
+        """The TUH+ version matches the direct convolution of each pixel with its triangular unit hydrograph."""
+        dados, pico, _ = self.executa('ascii', tuh=True)
+        n_passos = dados.shape[0]
+        chuva = hietogramas().astype('<f4').astype(np.float64) * AREA / 1000 / (DT * 60)
+        respostas = np.array([np.convolve(chuva[i], nucleo_triangular(t, n_passos))[:n_passos]
+                              for i, t in enumerate(TEMPO[BACIA == 1])])
+        np.testing.assert_allclose(dados[:, 1], respostas.sum(axis=0), atol=1e-5)
+        np.testing.assert_allclose(pico[BACIA == 1], respostas.max(axis=1), rtol=1e-4)
+        # Todo o volume excedente sai ate o fim do hidrograma
+        self.assertAlmostEqual(dados[:, 1].sum() * DT * 60, chuva.sum() * DT * 60, places=3)
+
+        # Classes: as colunas somam o total
+        dados, _, _ = self.executa('ascii', classes=True, tuh=True)
+        np.testing.assert_allclose(dados[:, 2] + dados[:, 3], dados[:, 1], atol=1e-5)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(FlowRoutingTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
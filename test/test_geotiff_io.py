@@ -0,0 +1,94 @@
+# coding=utf-8
+"""GeoTIFF writing test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from osgeo import gdal, gdalconst
+
+from modulos_files.geotiff_io import OpcoesGeoTiff, escreve_geotiff, fatores_overview
+
+GEOTRANSFORM = (500000.0, 30.0, 0.0, 9200000.0, 0.0, -30.0)
+
+
+class GeoTiffIoTest(unittest.TestCase):
+    """Test the GeoTIFF creation profiles."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.dados = np.arange(600 * 520, dtype=np.float32).reshape(600, 520) % 97
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def escreve(self, nome, opcoes, tipo=gdalconst.GDT_Float32):
+        arquivo = os.path.join(self.pasta.name, nome)
+        escreve_geotiff(arquivo, self.dados, 600, 520, GEOTRANSFORM, '', tipo, opcoes)
+        dataset = gdal.Open(arquivo)
+        np.testing.assert_array_equal(dataset.GetRasterBand(1).ReadAsArray(), self.dados.astype(
+            np.float32 if tipo == gdalconst.GDT_Float32 else np.int32))
+        self.assertEqual(dataset.GetGeoTransform(), GEOTRANSFORM)
+        return dataset
+
+    def test_creation_options(self):
+        """The predictor follows the data type and invalid options are refused."""
+        self.assertEqual(OpcoesGeoTiff('plain').opcoes_criacao(gdalconst.GDT_Float32), [])
+        self.assertIn('PREDICTOR=3', OpcoesGeoTiff().opcoes_criacao(gdalconst.GDT_Float32))
+        self.assertIn('PREDICTOR=2', OpcoesGeoTiff(compressao='zstd').opcoes_criacao(gdalconst.GDT_Int32))
+        self.assertIn('BIGTIFF=IF_SAFER', OpcoesGeoTiff().opcoes_criacao(gdalconst.GDT_Int32))
+        self.assertEqual(fatores_overview(600, 520), [2])
+        self.assertEqual(fatores_overview(100, 100), [])
+        with self.assertRaises(ValueError):
+            OpcoesGeoTiff('jpeg')
+        with self.assertRaises(ValueError):
+            OpcoesGeoTiff(compressao='JPEG')
+
+    def test_plain(self):
+        """The plain profile keeps the previous stripped, uncompressed files."""
+        dataset = self.escreve('plain.tif', OpcoesGeoTiff('plain'))
+        banda = dataset.GetRasterBand(1)
+        self.assertIsNone(dataset.GetMetadataItem('COMPRESSION', 'IMAGE_STRUCTURE'))
+        self.assertEqual(banda.GetOverviewCount(), 0)
+        self.assertIsNone(banda.GetNoDataValue())
+
+    def test_optimized(self):
+        """The optimized profile writes tiled, compressed files with overviews and nodata."""
+        dataset = self.escreve('otimizado.tif', OpcoesGeoTiff(nodata=-9999), gdalconst.GDT_Int32)
+        banda = dataset.GetRasterBand(1)
+        self.assertEqual(dataset.GetMetadataItem('COMPRESSION', 'IMAGE_STRUCTURE'), 'DEFLATE')
+        self.assertEqual(banda.GetBlockSize(), [256, 256])
+        self.assertEqual(banda.GetOverviewCount(), 1)
+        self.assertEqual(banda.GetNoDataValue(), -9999)
+        self.assertLess(os.path.getsize(dataset.GetDescription()), self.dados.size * 4)
+
+        sem_overviews = self.escreve('sem_overviews.tif', OpcoesGeoTiff(overviews=False))
+        self.assertEqual(sem_overviews.GetRasterBand(1).GetOverviewCount(), 0)
+
+    def test_cog(self):
+        """The cog profile writes a Cloud-Optimized GeoTIFF."""
+        dataset = self.escreve('cog.tif', OpcoesGeoTiff('cog'))
+        self.assertEqual(dataset.GetRasterBand(1).GetBlockSize(), [256, 256])
+        self.assertGreater(dataset.GetRasterBand(1).GetOverviewCount(), 0)
+        if gdal.GetDriverByName('COG') is not None:
+            self.assertEqual(dataset.GetMetadataItem('LAYOUT', 'IMAGE_STRUCTURE'), 'COG')
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(GeoTiffIoTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,215 @@
+# coding=utf-8
+"""Headless stage pipeline test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modulos_files import rainfall_interpolation
+from modulos_files.engine_io import le_config_arquivos, le_hietogramas, le_mapa
+from modulos_files.pipeline import ParametrosEtapa, ParametrosFlowRouting, executa_pipeline, main
+from modulos_files.rst_io import escreve_rst_ascii
+from modulos_files.weights_cache import ARQUIVO_INDICE, WeightsCache
+
+# Bacia 3x4: o rio (linha 1) escoa para leste ate o exutorio (1, 3); as linhas 0 e 2 escoam para o rio
+DIRECOES = np.array([[4, 4, 4, 4], [1, 1, 1, 1], [64, 64, 64, 64]])
+RIO = np.array([[0, 0, 0, 0], [1, 1, 1, 1], [0, 0, 0, 0]])
+MDE = np.array([[13.0, 12.0, 11.0, 10.0], [10.0, 9.0, 8.0, 7.0], [13.0, 12.0, 11.0, 10.0]])
+AREA_DRENAGEM = np.array([[0.0, 0.0, 0.0, 0.0], [1.0, 2.0, 4.0, 8.0], [0.0, 0.0, 0.0, 0.0]])
+CN = np.array([[70.0, 75.0, 80.0, 85.0], [90.0, 95.0, 90.0, 85.0], [80.0, 75.0, 70.0, 65.0]])
+
+
+class PipelineTest(unittest.TestCase):
+    """Test the four stages run from a JSON file, without any dialog."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, nome)
+
+    def escreve_mapa(self, nome, dados, file_type):
+        escreve_rst_ascii(self.caminho(nome), dados, file_type)
+        with open(self.caminho(nome.replace('.rst', '.rdc')), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,{dados.shape[0]}\nColumns,{dados.shape[1]}\nresolution,30.0\n')
+            rdc.write('Min_X,0.0\nMax_X,120.0\nMin_Y,0.0\nMax_Y,90.0\n')
+        return nome
+
+    def escreve_texto(self, nome, conteudo):
+        with open(self.caminho(nome), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return nome
+
+    def configuracao(self):
+        """JSON configuration of the four chained stages, with paths relative to the JSON file."""
+        bacia = self.escreve_mapa('bacia.rst', np.ones((3, 4), dtype=int), 'int')
+        return {
+            'exchange_format': 'ascii',
+            'stages': {
+                'flow_routing': {
+                    'entradas': {'watershed': bacia, 'flow_travel_time': 'saidas/tempo.rst',
+                                 'excess_hyetographs': 'saidas/excedente.bin',
+                                 'total_excess_rainfall': 'saidas/excedente_total.rst'},
+                    'saidas': {'resulting_watershed_hydrograph': 'saidas/hidrograma.txt',
+                               'map_of_resulting_peak_discharge': 'saidas/pico.rst'},
+                    'discretizacao': 10, 'beta': 0.6},
+                'flow_travel_time': {
+                    'entradas': {
+                        'watershed': bacia, 'DEM': self.escreve_mapa('mde.rst', MDE, 'float'),
+                        'Flow_Dir': self.escreve_mapa('direcoes.rst', DIRECOES, 'int'),
+                        'DA_km2': self.escreve_mapa('area.rst', AREA_DRENAGEM, 'float'),
+                        'drainage': self.escreve_mapa('rio.rst', RIO, 'int'),
+                        'river_segments': self.escreve_mapa('segmentos.rst', RIO, 'int'),
+                        'segment_characteristics': self.escreve_texto(
+                            'segmentos.txt', 'Class,Hydraulic radius,Manning,Slope\n1,0.5,0.04,0.01\n'),
+                        'LULC': self.escreve_mapa('uso.rst', np.ones((3, 4), dtype=int), 'int'),
+                        'surface_roughness': self.escreve_texto('rugosidade.txt', 'Class,Name,Manning,k\n1,Forest,0.1,5.0\n')},
+                    'saidas': {'Flow_travel_time': 'saidas/tempo.rst'},
+                    'p24': 80.0, 'manning_rio': 0.05, 'comprimento_maximo': 60, 'declividade_minima': 0.001},
+                'rainfall_interpolation': {
+                    'entradas': {'watershed': bacia,
+                                 'rain_gauges': self.escreve_texto('postos.txt', 'ID,X,Y\nA,0,0\nB,120,90\n'),
+                                 'rainfall_data': self.escreve_texto(
+                                     'chuva.txt', 'Time(min),A,B\n10,5,15\n20,30,10\n30,0,2\n')},
+                    'saidas': {'rainfall_interpolated_file': 'saidas/chuva.bin'}},
+                'excess_rainfall': {
+                    'entradas': {'watershed': bacia, 'curve_number_map': self.escreve_mapa('cn.rst', CN, 'float'),
+                                 'Spatially_distributed_rainfall': 'saidas/chuva.bin'},
+                    'saidas': {'Excess hyetographs per pixel (mm)': 'saidas/excedente.bin',
+                               'Map of total excess rainfall (mm)': 'saidas/excedente_total.rst'},
+                    'abstracao_inicial': 0.2},
+            },
+        }
+
+    def escreve_configuracao(self, configuracao):
+        arquivo = self.caminho('bacia.json')
+        with open(arquivo, 'w', encoding='utf-8') as arquivo_json:
+            json.dump(configuracao, arquivo_json)
+        return arquivo
+
+    def test_chained_stages(self):
+        """The stages run in order, each one reading the outputs delivered by the previous ones."""
+        arquivo = self.escreve_configuracao(self.configuracao())
+        relatorio = self.caminho('relatorio.json')
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            self.assertEqual(main([arquivo, '--temp', self.caminho('temp'), '--report', relatorio]), 0)
+        self.assertEqual(len(saida.getvalue().splitlines()), 4)
+
+        with open(relatorio, 'r', encoding='utf-8') as arquivo_json:
+            etapas = json.load(arquivo_json)['stages']
+        self.assertEqual([etapa['stage'] for etapa in etapas],
+                         ['flow_travel_time', 'rainfall_interpolation', 'excess_rainfall', 'flow_routing'])
+        self.assertTrue(all(etapa['exit_code'] == 0 and etapa['seconds'] >= 0 for etapa in etapas))
+
+        # Todo o volume excedente sai no exutorio
+        _, excedente = le_hietogramas(self.caminho(os.path.join('saidas', 'excedente.bin')))
+        volume = excedente.astype(np.float64).sum() / 1000 * 900.0
+        del excedente
+        hidrograma = np.loadtxt(self.caminho(os.path.join('saidas', 'hidrograma.txt')), skiprows=1, delimiter=',')
+        self.assertGreater(volume, 0)
+        self.assertAlmostEqual(hidrograma[:, 1].sum() * 600 / volume, 1.0, delta=2e-3)
+        self.assertTrue(np.all(le_mapa(self.caminho(os.path.join('saidas', 'tempo.rst')), 'float') > 0))
+
+    def test_failed_stage(self):
+        """A failing stage reports exit code 1 and stops the pipeline; a bad file returns 2."""
+        configuracao = self.configuracao()
+        configuracao['stages']['excess_rainfall']['entradas']['curve_number_map'] = 'nao_existe.rst'
+        saida = io.StringIO()
+        resultados = executa_pipeline(self.escreve_configuracao(configuracao), self.caminho('temp'), saida=saida)
+        self.assertEqual([resultado['exit_code'] for resultado in resultados], [0, 0, 1])
+        self.assertIn('nao_existe', resultados[-1]['error'])
+        self.assertIn('excess_rainfall', saida.getvalue())
+        # Cada etapa usa uma area de trabalho propria: apenas a da etapa com falha e mantida
+        self.assertEqual(len({resultado['workspace'] for resultado in resultados}), 3)
+        self.assertEqual(os.listdir(self.caminho('temp')), [os.path.basename(resultados[-1]['workspace'])])
+
+        configuracao['stages']['runoff'] = {}
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main([self.escreve_configuracao(configuracao), '--temp', self.caminho('temp')]), 2)
+
+    def test_parameter_sweep(self):
+        """A λ and CN multiplier sweep delivers the outputs of each combination, with the suffix of the combination."""
+        configuracao = self.configuracao()
+        for etapa in ('flow_travel_time', 'flow_routing'):
+            del configuracao['stages'][etapa]
+        configuracao['stages']['excess_rainfall'].update({'varredura_lambda': [0.1, 0.2], 'multiplicadores_cn': [1.05]})
+        resultados = executa_pipeline(self.escreve_configuracao(configuracao), self.caminho('temp'))
+        self.assertEqual([resultado['exit_code'] for resultado in resultados], [0, 0])
+        self.assertEqual(sorted(os.path.basename(saida) for saida in resultados[-1]['outputs']), [
+            'excedente_lambda0.1_cn1.05.bin', 'excedente_lambda0.2_cn1.05.bin',
+            'excedente_total_lambda0.1_cn1.05.rst', 'excedente_total_lambda0.2_cn1.05.rst'])
+        totais = [le_mapa(self.caminho(os.path.join('saidas', f'excedente_total_lambda{lamb}_cn1.05.rst')), 'float')
+                  for lamb in (0.1, 0.2)]
+        # Uma abstracao inicial menor gera mais chuva excedente
+        self.assertTrue(np.all(totais[0] >= totais[1]) and totais[0].sum() > totais[1].sum())
+
+    def test_weights_cache(self):
+        """Runs in different workspaces reuse the weights cached for the same gauge file and watershed."""
+        arquivo = self.escreve_configuracao(self.configuracao())
+        pasta_cache = self.caminho('cache')
+        with mock.patch.object(rainfall_interpolation, 'pesos_idw', wraps=rainfall_interpolation.pesos_idw) as pesos:
+            for _ in range(2):
+                resultados = executa_pipeline(arquivo, self.caminho('temp'), ['rainfall_interpolation'], pasta_cache)
+                self.assertEqual(resultados[0]['exit_code'], 0)
+        self.assertEqual(pesos.call_count, 1)
+
+        with open(os.path.join(pasta_cache, ARQUIVO_INDICE), 'r', encoding='utf-8') as arquivo_json:
+            indice = json.load(arquivo_json)
+        self.assertEqual(list(indice), [WeightsCache.origem(self.caminho('postos.txt'), self.caminho('bacia.rst'))])
+        self.assertEqual(len([nome for nome in os.listdir(pasta_cache) if nome.endswith('.npy')]), 1)
+
+    def test_configuration_files(self):
+        """The parameter object writes the configuration files read by the engine."""
+        parametros = ParametrosFlowRouting(
+            {'watershed': 'bacia.tif', 'flow_travel_time': 'tempo.tif', 'excess_hyetographs': 'chuva.bin',
+             'total_excess_rainfall': 'total.tif'},
+            {'resulting_watershed_hydrograph': ''}, discretizacao=5, beta=0.8, litros=True, tuh=True)
+        arquivos = parametros.escreve_configuracao(self.pasta.name, 'binary')
+        entradas, formato = le_config_arquivos(arquivos['input_config'])
+        saidas, _ = le_config_arquivos(arquivos['output_config'])
+        self.assertEqual(formato, 'binary')
+        self.assertNotIn('watershed_into_classes', entradas)
+        self.assertEqual(entradas['watershed'], os.path.join(self.pasta.name, 'Watershed.rst'))
+        self.assertEqual(list(saidas), ['resulting_watershed_hydrograph'])
+        with open(arquivos['parameters'], 'r', encoding='utf-8') as arquivo:
+            self.assertEqual(arquivo.read().splitlines(),
+                             ['Rainfall time step (min),5', 'Parameter β,0.8', 'L/s,1', 'm3/s,0', 'TUH+,1'])
+        with self.assertRaises(ValueError):
+            ParametrosFlowRouting({'watershed': 'bacia.tif', 'rainfall': 'chuva.bin'})
+
+        class ParametrosSemMotor(ParametrosEtapa):
+            def escreve_configuracao(self, pasta_temp, formato_troca='ascii'):
+                return {}
+
+        # Uma etapa sem o motor nativo falha ao ser criada, e nao durante a execucao
+        with self.assertRaises(TypeError):
+            ParametrosSemMotor({})
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PipelineTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
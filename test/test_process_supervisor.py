@@ -0,0 +1,118 @@
+# coding=utf-8
+"""Engine cancellation test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from modulos_files.engine_progress import ExecucaoCancelada, ProgressoMotor
+from modulos_files.process_supervisor import SupervisorProcesso
+
+# Processo que inicia um neto e grava o seu pid antes de esperar indefinidamente
+CODIGO_ARVORE = '''
+import subprocess, sys, time
+neto = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+open(sys.argv[1], 'w').write(str(neto.pid))
+time.sleep(60)
+'''
+
+# Processo que ignora o pedido de termino
+CODIGO_TEIMOSO = '''
+import signal, sys, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+open(sys.argv[1], 'w').write('ok')
+time.sleep(60)
+'''
+
+
+def processo_ativo(pid):
+    '''Verifica se o processo existe (e nao e um zumbi aguardando o pai)'''
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as stat:
+            return stat.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+class ProcessSupervisorTest(unittest.TestCase):
+    """Test that a cancelled run stops the engine and every process it started."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivo_pid = os.path.join(self.pasta.name, 'pid.txt')
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def aguarda_arquivo(self, limite=10.0):
+        inicio = time.monotonic()
+        while not os.path.isfile(self.arquivo_pid) or os.path.getsize(self.arquivo_pid) == 0:
+            self.assertLess(time.monotonic() - inicio, limite)
+            time.sleep(0.05)
+
+    def test_exit_code(self):
+        """A run that is not cancelled returns the exit code of the engine."""
+        supervisor = SupervisorProcesso([sys.executable, '-c', 'import sys; sys.exit(3)'], intervalo=0.01)
+        self.assertEqual(supervisor.executa(lambda: False), 3)
+
+    @unittest.skipIf(os.name == 'nt', 'the process tree is read from /proc')
+    def test_cancel_stops_process_tree(self):
+        """Cancelling stops the engine and the processes started by it."""
+        supervisor = SupervisorProcesso([sys.executable, '-c', CODIGO_ARVORE, self.arquivo_pid], intervalo=0.01)
+        supervisor.inicia()
+        self.aguarda_arquivo()
+        with open(self.arquivo_pid, 'r') as arquivo:
+            neto = int(arquivo.read())
+
+        with self.assertRaises(ExecucaoCancelada):
+            supervisor.executa(lambda: True)
+        self.assertIsNotNone(supervisor.processo.poll())
+        inicio = time.monotonic()
+        while processo_ativo(neto) and time.monotonic() - inicio < 5.0:
+            time.sleep(0.05)
+        self.assertFalse(processo_ativo(neto))
+
+    @unittest.skipIf(os.name == 'nt', 'SIGTERM is not available on Windows')
+    def test_forced_termination(self):
+        """An engine that ignores the termination request is killed after the grace period."""
+        supervisor = SupervisorProcesso([sys.executable, '-c', CODIGO_TEIMOSO, self.arquivo_pid],
+                                        tempo_termino=0.2, intervalo=0.01)
+        supervisor.inicia()
+        self.aguarda_arquivo()
+        inicio = time.monotonic()
+        with self.assertRaises(ExecucaoCancelada):
+            supervisor.executa(lambda: True)
+        self.assertLess(time.monotonic() - inicio, 5.0)
+        self.assertEqual(supervisor.processo.returncode, -9)
+
+    def test_native_engine_cancel(self):
+        """A native engine stops at its next progress update once the run is cancelled."""
+        cancelado = []
+        progresso = ProgressoMotor(os.path.join(self.pasta.name, 'progress.txt'), ('stage',),
+                                   cancelado=lambda: bool(cancelado))
+        progresso.etapa('stage', 10)
+        progresso.avanca(5)
+        cancelado.append(True)
+        with self.assertRaises(ExecucaoCancelada):
+            progresso.avanca(6)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ProcessSupervisorTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
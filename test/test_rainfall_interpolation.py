@@ -0,0 +1,168 @@
+# coding=utf-8
+"""Native rainfall interpolation engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.engine_io import le_hietogramas
+from modulos_files.rainfall_interpolation import PesosDisponibilidade, executa_rainfall_interpolation, pesos_idw
+from modulos_files.rst_io import escreve_rst_ascii
+
+BACIA = np.array([[0, 1, 1, 1], [1, 1, 1, 0], [0, 1, 1, 0]])
+# Grade de 100 m com canto inferior esquerdo em (1000, 5000): o centro do pixel (lin, col) e
+# (1050 + 100 col, 5250 - 100 lin)
+POSTOS = {'P2': (1150.0, 5150.0), 'P1': (900.0, 5400.0), 'P3': (1600.0, 4900.0)}
+CHUVA = np.array([[0.0, 2.0, 4.0], [5.5, 1.0, 0.0], [3.0, 3.0, 9.0], [0.0, 0.0, 0.0]])
+
+
+def idw_pixel(x, y, chuva):
+    """Reference IDW for a single point, using only the gauges without missing data (NaN)."""
+    pesos, valores = [], []
+    for posto, valor in zip(('P1', 'P2', 'P3'), chuva):
+        if np.isnan(valor):
+            continue
+        distancia = np.hypot(x - POSTOS[posto][0], y - POSTOS[posto][1])
+        if distancia == 0:
+            return valor
+        pesos.append(distancia ** -2)
+        valores.append(valor)
+    return float(np.dot(pesos, valores) / np.sum(pesos)) if pesos else 0.0
+
+
+class RainfallInterpolationTest(unittest.TestCase):
+    """Test the native IDW engine against a point by point computation."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, nome)
+
+    def executa(self, condicao_mapas, pasta_cache=None, linhas=None):
+        """Writes the inputs like run_process_rainfall_interpol and runs the engine."""
+        bacia = self.caminho('Watershed.rst')
+        escreve_rst_ascii(bacia, BACIA, 'int')
+        with open(self.caminho('Watershed.rdc'), 'w', encoding='utf-8') as rdc:
+            rdc.write('Raster Informations\nRows,3\nColumns,4\nresolution,100.0\n')
+            rdc.write('Min_X,1000.0\nMax_X,1400.0\nMin_Y,5000.0\nMax_Y,5300.0\n')
+
+        postos = self.caminho('rain_gauges.txt')
+        with open(postos, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('ID,X,Y\n')
+            arquivo.writelines(f'{posto},{x},{y}\n' for posto, (x, y) in POSTOS.items())
+        dados = self.caminho('rainfall_data.txt')
+        with open(dados, 'w', encoding='utf-8') as arquivo:
+            # Colunas em ordem diferente da dos postos: associadas pelo cabecalho
+            arquivo.write('Time(min),P1,P2,P3\n')
+            for t, linha in enumerate(CHUVA if linhas is None else linhas, start=1):
+                arquivo.write(f'{5 * t},' + ','.join(str(valor) for valor in linha) + '\n')
+
+        entradas = self.caminho('input_files_config_rain_inte.txt')
+        with open(entradas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Selected input file directory\nwatershed,{bacia}\nrain_gauges,{postos}\n')
+            arquivo.write(f'rainfall_data,{dados}\nmap_condiction,{condicao_mapas}')
+        saidas = self.caminho('output_files_config_rain_inte.txt')
+        with open(saidas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Select output file directory\nrainfall_interpolated_file,{self.caminho("chuva.bin")}\n')
+            arquivo.write(f'rainfall_interpolated_maps_path,{self.caminho("maps")}')
+        executa_rainfall_interpolation(entradas, saidas, pasta_cache)
+
+    def test_interpolated_file(self):
+        """The .bin file has the hyetograph layout and the IDW values of every watershed pixel."""
+        self.executa(0)
+        (n_pixels, n_blocos, discretizacao, duracao), valores = le_hietogramas(self.caminho('chuva.bin'))
+        self.assertEqual((n_pixels, n_blocos, discretizacao, duracao), (8, 4, 5.0, 20.0))
+        for i, (lin, col) in enumerate(zip(*np.nonzero(BACIA))):
+            esperado = [idw_pixel(1050 + 100 * col, 5250 - 100 * lin, linha) for linha in CHUVA]
+            np.testing.assert_allclose(valores[i], esperado, rtol=1e-6, atol=1e-6)
+        # O posto P2 esta no centro do pixel (1, 1): recebe todo o peso
+        np.testing.assert_allclose(valores[4], CHUVA[:, 1])
+        del valores
+
+    def test_missing_data(self):
+        """Steps with missing gauges use only the reporting ones, grouped by availability pattern."""
+        # Falhas: campo vazio, -999 (P2 esta no centro do pixel (1, 1)) e todos os postos sem dados
+        linhas = [[0.0, 2.0, 4.0], [5.5, 1.0, ''], [3.0, -999, 9.0], ['', '', ''], [1.0, -999, 2.0], [1.0, 2.0, 4.0]]
+        chuva = np.array([[np.nan if valor == '' or valor == -999 else valor for valor in linha] for linha in linhas])
+        for condicao_mapas in (0, 1):
+            self.executa(condicao_mapas, linhas=linhas)
+        _, valores = le_hietogramas(self.caminho('chuva.bin'))
+        for i, (lin, col) in enumerate(zip(*np.nonzero(BACIA))):
+            esperado = [idw_pixel(1050 + 100 * col, 5250 - 100 * lin, linha) for linha in chuva]
+            np.testing.assert_allclose(valores[i], esperado, rtol=1e-6, atol=1e-6)
+        self.assertTrue(np.all(valores[:, 3] == 0))
+        del valores
+        for t, linha in enumerate(chuva, start=1):
+            mapa = np.loadtxt(self.caminho(os.path.join('maps', f'rainfall_{t}.asc')), skiprows=5)
+            self.assertAlmostEqual(mapa[1, 1], idw_pixel(1150, 5150, linha), places=3)
+
+    def test_availability_lru(self):
+        """The normalization of each availability pattern is computed once and the least recently used is dropped."""
+        postos = np.array(list(POSTOS.values()))
+        pixels = np.array([[1050.0, 5250.0], [1150.0, 5150.0]])
+        disponibilidade = PesosDisponibilidade(pesos_idw(pixels, postos), lambda linhas: pixels[linhas], postos, 2)
+        padroes = [np.array(padrao) for padrao in ([False, True, True], [True, False, True], [True, True, False])]
+        primeiro = disponibilidade.normalizacao(padroes[0])
+        self.assertIs(disponibilidade.normalizacao(padroes[0]), primeiro)
+        # O pixel 1 esta no centro do posto P2 (primeiro posto, indisponivel no primeiro padrao)
+        np.testing.assert_array_equal(primeiro[1], [1])
+        np.testing.assert_allclose(primeiro[2].sum(axis=1), 1.0)
+        disponibilidade.normalizacao(padroes[1])
+        disponibilidade.normalizacao(padroes[2])
+        self.assertIsNot(disponibilidade.normalizacao(padroes[0]), primeiro)
+
+    def test_maps(self):
+        """map_condiction = 1 writes one ASCII grid per time step."""
+        self.executa(1)
+        for t, linha in enumerate(CHUVA, start=1):
+            mapa = np.loadtxt(self.caminho(os.path.join('maps', f'rainfall_{t}.asc')), skiprows=5)
+            self.assertAlmostEqual(mapa[0, 2], idw_pixel(1250, 5250, linha), places=3)
+            self.assertEqual(mapa[0, 0], 0.0)
+        self.assertFalse(os.path.exists(self.caminho('chuva.bin')))
+
+    def test_weights_cache(self):
+        """A second run reuses the stored weights and gives the same file; moving a gauge replaces the entry."""
+        pasta_cache = self.caminho('weights')
+        self.executa(0)
+        with open(self.caminho('chuva.bin'), 'rb') as arquivo:
+            esperado = arquivo.read()
+        for _ in range(2):
+            self.executa(0, pasta_cache)
+            with open(self.caminho('chuva.bin'), 'rb') as arquivo:
+                self.assertEqual(arquivo.read(), esperado)
+        matrizes = [arquivo for arquivo in os.listdir(pasta_cache) if arquivo.endswith('.npy')]
+        self.assertEqual(len(matrizes), 1)
+
+        POSTOS['P3'] = (1700.0, 4900.0)
+        try:
+            self.executa(0, pasta_cache)
+        finally:
+            POSTOS['P3'] = (1600.0, 4900.0)
+        novas = [arquivo for arquivo in os.listdir(pasta_cache) if arquivo.endswith('.npy')]
+        self.assertEqual(len(novas), 1)
+        self.assertNotEqual(novas, matrizes)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(RainfallInterpolationTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,174 @@
+# coding=utf-8
+"""Raster conversion test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from osgeo import gdal, gdalconst
+
+from modulos_files.raster_conversion import (
+    converte_geotiff_rst, converte_rst_geotiff, executa_em_paralelo, itera_blocos, janela_bacia)
+from modulos_files.rst_io import escreve_rst_ascii, escreve_rst_binario, le_rdc, le_rst
+
+GEOTRANSFORM = (500000.0, 30.0, 0.0, 9200000.0, 0.0, -30.0)
+
+
+class RasterConversionTest(unittest.TestCase):
+    """Test the GeoTIFF -> .rst conversion and the parallel runner."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def cria_geotiff(self, nome, dados, tipo=gdalconst.GDT_Int32):
+        caminho = os.path.join(self.pasta.name, nome)
+        dataset = gdal.GetDriverByName('GTiff').Create(caminho, dados.shape[1], dados.shape[0], 1, tipo)
+        dataset.SetGeoTransform(GEOTRANSFORM)
+        dataset.GetRasterBand(1).WriteArray(dados)
+        dataset = None
+        return caminho
+
+    def test_conversion(self):
+        """The .rst keeps the values and the .rdc describes the grid."""
+        dados = np.array([[0, 1, 1], [2, 2, 0]])
+        origem = self.cria_geotiff('classes.tif', dados)
+        destino = os.path.join(self.pasta.name, 'classes.rst')
+
+        for formato in ('ascii', 'binary'):
+            info = converte_geotiff_rst(origem, destino, 'int', 'y', formato)
+            self.assertEqual((info.nlin, info.ncol), (2, 3))
+            self.assertEqual(info.x_max, 500090.0)
+            self.assertEqual(info.y_min, 9199940.0)
+            rdc = le_rdc(destino.replace('.rst', '.rdc'))
+            self.assertEqual(rdc['watershed_classes'], '2')
+            self.assertEqual(rdc.get('file_format', 'ascii'), formato)
+            np.testing.assert_array_equal(le_rst(destino, 2, 3, 'int'), dados)
+
+    def test_strip_reading(self):
+        """Reading in row strips gives the same files as a single strip."""
+        dados = np.random.default_rng(3).integers(0, 50, (11, 7)).astype(np.int32)
+        origem = self.cria_geotiff('classes.tif', dados)
+        banda = gdal.Open(origem).GetRasterBand(1)
+        faixas = list(itera_blocos(banda, janela=(1, 2, 5, 8), linhas=3))
+        self.assertEqual([faixa.shape for faixa in faixas], [(3, 5), (3, 5), (2, 5)])
+        np.testing.assert_array_equal(np.vstack(faixas), dados[2:10, 1:6])
+
+        for formato in ('ascii', 'binary'):
+            inteiro = os.path.join(self.pasta.name, 'inteiro.rst')
+            faixas = os.path.join(self.pasta.name, 'faixas.rst')
+            converte_geotiff_rst(origem, inteiro, 'int', 'y', formato, linhas=100)
+            converte_geotiff_rst(origem, faixas, 'int', 'y', formato, linhas=2)
+            for extensao in ('.rst', '.rdc'):
+                with open(inteiro.replace('.rst', extensao), 'rb') as f1, \
+                        open(faixas.replace('.rst', extensao), 'rb') as f2:
+                    self.assertEqual(f1.read(), f2.read())
+            # Int32 com valores pequenos continua sendo gravado como int16
+            self.assertEqual(le_rdc(faixas.replace('.rst', '.rdc')).get('data_type', 'int16'), 'int16')
+
+    def test_output_round_trip(self):
+        """An engine output (.rst) is written back to GeoTIFF on the input grid."""
+        dados = np.arange(12, dtype=np.float32).reshape(3, 4) / 8
+        origem = self.cria_geotiff('mapa.tif', dados, gdalconst.GDT_Float32)
+        arquivo_rst = os.path.join(self.pasta.name, 'mapa.rst')
+        info = converte_geotiff_rst(origem, arquivo_rst, 'float')
+
+        arquivo_tif = os.path.join(self.pasta.name, 'saida.tif')
+        self.assertEqual(converte_rst_geotiff(arquivo_rst, arquivo_tif, 'float', info), arquivo_tif)
+        saida = gdal.Open(arquivo_tif)
+        self.assertEqual(saida.GetGeoTransform(), GEOTRANSFORM)
+        np.testing.assert_array_equal(saida.GetRasterBand(1).ReadAsArray(), dados)
+
+    def test_output_data_types(self):
+        """Integer outputs use the smallest type that keeps their values."""
+        info = converte_geotiff_rst(self.cria_geotiff('grade.tif', np.zeros((2, 3), dtype=np.int32)),
+                                    os.path.join(self.pasta.name, 'grade.rst'), 'int')
+        casos = [
+            ([[0, 1, 2], [255, 3, 4]], gdalconst.GDT_Byte),
+            ([[0, 1, 2], [256, 3, 60000]], gdalconst.GDT_UInt16),
+            ([[-1, 1, 2], [300, 3, 4]], gdalconst.GDT_Int16),
+            ([[-1, 1, 2], [70000, 3, 4]], gdalconst.GDT_Int32),
+        ]
+        for formato in ('ascii', 'binary'):
+            for valores, tipo in casos:
+                dados = np.array(valores)
+                arquivo_rst = os.path.join(self.pasta.name, 'saida.rst')
+                arquivo_rdc = arquivo_rst.replace('.rst', '.rdc')
+                if formato == 'binary':
+                    data_type = escreve_rst_binario(arquivo_rst, dados, 'int')
+                    with open(arquivo_rdc, 'w', encoding='utf-8') as rdc:
+                        rdc.write(f'Raster Informations\nfile_format,binary\ndata_type,{data_type}\n')
+                else:
+                    escreve_rst_ascii(arquivo_rst, dados, 'int')
+                    if os.path.isfile(arquivo_rdc):
+                        os.remove(arquivo_rdc)
+
+                arquivo_tif = os.path.join(self.pasta.name, 'saida.tif')
+                converte_rst_geotiff(arquivo_rst, arquivo_tif, 'int', info)
+                banda = gdal.Open(arquivo_tif).GetRasterBand(1)
+                self.assertEqual(banda.DataType, tipo)
+                np.testing.assert_array_equal(banda.ReadAsArray(), dados)
+                banda = None
+
+    def test_crop_to_watershed(self):
+        """Inputs are cropped to the watershed box and outputs are pasted back into the full grid."""
+        bacia = np.zeros((8, 10), dtype=np.int32)
+        bacia[3:5, 4:7] = 1
+        arquivo_bacia = self.cria_geotiff('bacia.tif', bacia)
+        self.assertEqual(janela_bacia(arquivo_bacia, margem=1), (3, 2, 5, 4))
+        self.assertEqual(janela_bacia(arquivo_bacia, margem=50), (0, 0, 10, 8))
+        self.assertIsNone(janela_bacia(self.cria_geotiff('vazia.tif', np.zeros((2, 2), dtype=np.int32))))
+
+        dados = np.arange(80, dtype=np.float32).reshape(8, 10)
+        origem = self.cria_geotiff('mapa.tif', dados, gdalconst.GDT_Float32)
+        arquivo_rst = os.path.join(self.pasta.name, 'mapa.rst')
+        info = converte_geotiff_rst(origem, arquivo_rst, 'float', janela=(3, 2, 5, 4))
+        self.assertEqual((info.nlin, info.ncol), (4, 5))
+        self.assertEqual(info.geotransform[0], GEOTRANSFORM[0] + 3 * 30.0)
+        self.assertEqual(info.geotransform[3], GEOTRANSFORM[3] - 2 * 30.0)
+        np.testing.assert_array_equal(le_rst(arquivo_rst, 4, 5, 'float'), dados[2:6, 3:8])
+
+        arquivo_tif = os.path.join(self.pasta.name, 'saida.tif')
+        converte_rst_geotiff(arquivo_rst, arquivo_tif, 'float', info)
+        saida = gdal.Open(arquivo_tif)
+        self.assertEqual(saida.GetGeoTransform(), GEOTRANSFORM)
+        esperado = np.zeros_like(dados)
+        esperado[2:6, 3:8] = dados[2:6, 3:8]
+        np.testing.assert_array_equal(saida.GetRasterBand(1).ReadAsArray(), esperado)
+
+    def test_parallel_errors(self):
+        """Each input is converted and the failures are reported by name."""
+        tarefas = {}
+        for i in range(4):
+            origem = self.cria_geotiff(f'mapa_{i}.tif', np.full((3, 4), i, dtype=np.float32), gdalconst.GDT_Float32)
+            tarefas[f'mapa {i}'] = (origem, os.path.join(self.pasta.name, f'mapa_{i}.rst'), 'float')
+        tarefas['faltando'] = (os.path.join(self.pasta.name, 'nao_existe.tif'),
+                               os.path.join(self.pasta.name, 'faltando.rst'), 'float')
+
+        resultados, erros = executa_em_paralelo(converte_geotiff_rst, tarefas, max_workers=2)
+        self.assertEqual(sorted(resultados), [f'mapa {i}' for i in range(4)])
+        self.assertEqual(list(erros), ['faltando'])
+        for i in range(4):
+            np.testing.assert_array_equal(le_rst(tarefas[f'mapa {i}'][1], 3, 4, 'float'), np.full((3, 4), i))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(RasterConversionTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
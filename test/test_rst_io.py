@@ -0,0 +1,162 @@
+# coding=utf-8
+"""RST exchange files test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.rst_io import (
+    escreve_rst_ascii, escreve_rst_ascii_blocos, escreve_rst_binario, escreve_rst_binario_blocos, le_rdc, le_rst,
+    le_rst_ascii, le_rst_binario)
+
+
+def escreve_valor_a_valor(arquivo, dados, int_float):
+    """Reference writer: one write call per pixel."""
+    with open(arquivo, 'w') as arquivo_ascii:
+        for valor in dados.ravel():
+            if int_float == 'int':
+                arquivo_ascii.write(f'{str(int(valor))}\n')
+            else:
+                arquivo_ascii.write(f'{str(float(valor))}\n')
+
+
+class RstIoTest(unittest.TestCase):
+    """Test the bulk .rst ascii writer."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def assertMesmoArquivo(self, dados, int_float):
+        esperado = os.path.join(self.pasta.name, 'esperado.rst')
+        obtido = os.path.join(self.pasta.name, 'obtido.rst')
+        escreve_valor_a_valor(esperado, dados, int_float)
+        # Blocos pequenos para exercitar a divisao em varios blocos
+        escreve_rst_ascii(obtido, dados, int_float, valores_por_bloco=7)
+        with open(esperado, 'rb') as f1, open(obtido, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_int_mode(self):
+        """Int mode truncates floats and keeps signs like int()."""
+        dados = np.array([[0, -1.7, 2.9], [1e6, -0.0, 3]], dtype=np.float32)
+        self.assertMesmoArquivo(dados, 'int')
+        self.assertMesmoArquivo(np.arange(-20, 20, dtype=np.int16).reshape(5, 8), 'int')
+
+    def test_float_mode(self):
+        """Float mode keeps repr of float32/float64, signed zeros and nan."""
+        dados = np.array([[0.1, -0.0, 0.0, np.nan], [1e-7, 3e20, np.inf, -2.5]], dtype=np.float32)
+        self.assertMesmoArquivo(dados, 'float')
+        self.assertMesmoArquivo(dados.astype(np.float64) / 3, 'float')
+        classes = np.tile(np.array([30.0, 55.5, -0.0, 0.0], dtype=np.float32), (20, 5))
+        self.assertMesmoArquivo(classes, 'float')
+
+    def test_int_mode_nan(self):
+        """Int mode refuses nan like int() does."""
+        arquivo = os.path.join(self.pasta.name, 'nan.rst')
+        with self.assertRaises(ValueError):
+            escreve_rst_ascii(arquivo, np.array([[1.0, np.nan]]), 'int')
+
+    def test_read_round_trip(self):
+        """The bulk reader rebuilds the grid written by the writer."""
+        arquivo = os.path.join(self.pasta.name, 'mapa.rst')
+        dados = np.random.default_rng(1).random((6, 9)) * 100
+        escreve_rst_ascii(arquivo, dados, 'float')
+        lido = le_rst_ascii(arquivo, 6, 9, 'float', bytes_por_leitura=16)
+        np.testing.assert_array_equal(lido, dados)
+
+        escreve_rst_ascii(arquivo, dados, 'int')
+        lido = le_rst_ascii(arquivo, 6, 9, 'int')
+        np.testing.assert_array_equal(lido, np.trunc(dados))
+
+    def test_read_header(self):
+        """Header lines are skipped before the values."""
+        arquivo = os.path.join(self.pasta.name, 'mapa.asc')
+        with open(arquivo, 'w') as f:
+            f.write('ncols 2\nnrows 2\nxll 0\nyll 0\ncellsize 1\nnodata -9999\n1.5\n2\n3\n4\n\n')
+        lido = le_rst_ascii(arquivo, 2, 2, 'float', linhas_cabecalho=6)
+        np.testing.assert_array_equal(lido, [[1.5, 2], [3, 4]])
+
+    def test_read_count_mismatch(self):
+        """A value count different from nlin*ncol fails with a clear error."""
+        arquivo = os.path.join(self.pasta.name, 'mapa.rst')
+        escreve_rst_ascii(arquivo, np.arange(10).reshape(2, 5), 'int')
+        with self.assertRaisesRegex(ValueError, '10 values'):
+            le_rst_ascii(arquivo, 3, 5, 'int')
+        with self.assertRaisesRegex(ValueError, 'more values'):
+            le_rst_ascii(arquivo, 3, 3, 'int')
+
+    def test_binary_round_trip(self):
+        """Binary files use the smallest lossless type and read back unchanged."""
+        arquivo = os.path.join(self.pasta.name, 'mapa.rst')
+        classes = np.array([[0, 1, 2], [-3, 200, 7]], dtype=np.int32)
+        self.assertEqual(escreve_rst_binario(arquivo, classes, 'int'), 'int16')
+        self.assertEqual(os.path.getsize(arquivo), classes.size * 2)
+        np.testing.assert_array_equal(le_rst_binario(arquivo, 2, 3, 'int16'), classes)
+
+        grandes = np.array([[1.9, -70000.5]])
+        self.assertEqual(escreve_rst_binario(arquivo, grandes, 'int'), 'int32')
+        np.testing.assert_array_equal(le_rst_binario(arquivo, 1, 2, 'int32'), [[1, -70000]])
+
+        reais = np.array([[0.1, np.nan], [-2.5, 1e20]])
+        self.assertEqual(escreve_rst_binario(arquivo, reais, 'float'), 'float32')
+        np.testing.assert_array_equal(
+            le_rst_binario(arquivo, 2, 2, 'float32'), reais.astype(np.float32))
+
+        with self.assertRaisesRegex(ValueError, 'bytes'):
+            le_rst_binario(arquivo, 3, 2, 'float32')
+
+    def test_strips(self):
+        """Writing row strips gives the same files as writing the whole grid."""
+        dados = np.random.default_rng(2).integers(-300, 300, (7, 5))
+        faixas = [dados[0:3], dados[3:6], dados[6:7]]
+        inteiro = os.path.join(self.pasta.name, 'inteiro.rst')
+        partes = os.path.join(self.pasta.name, 'partes.rst')
+
+        escreve_rst_ascii(inteiro, dados, 'int')
+        escreve_rst_ascii_blocos(partes, iter(faixas), 'int', valores_por_bloco=4)
+        with open(inteiro, 'rb') as f1, open(partes, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        escreve_rst_binario(inteiro, dados, 'int')
+        escreve_rst_binario_blocos(partes, iter(faixas), 'int', 'int16')
+        with open(inteiro, 'rb') as f1, open(partes, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        with self.assertRaisesRegex(ValueError, 'int16'):
+            escreve_rst_binario_blocos(partes, [dados, np.array([[40000]])], 'int', 'int16')
+
+    def test_read_from_rdc(self):
+        """le_rst follows the format declared in the .rdc and falls back to ascii."""
+        arquivo = os.path.join(self.pasta.name, 'mapa.rst')
+        dados = np.arange(6, dtype=np.float64).reshape(2, 3) / 4
+        escreve_rst_ascii(arquivo, dados, 'float')
+        np.testing.assert_array_equal(le_rst(arquivo, 2, 3, 'float'), dados)
+
+        tipo = escreve_rst_binario(arquivo, dados, 'float')
+        with open(os.path.join(self.pasta.name, 'mapa.rdc'), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,2\nColumns,3\nfile_format,binary\ndata_type,{tipo}\n')
+        self.assertEqual(le_rdc(os.path.join(self.pasta.name, 'mapa.rdc'))['data_type'], 'float32')
+        np.testing.assert_array_equal(le_rst(arquivo, 2, 3, 'float'), dados)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(RstIoTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,112 @@
+# coding=utf-8
+"""Run workspace test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from modulos_files.scratch_workspace import (
+    ARQUIVO_ESTADO, ESTADO_EXECUTANDO, ESTADO_FALHOU, SUBPASTAS, VARIAVEL_RAIZ, AreaTrabalho, LimpezaAreas,
+    PoliticaRetencao, areas_expiradas, processo_ativo, raiz_trabalho)
+
+
+class ScratchWorkspaceTest(unittest.TestCase):
+    """Test the per-run scratch folders and their retention policy."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.raiz = os.path.join(self.pasta.name, 'runs')
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def envelhece(self, area, segundos):
+        instante = time.time() - segundos
+        os.utime(area.caminho(ARQUIVO_ESTADO), (instante, instante))
+
+    def abandona(self, area):
+        """Leaves the workspace in the running state of a process that has already finished."""
+        processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+        processo.wait()
+        self.assertFalse(processo_ativo(processo.pid))
+        with open(area.caminho(ARQUIVO_ESTADO), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'{ESTADO_EXECUTANDO},{processo.pid}')
+
+    def test_isolated_workspaces(self):
+        """Each run gets its own empty folder, with the subfolders used by the engines."""
+        primeira = AreaTrabalho.cria(self.raiz, 'flow_tt')
+        segunda = AreaTrabalho.cria(self.raiz, 'flow_tt')
+        self.assertNotEqual(primeira.pasta, segunda.pasta)
+        self.assertEqual(os.path.dirname(primeira.pasta), self.raiz)
+        self.assertEqual(primeira.estado, ESTADO_EXECUTANDO)
+        self.assertTrue(all(os.path.isdir(primeira.caminho(subpasta)) for subpasta in SUBPASTAS))
+
+        self.assertEqual(raiz_trabalho('/scratch', '/padrao'), '/scratch')
+        antiga = os.environ.pop(VARIAVEL_RAIZ, None)
+        try:
+            self.assertEqual(raiz_trabalho('', '/padrao'), '/padrao')
+            os.environ[VARIAVEL_RAIZ] = '/dev/shm/hidropixel'
+            self.assertEqual(raiz_trabalho('', '/padrao'), '/dev/shm/hidropixel')
+        finally:
+            os.environ.pop(VARIAVEL_RAIZ, None)
+            if antiga is not None:
+                os.environ[VARIAVEL_RAIZ] = antiga
+
+    def test_retention_policy(self):
+        """Finished runs are removed, only the latest failures are kept and abandoned runs expire; runs whose process
+        is still alive are kept, however old."""
+        limpeza = LimpezaAreas(self.raiz, PoliticaRetencao(manter_falhas=2, idade_maxima=3600))
+        concluida = limpeza.nova_area('exc_rain')
+        falhas = [limpeza.nova_area('exc_rain') for _ in range(3)]
+        for idade, area in zip((30, 20, 10), falhas):
+            area.define_estado(ESTADO_FALHOU)
+            self.envelhece(area, idade)
+        executando = limpeza.nova_area('flow_rout')
+        self.envelhece(executando, 7200)
+        abandonada = limpeza.nova_area('flow_rout')
+        self.abandona(abandonada)
+        self.envelhece(abandonada, 7200)
+        externa = os.path.join(self.raiz, 'nao_e_area')
+        os.makedirs(externa)
+
+        self.assertEqual(sorted(areas_expiradas(self.raiz, limpeza.politica)),
+                         sorted([falhas[0].pasta, abandonada.pasta]))
+        removidas = limpeza.libera(concluida, True).result()
+        limpeza.encerra()
+        self.assertEqual(sorted(removidas), sorted([concluida.pasta, falhas[0].pasta, abandonada.pasta]))
+        self.assertEqual(sorted(os.listdir(self.raiz)), sorted(os.path.basename(pasta) for pasta in (
+            falhas[1].pasta, falhas[2].pasta, executando.pasta, externa)))
+
+    def test_keep_finished_runs(self):
+        """With manter_concluidas the folders of the finished runs are kept until they expire."""
+        limpeza = LimpezaAreas(self.raiz, PoliticaRetencao(manter_concluidas=True, idade_maxima=60))
+        area = limpeza.nova_area('rain_inte')
+        with open(area.caminho('progress.txt'), 'w', encoding='utf-8') as arquivo:
+            arquivo.write('interpolation,2,2,1,1,0.5\n')
+        self.assertEqual(limpeza.libera(area, True).result(), [])
+        self.envelhece(area, 120)
+        self.assertEqual(limpeza.agenda().result(), [area.pasta])
+        limpeza.encerra()
+        self.assertFalse(os.path.exists(area.pasta))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ScratchWorkspaceTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
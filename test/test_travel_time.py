@@ -0,0 +1,200 @@
+# coding=utf-8
+"""Native travel time engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.engine_io import le_mapa
+from modulos_files.flow_graph import DESLOCAMENTOS, GrafoFluxo
+from modulos_files.rst_io import escreve_rst_ascii, escreve_rst_binario
+from modulos_files.travel_time import executa_travel_time
+
+# Codigos das direcoes no padrao do ArcGIS (A = nordeste, em sentido horario)
+CODIGOS = {'A': 128, 'B': 1, 'C': 2, 'D': 4, 'E': 8, 'F': 16, 'G': 32, 'H': 64}
+
+# Bacia 3x4: o rio (linha 1) escoa para leste ate o exutorio (1, 3); as linhas 0 e 2 escoam para o rio
+DIRECOES = np.array([[4, 4, 4, 4], [1, 1, 1, 1], [64, 64, 64, 64]])
+RIO = np.array([[0, 0, 0, 0], [1, 1, 1, 1], [0, 0, 0, 0]])
+MDE = np.array([[13.0, 12.0, 11.0, 10.0], [10.0, 9.0, 8.0, 7.0], [13.0, 12.0, 11.0, 10.0]])
+AREA_DRENAGEM = np.array([[0.0, 0.0, 0.0, 0.0], [1.0, 2.0, 4.0, 8.0], [0.0, 0.0, 0.0, 0.0]])
+MANNING_LAMINA, P24 = 0.1, 80.0
+
+
+def tempo_lamina_horas(comprimento, declividade):
+    """TR-55 sheet flow time (h)."""
+    return 0.0913 * (MANNING_LAMINA * comprimento) ** 0.8 / (P24 ** 0.5 * declividade ** 0.4)
+
+
+class FlowGraphTest(unittest.TestCase):
+    """Test the topologically ordered downstream graph."""
+
+    def test_accumulation(self):
+        """Accumulating along the levels matches walking the path of each pixel."""
+        rng = np.random.default_rng(3)
+        codigos = {codigo: DESLOCAMENTOS[letra] for letra, codigo in CODIGOS.items()}
+        # Direcoes aleatorias sem ciclos: todos os pixels escoam para o sul, sudeste ou sudoeste
+        direcoes = rng.choice([2, 4, 8], size=(12, 9))
+        bacia = rng.random((12, 9)) > 0.2
+        grafo = GrafoFluxo(direcoes, bacia, codigos, 30.0, 30.0)
+        valores = rng.random(grafo.n)
+
+        acumulado = grafo.acumula_jusante(valores)
+        for pixel in range(grafo.n):
+            esperado, atual = 0.0, pixel
+            while atual >= 0:
+                esperado += valores[atual]
+                atual = grafo.jusante[atual]
+            self.assertAlmostEqual(acumulado[pixel], esperado)
+        self.assertEqual(sum(nivel.size for nivel in grafo.niveis), grafo.n)
+
+    def test_loops(self):
+        """Flow directions with loops are rejected."""
+        codigos = {codigo: DESLOCAMENTOS[letra] for letra, codigo in CODIGOS.items()}
+        with self.assertRaises(ValueError):
+            GrafoFluxo(np.array([[1, 16]]), np.ones((1, 2), dtype=bool), codigos, 30.0, 30.0)
+
+
+class TravelTimeTest(unittest.TestCase):
+    """Test the native travel time engine on a small synthetic watershed."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, nome)
+
+    def escreve_mapa(self, nome, dados, file_type, formato):
+        arquivo = self.caminho(nome)
+        with open(arquivo.replace('.rst', '.rdc'), 'w', encoding='utf-8') as rdc:
+            rdc.write(f'Raster Informations\nRows,{dados.shape[0]}\nColumns,{dados.shape[1]}\nresolution,30.0\n')
+            if formato == 'binary':
+                rdc.write(f'file_format,binary\ndata_type,{escreve_rst_binario(arquivo, dados, file_type)}\n')
+        if formato == 'ascii':
+            escreve_rst_ascii(arquivo, dados, file_type)
+        return arquivo
+
+    def executa(self, formato, curva_regional, exutorios='0'):
+        """Writes the inputs like run_process_flow_tt and runs the engine."""
+        entradas = {
+            'watershed': self.escreve_mapa('Watershed.rst', np.ones((3, 4), dtype=int), 'int', formato),
+            'DEM': self.escreve_mapa('DEM.rst', MDE, 'float', formato),
+            'Flow_Dir': self.escreve_mapa('Flow_Dir.rst', DIRECOES, 'int', formato),
+            'DA_km2': self.escreve_mapa('DA_km2.rst', AREA_DRENAGEM, 'float', formato),
+            'drainage': self.escreve_mapa('drainage.rst', RIO, 'int', formato),
+            'LULC': self.escreve_mapa('LULC.rst', np.ones((3, 4), dtype=int), 'int', formato),
+        }
+        if not curva_regional:
+            entradas['river_segments'] = self.escreve_mapa('river_segments.rst', RIO, 'int', formato)
+            entradas['segment_characteristics'] = self.caminho('segment_characteristics.txt')
+            with open(entradas['segment_characteristics'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write('Class,Hydraulic radius,Manning,Slope\n1,0.5,0.04,0.01\n')
+        entradas['surface_roughness'] = self.caminho('surface_roughness.txt')
+        with open(entradas['surface_roughness'], 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Class,Name,Manning,k\n1,Forest,{MANNING_LAMINA},5.0\n')
+
+        entradas['parameters'] = self.caminho('parameters_flow_tt.txt')
+        with open(entradas['parameters'], 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Regional curve method is checked,{1 if curva_regional else 0}\n')
+            arquivo.write('Manning coefficient for river segments without cross-section information,0.05\n')
+            arquivo.write('Sheet flow lenght (m),30.48\n')
+            arquivo.write(f'P24 - Rainfall depth for 24-hour duration and 2-year return period (mm),{P24}\n')
+            arquivo.write('Mean depth of lake or reservoir (m),5\n')
+            arquivo.write('Regional curve coefficient c,2.0\nRegional curve coefficient d,0.5\n')
+            arquivo.write('Regional curve coefficient g,4.0\nRegional curve coefficient h,0.25\n')
+            arquivo.write('Maximum river segment lenght for river segments without cross-section information (m),60\n')
+            arquivo.write('Minimum slope,0.001')
+
+        arquivo_entradas = self.caminho('input_files_config_flow_tt.txt')
+        with open(arquivo_entradas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Selected input file directory\n')
+            for nome, diretorio in entradas.items():
+                arquivo.write(f'1,{nome},{diretorio}\n')
+            arquivo.write('0,reservoirs,\n')
+            if formato == 'binary':
+                arquivo.write('exchange_format,binary')
+
+        nomes = ('Slope', 'river_segments', 'River_cross-sectional_area', 'River_bankfull_width', 'Flow_travel_time')
+        arquivo_saidas = self.caminho('output_files_config_flow_tt.txt')
+        with open(arquivo_saidas, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Select output file directory\n')
+            for nome in nomes:
+                arquivo.write(f'1,{nome},{self.caminho(f"saida_{nome}.rst")}\n')
+            arquivo.write(f'1,Hydraulic_radius-roughness_and_slope,{self.caminho("tabela.txt")}')
+            if formato == 'binary':
+                arquivo.write('\nexchange_format,binary')
+
+        arquivo_direcoes = self.caminho('flow_directions_code.txt')
+        with open(arquivo_direcoes, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('Flow direction,Code\n')
+            arquivo.writelines(f'{letra},{codigo}\n' for letra, codigo in CODIGOS.items())
+        arquivo_exutorios = self.caminho('exutorios.txt')
+        with open(arquivo_exutorios, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(exutorios)
+
+        executa_travel_time(arquivo_entradas, arquivo_saidas, arquivo_direcoes, arquivo_exutorios,
+                            self.caminho('tv_for_each_poi'))
+        return {nome: le_mapa(self.caminho(f'saida_{nome}.rst'), 'int' if nome == 'river_segments' else 'float')
+                for nome in nomes}
+
+    def test_informed_segments(self):
+        """Manning flow in the river and sheet flow on the hillslopes match the hand computation."""
+        velocidade = 0.5 ** (2 / 3) * 0.01 ** 0.5 / 0.04
+        for formato in ('ascii', 'binary'):
+            mapas = self.executa(formato, False, '1\nlin,col\n1,1\n')
+            tempo = mapas['Flow_travel_time']
+            for col in range(4):
+                rio = (4 - col) * 30.0 / velocidade / 60.0
+                self.assertAlmostEqual(tempo[1, col], rio, places=3)
+                # O escoamento em lamina cobre todo o pixel de encosta (30 m) ate o rio
+                encosta = tempo_lamina_horas(30.0, 0.1) * 60.0 + rio
+                self.assertAlmostEqual(tempo[0, col], encosta, places=3)
+                self.assertAlmostEqual(tempo[2, col], encosta, places=3)
+            np.testing.assert_allclose(mapas['Slope'][0], 0.1, rtol=1e-5)
+            self.assertAlmostEqual(mapas['Slope'][1, 3], 0.001, places=6)
+
+            # Ponto de interesse no pixel (1, 1): sub-bacia das colunas 0 e 1
+            pasta = self.caminho('tv_for_each_poi')
+            sub_bacia = le_mapa(os.path.join(pasta, 'sub_watershed_POI_1.rst'), 'int')
+            tempo_poi = le_mapa(os.path.join(pasta, 'travel_time_POI_1.rst'), 'float')
+            np.testing.assert_array_equal(sub_bacia, [[1, 1, 0, 0], [1, 1, 0, 0], [1, 1, 0, 0]])
+            self.assertAlmostEqual(tempo_poi[1, 1], 30.0 / velocidade / 60.0, places=3)
+            self.assertAlmostEqual(tempo_poi[1, 0], 60.0 / velocidade / 60.0, places=3)
+            self.assertEqual(tempo_poi[1, 2], 0.0)
+
+            with open(self.caminho('tabela.txt'), 'r', encoding='utf-8') as arquivo:
+                self.assertEqual(arquivo.read().splitlines()[1].split(','), ['1', '0.5', '0.04', '0.01'])
+
+    def test_regional_curve(self):
+        """Generated segments follow the maximum length and the cross-section follows the regional curves."""
+        mapas = self.executa('ascii', True)
+        np.testing.assert_array_equal(mapas['river_segments'][1], [1, 1, 2, 2])
+        self.assertTrue(np.all(mapas['river_segments'][[0, 2]] == 0))
+        np.testing.assert_allclose(mapas['River_cross-sectional_area'][1], 2.0 * AREA_DRENAGEM[1] ** 0.5, rtol=1e-5)
+        np.testing.assert_allclose(mapas['River_bankfull_width'][1], 4.0 * AREA_DRENAGEM[1] ** 0.25, rtol=1e-5)
+        tempo = mapas['Flow_travel_time'][1]
+        self.assertTrue(np.all(np.diff(tempo) < 0) and tempo[-1] > 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TravelTimeTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
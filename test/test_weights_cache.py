@@ -0,0 +1,84 @@
+# coding=utf-8
+"""Interpolation weights cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'jvds@academico.ufpb.br'
+__date__ = '2023-11-29'
+__copyright__ = 'Copyright 2023, João Vitor & Adriano Rolim'
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modulos_files.weights_cache import WeightsCache
+
+POSTOS = np.array([[1000.0, 5000.0], [1300.0, 5200.0]])
+GRADE = [4, 3, '1000.0', '5300.0', '100.0', '100.0']
+PIXELS = np.array([1, 2, 4, 5])
+
+
+class WeightsCacheTest(unittest.TestCase):
+    """Test the cache of interpolation weight matrices."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.cache = WeightsCache(os.path.join(self.pasta.name, 'weights'))
+        self.origem = WeightsCache.origem('rain_gauges.txt', 'Watershed.rst')
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.pasta.cleanup()
+
+    def arquivos(self):
+        return sorted(arquivo for arquivo in os.listdir(self.cache.pasta) if arquivo.endswith('.npy'))
+
+    def test_hit_and_miss(self):
+        """A stored matrix is returned while the gauges, the grid and the method do not change."""
+        chave = WeightsCache.chave(POSTOS, GRADE, PIXELS, 'IDW', 2.0)
+        self.assertIsNone(self.cache.busca(self.origem, chave))
+
+        pesos = np.random.default_rng(1).random((4, 2))
+        self.cache.armazena(self.origem, chave, pesos)
+        np.testing.assert_array_equal(self.cache.busca(self.origem, chave), pesos)
+        # O indice e recarregado por uma nova instancia (novo processamento)
+        np.testing.assert_array_equal(WeightsCache(self.cache.pasta).busca(self.origem, chave), pesos)
+
+        self.assertNotEqual(chave, WeightsCache.chave(POSTOS + 1.0, GRADE, PIXELS, 'IDW', 2.0))
+        self.assertNotEqual(chave, WeightsCache.chave(POSTOS, GRADE[:2] + ['1030.0'] + GRADE[3:], PIXELS, 'IDW', 2.0))
+        self.assertNotEqual(chave, WeightsCache.chave(POSTOS, GRADE, PIXELS[:3], 'IDW', 2.0))
+        self.assertNotEqual(chave, WeightsCache.chave(POSTOS, GRADE, PIXELS, 'IDW', 3.0))
+
+    def test_stale_eviction(self):
+        """A new key for the same gauge file and watershed removes the previous matrix."""
+        antiga = WeightsCache.chave(POSTOS, GRADE, PIXELS, 'IDW', 2.0)
+        nova = WeightsCache.chave(POSTOS + 1.0, GRADE, PIXELS, 'IDW', 2.0)
+        self.cache.armazena(self.origem, antiga, np.ones((4, 2)))
+        outra_origem = WeightsCache.origem('outros_postos.txt', 'Watershed.rst')
+        self.cache.armazena(outra_origem, antiga, np.ones((4, 2)))
+
+        # Postos alterados: a busca descarta a entrada antiga da origem
+        self.assertIsNone(self.cache.busca(self.origem, nova))
+        self.cache.armazena(self.origem, nova, np.zeros((4, 2)))
+        self.assertEqual(self.arquivos(), sorted([f'{antiga}.npy', f'{nova}.npy']))
+        # A matriz antiga ainda e usada pela outra origem; removida quando ela tambem muda
+        self.cache.armazena(outra_origem, nova, np.zeros((4, 2)))
+        self.assertEqual(self.arquivos(), [f'{nova}.npy'])
+
+        self.assertGreater(self.cache.limpa(), 0)
+        self.assertEqual(self.arquivos(), [])
+        self.assertIsNone(self.cache.busca(self.origem, nova))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(WeightsCacheTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
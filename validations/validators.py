@@ -1,12 +1,15 @@
 # core/validators.py
 import numpy as np
 import struct
-from qgis.core import QgsProject, QgsRasterLayer
+from qgis.core import QgsProject, QgsRasterLayer, QgsRectangle
 from qgis.PyQt.QtWidgets import QMessageBox, QApplication, QProgressDialog
 from qgis.PyQt.QtCore import QByteArray, Qt
 from collections import deque
 import os
 
+# Quantidade aproximada de pixels lidos por vez nas validacoes que percorrem o raster em faixas
+PIXELS_PER_BLOCK = 4 << 20
+
 
 class RasterValidator:
     def __init__(self, hidropixel, dlg_flow_tt, dlg_exc_rain, dlg_flow_rout):
@@ -63,11 +66,44 @@ class RasterValidator:
     def raster_to_array(self, raster_layer):
 
         provider = raster_layer.dataProvider()
-        band = 1  # assuming first band
         extent = raster_layer.extent()
         width = raster_layer.width()
         height = raster_layer.height()
 
+        return self._read_block(provider, extent, width, height)
+
+    def iter_raster_blocks(self, raster_layer, rows_per_block=0):
+        """Yield the raster as strips of whole rows (top to bottom), so that peak memory is bounded by the strip size.
+
+        rows_per_block <= 0 uses the plugin setting, or strips of about PIXELS_PER_BLOCK pixels.
+        """
+        provider = raster_layer.dataProvider()
+        extent = raster_layer.extent()
+        width = raster_layer.width()
+        height = raster_layer.height()
+
+        if rows_per_block <= 0:
+            rows_per_block = getattr(self.hidropixel, 'linhas_por_bloco', 0)
+        if rows_per_block <= 0:
+            rows_per_block = max(1, PIXELS_PER_BLOCK // max(width, 1))
+
+        res_y = extent.height() / height
+        for row in range(0, height, rows_per_block):
+            rows = min(rows_per_block, height - row)
+            strip = QgsRectangle(extent.xMinimum(), extent.yMaximum() - (row + rows) * res_y,
+                                 extent.xMaximum(), extent.yMaximum() - row * res_y)
+            yield self._read_block(provider, strip, width, rows)
+
+    def iter_paired_blocks(self, *raster_layers):
+        """Yield matching strips of rasters with the same dimensions (e.g. basin and CN)."""
+        sizes = {(layer.width(), layer.height()) for layer in raster_layers}
+        if len(sizes) != 1:
+            raise ValueError("Rasters have different dimensions.")
+        return zip(*(self.iter_raster_blocks(layer) for layer in raster_layers))
+
+    def _read_block(self, provider, extent, width, height):
+        band = 1  # assuming first band
+
         # Get the raster block
         block = provider.block(band, extent, width, height)
         if not block or block.isEmpty():
@@ -135,9 +171,10 @@ class RasterValidator:
                 return
 
             layer = self.get_raster_layer_by_name(path)
-            array = self.raster_to_array(layer)
 
-            unique_values = np.unique(array)
+            # Percorre o raster em faixas: guarda apenas os valores distintos
+            unique_values = np.unique(np.concatenate(
+                [np.unique(block) for block in self.iter_raster_blocks(layer)]))
             if not np.all(np.isin(unique_values, [0, 1])):
                 QMessageBox.critical(
                     button,
@@ -171,9 +208,9 @@ class RasterValidator:
                 return
 
             layer = self.get_raster_layer_by_name(name)
-            array = self.raster_to_array(layer)
 
-            if np.any(array < 0):
+            # Percorre o raster em faixas e interrompe na primeira faixa com valores negativos
+            if any(np.any(block < 0) for block in self.iter_raster_blocks(layer)):
                 QMessageBox.critical(
                     self.dlg_flow_tt, "Error", "Invalid DEM: contains negative values.")
                 self.atualizar_label_validacao(self.dlg_flow_tt.label_96, 0)
@@ -553,21 +590,22 @@ class RasterValidator:
             layer_bacia = self.get_raster_layer_by_name(raster_bacia_nome)
             layer_uso = self.get_raster_layer_by_name(raster_uso_nome)
 
-            array_bacia = self.raster_to_array(layer_bacia)
-            array_uso = self.raster_to_array(layer_uso)
+            # Percorre os rasters em faixas: guarda apenas as classes de uso encontradas dentro da bacia
+            classes_faixas = []
+            for array_bacia, array_uso in self.iter_paired_blocks(layer_bacia, layer_uso):
+                # Ensure masked values become zeros for basin
+                array_bacia = np.where(
+                    np.ma.getmaskarray(array_bacia), 0, array_bacia)
+                mask_bacia = array_bacia == 1
 
-            # Ensure masked values become zeros for basin
-            array_bacia = np.where(
-                np.ma.getmaskarray(array_bacia), 0, array_bacia)
-            mask_bacia = array_bacia == 1
+                # Mask nodata in land use raster
+                # check nodata later
+                array_uso = np.where(np.ma.getmaskarray(
+                    array_uso), -9999, array_uso)
 
-            # Mask nodata in land use raster
-            # check nodata later
-            array_uso = np.where(np.ma.getmaskarray(
-                array_uso), -9999, array_uso)
+                classes_faixas.append(np.unique(array_uso[mask_bacia]))
 
-            valores_uso = array_uso[mask_bacia]
-            valores_unicos = np.unique(valores_uso)
+            valores_unicos = np.unique(np.concatenate(classes_faixas))
 
             valores_invalidos = [
                 v for v in valores_unicos
@@ -684,14 +722,18 @@ class RasterValidator:
                 return
 
             layer = self.get_raster_layer_by_name(nome_raster)
-            array = self.raster_to_array(layer)
 
-            array = array[np.isfinite(array)]
+            # Percorre o raster em faixas: guarda apenas os segmentos distintos
+            unicos_faixas = []
+            for array in self.iter_raster_blocks(layer):
+                array = array[np.isfinite(array)]
+
+                if not np.all(np.equal(np.floor(array), array)):
+                    raise ValueError("Raster contains non-integer values.")
 
-            if not np.all(np.equal(np.floor(array), array)):
-                raise ValueError("Raster contains non-integer values.")
+                unicos_faixas.append(np.unique(array.astype(int)))
 
-            unicos = np.unique(array.astype(int))
+            unicos = np.unique(np.concatenate(unicos_faixas))
             if 0 not in unicos:
                 raise ValueError(
                     "Raster does not contain the value 0 (non-network).")
@@ -937,25 +979,38 @@ class RasterValidator:
             cn_layer = self.get_raster_layer_by_name(nome_cn)
             bacia_layer = self.get_raster_layer_by_name(nome_bacia)
 
-            cn_array = self.raster_to_array(cn_layer)
-            bacia_array = self.raster_to_array(bacia_layer)
+            # Percorre os rasters em faixas: guarda apenas o minimo, o maximo e se ha valores invalidos dentro da bacia
+            todos_finitos = True
+            cn_min, cn_max = np.inf, -np.inf
+            for cn_array, bacia_array in self.iter_paired_blocks(cn_layer, bacia_layer):
+                # Mascara da bacia
+                valores_cn = cn_array[bacia_array == 1]
+                if valores_cn.size == 0:
+                    continue
+                todos_finitos = todos_finitos and bool(np.all(np.isfinite(valores_cn)))
+                cn_min = min(cn_min, np.min(valores_cn))
+                cn_max = max(cn_max, np.max(valores_cn))
 
-            # Mascara da bacia
-            dentro_bacia = (bacia_array == 1)
-            valores_cn = cn_array[dentro_bacia]
+            # Nenhum pixel da bacia encontrado: nao ha valores CN para validar
+            if cn_min > cn_max:
+                QMessageBox.critical(self.dlg_exc_rain, "Error",
+                                     "No basin pixels (value 1) were found to validate the CN raster.")
+                self.atualizar_label_validacao(self.dlg_exc_rain.label_41, 0)
+                self.atualizar_validação("validar_raster_cn", False)
+                return
 
             # Validar valores CN
-            if not np.all(np.isfinite(valores_cn)):
+            if not todos_finitos:
                 QMessageBox.critical(self.dlg_exc_rain, "Error",
                                      "CN raster contains null or non-numeric values inside the basin.")
                 self.atualizar_label_validacao(self.dlg_exc_rain.label_41, 0)
                 self.atualizar_validação("validar_raster_cn", False)
                 return
 
-            if np.any(valores_cn <= 0) or np.any(valores_cn > 100):
+            if cn_min <= 0 or cn_max > 100:
                 QMessageBox.critical(self.dlg_exc_rain, "Error",
                                      f"CN raster contains values out of range (>0 and ≤100). "
-                                     f"Values found: min={np.min(valores_cn)}, max={np.max(valores_cn)}")
+                                     f"Values found: min={cn_min}, max={cn_max}")
                 self.atualizar_label_validacao(self.dlg_exc_rain.label_41, 0)
                 self.atualizar_validação("validar_raster_cn", False)
                 return